@@ -34,6 +34,19 @@ XMLNS_V11 = 'http://docs.openstack.org/compute/api/v1.1'
 XMLNS_COMMON_V10 = 'http://docs.openstack.org/common/api/v1.0'
 XMLNS_ATOM = 'http://www.w3.org/2005/Atom'
 
+# Bumped whenever a template element is modified, so that the compiled
+# form of the templates using it gets rebuilt.
+_template_generation = 0
+
+# Number of sibling combinations compiled for a root template element,
+# i.e. of different sets of attached subordinate templates.
+_MAX_COMPILED_PER_ROOT = 32
+
+
+def _template_changed():
+    global _template_generation
+    _template_generation += 1
+
 
 def validate_schema(xml, schema_name, version='v1.1'):
     if isinstance(xml, str):
@@ -184,6 +197,7 @@ class TemplateElement(object):
         self._text = None
         self._children = []
         self._childmap = {}
+        self._compiled = {}
         self.colon_ns = colon_ns
 
         # Run the incoming attributes through set() so that they
@@ -232,6 +246,7 @@ class TemplateElement(object):
 
         self._children.append(elem)
         self._childmap[elem.tag] = elem
+        _template_changed()
 
     def extend(self, elems):
         """Append children to the element."""
@@ -253,6 +268,7 @@ class TemplateElement(object):
         # Update the children
         self._children.extend(elemlist)
         self._childmap.update(elemmap)
+        _template_changed()
 
     def insert(self, idx, elem):
         """Insert a child element at the given index."""
@@ -266,6 +282,7 @@ class TemplateElement(object):
 
         self._children.insert(idx, elem)
         self._childmap[elem.tag] = elem
+        _template_changed()
 
     def remove(self, elem):
         """Remove a child element."""
@@ -279,6 +296,7 @@ class TemplateElement(object):
 
         self._children.remove(elem)
         del self._childmap[elem.tag]
+        _template_changed()
 
     def get(self, key):
         """Get an attribute.
@@ -309,6 +327,7 @@ class TemplateElement(object):
             value = Selector(value)
 
         self.attrib[key] = value
+        _template_changed()
 
     def keys(self):
         """Return the attribute names."""
@@ -475,9 +494,11 @@ class TemplateElement(object):
             value = Selector(value)
 
         self._text = value
+        _template_changed()
 
     def _text_del(self):
         self._text = None
+        _template_changed()
 
     text = property(_text_get, _text_set, _text_del)
 
@@ -534,6 +555,183 @@ def SubTemplateElement(parent, tag, attrib=None, selector=None,
     return elem
 
 
+def _compile_selector(selector):
+    """Return a faster equivalent of a selector, if it is a known kind."""
+
+    kind = type(selector)
+    if kind is ConstantSelector:
+        value = selector.value
+        return lambda obj, do_raise=False: value
+    elif kind is not Selector:
+        return selector
+
+    chain = selector.chain
+    if not chain:
+        return lambda obj, do_raise=False: obj
+    elif len(chain) > 1 or callable(chain[0]):
+        return selector
+
+    key = chain[0]
+
+    def select(obj, do_raise=False):
+        if obj == '':
+            return ''
+        try:
+            return obj[key]
+        except (KeyError, IndexError):
+            if do_raise:
+                raise KeyError(key)
+            return None
+
+    return select
+
+
+def _overrides(obj, base, name):
+    return getattr(type(obj), name).__func__ is not getattr(base,
+                                                            name).__func__
+
+
+class _CompiledElement(object):
+    """A template element merged with its siblings, ready to render.
+
+    Does what Template._serialize() does with the siblings, but works out
+    their children, the patches to apply and the selectors only once.
+    """
+
+    def __init__(self, siblings):
+        elem = siblings[0]
+        self.elem = elem
+        self.patches = siblings[1:]
+
+        # Elements which change how they render do it by themselves
+        self.custom = (_overrides(elem, TemplateElement, 'render') or
+                       _overrides(elem, TemplateElement, '_render') or
+                       any(_overrides(sibling, TemplateElement, 'apply')
+                           for sibling in siblings))
+        if _overrides(elem, TemplateElement, 'will_render'):
+            self.will_render = elem.will_render
+        else:
+            self.will_render = None
+
+        self.tag = elem.tag
+        self.dyntag = callable(elem.tag)
+        self.colon_ns = elem.colon_ns
+        self.selector = _compile_selector(elem.selector)
+        self.subselector = None
+        if elem.subselector is not None:
+            self.subselector = _compile_selector(elem.subselector)
+
+        # The text and attributes to set, in the order apply() sets them;
+        # the text has no attribute name.
+        ops = []
+        for sibling in siblings:
+            if sibling.text is not None:
+                ops.append((None, _compile_selector(sibling.text)))
+            for key, value in sibling.attrib.items():
+                ops.append((key, _compile_selector(value)))
+        self.ops = tuple(ops)
+
+        children = []
+        seen = set()
+        for idx, sibling in enumerate(siblings):
+            for child in sibling:
+                if child.tag in seen:
+                    continue
+                seen.add(child.tag)
+
+                nieces = [child]
+                for sib in siblings[idx + 1:]:
+                    if child.tag in sib:
+                        nieces.append(sib[child.tag])
+                children.append(_CompiledElement(nieces))
+        self.children = tuple(children)
+
+    def _render(self, parent, datum, nsmap):
+        # See TemplateElement._render() and apply()
+        if self.dyntag:
+            tagname = self.tag(datum)
+        else:
+            tagname = self.tag
+
+        if self.colon_ns:
+            if ':' in tagname:
+                if nsmap is None:
+                    nsmap = {}
+                colon_key, colon_name = tagname.split(':')
+                nsmap[colon_key] = colon_key
+                tagname = '{%s}%s' % (colon_key, colon_name)
+
+        elem = etree.Element(tagname, nsmap=nsmap)
+        if parent is not None:
+            parent.append(elem)
+
+        if datum is None:
+            return elem
+
+        for key, select in self.ops:
+            if key is None:
+                elem.text = unicode(select(datum))
+                continue
+            try:
+                elem.set(key, unicode(select(datum, True)))
+            except KeyError:
+                # Attribute has no value, so don't include it
+                pass
+        return elem
+
+    def _render_all(self, parent, obj, nsmap):
+        # See TemplateElement.render()
+        if self.custom:
+            return self.elem.render(parent, obj, self.patches, nsmap)
+
+        data = None if obj is None else self.selector(obj)
+        if self.will_render is None:
+            if data is None:
+                return []
+        elif not self.will_render(data):
+            return []
+        elif data is None:
+            return [(self._render(parent, None, nsmap), None)]
+
+        if not isinstance(data, list):
+            data = [data]
+        elif parent is None:
+            raise ValueError(_('root element selecting a list'))
+
+        subselector = self.subselector
+        elems = []
+        for datum in data:
+            if subselector is not None:
+                datum = subselector(datum)
+            elems.append((self._render(parent, datum, nsmap), datum))
+        return elems
+
+    def render(self, parent, obj, nsmap=None):
+        """Render obj and its children, returning the first element."""
+
+        elems = self._render_all(parent, obj, nsmap)
+        for child in self.children:
+            for elem, datum in elems:
+                child.render(elem, datum)
+
+        if elems:
+            return elems[0][0]
+
+
+def _compile(siblings):
+    """Return the _CompiledElement for siblings, compiling it once."""
+
+    root = siblings[0]
+    key = tuple(siblings[1:])
+    generation, compiled = root._compiled.get(key, (None, None))
+    if generation != _template_generation:
+        if len(root._compiled) >= _MAX_COMPILED_PER_ROOT:
+            root._compiled.clear()
+        compiled = _CompiledElement(siblings)
+        root._compiled[key] = (_template_generation, compiled)
+    return compiled
+
+
 class Template(object):
     """Represent a template."""
 
@@ -632,7 +830,9 @@ class Template(object):
         nsmap = self._nsmap()
 
         # Form the element tree
-        return self._serialize(None, obj, siblings, nsmap)
+        if _overrides(self, Template, '_serialize'):
+            return self._serialize(None, obj, siblings, nsmap)
+        return _compile(siblings).render(None, obj, nsmap)
 
     def _siblings(self):
         """Hook method for computing root siblings.
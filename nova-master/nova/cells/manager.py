@@ -153,21 +153,34 @@ class CellsManager(manager.Manager):
             return instance
 
         rd_context = ctxt.elevated(read_deleted='yes')
-
-        for i in xrange(CONF.cells.instance_update_num_instances):
-            while True:
-                # Yield to other greenthreads
-                time.sleep(0)
+        num_instances = CONF.cells.instance_update_num_instances
+        instances = []
+
+        while len(instances) < num_instances:
+            # Yield to other greenthreads
+            time.sleep(0)
+            wanted = num_instances - len(instances)
+            instance_uuids = []
+            while len(instance_uuids) < wanted:
                 instance_uuid = _next_instance()
                 if not instance_uuid:
-                    return
-                try:
-                    instance = self.db.instance_get_by_uuid(rd_context,
-                            instance_uuid)
-                except exception.InstanceNotFound:
-                    continue
-                self._sync_instance(ctxt, instance)
+                    break
+                instance_uuids.append(instance_uuid)
+            if not instance_uuids:
                 break
+            # Fetch them all at once, instances gone since the list was
+            # built are skipped and replaced by the next ones.
+            found = dict((instance['uuid'], instance) for instance in
+                         self.db.instance_get_all_by_filters(
+                             rd_context, {'uuid': instance_uuids}))
+            instances.extend(found[instance_uuid]
+                             for instance_uuid in instance_uuids
+                             if instance_uuid in found)
+            if len(instance_uuids) < wanted:
+                break
+
+        for instance in instances:
+            self._sync_instance(ctxt, instance)
 
     def _sync_instance(self, ctxt, instance):
         """Broadcast an instance_update or instance_destroy message up to
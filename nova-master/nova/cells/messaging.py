@@ -24,6 +24,7 @@ The interface into this module is the MessageRunner class.
 """
 import sys
 
+import eventlet
 from eventlet import queue
 from oslo.config import cfg
 
@@ -58,7 +59,16 @@ cell_messaging_opts = [
             help='Maximum number of hops for cells routing.'),
     cfg.StrOpt('scheduler',
             default='nova.cells.scheduler.CellsScheduler',
-            help='Cells scheduler to use')]
+            help='Cells scheduler to use'),
+    cfg.FloatOpt('instance_update_batch_window',
+            default=0.0,
+            help='Number of seconds during which instance updates, '
+                 'destroys and faults going to the top level cell are '
+                 'collected and sent together as a single message per '
+                 'kind.  Several updates of the same instance within the '
+                 'window are merged.  0 sends each of them right away.  '
+                 'Only enable this once all the cells above understand '
+                 'batched messages.')]
 
 CONF = cfg.CONF
 CONF.import_opt('name', 'nova.cells.opts', group='cells')
@@ -1064,6 +1074,32 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         except exception.InstanceNotFound:
             pass
 
+    def instances_update_at_top(self, message, instances, **kwargs):
+        """Update a batch of instances in the DB if we're a top level
+        cell.
+        """
+        if not self._at_the_top():
+            return
+        for instance in instances:
+            try:
+                self.instance_update_at_top(message, instance)
+            except Exception:
+                LOG.exception(_("Failed to update instance at top"),
+                              instance_uuid=instance['uuid'])
+
+    def instances_destroy_at_top(self, message, instances, **kwargs):
+        """Destroy a batch of instances from the DB if we're a top level
+        cell.
+        """
+        if not self._at_the_top():
+            return
+        for instance in instances:
+            try:
+                self.instance_destroy_at_top(message, instance)
+            except Exception:
+                LOG.exception(_("Failed to destroy instance at top"),
+                              instance_uuid=instance['uuid'])
+
     def instance_delete_everywhere(self, message, instance, delete_type,
                                    **kwargs):
         """Call compute API delete() or soft_delete() in every cell.
@@ -1090,6 +1126,21 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         LOG.debug(log_str, {'instance_fault': instance_fault})
         self.db.instance_fault_create(message.ctxt, instance_fault)
 
+    def instance_faults_create_at_top(self, message, instance_faults,
+                                      **kwargs):
+        """Create a batch of instance faults in the DB if we're a top level
+        cell.
+        """
+        if not self._at_the_top():
+            return
+        for instance_fault in instance_faults:
+            try:
+                self.instance_fault_create_at_top(message, instance_fault)
+            except Exception:
+                LOG.exception(_("Failed to create instance fault at top"),
+                              instance_uuid=instance_fault.get(
+                                  'instance_uuid'))
+
     def bw_usage_update_at_top(self, message, bw_update_info, **kwargs):
         """Update Bandwidth usage in the DB if we're a top level cell."""
         if not self._at_the_top():
@@ -1224,6 +1275,46 @@ _CELL_MESSAGE_TYPE_TO_METHODS_CLS = {'targeted': _TargetedMessageMethods,
 #
 
 
+class _InstanceSyncBatch(object):
+    """Instance updates, destroys and faults waiting to be sent to the
+    top level cell.
+
+    Updates and destroys are coalesced per instance: the fields of
+    successive updates are merged, and a destroy replaces whatever was
+    pending for the instance, as does an update following a destroy.
+    """
+
+    def __init__(self):
+        self.instances = {}
+        self.uuids = []
+        self.instance_faults = []
+
+    def _set(self, uuid, action, instance):
+        if uuid not in self.instances:
+            self.uuids.append(uuid)
+        self.instances[uuid] = (action, instance)
+
+    def add_update(self, instance):
+        instance = jsonutils.to_primitive(instance)
+        uuid = instance['uuid']
+        pending = self.instances.get(uuid)
+        if pending is not None and pending[0] == 'update':
+            pending[1].update(instance)
+        else:
+            self._set(uuid, 'update', instance)
+
+    def add_destroy(self, instance):
+        instance = jsonutils.to_primitive(instance)
+        self._set(instance['uuid'], 'destroy', instance)
+
+    def add_fault(self, instance_fault):
+        self.instance_faults.append(jsonutils.to_primitive(instance_fault))
+
+    def get_instances(self, action):
+        return [self.instances[uuid][1] for uuid in self.uuids
+                if self.instances[uuid][0] == action]
+
+
 class MessageRunner(object):
     """This class is the main interface into creating messages and
     processing them.
@@ -1256,6 +1347,7 @@ class MessageRunner(object):
         for msg_type, cls in _CELL_MESSAGE_TYPE_TO_METHODS_CLS.iteritems():
             self.methods_by_type[msg_type] = cls(self)
         self.serializer = objects_base.NovaObjectSerializer()
+        self._instance_sync_batch = None
 
     def _process_message_locally(self, message):
         """Message processing will call this when its determined that
@@ -1423,8 +1515,51 @@ class MessageRunner(object):
                                    cell_name, need_response=call)
         return message.process()
 
+    def _get_instance_sync_batch(self):
+        """Return the batch collecting instance updates, destroys and
+        faults, or None if batching is disabled.  Schedule the flush of
+        the batch when it is created.
+        """
+        window = CONF.cells.instance_update_batch_window
+        if window <= 0:
+            return None
+        if self._instance_sync_batch is None:
+            self._instance_sync_batch = _InstanceSyncBatch()
+            eventlet.spawn_after(window, self._flush_instance_sync_batch)
+        return self._instance_sync_batch
+
+    def _flush_instance_sync_batch(self):
+        """Send the pending batch up, with one message per kind."""
+        batch, self._instance_sync_batch = self._instance_sync_batch, None
+        if batch is None:
+            return
+        # NOTE: the batch gathers instances of any project, so it can't be
+        # sent with the context of one of the requests that filled it.
+        ctxt = context.get_admin_context()
+        for method_name, arg_name, items in (
+                ('instances_update_at_top', 'instances',
+                 batch.get_instances('update')),
+                ('instances_destroy_at_top', 'instances',
+                 batch.get_instances('destroy')),
+                ('instance_faults_create_at_top', 'instance_faults',
+                 batch.instance_faults)):
+            if not items:
+                continue
+            try:
+                message = _BroadcastMessage(self, ctxt, method_name,
+                                            {arg_name: items}, 'up',
+                                            run_locally=False)
+                message.process()
+            except Exception:
+                LOG.exception(_("Failed to send %s batch to the top level "
+                                "cell"), method_name)
+
     def instance_update_at_top(self, ctxt, instance):
         """Update an instance at the top level cell."""
+        batch = self._get_instance_sync_batch()
+        if batch is not None:
+            batch.add_update(instance)
+            return
         message = _BroadcastMessage(self, ctxt, 'instance_update_at_top',
                                     dict(instance=instance), 'up',
                                     run_locally=False)
@@ -1432,6 +1567,10 @@ class MessageRunner(object):
 
     def instance_destroy_at_top(self, ctxt, instance):
         """Destroy an instance at the top level cell."""
+        batch = self._get_instance_sync_batch()
+        if batch is not None:
+            batch.add_destroy(instance)
+            return
         message = _BroadcastMessage(self, ctxt, 'instance_destroy_at_top',
                                     dict(instance=instance), 'up',
                                     run_locally=False)
@@ -1451,6 +1590,10 @@ class MessageRunner(object):
 
     def instance_fault_create_at_top(self, ctxt, instance_fault):
         """Create an instance fault at the top level cell."""
+        batch = self._get_instance_sync_batch()
+        if batch is not None:
+            batch.add_fault(instance_fault)
+            return
         message = _BroadcastMessage(self, ctxt,
                                     'instance_fault_create_at_top',
                                     dict(instance_fault=instance_fault),
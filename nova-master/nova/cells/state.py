@@ -28,11 +28,14 @@ from nova.db import base
 from nova import exception
 from nova.openstack.common import fileutils
 from nova.openstack.common.gettextutils import _
+from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
 from nova import utils
 
+numpy = importutils.try_import('numpy')
+
 cell_state_manager_opts = [
         cfg.IntOpt('db_check_interval',
                 default=60,
@@ -54,6 +57,51 @@ CONF.import_opt('mute_child_interval', 'nova.cells.opts', group='cells')
 CONF.register_opts(cell_state_manager_opts, group='cells')
 
 
+def _free_units_by_size(sizes, totals, frees, reserve_level):
+    """Count the units of every size that fit in the free room of the hosts.
+
+    :param sizes: the size of every instance_type, sizes shared by several
+                  instance_types are counted once per instance_type.
+    :param totals: the total amount of the resource of every host.
+    :param frees: the free amount of the resource of every host, in the
+                  same order as totals.
+    :param reserve_level: the fraction of the total of a host that must be
+                          kept free.
+    :returns: a dictionary of the number of units by str(size).
+
+    Each distinct size is computed once, and sizes that are not positive or
+    larger than the free room of every host are known to fit nowhere.  The
+    remaining ones are computed over all hosts at once with numpy when it is
+    available.
+    """
+    counts = {}
+    for size in sizes:
+        counts[size] = counts.get(size, 0) + 1
+    units = dict((str(size), 0) for size in counts)
+
+    if numpy is not None:
+        room = numpy.maximum(0, numpy.array(frees, dtype=numpy.float64) -
+                             numpy.array(totals, dtype=numpy.float64) *
+                             reserve_level)
+        largest = room.max() if len(room) else 0
+        fitting = [size for size in counts if 0 < size <= largest]
+        if fitting:
+            per_size = numpy.array(fitting, dtype=numpy.float64)
+            fits = numpy.floor(room / per_size[:, numpy.newaxis]).sum(axis=1)
+            for size, n in zip(fitting, fits):
+                units[str(size)] = int(n) * counts[size]
+        return units
+
+    room = [max(0, free - total * reserve_level)
+            for total, free in zip(totals, frees)]
+    largest = max(room) if room else 0
+    for size in counts:
+        if 0 < size <= largest:
+            units[str(size)] = counts[size] * sum(int(free / size)
+                                                  for free in room)
+    return units
+
+
 class CellState(object):
     """Holds information for a particular cell."""
     def __init__(self, cell_name, is_me=False):
@@ -267,39 +315,24 @@ class CellStateManager(base.Base):
             self.my_cell_state.update_capacities({})
             return
 
-        ram_mb_free_units = {}
-        disk_mb_free_units = {}
-        total_ram_mb_free = 0
-        total_disk_mb_free = 0
-
-        def _free_units(total, free, per_inst):
-            if per_inst:
-                min_free = total * reserve_level
-                free = max(0, free - min_free)
-                return int(free / per_inst)
-            else:
-                return 0
-
-        def _update_from_values(values, instance_type):
-            memory_mb = instance_type['memory_mb']
-            disk_mb = (instance_type['root_gb'] +
-                    instance_type['ephemeral_gb']) * 1024
-            ram_mb_free_units.setdefault(str(memory_mb), 0)
-            disk_mb_free_units.setdefault(str(disk_mb), 0)
-            ram_free_units = _free_units(compute_values['total_ram_mb'],
-                    compute_values['free_ram_mb'], memory_mb)
-            disk_free_units = _free_units(compute_values['total_disk_mb'],
-                    compute_values['free_disk_mb'], disk_mb)
-            ram_mb_free_units[str(memory_mb)] += ram_free_units
-            disk_mb_free_units[str(disk_mb)] += disk_free_units
+        hosts = compute_hosts.values()
+        total_ram_mb_free = sum(host['free_ram_mb'] for host in hosts)
+        total_disk_mb_free = sum(host['free_disk_mb'] for host in hosts)
 
         instance_types = self.db.flavor_get_all(ctxt)
-
-        for compute_values in compute_hosts.values():
-            total_ram_mb_free += compute_values['free_ram_mb']
-            total_disk_mb_free += compute_values['free_disk_mb']
-            for instance_type in instance_types:
-                _update_from_values(compute_values, instance_type)
+        ram_mb_free_units = _free_units_by_size(
+                [instance_type['memory_mb']
+                 for instance_type in instance_types],
+                [host['total_ram_mb'] for host in hosts],
+                [host['free_ram_mb'] for host in hosts],
+                reserve_level)
+        disk_mb_free_units = _free_units_by_size(
+                [(instance_type['root_gb'] +
+                  instance_type['ephemeral_gb']) * 1024
+                 for instance_type in instance_types],
+                [host['total_disk_mb'] for host in hosts],
+                [host['free_disk_mb'] for host in hosts],
+                reserve_level)
 
         capacities = {'ram_free': {'total_mb': total_ram_mb_free,
                                    'units_by_mb': ram_mb_free_units},
@@ -65,6 +65,7 @@ import six
 from nova.api.ec2 import ec2utils
 from nova import availability_zones
 from nova.cells import rpc_driver
+from nova import compute
 from nova.compute import flavors
 from nova import config
 from nova import context
@@ -82,6 +83,7 @@ from nova import servicegroup
 from nova import version
 
 CONF = cfg.CONF
+CONF.import_opt('auth_strategy', 'nova.api.auth')
 CONF.import_opt('network_manager', 'nova.service')
 CONF.import_opt('service_down_time', 'nova.service')
 CONF.import_opt('flat_network_bridge', 'nova.network.manager')
@@ -873,6 +875,29 @@ class HostCommands(object):
         for h in hosts:
             print("%-25s\t%-15s" % (h['host'], h['availability_zone']))
 
+    @args('--image', dest='image_id', metavar='<image id>', help='Image')
+    @args('--hosts', metavar='<host>[,<host>...]', help='Compute hosts')
+    @args('--token', metavar='<token>',
+          help='Token the compute hosts download the image with, required '
+               'with the keystone auth strategy. It has to stay valid until '
+               'the downloads start.')
+    def prefetch_image(self, image_id, hosts, token=None):
+        """Download an image to the image cache of compute hosts."""
+        if CONF.auth_strategy == 'keystone' and not token:
+            print(_("error: a token is required to download the image "
+                    "with the keystone auth strategy"))
+            return(2)
+        ctxt = context.get_admin_context()
+        ctxt.auth_token = token
+        try:
+            compute.HostAPI().prefetch_image(ctxt, image_id,
+                                             hosts.split(','))
+        except exception.HostNotFound as ex:
+            print(_("error: %s") % ex)
+            return(2)
+        print(_("Prefetching image %(image)s on %(hosts)s.") %
+              {'image': image_id, 'hosts': hosts})
+
 
 class DbCommands(object):
     """Class for managing the database."""
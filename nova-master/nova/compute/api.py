@@ -3047,6 +3047,16 @@ class HostAPI(base.Base):
                                                payload)
         return result
 
+    def prefetch_image(self, context, image_id, host_names):
+        """Downloads an image to the image cache of compute hosts in the
+        background.
+        """
+        host_names = [self._assert_host_exists(context, host_name)
+                      for host_name in host_names]
+        for host_name in host_names:
+            self.rpcapi.prefetch_image(context, image_id=image_id,
+                                       host=host_name)
+
     @wrap_exception()
     def set_host_maintenance(self, context, host_name, mode):
         """Start/Stop host maintenance window. On start, it triggers
@@ -433,7 +433,7 @@ class HostAPI(compute_api.HostAPI):
         """Cannot check this in API cell.  This will be checked in the
         target child cell.
         """
-        pass
+        return host_name
 
     def get_host_uptime(self, context, host_name):
         """Returns the result of calling "uptime" on the target host."""
@@ -416,7 +416,7 @@ class ComputeVirtAPI(virtapi.VirtAPI):
 class ComputeManager(manager.Manager):
     """Manages the running instances from creation to destruction."""
 
-    RPC_API_VERSION = '3.4'
+    RPC_API_VERSION = '3.5'
 
     def __init__(self, compute_driver=None, *args, **kwargs):
         """Load configuration options and connect to the hypervisor."""
@@ -3401,6 +3401,15 @@ class ComputeManager(manager.Manager):
         """Returns the result of calling "uptime" on the target host."""
         return self.driver.get_host_uptime(self.host)
 
+    @wrap_exception()
+    def prefetch_image(self, context, image_id):
+        """Download an image to the image cache of this host."""
+        try:
+            self.driver.prefetch_image(context, image_id)
+        except NotImplementedError:
+            LOG.debug(_('Hypervisor driver does not support image '
+                        'prefetch'))
+
     @wrap_exception()
     @wrap_instance_fault
     def get_diagnostics(self, context, instance):
@@ -4816,33 +4825,54 @@ class ComputeManager(manager.Manager):
                      {'num_db_instances': num_db_instances,
                       'num_vm_instances': num_vm_instances})
 
-        for db_instance in db_instances:
-            if db_instance['task_state'] is not None:
-                LOG.info(_("During sync_power_state the instance has a "
-                           "pending task. Skip."), instance=db_instance)
-                continue
-            # No pending tasks. Now try to figure out the real vm_power_state.
-            try:
-                try:
-                    vm_instance = self.driver.get_info(db_instance)
-                    vm_power_state = vm_instance['state']
-                except exception.InstanceNotFound:
-                    vm_power_state = power_state.NOSTATE
-                # Note(maoy): the above get_info call might take a long time,
-                # for example, because of a broken libvirt driver.
-                try:
-                    self._sync_instance_power_state(context,
-                                                    db_instance,
-                                                    vm_power_state,
-                                                    use_subordinate=True)
-                except exception.InstanceNotFound:
-                    # NOTE(hanlind): If the instance gets deleted during sync,
-                    # silently ignore and move on to next instance.
+        # Ask the hypervisor about all the instances at once; the ones it
+        # gives no answer for are looked up one at a time below, which
+        # tells a missing VM from a failure.
+        try:
+            vm_instances = self.driver.get_info_for_instances(
+                [db_instance for db_instance in db_instances
+                 if db_instance['task_state'] is None])
+        except Exception:
+            LOG.exception(_("Periodic sync_power_state task could not get "
+                            "the state of all the instances at once."))
+            vm_instances = {}
+
+        # NOTE: The power_state updates are sent to conductor along with
+        # the refresh() of the next instance. A deferred save() fails when
+        # the instance was deleted meanwhile, which is logged and skipped
+        # like the InstanceNotFound below.
+        with obj_base.NovaObjectSerializer().batch_actions(
+                raise_failures=False):
+            for db_instance in db_instances:
+                if db_instance['task_state'] is not None:
+                    LOG.info(_("During sync_power_state the instance has a "
+                               "pending task. Skip."), instance=db_instance)
                     continue
-            except Exception:
-                LOG.exception(_("Periodic sync_power_state task had an error "
-                                "while processing an instance."),
-                                instance=db_instance)
+                # No pending tasks. Now try to figure out the real
+                # vm_power_state.
+                try:
+                    try:
+                        vm_instance = vm_instances.get(db_instance['uuid'])
+                        if vm_instance is None:
+                            vm_instance = self.driver.get_info(db_instance)
+                        vm_power_state = vm_instance['state']
+                    except exception.InstanceNotFound:
+                        vm_power_state = power_state.NOSTATE
+                    # Note(maoy): the above get_info call might take a long
+                    # time, for example, because of a broken libvirt driver.
+                    try:
+                        self._sync_instance_power_state(context,
+                                                        db_instance,
+                                                        vm_power_state,
+                                                        use_subordinate=True)
+                    except exception.InstanceNotFound:
+                        # NOTE(hanlind): If the instance gets deleted during
+                        # sync, silently ignore and move on to next instance.
+                        continue
+                except Exception:
+                    LOG.exception(_("Periodic sync_power_state task had an "
+                                    "error while processing an instance."),
+                                  instance=db_instance)
 
     def _sync_instance_power_state(self, context, db_instance, vm_power_state,
                                    use_subordinate=False):
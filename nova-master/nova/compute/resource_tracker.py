@@ -32,6 +32,7 @@ from nova import exception
 from nova.objects import base as obj_base
 from nova.objects import instance as instance_obj
 from nova.objects import migration as migration_obj
+from nova.openstack.common import excutils
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
@@ -73,6 +74,10 @@ class ResourceTracker(object):
         self.stats = importutils.import_object(CONF.compute_stats_class)
         self.tracked_instances = {}
         self.tracked_migrations = {}
+        # Claims, aborts and drops made while an audit is gathering data
+        # outside of the semaphore, replayed on top of the audited usage.
+        self._journal = None
+        self.drift = {}
         self.conductor_api = conductor.API()
         monitor_handler = monitors.ResourceMonitorHandler()
         self.monitors = monitor_handler.choose_monitors(self)
@@ -124,6 +129,7 @@ class ResourceTracker(object):
 
             # Mark resources in-use and update stats
             self._update_usage_from_instance(self.compute_node, instance_ref)
+            self._journal_append('claim', instance_ref)
 
             elevated = context.elevated()
             # persist changes to the compute node:
@@ -174,6 +180,7 @@ class ResourceTracker(object):
             # compute host:
             self._update_usage_from_migration(context, instance_ref,
                                               self.compute_node, migration)
+            self._journal_append('migration', instance_ref, migration)
             elevated = context.elevated()
             self._update(elevated, self.compute_node)
 
@@ -221,6 +228,7 @@ class ResourceTracker(object):
         # and associated stats:
         instance['vm_state'] = vm_states.DELETED
         self._update_usage_from_instance(self.compute_node, instance)
+        self._journal_append('update', instance)
 
         ctxt = context.get_admin_context()
         self._update(ctxt, self.compute_node)
@@ -228,23 +236,31 @@ class ResourceTracker(object):
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def drop_resize_claim(self, instance, instance_type=None, prefix='new_'):
         """Remove usage for an incoming/outgoing migration."""
-        if instance['uuid'] in self.tracked_migrations:
-            migration, itype = self.tracked_migrations.pop(instance['uuid'])
+        ctxt = context.get_admin_context()
+        if self._drop_resize_claim(ctxt, self.compute_node, instance,
+                                   instance_type, prefix):
+            self._journal_append('drop', instance, (instance_type, prefix))
+            self._update(ctxt, self.compute_node)
+
+    def _drop_resize_claim(self, context, resources, instance,
+                           instance_type, prefix):
+        if instance['uuid'] not in self.tracked_migrations:
+            return False
 
-            if not instance_type:
-                ctxt = context.get_admin_context()
-                instance_type = self._get_instance_type(ctxt, instance, prefix)
+        migration, itype = self.tracked_migrations.pop(instance['uuid'])
 
-            if instance_type['id'] == itype['id']:
-                self.stats.update_stats_for_migration(itype, sign=-1)
-                if self.pci_tracker:
-                    self.pci_tracker.update_pci_for_migration(instance,
-                                                              sign=-1)
-                self._update_usage(self.compute_node, itype, sign=-1)
-                self.compute_node['stats'] = self.stats
+        if not instance_type:
+            instance_type = self._get_instance_type(context, instance, prefix)
 
-                ctxt = context.get_admin_context()
-                self._update(ctxt, self.compute_node)
+        if instance_type['id'] != itype['id']:
+            return False
+
+        self.stats.update_stats_for_migration(itype, sign=-1)
+        if self.pci_tracker:
+            self.pci_tracker.update_pci_for_migration(instance, sign=-1)
+        self._update_usage(resources, itype, sign=-1)
+        resources['stats'] = self.stats
+        return True
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def update_usage(self, context, instance):
@@ -260,6 +276,7 @@ class ResourceTracker(object):
         # claim first:
         if uuid in self.tracked_instances:
             self._update_usage_from_instance(self.compute_node, instance)
+            self._journal_append('update', instance)
             self._update(context.elevated(), self.compute_node)
 
     @property
@@ -287,7 +304,6 @@ class ResourceTracker(object):
                             metrics_info)
         return metrics
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def update_available_resource(self, context):
         """Override in-memory calculations of compute node resource usage based
         on data audited from the hypervisor layer.
@@ -295,6 +311,14 @@ class ResourceTracker(object):
         Add in resource claims in progress to account for operations that have
         declared a need for resources, but not necessarily retrieved them from
         the hypervisor layer yet.
+
+        Claims keep the usage up to date between two audits, so the audit is
+        mostly a consistency check.  The hypervisor and the database are
+        queried without holding COMPUTE_RESOURCE_SEMAPHORE so that claims are
+        not blocked meanwhile.  The claims made during that time are journaled
+        and replayed on top of the audited usage before it replaces the one
+        maintained by the claims, and any difference between the two is
+        reported as drift.
         """
         LOG.audit(_("Auditing locally available compute resources"))
         resources = self.driver.get_available_resource(self.nodename)
@@ -303,7 +327,7 @@ class ResourceTracker(object):
             # The virt driver does not support this function
             LOG.audit(_("Virt driver does not support "
                  "'get_available_resource'  Compute tracking is disabled."))
-            self.compute_node = None
+            self._disable()
             return
         resources['host_ip'] = CONF.my_ip
 
@@ -311,31 +335,113 @@ class ResourceTracker(object):
 
         self._report_hypervisor_resource_view(resources)
 
+        self._start_audit()
+        try:
+            # Grab all instances assigned to this node:
+            instances = instance_obj.InstanceList.get_by_host_and_node(
+                context, self.host, self.nodename)
+
+            # Grab all in-progress migrations:
+            capi = self.conductor_api
+            migrations = capi.migration_get_in_progress_by_host_and_node(
+                    context, self.host, self.nodename)
+
+            usage = self.driver.get_per_instance_usage()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._abort_audit()
+
+        self._finish_audit(context, resources, instances, migrations, usage)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _disable(self):
+        self._journal = None
+        self.compute_node = None
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _start_audit(self):
+        self._journal = []
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _abort_audit(self):
+        self._journal = None
+
+    def _journal_append(self, action, instance, *args):
+        if self._journal is not None:
+            # copy, aborts flag the instance they are given as deleted
+            instance = dict(obj_base.obj_to_primitive(instance))
+            self._journal.append((action, instance, args))
+
+    def _replay_journal(self, context, resources):
+        """Apply the claims made since the audit started to its result."""
+        journal, self._journal = self._journal or [], None
+        for action, instance, args in journal:
+            uuid = instance['uuid']
+            if action == 'claim':
+                self._update_usage_from_instance(resources, instance)
+            elif action == 'update':
+                if uuid in self.tracked_instances:
+                    self._update_usage_from_instance(resources, instance)
+            elif action == 'migration':
+                if uuid not in self.tracked_migrations:
+                    self._update_usage_from_migration(context, instance,
+                                                      resources, args[0])
+            elif action == 'drop':
+                self._drop_resize_claim(context, resources, instance,
+                                        *args[0])
+
+    def _report_drift(self, ledger, ledger_uuids, resources):
+        """Log the differences between the usage maintained by the claims
+        and the usage computed by the audit.
+        """
+        drift = {}
+        if ledger:
+            for key in ('memory_mb_used', 'local_gb_used', 'vcpus_used',
+                        'running_vms'):
+                if ledger.get(key) != resources.get(key):
+                    drift[key] = {'ledger': ledger.get(key),
+                                  'audit': resources.get(key)}
+
+            audit_uuids = set(self.tracked_instances)
+            missing = audit_uuids - ledger_uuids
+            extra = ledger_uuids - audit_uuids
+            if missing:
+                drift['untracked_instances'] = sorted(missing)
+            if extra:
+                drift['unknown_instances'] = sorted(extra)
+
+        if drift:
+            LOG.warn(_("Resource usage drift detected for %(host)s:%(node)s: "
+                       "%(drift)s"),
+                     {'host': self.host, 'node': self.nodename,
+                      'drift': drift})
+        self.drift = drift
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _finish_audit(self, context, resources, instances, migrations, usage):
+        ledger = self.compute_node
+        ledger_uuids = set(self.tracked_instances)
+
         if 'pci_passthrough_devices' in resources:
             if not self.pci_tracker:
                 self.pci_tracker = pci_manager.PciDevTracker()
             self.pci_tracker.set_hvdevs(jsonutils.loads(resources.pop(
                 'pci_passthrough_devices')))
 
-        # Grab all instances assigned to this node:
-        instances = instance_obj.InstanceList.get_by_host_and_node(
-            context, self.host, self.nodename)
-
         # Now calculate usage based on instance utilization:
         self._update_usage_from_instances(resources, instances)
 
-        # Grab all in-progress migrations:
-        capi = self.conductor_api
-        migrations = capi.migration_get_in_progress_by_host_and_node(context,
-                self.host, self.nodename)
-
         self._update_usage_from_migrations(context, resources, migrations)
 
+        self._replay_journal(context, resources)
+
         # Detect and account for orphaned instances that may exist on the
         # hypervisor, but are not in the DB:
-        orphans = self._find_orphaned_instances()
+        orphans = self._find_orphaned_instances(usage)
         self._update_usage_from_orphans(resources, orphans)
 
+        self._report_drift(ledger, ledger_uuids, resources)
+
         # NOTE(yjiang5): Because pci device tracker status is not cleared in
         # this periodic task, and also because the resource tracker is not
         # notified when instances are deleted, we need remove all usages
@@ -628,7 +734,7 @@ class ResourceTracker(object):
             else:
                 self._update_usage_from_instance(resources, instance)
 
-    def _find_orphaned_instances(self):
+    def _find_orphaned_instances(self, usage=None):
         """Given the set of instances and migrations already account for
         by resource tracker, sanity check the hypervisor to determine
         if there are any "orphaned" instances left hanging around.
@@ -636,12 +742,16 @@ class ResourceTracker(object):
         Orphans could be consuming memory and should be accounted for in
         usage calculations to guard against potential out of memory
         errors.
+
+        :param usage: per instance usage reported by the virt driver, it is
+                      fetched from the driver if not provided.
         """
         uuids1 = frozenset(self.tracked_instances.keys())
         uuids2 = frozenset(self.tracked_migrations.keys())
         uuids = uuids1 | uuids2
 
-        usage = self.driver.get_per_instance_usage()
+        if usage is None:
+            usage = self.driver.get_per_instance_usage()
         vuuids = frozenset(usage.keys())
 
         orphan_uuids = vuuids - uuids
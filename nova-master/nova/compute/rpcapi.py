@@ -216,6 +216,7 @@ class ComputeAPI(rpcclient.RpcProxy):
         3.2 - Update get_vnc_console() to take an instance object
         3.3 - Update validate_console_port() to take an instance object
         3.4 - Update rebuild_instance() to take an instance object
+        3.5 - Add prefetch_image()
     '''
 
     #
@@ -729,6 +730,10 @@ class ComputeAPI(rpcclient.RpcProxy):
         cctxt = self.client.prepare(server=host, version=version)
         return cctxt.call(ctxt, 'get_host_uptime')
 
+    def prefetch_image(self, ctxt, image_id, host):
+        cctxt = self.client.prepare(server=host, version='3.5')
+        cctxt.cast(ctxt, 'prefetch_image', image_id=image_id)
+
     def reserve_block_device_name(self, ctxt, instance, device, volume_id):
         # NOTE(russellb) Havana compat
         version = self._get_compat_version('3.0', '2.3')
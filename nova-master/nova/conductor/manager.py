@@ -14,6 +14,8 @@
 
 """Handles database requests from other nova services."""
 
+import sys
+
 import six
 
 from nova.api.ec2 import ec2utils
@@ -76,7 +78,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    RPC_API_VERSION = '1.62'
+    RPC_API_VERSION = '1.63'
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -611,6 +613,37 @@ class ConductorManager(manager.Manager):
         updates['obj_what_changed'] = objinst.obj_what_changed()
         return updates, result
 
+    def object_actions(self, context, actions):
+        """Perform a list of object actions and object class actions.
+
+        Each action is a (objinst or objname, objmethod, objver, args,
+        kwargs) tuple, objver being ignored for instance actions. The
+        actions are run in order and a (failure, updates, result) tuple is
+        returned for each of them, failure being a serialized exception
+        (see rpc_common.serialize_remote_exception()) or None.
+        """
+        results = []
+        for target, objmethod, objver, args, kwargs in actions:
+            try:
+                if isinstance(target, nova_object.NovaObject):
+                    updates, result = self.object_action(
+                        context, target, objmethod, args, kwargs)
+                else:
+                    updates = None
+                    result = self.object_class_action(
+                        context, target, objmethod, objver, args, kwargs)
+            except rpc_common.ClientException as e:
+                failure = rpc_common.serialize_remote_exception(
+                    e._exc_info, log_failure=False)
+                results.append((failure, None, None))
+            except Exception:
+                failure = rpc_common.serialize_remote_exception(
+                    sys.exc_info())
+                results.append((failure, None, None))
+            else:
+                results.append((None, updates, result))
+        return results
+
     # NOTE(danms): This method is now deprecated and can be removed in
     # v2.0 of the RPC API
     def compute_reboot(self, context, instance, reboot_type):
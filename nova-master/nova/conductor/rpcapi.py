@@ -121,6 +121,7 @@ class ConductorAPI(rpcclient.RpcProxy):
            security_group_rule_get_by_security_group()
     1.61 - Return deleted instance from instance_destroy()
     1.62 - Added object_backport()
+    1.63 - Added object_actions()
     """
 
     BASE_RPC_API_VERSION = '1.0'
@@ -474,6 +475,37 @@ class ConductorAPI(rpcclient.RpcProxy):
         return cctxt.call(context, 'object_action', objinst=objinst,
                           objmethod=objmethod, args=args, kwargs=kwargs)
 
+    def object_actions(self, context, actions):
+        """Run a list of object actions in one call.
+
+        See ConductorManager.object_actions() for the format of actions.
+        Returns an (exception, updates, result) tuple for each action. When
+        the conductor is too old, the actions are sent one by one.
+        """
+        if not self.client.can_send_version('1.63'):
+            results = []
+            for target, objmethod, objver, args, kwargs in actions:
+                try:
+                    if isinstance(target, objects_base.NovaObject):
+                        updates, result = self.object_action(
+                            context, target, objmethod, args, kwargs)
+                    else:
+                        updates = None
+                        result = self.object_class_action(
+                            context, target, objmethod, objver, args,
+                            kwargs)
+                except Exception as exc:
+                    results.append((exc, None, None))
+                else:
+                    results.append((None, updates, result))
+            return results
+
+        cctxt = self.client.prepare(version='1.63')
+        results = cctxt.call(context, 'object_actions', actions=actions)
+        return [(rpc_common.deserialize_remote_exception(CONF, failure)
+                 if failure else None, updates, result)
+                for failure, updates, result in results]
+
     def object_backport(self, context, objinst, target_version):
         cctxt = self.client.prepare(version='1.62')
         return cctxt.call(context, 'object_backport', objinst=objinst,
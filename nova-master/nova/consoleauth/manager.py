@@ -24,11 +24,11 @@ from oslo.config import cfg
 
 from nova.cells import rpcapi as cells_rpcapi
 from nova.compute import rpcapi as compute_rpcapi
+from nova.consoleauth import store
 from nova import manager
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
 
 
 LOG = logging.getLogger(__name__)
@@ -55,17 +55,12 @@ class ConsoleAuthManager(manager.Manager):
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         super(ConsoleAuthManager, self).__init__(service_name='consoleauth',
                                                  *args, **kwargs)
-        self.mc = memorycache.get_client()
+        self.token_store = store.get_token_store()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.cells_rpcapi = cells_rpcapi.CellsAPI()
 
     def _get_tokens_for_instance(self, instance_uuid):
-        tokens_str = self.mc.get(instance_uuid.encode('UTF-8'))
-        if not tokens_str:
-            tokens = []
-        else:
-            tokens = jsonutils.loads(tokens_str)
-        return tokens
+        return self.token_store.get_instance_tokens(instance_uuid)
 
     def authorize_console(self, context, token, console_type, host, port,
                           internal_access_path, instance_uuid):
@@ -78,16 +73,8 @@ class ConsoleAuthManager(manager.Manager):
                       'internal_access_path': internal_access_path,
                       'last_activity_at': time.time()}
         data = jsonutils.dumps(token_dict)
-        self.mc.set(token.encode('UTF-8'), data, CONF.console_token_ttl)
-        tokens = self._get_tokens_for_instance(instance_uuid)
-        # Remove the expired tokens from cache.
-        for tok in tokens:
-            token_str = self.mc.get(tok.encode('UTF-8'))
-            if not token_str:
-                tokens.remove(tok)
-        tokens.append(token)
-        self.mc.set(instance_uuid.encode('UTF-8'),
-                    jsonutils.dumps(tokens))
+        self.token_store.add(token, instance_uuid, data,
+                             CONF.console_token_ttl)
 
         LOG.audit(_("Received Token: %(token)s, %(token_dict)s"),
                   {'token': token, 'token_dict': token_dict})
@@ -112,7 +99,7 @@ class ConsoleAuthManager(manager.Manager):
                                             token['console_type'])
 
     def check_token(self, context, token):
-        token_str = self.mc.get(token.encode('UTF-8'))
+        token_str = self.token_store.get(token)
         token_valid = (token_str is not None)
         LOG.audit(_("Checking Token: %(token)s, %(token_valid)s"),
                   {'token': token, 'token_valid': token_valid})
@@ -122,7 +109,4 @@ class ConsoleAuthManager(manager.Manager):
                 return token
 
     def delete_tokens_for_instance(self, context, instance_uuid):
-        tokens = self._get_tokens_for_instance(instance_uuid)
-        for token in tokens:
-            self.mc.delete(token.encode('UTF-8'))
-        self.mc.delete(instance_uuid.encode('UTF-8'))
+        self.token_store.delete_instance_tokens(instance_uuid)
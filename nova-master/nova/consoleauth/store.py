@@ -0,0 +1,214 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""Storage of console tokens, and of the tokens of each instance."""
+
+import heapq
+
+from oslo.config import cfg
+
+from nova.openstack.common import jsonutils
+from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
+
+
+CONF = cfg.CONF
+CONF.import_opt('memcached_servers', 'nova.openstack.common.memorycache')
+
+
+def get_token_store():
+    """Returns the token store to use.
+
+    Like memorycache.get_client(), tokens are kept in memcached when
+    memcached_servers is set, and in the memory of the process otherwise.
+    """
+    if CONF.memcached_servers:
+        return MemcacheTokenStore()
+    return MemoryTokenStore()
+
+
+class TokenStore(object):
+    """Keeps the data of console tokens until they expire.
+
+    The tokens of each instance are tracked along with the time they expire
+    at, so that looking them up or dropping the expired ones doesn't take
+    one lookup per token.
+    """
+
+    def add(self, token, instance_uuid, data, ttl):
+        """Stores the data of a token of an instance for ttl seconds."""
+        raise NotImplementedError()
+
+    def get(self, token):
+        """Returns the data of a token, or None once it has expired."""
+        return self.get_multi([token]).get(token)
+
+    def get_multi(self, tokens):
+        """Returns a dict of the data of the tokens which haven't expired."""
+        raise NotImplementedError()
+
+    def delete_multi(self, tokens):
+        """Deletes tokens."""
+        raise NotImplementedError()
+
+    def get_instance_tokens(self, instance_uuid):
+        """Returns the tokens of an instance which haven't expired."""
+        raise NotImplementedError()
+
+    def delete_instance_tokens(self, instance_uuid):
+        """Deletes all the tokens of an instance."""
+        raise NotImplementedError()
+
+
+class MemoryTokenStore(TokenStore):
+    """Keeps the tokens in the memory of the process.
+
+    Tokens are purged in the order they expire in, from a heap, so no
+    operation has to go through all of them.
+    """
+
+    def __init__(self):
+        # token -> (expires_at, instance_uuid, data)
+        self._tokens = {}
+        # instance_uuid -> set of tokens
+        self._instance_tokens = {}
+        # (expires_at, token) of the tokens, including deleted ones
+        self._expiry = []
+
+    def _remove(self, token):
+        _expires_at, instance_uuid, _data = self._tokens.pop(token)
+        tokens = self._instance_tokens[instance_uuid]
+        tokens.discard(token)
+        if not tokens:
+            del self._instance_tokens[instance_uuid]
+
+    def _purge(self):
+        now = timeutils.utcnow_ts()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, token = heapq.heappop(self._expiry)
+            # The token may have been deleted, or added again since
+            if self._tokens.get(token, (None,))[0] == expires_at:
+                self._remove(token)
+
+    def add(self, token, instance_uuid, data, ttl):
+        self._purge()
+        if token in self._tokens:
+            self._remove(token)
+        expires_at = timeutils.utcnow_ts() + ttl
+        self._tokens[token] = (expires_at, instance_uuid, data)
+        self._instance_tokens.setdefault(instance_uuid, set()).add(token)
+        heapq.heappush(self._expiry, (expires_at, token))
+
+    def get_multi(self, tokens):
+        self._purge()
+        return dict((token, self._tokens[token][2]) for token in tokens
+                    if token in self._tokens)
+
+    def delete_multi(self, tokens):
+        for token in tokens:
+            if token in self._tokens:
+                self._remove(token)
+
+    def get_instance_tokens(self, instance_uuid):
+        self._purge()
+        return list(self._instance_tokens.get(instance_uuid, ()))
+
+    def delete_instance_tokens(self, instance_uuid):
+        for token in self._instance_tokens.pop(instance_uuid, ()):
+            del self._tokens[token]
+
+
+def _key(value):
+    return value.encode('UTF-8')
+
+
+class MemcacheTokenStore(TokenStore):
+    """Keeps the tokens in memcached.
+
+    Each token is stored under its own key, expiring with it. The tokens of
+    an instance are stored under its uuid as a list, which older releases
+    read and update too, and the time they expire at under a key of their
+    own, so the expired ones are dropped without being looked up.
+    """
+
+    _EXPIRY_SUFFIX = '.expiry'
+
+    def __init__(self, client=None):
+        self.mc = client or memorycache.get_client()
+
+    def _get_expiry(self, instance_uuid):
+        """Returns a dict of the tokens of an instance and their expiry.
+
+        Tokens added by older releases, which don't record it, expire at 0.
+        """
+        expiry_name = instance_uuid + self._EXPIRY_SUFFIX
+        values = self.get_multi([instance_uuid, expiry_name])
+        tokens_str = values.get(instance_uuid)
+        if not tokens_str:
+            return {}
+        expiry = jsonutils.loads(values.get(expiry_name) or '{}')
+        return dict((token, expiry.get(token, 0))
+                    for token in jsonutils.loads(tokens_str))
+
+    def _live(self, expiry):
+        now = timeutils.utcnow_ts()
+        live = dict((token, expires_at)
+                    for token, expires_at in expiry.iteritems()
+                    if expires_at > now)
+        unknown = [token for token, expires_at in expiry.iteritems()
+                   if not expires_at]
+        if unknown:
+            live.update(dict.fromkeys(self.get_multi(unknown), 0))
+        return live
+
+    def add(self, token, instance_uuid, data, ttl):
+        self.mc.set(_key(token), data, ttl)
+        expiry = self._live(self._get_expiry(instance_uuid))
+        expiry[token] = timeutils.utcnow_ts() + ttl
+        self.mc.set(_key(instance_uuid), jsonutils.dumps(expiry.keys()), ttl)
+        self.mc.set(_key(instance_uuid + self._EXPIRY_SUFFIX),
+                    jsonutils.dumps(expiry), ttl)
+
+    def get(self, token):
+        return self.mc.get(_key(token))
+
+    def get_multi(self, tokens):
+        if not tokens:
+            return {}
+        if not hasattr(self.mc, 'get_multi'):
+            # The in process memorycache client
+            data = ((token, self.mc.get(_key(token))) for token in tokens)
+            return dict((token, value) for token, value in data
+                        if value is not None)
+        data = self.mc.get_multi([_key(token) for token in tokens])
+        return dict((token, data[_key(token)]) for token in tokens
+                    if _key(token) in data)
+
+    def delete_multi(self, tokens):
+        if not hasattr(self.mc, 'delete_multi'):
+            for token in tokens:
+                self.mc.delete(_key(token))
+            return
+        self.mc.delete_multi([_key(token) for token in tokens])
+
+    def get_instance_tokens(self, instance_uuid):
+        return self._live(self._get_expiry(instance_uuid)).keys()
+
+    def delete_instance_tokens(self, instance_uuid):
+        tokens = self._get_expiry(instance_uuid).keys()
+        self.delete_multi(tokens + [instance_uuid,
+                                    instance_uuid + self._EXPIRY_SUFFIX])
@@ -1850,6 +1850,16 @@ def ec2_instance_create(context, instance_uuid, id=None):
     return IMPL.ec2_instance_create(context, instance_uuid, id)
 
 
+def get_ec2_instance_ids_by_uuids(context, instance_uuids):
+    """Get a dict of uuid to ec2 id for the mappings that exist."""
+    return IMPL.get_ec2_instance_ids_by_uuids(context, instance_uuids)
+
+
+def ec2_instance_create_many(context, instance_uuids):
+    """Create ec2 id to instance uuid mappings in a single batch."""
+    return IMPL.ec2_instance_create_many(context, instance_uuids)
+
+
 ####################
 
 
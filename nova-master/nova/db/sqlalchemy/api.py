@@ -5456,6 +5456,44 @@ def get_instance_uuid_by_ec2_id(context, ec2_id):
     return result['uuid']
 
 
+@require_context
+def get_ec2_instance_ids_by_uuids(context, instance_uuids):
+    return _ec2_instance_get_ids_by_uuids(context, instance_uuids)
+
+
+@require_context
+def ec2_instance_create_many(context, instance_uuids):
+    """Create ec2 compatible instances for all of the provided uuids."""
+    if not instance_uuids:
+        return {}
+
+    session = get_session()
+    with session.begin():
+        session.execute(models.InstanceIdMapping.__table__.insert(),
+                        [{'uuid': instance_uuid}
+                         for instance_uuid in instance_uuids])
+        return _ec2_instance_get_ids_by_uuids(context, instance_uuids,
+                                              session=session)
+
+
+def _ec2_instance_get_ids_by_uuids(context, instance_uuids, session=None):
+    if not instance_uuids:
+        return {}
+
+    rows = _ec2_instance_get_query(context, session=session).\
+                    filter(models.InstanceIdMapping.uuid.in_(
+                        instance_uuids)).\
+                    order_by(asc(models.InstanceIdMapping.id)).\
+                    all()
+
+    # NOTE: uuid is not unique in instance_id_mappings, so if a mapping was
+    # created twice make sure we always hand back the oldest one.
+    result = {}
+    for row in rows:
+        result.setdefault(row['uuid'], row['id'])
+    return result
+
+
 def _ec2_instance_get_query(context, session=None):
     return model_query(context,
                        models.InstanceIdMapping,
@@ -15,7 +15,9 @@
 """Nova common internal object model"""
 
 import collections
+import contextlib
 import copy
+import datetime
 import functools
 
 import six
@@ -24,6 +26,7 @@ from nova import context
 from nova import exception
 from nova.objects import fields
 from nova.openstack.common.gettextutils import _
+from nova.openstack.common import local
 from nova.openstack.common import log as logging
 from nova.openstack.common.rpc import common as rpc_common
 import nova.openstack.common.rpc.serializer
@@ -42,6 +45,70 @@ def get_attrname(name):
     return '_%s' % name
 
 
+# Field values whose primitive form can be kept until they are set again
+_IMMUTABLE_TYPES = six.string_types + six.integer_types + (
+    float, bool, type(None), datetime.datetime)
+
+# Marks the unset fields in the storage of obj_compact_storage objects
+_UNSET = object()
+
+
+def _make_dict_property(name, field):
+    def getter(self, name=name):
+        attrname = get_attrname(name)
+        if not hasattr(self, attrname):
+            self.obj_load_attr(name)
+        return getattr(self, attrname)
+
+    def setter(self, value, name=name, field=field):
+        self._changed_fields.add(name)
+        try:
+            return setattr(self, get_attrname(name),
+                           field.coerce(self, name, value))
+        except Exception:
+            attr = "%s.%s" % (self.obj_name(), name)
+            LOG.exception(_('Error setting %(attr)s') %
+                          {'attr': attr})
+            raise
+
+    def deleter(self, name=name):
+        delattr(self, get_attrname(name))
+
+    return property(getter, setter, deleter)
+
+
+def _make_compact_property(name, field, index):
+    def getter(self, name=name, index=index):
+        value = self._obj_values[index]
+        if value is _UNSET:
+            self.obj_load_attr(name)
+            value = self._obj_values[index]
+            if value is _UNSET:
+                raise AttributeError(
+                    _("'%(objname)s' object has no attribute '%(attr)s'") %
+                    {'objname': self.obj_name(), 'attr': name})
+        return value
+
+    def setter(self, value, name=name, field=field, index=index):
+        self._changed_fields.add(name)
+        self._obj_primitives[index] = _UNSET
+        try:
+            self._obj_values[index] = field.coerce(self, name, value)
+        except Exception:
+            attr = "%s.%s" % (self.obj_name(), name)
+            LOG.exception(_('Error setting %(attr)s') %
+                          {'attr': attr})
+            raise
+
+    def deleter(self, name=name, index=index):
+        if self._obj_values[index] is _UNSET:
+            raise AttributeError(name)
+        self._obj_values[index] = _UNSET
+        self._obj_primitives[index] = _UNSET
+
+    return property(getter, setter, deleter)
+
+
 def make_class_properties(cls):
     # NOTE(danms/comstud): Inherit fields from super classes.
     # mro() returns the current class first and returns 'object' last, so
@@ -55,26 +122,17 @@ def make_class_properties(cls):
         for name, field in supercls.fields.items():
             if name not in cls.fields:
                 cls.fields[name] = field
+    compact = getattr(cls, 'obj_compact_storage', False)
+    if compact:
+        cls._obj_field_index = dict((name, index) for index, name
+                                    in enumerate(sorted(cls.fields)))
     for name, field in cls.fields.iteritems():
-
-        def getter(self, name=name):
-            attrname = get_attrname(name)
-            if not hasattr(self, attrname):
-                self.obj_load_attr(name)
-            return getattr(self, attrname)
-
-        def setter(self, value, name=name, field=field):
-            self._changed_fields.add(name)
-            try:
-                return setattr(self, get_attrname(name),
-                               field.coerce(self, name, value))
-            except Exception:
-                attr = "%s.%s" % (self.obj_name(), name)
-                LOG.exception(_('Error setting %(attr)s') %
-                              {'attr': attr})
-                raise
-
-        setattr(cls, name, property(getter, setter))
+        if compact:
+            prop = _make_compact_property(name, field,
+                                          cls._obj_field_index[name])
+        else:
+            prop = _make_dict_property(name, field)
+        setattr(cls, name, prop)
 
 
 class NovaObjectMetaclass(type):
@@ -105,7 +163,9 @@ def remotable_classmethod(fn):
     @functools.wraps(fn)
     def wrapper(cls, context, *args, **kwargs):
         if NovaObject.indirection_api:
-            result = NovaObject.indirection_api.object_class_action(
+            batch = getattr(local.store, 'object_action_batch', None)
+            api = batch or NovaObject.indirection_api
+            result = api.object_class_action(
                 context, cls.obj_name(), fn.__name__, cls.VERSION,
                 args, kwargs)
         else:
@@ -116,6 +176,16 @@ def remotable_classmethod(fn):
     return classmethod(wrapper)
 
 
+def _apply_updates(objinst, updates):
+    """Apply the updates returned by an object_action() call."""
+    for key, value in updates.iteritems():
+        if key in objinst.fields:
+            field = objinst.fields[key]
+            objinst[key] = field.from_primitive(objinst, key, value)
+    objinst.obj_reset_changes()
+    objinst._changed_fields = set(updates.get('obj_what_changed', []))
+
+
 # See comment above for remotable_classmethod()
 #
 # Note that this will use either the provided context, or the one
@@ -139,14 +209,13 @@ def remotable(fn):
         # Force this to be set if it wasn't before.
         self._context = ctxt
         if NovaObject.indirection_api:
-            updates, result = NovaObject.indirection_api.object_action(
+            batch = getattr(local.store, 'object_action_batch', None)
+            if batch and batch.defer(ctxt, self, fn.__name__, args, kwargs):
+                return
+            api = batch or NovaObject.indirection_api
+            updates, result = api.object_action(
                 ctxt, self, fn.__name__, args, kwargs)
-            for key, value in updates.iteritems():
-                if key in self.fields:
-                    field = self.fields[key]
-                    self[key] = field.from_primitive(self, key, value)
-            self.obj_reset_changes()
-            self._changed_fields = set(updates.get('obj_what_changed', []))
+            _apply_updates(self, updates)
             return result
         else:
             return fn(self, ctxt, *args, **kwargs)
@@ -180,9 +249,17 @@ class NovaObject(object):
     fields = {}
     obj_extra_fields = []
 
+    # Keep the field values of each object in a list rather than in as
+    # many attributes, and cache the primitive form of the immutable ones.
+    # This saves memory and time for objects that come in big lists.
+    obj_compact_storage = False
+
     def __init__(self, context=None, **kwargs):
         self._changed_fields = set()
         self._context = context
+        if self.obj_compact_storage:
+            self._obj_values = [_UNSET] * len(self._obj_field_index)
+            self._obj_primitives = [_UNSET] * len(self._obj_field_index)
         for key in kwargs.keys():
             self[key] = kwargs[key]
 
@@ -259,10 +336,19 @@ class NovaObject(object):
 
         nobj = self.__class__()
         nobj._context = self._context
-        for name in self.fields:
-            if self.obj_attr_is_set(name):
-                nval = copy.deepcopy(getattr(self, name), memo)
-                setattr(nobj, name, nval)
+        if self.obj_compact_storage:
+            # NOTE: The values are already coerced and immutable ones
+            # can be shared.
+            nobj._obj_values = [
+                value if isinstance(value, _IMMUTABLE_TYPES) or
+                value is _UNSET else copy.deepcopy(value, memo)
+                for value in self._obj_values]
+            nobj._obj_primitives = list(self._obj_primitives)
+        else:
+            for name in self.fields:
+                if self.obj_attr_is_set(name):
+                    nval = copy.deepcopy(getattr(self, name), memo)
+                    setattr(nobj, name, nval)
         nobj._changed_fields = set(self._changed_fields)
         return nobj
 
@@ -294,8 +380,7 @@ class NovaObject(object):
         primitive = dict()
         for name, field in self.fields.items():
             if self.obj_attr_is_set(name):
-                primitive[name] = field.to_primitive(self, name,
-                                                     getattr(self, name))
+                primitive[name] = self._obj_field_to_primitive(name, field)
         if target_version:
             self.obj_make_compatible(primitive, target_version)
         obj = {'nova_object.name': self.obj_name(),
@@ -306,6 +391,18 @@ class NovaObject(object):
             obj['nova_object.changes'] = list(self.obj_what_changed())
         return obj
 
+    def _obj_field_to_primitive(self, name, field):
+        if not self.obj_compact_storage:
+            return field.to_primitive(self, name, getattr(self, name))
+        index = self._obj_field_index[name]
+        primitive = self._obj_primitives[index]
+        if primitive is _UNSET:
+            value = getattr(self, name)
+            primitive = field.to_primitive(self, name, value)
+            if isinstance(value, _IMMUTABLE_TYPES):
+                self._obj_primitives[index] = primitive
+        return primitive
+
     def obj_load_attr(self, attrname):
         """Load an additional attribute from the real object.
 
@@ -355,6 +452,9 @@ class NovaObject(object):
             raise AttributeError(
                 _("%(objname)s object has no attribute '%(attrname)s'") %
                 {'objname': self.obj_name(), 'attrname': attrname})
+        if self.obj_compact_storage and attrname in self._obj_field_index:
+            return self._obj_values[
+                self._obj_field_index[attrname]] is not _UNSET
         return hasattr(self, get_attrname(attrname))
 
     @property
@@ -502,6 +602,93 @@ class ObjectListBase(object):
             primitives[index]['nova_object.version'] = child_target_version
 
 
+class _ObjectActionBatch(object):
+    """Object actions deferred by NovaObjectSerializer.batch_actions().
+
+    Deferred actions are sent along with the next action that has to be
+    run right away, or when the batch is flushed, in one object_actions()
+    call to the indirection api. A copy of the object is sent, and the
+    object itself looks saved as soon as the action is deferred.
+    """
+
+    def __init__(self, indirection_api, methods):
+        self.indirection_api = indirection_api
+        self.methods = methods
+        self.context = None
+        self.actions = []
+        self.objects = []
+        self.failure = None
+
+    def defer(self, context, objinst, objmethod, args, kwargs):
+        """Queue an object action, returning False if it cannot be."""
+        # NOTE: Keyword arguments like expected_task_state are checked
+        # on the other side and the caller wants to know the outcome.
+        if objmethod not in self.methods or kwargs:
+            return False
+        if self.context is not None and context is not self.context:
+            self.flush()
+        self.context = context
+        self.actions.append((objinst.obj_clone(), objmethod, None, args,
+                             kwargs))
+        self.objects.append(objinst)
+        objinst.obj_reset_changes()
+        return True
+
+    @staticmethod
+    def _apply_updates(objinst, updates):
+        # Leave alone what was changed since the action was deferred
+        changed = objinst.obj_what_changed()
+        changed_fields = objinst._changed_fields
+        for key, value in updates.iteritems():
+            if key in objinst.fields and key not in changed:
+                field = objinst.fields[key]
+                objinst[key] = field.from_primitive(objinst, key, value)
+        objinst._changed_fields = changed_fields
+
+    def _send(self, context, action=None):
+        if self.actions and context is not self.context:
+            self.flush()
+        deferred, objects = self.actions, self.objects
+        self.actions, self.objects = [], []
+        self.context = None
+        actions = deferred + [action] if action else deferred
+        if not actions:
+            return
+        results = self.indirection_api.object_actions(context, actions)
+        for objinst, deferred_action, (exc, updates, _result) in zip(
+                objects, deferred, results):
+            objmethod = deferred_action[1]
+            if exc is None:
+                self._apply_updates(objinst, updates)
+                continue
+            LOG.error(_('Deferred %(objname)s.%(objmethod)s() failed: '
+                        '%(exc)s'), {'objname': objinst.obj_name(),
+                                     'objmethod': objmethod,
+                                     'exc': exc})
+            if self.failure is None:
+                self.failure = exc
+        if action:
+            return results[-1]
+
+    def flush(self):
+        self._send(self.context)
+
+    def object_action(self, context, objinst, objmethod, args, kwargs):
+        exc, updates, result = self._send(
+            context, (objinst, objmethod, None, args, kwargs))
+        if exc is not None:
+            raise exc
+        return updates, result
+
+    def object_class_action(self, context, objname, objmethod, objver,
+                            args, kwargs):
+        exc, _updates, result = self._send(
+            context, (objname, objmethod, objver, args, kwargs))
+        if exc is not None:
+            raise exc
+        return result
+
+
 class NovaObjectSerializer(nova.openstack.common.rpc.serializer.Serializer):
     """A NovaObject-aware Serializer.
 
@@ -551,6 +738,38 @@ class NovaObjectSerializer(nova.openstack.common.rpc.serializer.Serializer):
             entity = entity.obj_to_primitive()
         return entity
 
+    @contextlib.contextmanager
+    def batch_actions(self, methods=('save',), raise_failures=True):
+        """Batch the remotable calls made in the block.
+
+        Calls to the remotable methods named in methods are queued instead
+        of being sent to the indirection api (usually conductor) right away,
+        and return None. The queue is sent along with the next remotable
+        call that has to return something, and at the end of the block,
+        in a single object_actions() call. Calls with keyword arguments,
+        like save(expected_task_state=...), are never deferred.
+
+        Failures of deferred calls are logged, and the first one is raised
+        at the end of the block unless raise_failures is False, for callers
+        that handle each object on its own. Nothing is batched when objects
+        are not remoted, and only the calls of the current greenthread are.
+        """
+        api = NovaObject.indirection_api
+        if (getattr(local.store, 'object_action_batch', None) or
+                not hasattr(api, 'object_actions')):
+            yield
+            return
+
+        batch = _ObjectActionBatch(api, methods)
+        local.store.object_action_batch = batch
+        try:
+            yield
+        finally:
+            del local.store.object_action_batch
+            batch.flush()
+        if raise_failures and batch.failure is not None:
+            raise batch.failure
+
     def deserialize_entity(self, context, entity):
         if isinstance(entity, dict) and 'nova_object.name' in entity:
             entity = self._process_object(context, entity)
@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import weakref
+
 from nova.cells import opts as cells_opts
 from nova.cells import rpcapi as cells_rpcapi
 from nova.compute import flavors
@@ -162,19 +164,27 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
 
     obj_extra_fields = ['name']
 
+    obj_compact_storage = True
+
+    # Weak reference to the InstanceList this instance is a member of, which
+    # lazy-loads attributes for all of its members at once.
+    _instance_list = None
+
     def __init__(self, *args, **kwargs):
         super(Instance, self).__init__(*args, **kwargs)
         self._reset_metadata_tracking()
 
-    def _reset_metadata_tracking(self):
-        self._orig_system_metadata = (dict(self.system_metadata) if
-                                      'system_metadata' in self else {})
-        self._orig_metadata = (dict(self.metadata) if
-                               'metadata' in self else {})
+    def _reset_metadata_tracking(self, fields=None):
+        if fields is None or 'system_metadata' in fields:
+            self._orig_system_metadata = (dict(self.system_metadata) if
+                                          'system_metadata' in self else {})
+        if fields is None or 'metadata' in fields:
+            self._orig_metadata = (dict(self.metadata) if
+                                   'metadata' in self else {})
 
     def obj_reset_changes(self, fields=None):
         super(Instance, self).obj_reset_changes(fields)
-        self._reset_metadata_tracking()
+        self._reset_metadata_tracking(fields=fields)
 
     def obj_what_changed(self):
         changes = super(Instance, self).obj_what_changed()
@@ -351,7 +361,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
         except exception.ConstraintNotMet:
             raise exception.ObjectActionError(action='destroy',
                                               reason='host changed')
-        delattr(self, base.get_attrname('id'))
+        delattr(self, 'id')
 
     def _save_info_cache(self, context):
         self.info_cache.save(context)
@@ -499,6 +509,12 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
             raise exception.OrphanedObjectError(method='obj_load_attr',
                                                 objtype=self.obj_name())
 
+        inst_list = self._instance_list and self._instance_list()
+        if inst_list is not None:
+            inst_list._load_attr(self._context, attrname)
+            if self.obj_attr_is_set(attrname):
+                return
+
         LOG.debug(_("Lazy-loading `%(attr)s' on %(name)s uuid %(uuid)s"),
                   {'attr': attrname,
                    'name': self.obj_name(),
@@ -581,6 +597,67 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         '1.3': '1.11',
         }
 
+    def __init__(self, *args, **kwargs):
+        super(InstanceList, self).__init__(*args, **kwargs)
+        self._attached_objects = None
+        # The attributes that had to be lazy-loaded on the members, which
+        # callers should think about passing in expected_attrs.
+        self.lazy_loaded_attrs = set()
+
+    def __iter__(self):
+        self._attach_members()
+        return super(InstanceList, self).__iter__()
+
+    def __getitem__(self, index):
+        self._attach_members()
+        return super(InstanceList, self).__getitem__(index)
+
+    def _attach_members(self):
+        """Make the members lazy-load their attributes through this list."""
+        if (self._attached_objects is not None and
+                self._attached_objects is self.objects):
+            return
+        if not self.obj_attr_is_set('objects'):
+            return
+        ref = weakref.ref(self)
+        for inst in self.objects:
+            # NOTE: Members of a slice stay with the list they came from
+            # while it is around.
+            current = inst._instance_list
+            if current is None or current() is None:
+                inst._instance_list = ref
+        self._attached_objects = self.objects
+
+    def _load_attr(self, context, attrname):
+        """Load attrname for all the members missing it in one query."""
+        missing = [inst for inst in self.objects
+                   if not inst.obj_attr_is_set(attrname)]
+        if not missing:
+            return
+        self.lazy_loaded_attrs.add(attrname)
+        LOG.debug(_("Lazy-loading `%(attr)s' on %(count)d instances, "
+                    "consider passing it in expected_attrs"),
+                  {'attr': attrname, 'count': len(missing)})
+
+        uuids = [inst.uuid for inst in missing]
+        if attrname == 'fault':
+            faults = instance_fault.InstanceFaultList.get_by_instance_uuids(
+                context, uuids)
+            values = dict((uuid, None) for uuid in uuids)
+            for fault in faults:
+                if values[fault.instance_uuid] is None:
+                    values[fault.instance_uuid] = fault
+        else:
+            loaded = self.get_by_filters(context, {'uuid': uuids},
+                                         expected_attrs=[attrname])
+            values = dict((inst.uuid, inst[attrname]) for inst in loaded
+                          if inst.obj_attr_is_set(attrname))
+
+        for inst in missing:
+            if inst.uuid in values:
+                inst[attrname] = values[inst.uuid]
+                inst.obj_reset_changes([attrname])
+
     @base.remotable_classmethod
     def get_by_filters(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
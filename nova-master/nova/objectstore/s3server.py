@@ -34,18 +34,22 @@ S3 client with this module::
 
 """
 
-import bisect
 import datetime
+import hashlib
+import json
 import os
 import os.path
+import shutil
 import urllib
 
 from oslo.config import cfg
 import routes
 import six
 import webob
+import webob.static
 
 from nova.openstack.common import fileutils
+from nova.openstack.common import strutils
 from nova import paths
 from nova import utils
 from nova import wsgi
@@ -66,6 +70,12 @@ s3_opts = [
 CONF = cfg.CONF
 CONF.register_opts(s3_opts)
 
+# Objects are read and written this many bytes at a time
+CHUNK_SIZE = 64 * 1024
+# Directory of the bucket indexes, under the root directory. Buckets can't
+# be hidden, so it can't be taken for one.
+INDEX_DIRECTORY = '.index'
+
 
 def get_wsgi_server():
     return wsgi.Server("S3 Objectstore",
@@ -99,6 +109,95 @@ class S3Application(wsgi.Router):
         super(S3Application, self).__init__(mapper)
 
 
+class BucketIndex(object):
+    """Sorted index of the objects of a bucket, kept in a file.
+
+    Each line of the file holds the JSON encoded name, size and
+    modification time of an object, sorted by name, so a listing can seek
+    to its marker or prefix with a binary search on the file and read only
+    the objects it returns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def write(self, entries):
+        """Replaces the index with entries of (name, size, mtime)."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for entry in sorted(entries, key=lambda e: e[0]):
+                f.write(json.dumps(list(entry)) + '\n')
+        os.rename(temp_path, self.path)
+
+    def _replace(self, name, line):
+        """Replaces the line of an object, without parsing the others."""
+        temp_path = self.path + '.tmp'
+        with open(self.path) as f:
+            with open(temp_path, 'w') as temp:
+                self._seek(f, os.fstat(f.fileno()).st_size, name, True)
+                left = f.tell()
+                f.seek(0)
+                while left:
+                    chunk = f.read(min(left, CHUNK_SIZE))
+                    left -= len(chunk)
+                    temp.write(chunk)
+                temp.write(line)
+                next_line = f.readline()
+                if next_line and json.loads(next_line)[0] != name:
+                    temp.write(next_line)
+                shutil.copyfileobj(f, temp, CHUNK_SIZE)
+        os.rename(temp_path, self.path)
+
+    def add(self, name, size, mtime):
+        name = strutils.safe_decode(name)
+        self._replace(name, json.dumps([name, size, mtime]) + '\n')
+
+    def remove(self, name):
+        self._replace(strutils.safe_decode(name), '')
+
+    def delete(self):
+        if self.exists():
+            os.unlink(self.path)
+
+    @staticmethod
+    def _seek(f, size, key, inclusive):
+        """Seeks to the first line of a name after key, or equal to it."""
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            if mid:
+                f.readline()
+            line = f.readline()
+            name = line and json.loads(line)[0]
+            if line and (name < key or not inclusive and name == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        f.seek(lo)
+        if lo:
+            f.readline()
+
+    def list(self, prefix=u'', marker=u''):
+        """Yields the (name, size, mtime) of the objects after marker, whose
+        names start with prefix.
+        """
+        with open(self.path) as f:
+            size = os.fstat(f.fileno()).st_size
+            if prefix > marker:
+                self._seek(f, size, prefix, True)
+            elif marker:
+                self._seek(f, size, marker, False)
+            for line in f:
+                entry = json.loads(line)
+                if not entry[0].startswith(prefix):
+                    break
+                yield entry
+
+
 class BaseRequestHandler(object):
     """Base class emulating Tornado's web framework pattern in WSGI.
 
@@ -201,6 +300,40 @@ class BaseRequestHandler(object):
         else:
             raise Exception("Unknown S3 value type %r", value)
 
+    def _bucket_path(self, bucket):
+        """Returns the directory of a bucket, or None if it is invalid."""
+        path = os.path.abspath(os.path.join(self.application.directory,
+                                            bucket))
+        if (not path.startswith(self.application.directory) or
+                bucket.startswith('.')):
+            return None
+        return path
+
+    def _bucket_index(self, bucket, create=True):
+        """Returns the index of a bucket.
+
+        Buckets created before indexes existed are indexed on first use.
+        """
+        index = BucketIndex(os.path.join(self.application.directory,
+                                         INDEX_DIRECTORY, bucket))
+        if create and not index.exists():
+            object_names = []
+            path = self._bucket_path(bucket)
+            for root, dirs, files in os.walk(path):
+                for file_name in files:
+                    object_names.append(os.path.join(root, file_name))
+            skip = len(path) + 1
+            for i in range(self.application.bucket_depth):
+                skip += 2 * (i + 1) + 1
+            entries = []
+            for object_path in object_names:
+                info = os.stat(object_path)
+                entries.append((strutils.safe_decode(object_path[skip:]),
+                                info.st_size, info.st_mtime))
+            fileutils.ensure_tree(os.path.dirname(index.path))
+            index.write(entries)
+        return index
+
     def _object_path(self, bucket, object_name):
         if self.application.bucket_depth < 1:
             return os.path.abspath(os.path.join(
@@ -218,6 +351,8 @@ class RootHandler(BaseRequestHandler):
         names = os.listdir(self.application.directory)
         buckets = []
         for name in names:
+            if name.startswith('.'):
+                continue
             path = os.path.join(self.application.directory, name)
             info = os.stat(path)
             buckets.append({
@@ -235,45 +370,25 @@ class BucketHandler(BaseRequestHandler):
         prefix = self.get_argument("prefix", u"")
         marker = self.get_argument("marker", u"")
         max_keys = int(self.get_argument("max-keys", 50000))
-        path = os.path.abspath(os.path.join(self.application.directory,
-                                            bucket_name))
+        path = self._bucket_path(bucket_name)
         terse = int(self.get_argument("terse", 0))
-        if (not path.startswith(self.application.directory) or
-                not os.path.isdir(path)):
+        if not path or not os.path.isdir(path):
             self.set_404()
             return
-        object_names = []
-        for root, dirs, files in os.walk(path):
-            for file_name in files:
-                object_names.append(os.path.join(root, file_name))
-        skip = len(path) + 1
-        for i in range(self.application.bucket_depth):
-            skip += 2 * (i + 1) + 1
-        object_names = [n[skip:] for n in object_names]
-        object_names.sort()
+        index = self._bucket_index(bucket_name)
         contents = []
 
-        start_pos = 0
-        if marker:
-            start_pos = bisect.bisect_right(object_names, marker, start_pos)
-        if prefix:
-            start_pos = bisect.bisect_left(object_names, prefix, start_pos)
-
         truncated = False
-        for object_name in object_names[start_pos:]:
-            if not object_name.startswith(prefix):
-                break
+        for object_name, size, mtime in index.list(prefix, marker):
             if len(contents) >= max_keys:
                 truncated = True
                 break
-            object_path = self._object_path(bucket_name, object_name)
             c = {"Key": object_name}
             if not terse:
-                info = os.stat(object_path)
                 c.update({
                     "LastModified": datetime.datetime.utcfromtimestamp(
-                        info.st_mtime),
-                    "Size": info.st_size,
+                        mtime),
+                    "Size": size,
                 })
             contents.append(c)
             marker = object_name
@@ -287,26 +402,24 @@ class BucketHandler(BaseRequestHandler):
         }})
 
     def put(self, bucket_name):
-        path = os.path.abspath(os.path.join(
-            self.application.directory, bucket_name))
-        if (not path.startswith(self.application.directory) or
-                os.path.exists(path)):
+        path = self._bucket_path(bucket_name)
+        if not path or os.path.exists(path):
             self.set_status(403)
             return
         fileutils.ensure_tree(path)
+        self._bucket_index(bucket_name)
         self.finish()
 
     def delete(self, bucket_name):
-        path = os.path.abspath(os.path.join(
-            self.application.directory, bucket_name))
-        if (not path.startswith(self.application.directory) or
-                not os.path.isdir(path)):
+        path = self._bucket_path(bucket_name)
+        if not path or not os.path.isdir(path):
             self.set_404()
             return
         if len(os.listdir(path)) > 0:
             self.set_status(403)
             return
         os.rmdir(path)
+        self._bucket_index(bucket_name, create=False).delete()
         self.set_status(204)
         self.finish()
 
@@ -315,26 +428,30 @@ class ObjectHandler(BaseRequestHandler):
     def get(self, bucket, object_name):
         object_name = urllib.unquote(object_name)
         path = self._object_path(bucket, object_name)
-        if (not path.startswith(self.application.directory) or
+        if (not self._bucket_path(bucket) or
+                not path.startswith(self.application.directory) or
                 not os.path.isfile(path)):
             self.set_404()
             return
-        info = os.stat(path)
+        object_file = open(path, "r")
+        info = os.fstat(object_file.fileno())
         self.set_header("Content-Type", "application/unknown")
         self.set_header("Last-Modified", datetime.datetime.utcfromtimestamp(
             info.st_mtime))
-        object_file = open(path, "r")
-        try:
-            self.finish(object_file.read())
-        finally:
-            object_file.close()
+        # Stream the object rather than reading it in memory, letting the
+        # server send the file itself when it can.
+        file_wrapper = self.request.environ.get('wsgi.file_wrapper')
+        if file_wrapper:
+            self.response.app_iter = file_wrapper(object_file, CHUNK_SIZE)
+        else:
+            self.response.app_iter = webob.static.FileIter(
+                object_file).app_iter_range(block_size=CHUNK_SIZE)
+        self.response.content_length = info.st_size
 
     def put(self, bucket, object_name):
         object_name = urllib.unquote(object_name)
-        bucket_dir = os.path.abspath(os.path.join(
-            self.application.directory, bucket))
-        if (not bucket_dir.startswith(self.application.directory) or
-                not os.path.isdir(bucket_dir)):
+        bucket_dir = self._bucket_path(bucket)
+        if not bucket_dir or not os.path.isdir(bucket_dir):
             self.set_404()
             return
         path = self._object_path(bucket, object_name)
@@ -343,20 +460,31 @@ class ObjectHandler(BaseRequestHandler):
             return
         directory = os.path.dirname(path)
         fileutils.ensure_tree(directory)
-        object_file = open(path, "w")
-        object_file.write(self.request.body)
-        object_file.close()
-        self.set_header('ETag',
-                        '"%s"' % utils.get_hash_str(self.request.body))
+        # Write the body as it is received rather than reading it in memory
+        body_file = self.request.body_file
+        md5 = hashlib.md5()
+        with open(path, "w") as object_file:
+            while True:
+                chunk = body_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                md5.update(chunk)
+                object_file.write(chunk)
+            size = object_file.tell()
+        info = os.stat(path)
+        self._bucket_index(bucket).add(object_name, size, info.st_mtime)
+        self.set_header('ETag', '"%s"' % md5.hexdigest())
         self.finish()
 
     def delete(self, bucket, object_name):
         object_name = urllib.unquote(object_name)
         path = self._object_path(bucket, object_name)
-        if (not path.startswith(self.application.directory) or
+        if (not self._bucket_path(bucket) or
+                not path.startswith(self.application.directory) or
                 not os.path.isfile(path)):
             self.set_404()
             return
         os.unlink(path)
+        self._bucket_index(bucket).remove(object_name)
         self.set_status(204)
         self.finish()
@@ -32,6 +32,7 @@ import greenlet
 from oslo.config import cfg
 
 from nova.openstack.common.gettextutils import _
+from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
 
 help_for_backdoor_port = 'Acceptable ' + \
@@ -83,6 +84,19 @@ def _print_nativethreads():
         print()
 
 
+def _print_lock_stats():
+    stats = lockutils.get_stats()
+    print('%-40s %8s %10s %10s %10s %10s' % ('lock', 'count', 'wait',
+                                             'max wait', 'hold', 'max hold'))
+    for name in sorted(stats, key=lambda n: stats[n]['wait']['total'],
+                       reverse=True):
+        wait = stats[name]['wait']
+        hold = stats[name]['hold']
+        print('%-40s %8d %10.3f %10.3f %10.3f %10.3f' % (
+              name, wait['count'], wait['total'], wait['max'],
+              hold['total'], hold['max']))
+
+
 def _parse_port_range(port_range):
     if ':' not in port_range:
         start, end = port_range, port_range
@@ -117,6 +131,7 @@ def initialize_if_enabled():
         'fo': _find_objects,
         'pgt': _print_greenthreads,
         'pnt': _print_nativethreads,
+        'pls': _print_lock_stats,
     }
 
     if CONF.backdoor_port is None:
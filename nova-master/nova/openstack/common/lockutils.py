@@ -14,6 +14,7 @@
 #    under the License.
 
 
+import bisect
 import contextlib
 import errno
 import functools
@@ -70,6 +71,10 @@ class _InterProcessLock(object):
     safe to close the file descriptor while another green thread holds the
     lock. Just opening and closing the lock file can break synchronisation,
     so lock files must be accessed only using this abstraction.
+
+    The lock file is opened on first use and kept open until close() is
+    called or the lock object is garbage collected, so that repeated
+    acquisitions do not pay for an open() each time.
     """
 
     def __init__(self, name):
@@ -77,7 +82,8 @@ class _InterProcessLock(object):
         self.fname = name
 
     def __enter__(self):
-        self.lockfile = open(self.fname, 'w')
+        if self.lockfile is None or self.lockfile.closed:
+            self.lockfile = open(self.fname, 'w')
 
         while True:
             try:
@@ -98,10 +104,15 @@ class _InterProcessLock(object):
     def __exit__(self, exc_type, exc_val, exc_tb):
         try:
             self.unlock()
-            self.lockfile.close()
         except IOError:
             LOG.exception(_("Could not release the acquired lock `%s`"),
                           self.fname)
+            self.close()
+
+    def close(self):
+        if self.lockfile is not None:
+            self.lockfile.close()
+            self.lockfile = None
 
     def trylock(self):
         raise NotImplementedError()
@@ -133,8 +144,197 @@ else:
     import fcntl
     InterProcessLock = _PosixLock
 
-_semaphores = weakref.WeakValueDictionary()
-_semaphores_lock = threading.Lock()
+
+# Number of recently used locks each shard keeps, with their lock file
+# open, once no thread uses them anymore
+_RECENT_LOCKS_PER_SHARD = 8
+# Number of lock names each shard keeps statistics for. The names used the
+# longest time ago are forgotten first.
+_STATS_PER_SHARD = 64
+
+# Upper bounds, in seconds, of the buckets of the wait and hold time
+# histograms. The last bucket counts everything above the last bound.
+_HISTOGRAM_BOUNDS = (0.001, 0.01, 0.1, 1, 10)
+
+
+class _Histogram(object):
+    def __init__(self):
+        self.buckets = [0] * (len(_HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(_HISTOGRAM_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {'count': self.count,
+                'total': self.total,
+                'max': self.max,
+                'buckets': list(self.buckets)}
+
+
+class _LockStats(object):
+    def __init__(self):
+        self.wait = _Histogram()
+        self.hold = _Histogram()
+        self.last_used = 0
+
+
+class _Lock(object):
+    """In-process state for a lock name.
+
+    Holds the semaphore serializing the local threads and, for external
+    locks, the InterProcessLock with its open lock file. The threads using
+    the lock and the recently used locks of its shard keep a reference to
+    it, so it goes away together with its file descriptor once nobody uses
+    the name anymore and other names have been used since.
+    """
+
+    def __init__(self):
+        self.sem = threading.Semaphore()
+        self.file_lock = None
+
+    def __del__(self):
+        if self.file_lock is not None:
+            try:
+                self.file_lock.close()
+            except Exception:
+                pass
+
+
+class _Shard(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Every lock in use, so that all its users share its semaphore
+        self.locks = weakref.WeakValueDictionary()
+        # name -> (use count, lock) of the most recently used locks
+        self.recent = {}
+        self.uses = 0
+        self.stats = {}
+
+
+class _LockManager(object):
+    """Maps lock names to their _Lock and keeps per name statistics.
+
+    The map is split in shards, each one guarded by its own lock, so that
+    threads taking different locks do not all serialize on a single mutex
+    just to find their semaphore. Each shard keeps its most recently used
+    locks alive, so that their lock files stay open between acquisitions.
+    """
+
+    def __init__(self, shards=16, recent_locks=_RECENT_LOCKS_PER_SHARD,
+                 stats=_STATS_PER_SHARD):
+        self._shards = [_Shard() for _i in xrange(shards)]
+        self._recent_locks = recent_locks
+        self._max_stats = stats
+
+    def _shard(self, name):
+        return self._shards[hash(name) % len(self._shards)]
+
+    def get(self, name):
+        shard = self._shard(name)
+        with shard.lock:
+            lock = shard.locks.get(name)
+            if lock is None:
+                lock = _Lock()
+                shard.locks[name] = lock
+            shard.uses += 1
+            shard.recent[name] = (shard.uses, lock)
+            if len(shard.recent) > self._recent_locks:
+                oldest = min(shard.recent, key=lambda n: shard.recent[n][0])
+                del shard.recent[oldest]
+            return lock
+
+    def record(self, name, wait, hold):
+        shard = self._shard(name)
+        with shard.lock:
+            try:
+                stats = shard.stats[name]
+            except KeyError:
+                if len(shard.stats) >= self._max_stats:
+                    oldest = min(shard.stats,
+                                 key=lambda n: shard.stats[n].last_used)
+                    del shard.stats[oldest]
+                stats = shard.stats[name] = _LockStats()
+            shard.uses += 1
+            stats.last_used = shard.uses
+            stats.wait.add(wait)
+            stats.hold.add(hold)
+
+    def stats(self):
+        result = {}
+        for shard in self._shards:
+            with shard.lock:
+                for name, stats in shard.stats.items():
+                    result[name] = {'wait': stats.wait.to_dict(),
+                                    'hold': stats.hold.to_dict()}
+        return result
+
+    def reset_stats(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.stats.clear()
+
+
+_lock_manager = _LockManager()
+
+
+def get_stats():
+    """Return the wait and hold time statistics of every lock name.
+
+    The result maps each lock name to a dict with 'wait' and 'hold' keys,
+    each of them giving the count, total and max time in seconds as well as
+    a histogram whose bucket upper bounds are _HISTOGRAM_BOUNDS. Only the
+    names used the most recently are kept, up to _STATS_PER_SHARD per shard.
+    """
+    return _lock_manager.stats()
+
+
+def reset_stats():
+    _lock_manager.reset_stats()
+
+
+def log_stats(limit=20):
+    """Log the statistics of the locks with the highest total wait time."""
+    stats = get_stats()
+    names = sorted(stats, key=lambda name: stats[name]['wait']['total'],
+                   reverse=True)
+    for name in names[:limit]:
+        wait = stats[name]['wait']
+        hold = stats[name]['hold']
+        LOG.info(_('Lock "%(lock)s": acquired %(count)d times, waited '
+                   '%(wait_total).3fs (max %(wait_max).3fs), held '
+                   '%(hold_total).3fs (max %(hold_max).3fs)'),
+                 {'lock': name, 'count': wait['count'],
+                  'wait_total': wait['total'], 'wait_max': wait['max'],
+                  'hold_total': hold['total'], 'hold_max': hold['max']})
+
+
+def _get_lock_file_path(name, lock_file_prefix, lock_path):
+    # We need a copy of lock_path because it is non-local
+    local_lock_path = lock_path or CONF.lock_path
+    if not local_lock_path:
+        raise cfg.RequiredOptError('lock_path')
+
+    if not os.path.exists(local_lock_path):
+        fileutils.ensure_tree(local_lock_path)
+        LOG.info(_('Created lock path: %s'), local_lock_path)
+
+    def add_prefix(name, prefix):
+        if not prefix:
+            return name
+        sep = '' if prefix.endswith('-') else '-'
+        return '%s%s%s' % (prefix, sep, name)
+
+    # NOTE(mikal): the lock name cannot contain directory separators
+    lock_file_name = add_prefix(name.replace(os.sep, '_'), lock_file_prefix)
+
+    return os.path.join(local_lock_path, lock_file_name)
 
 
 @contextlib.contextmanager
@@ -145,6 +345,9 @@ def lock(name, lock_file_prefix=None, external=False, lock_path=None):
     eventlet.monkey_patch(), else `semaphore.Semaphore`) unless external is
     True, in which case, it'll yield an InterProcessLock instance.
 
+    The time spent waiting for and holding the lock is recorded per name,
+    see get_stats().
+
     :param lock_file_prefix: The lock_file_prefix argument is used to provide
     lock files on disk with a meaningful prefix.
 
@@ -157,14 +360,11 @@ def lock(name, lock_file_prefix=None, external=False, lock_path=None):
     special location for external lock files to live. If nothing is set, then
     CONF.lock_path is used as a default.
     """
-    with _semaphores_lock:
-        try:
-            sem = _semaphores[name]
-        except KeyError:
-            sem = threading.Semaphore()
-            _semaphores[name] = sem
+    int_lock = _lock_manager.get(name)
+    start = time.time()
+    acquired = None
 
-    with sem:
+    with int_lock.sem:
         LOG.debug(_('Got semaphore "%(lock)s"'), {'lock': name})
 
         # NOTE(mikal): I know this looks odd
@@ -177,31 +377,21 @@ def lock(name, lock_file_prefix=None, external=False, lock_path=None):
                 LOG.debug(_('Attempting to grab file lock "%(lock)s"'),
                           {'lock': name})
 
-                # We need a copy of lock_path because it is non-local
-                local_lock_path = lock_path or CONF.lock_path
-                if not local_lock_path:
-                    raise cfg.RequiredOptError('lock_path')
-
-                if not os.path.exists(local_lock_path):
-                    fileutils.ensure_tree(local_lock_path)
-                    LOG.info(_('Created lock path: %s'), local_lock_path)
-
-                def add_prefix(name, prefix):
-                    if not prefix:
-                        return name
-                    sep = '' if prefix.endswith('-') else '-'
-                    return '%s%s%s' % (prefix, sep, name)
-
-                # NOTE(mikal): the lock name cannot contain directory
-                # separators
-                lock_file_name = add_prefix(name.replace(os.sep, '_'),
-                                            lock_file_prefix)
+                lock_file_path = _get_lock_file_path(name, lock_file_prefix,
+                                                     lock_path)
 
-                lock_file_path = os.path.join(local_lock_path, lock_file_name)
+                # NOTE: the semaphore above guarantees nobody else in this
+                # process uses the cached lock file while we hold it.
+                file_lock = int_lock.file_lock
+                if file_lock is None or file_lock.fname != lock_file_path:
+                    if file_lock is not None:
+                        file_lock.close()
+                    file_lock = InterProcessLock(lock_file_path)
+                    int_lock.file_lock = file_lock
 
                 try:
-                    lock = InterProcessLock(lock_file_path)
-                    with lock as lock:
+                    with file_lock as lock:
+                        acquired = time.time()
                         LOG.debug(_('Got file lock "%(lock)s" at %(path)s'),
                                   {'lock': name, 'path': lock_file_path})
                         yield lock
@@ -209,10 +399,14 @@ def lock(name, lock_file_prefix=None, external=False, lock_path=None):
                     LOG.debug(_('Released file lock "%(lock)s" at %(path)s'),
                               {'lock': name, 'path': lock_file_path})
             else:
-                yield sem
+                acquired = time.time()
+                yield int_lock.sem
 
         finally:
             local.strong_store.locks_held.remove(name)
+            if acquired is not None:
+                _lock_manager.record(name, acquired - start,
+                                     time.time() - acquired)
 
 
 def synchronized(name, lock_file_prefix=None, external=False, lock_path=None):
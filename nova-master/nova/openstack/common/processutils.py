@@ -24,16 +24,23 @@ import os
 import random
 import shlex
 import signal
+import socket
 
 from eventlet.green import subprocess
 from eventlet import greenthread
+from eventlet import semaphore
 
 from nova.openstack.common.gettextutils import _  # noqa
 from nova.openstack.common import log as logging
+from nova.openstack.common.rootwrap import daemon as rootwrap_daemon
 
 
 LOG = logging.getLogger(__name__)
 
+# Running rootwrap daemons, keyed by the command used to start them
+_ROOTWRAP_DAEMONS = {}
+_ROOTWRAP_DAEMONS_LOCK = semaphore.Semaphore()
+
 
 class InvalidArgumentError(Exception):
     def __init__(self, message=None):
@@ -74,6 +81,50 @@ def _subprocess_setup():
     signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
 
+class _RootwrapDaemon(object):
+    """A rootwrap daemon started by this process and its client."""
+
+    def __init__(self, root_helper_daemon):
+        self.process = subprocess.Popen(shlex.split(root_helper_daemon),
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        close_fds=True,
+                                        preexec_fn=_subprocess_setup)
+        socket_path = self.process.stdout.readline().strip()
+        if not socket_path:
+            raise ProcessExecutionError(
+                exit_code=self.process.wait(),
+                cmd=root_helper_daemon,
+                description=_('Failed to start the rootwrap daemon'))
+        self.client = rootwrap_daemon.Client(socket_path)
+
+    def is_running(self):
+        return self.process.poll() is None
+
+
+def _get_rootwrap_daemon(root_helper_daemon):
+    with _ROOTWRAP_DAEMONS_LOCK:
+        daemon = _ROOTWRAP_DAEMONS.get(root_helper_daemon)
+        if daemon is None or not daemon.is_running():
+            LOG.debug(_('Starting rootwrap daemon: %s'), root_helper_daemon)
+            daemon = _RootwrapDaemon(root_helper_daemon)
+            _ROOTWRAP_DAEMONS[root_helper_daemon] = daemon
+        return daemon
+
+
+def _execute_with_rootwrap_daemon(root_helper_daemon, cmd, process_input):
+    daemon = _get_rootwrap_daemon(root_helper_daemon)
+    try:
+        return daemon.client.execute(cmd, process_input)
+    except (EOFError, socket.error) as e:
+        with _ROOTWRAP_DAEMONS_LOCK:
+            if _ROOTWRAP_DAEMONS.get(root_helper_daemon) is daemon:
+                del _ROOTWRAP_DAEMONS[root_helper_daemon]
+        raise ProcessExecutionError(
+            cmd=' '.join(cmd),
+            description=_('Lost connection to the rootwrap daemon: %s') % e)
+
+
 def execute(*cmd, **kwargs):
     """Helper method to shell out and execute a command through subprocess.
 
@@ -100,6 +151,12 @@ def execute(*cmd, **kwargs):
     :param root_helper:     command to prefix to commands called with
                             run_as_root=True
     :type root_helper:      string
+    :param root_helper_daemon: command starting a rootwrap daemon. If set,
+                            commands called with run_as_root=True are
+                            sent to that daemon, which is started on
+                            first use and then shared by later calls,
+                            instead of being prefixed with root_helper.
+    :type root_helper_daemon: string
     :param shell:           whether or not there should be a shell used to
                             execute this command. Defaults to false.
     :type shell:            boolean
@@ -119,6 +176,7 @@ def execute(*cmd, **kwargs):
     attempts = kwargs.pop('attempts', 1)
     run_as_root = kwargs.pop('run_as_root', False)
     root_helper = kwargs.pop('root_helper', '')
+    root_helper_daemon = kwargs.pop('root_helper_daemon', None)
     shell = kwargs.pop('shell', False)
     loglevel = kwargs.pop('loglevel', stdlib_logging.DEBUG)
 
@@ -132,42 +190,54 @@ def execute(*cmd, **kwargs):
         raise UnknownArgumentError(_('Got unknown keyword args '
                                      'to utils.execute: %r') % kwargs)
 
+    use_daemon = False
     if run_as_root and hasattr(os, 'geteuid') and os.geteuid() != 0:
-        if not root_helper:
+        if root_helper_daemon and not shell:
+            use_daemon = True
+        elif not root_helper:
             raise NoRootWrapSpecified(
                 message=('Command requested root, but did not specify a root '
                          'helper.'))
-        cmd = shlex.split(root_helper) + list(cmd)
+        else:
+            cmd = shlex.split(root_helper) + list(cmd)
 
     cmd = map(str, cmd)
 
     while attempts > 0:
         attempts -= 1
         try:
-            LOG.log(loglevel, _('Running cmd (subprocess): %s'), ' '.join(cmd))
-            _PIPE = subprocess.PIPE  # pylint: disable=E1101
-
-            if os.name == 'nt':
-                preexec_fn = None
-                close_fds = False
-            else:
-                preexec_fn = _subprocess_setup
-                close_fds = True
-
-            obj = subprocess.Popen(cmd,
-                                   stdin=_PIPE,
-                                   stdout=_PIPE,
-                                   stderr=_PIPE,
-                                   close_fds=close_fds,
-                                   preexec_fn=preexec_fn,
-                                   shell=shell)
-            result = None
-            if process_input is not None:
-                result = obj.communicate(process_input)
+            if use_daemon:
+                LOG.log(loglevel, _('Running cmd (rootwrap daemon): %s'),
+                        ' '.join(cmd))
+                _returncode, stdout, stderr = _execute_with_rootwrap_daemon(
+                    root_helper_daemon, cmd, process_input)
+                result = (stdout, stderr)
             else:
-                result = obj.communicate()
-            obj.stdin.close()  # pylint: disable=E1101
-            _returncode = obj.returncode  # pylint: disable=E1101
+                LOG.log(loglevel, _('Running cmd (subprocess): %s'),
+                        ' '.join(cmd))
+                _PIPE = subprocess.PIPE  # pylint: disable=E1101
+
+                if os.name == 'nt':
+                    preexec_fn = None
+                    close_fds = False
+                else:
+                    preexec_fn = _subprocess_setup
+                    close_fds = True
+
+                obj = subprocess.Popen(cmd,
+                                       stdin=_PIPE,
+                                       stdout=_PIPE,
+                                       stderr=_PIPE,
+                                       close_fds=close_fds,
+                                       preexec_fn=preexec_fn,
+                                       shell=shell)
+                result = None
+                if process_input is not None:
+                    result = obj.communicate(process_input)
+                else:
+                    result = obj.communicate()
+                obj.stdin.close()  # pylint: disable=E1101
+                _returncode = obj.returncode  # pylint: disable=E1101
             if _returncode:
                 LOG.log(loglevel, _('Result was %s') % _returncode)
                 if not ignore_exit_code and _returncode not in check_exit_code:
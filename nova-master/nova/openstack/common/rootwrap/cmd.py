@@ -30,6 +30,9 @@
 
    Service packaging should deploy .filters files only on nodes where
    they are needed, to avoid allowing more than is necessary.
+
+   Services running with use_rootwrap_daemon=True start a single
+   nova-rootwrap-daemon instead, see rootwrap/daemon.py.
 """
 
 from __future__ import print_function
@@ -71,24 +74,17 @@ def _getlogin():
                 os.getenv('LOGNAME'))
 
 
-def main():
-    # Split arguments, require at least a command
-    execname = sys.argv.pop(0)
-    if len(sys.argv) < 2:
-        _exit_error(execname, "No command specified", RC_NOCOMMAND, log=False)
-
-    configfile = sys.argv.pop(0)
-    userargs = sys.argv[:]
-
+def _add_topdir_to_path(execname):
     # Add ../ to sys.path to allow running from branch
     possible_topdir = os.path.normpath(os.path.join(os.path.abspath(execname),
                                                     os.pardir, os.pardir))
     if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
         sys.path.insert(0, possible_topdir)
 
+
+def _load_config(execname, configfile):
     from nova.openstack.common.rootwrap import wrapper
 
-    # Load configuration
     try:
         rawconfig = ConfigParser.RawConfigParser()
         rawconfig.read(configfile)
@@ -104,6 +100,39 @@ def main():
         wrapper.setup_syslog(execname,
                              config.syslog_log_facility,
                              config.syslog_log_level)
+    return config
+
+
+def daemon():
+    execname = sys.argv.pop(0)
+    if len(sys.argv) != 1:
+        _exit_error(execname, "Extra arguments to daemon", RC_NOCOMMAND,
+                    log=False)
+    configfile = sys.argv.pop(0)
+
+    _add_topdir_to_path(execname)
+    from nova.openstack.common.rootwrap import daemon as rootwrap_daemon
+    from nova.openstack.common.rootwrap import wrapper
+
+    config = _load_config(execname, configfile)
+    filters = wrapper.load_filters(config.filters_path)
+    rootwrap_daemon.daemon_start(config, filters)
+
+
+def main():
+    # Split arguments, require at least a command
+    execname = sys.argv.pop(0)
+    if len(sys.argv) < 2:
+        _exit_error(execname, "No command specified", RC_NOCOMMAND, log=False)
+
+    configfile = sys.argv.pop(0)
+    userargs = sys.argv[:]
+
+    _add_topdir_to_path(execname)
+    from nova.openstack.common.rootwrap import wrapper
+
+    # Load configuration
+    config = _load_config(execname, configfile)
 
     # Execute command if it matches any of the loaded filters
     filters = wrapper.load_filters(config.filters_path)
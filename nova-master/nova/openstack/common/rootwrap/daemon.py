@@ -0,0 +1,215 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-lived root wrapper
+
+   Running "sudo nova-rootwrap /etc/nova/rootwrap.conf <cmd>" costs a sudo
+   call, a fresh Python interpreter and a parse of every filter file for
+   each command. The daemon pays this once: it is started through sudo by
+   the service, loads the filters and then runs commands sent to it over a
+   UNIX socket, checking each of them with the same match_filter logic as
+   nova-rootwrap.
+
+   The socket lives in a private directory only accessible by the user that
+   ran sudo. Its path is written on stdout once the daemon is ready, and the
+   daemon exits as soon as its stdin is closed, i.e. when the service that
+   started it goes away.
+
+   You also need to let the nova user run nova-rootwrap-daemon as root in
+   sudoers:
+   nova ALL = (root) NOPASSWD: /usr/bin/nova-rootwrap-daemon
+                                   /etc/nova/rootwrap.conf
+"""
+
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+from nova.openstack.common.rootwrap import cmd
+from nova.openstack.common.rootwrap import wrapper
+
+
+# Request: length of the JSON encoded argument list, length of stdin
+_REQUEST_HEADER = struct.Struct('!II')
+# Reply: exit code, length of stdout, length of stderr
+_REPLY_HEADER = struct.Struct('!iII')
+
+
+def _subprocess_setup():
+    # Python installs a SIGPIPE handler by default. This is usually not what
+    # non-Python subprocesses expect.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+def _recvall(sock, length):
+    chunks = []
+    while length:
+        chunk = sock.recv(min(length, 65536))
+        if not chunk:
+            raise EOFError()
+        chunks.append(chunk)
+        length -= len(chunk)
+    return ''.join(chunks)
+
+
+def _send_request(sock, userargs, stdin):
+    args = json.dumps(userargs)
+    stdin = stdin or ''
+    sock.sendall(_REQUEST_HEADER.pack(len(args), len(stdin)) + args + stdin)
+
+
+def _recv_request(sock):
+    args_len, stdin_len = _REQUEST_HEADER.unpack(
+        _recvall(sock, _REQUEST_HEADER.size))
+    userargs = [str(arg) for arg in json.loads(_recvall(sock, args_len))]
+    stdin = _recvall(sock, stdin_len) if stdin_len else None
+    return userargs, stdin
+
+
+def _send_reply(sock, returncode, stdout, stderr):
+    stdout = stdout or ''
+    stderr = stderr or ''
+    sock.sendall(_REPLY_HEADER.pack(returncode, len(stdout), len(stderr)) +
+                 stdout + stderr)
+
+
+def _recv_reply(sock):
+    returncode, stdout_len, stderr_len = _REPLY_HEADER.unpack(
+        _recvall(sock, _REPLY_HEADER.size))
+    stdout = _recvall(sock, stdout_len)
+    stderr = _recvall(sock, stderr_len)
+    return returncode, stdout, stderr
+
+
+class Client(object):
+    """Runs commands through a rootwrap daemon listening on socket_path."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+    def execute(self, userargs, stdin=None):
+        """Returns (returncode, stdout, stderr) for the command.
+
+        Raises socket.error or EOFError if the daemon cannot be reached.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            _send_request(sock, userargs, stdin)
+            return _recv_reply(sock)
+        finally:
+            sock.close()
+
+
+class Daemon(object):
+    """Checks and runs the commands sent over a listening socket."""
+
+    def __init__(self, config, filters):
+        self.config = config
+        self.filters = filters
+
+    def run_command(self, userargs, stdin=None):
+        try:
+            filtermatch = wrapper.match_filter(self.filters, userargs,
+                                               exec_dirs=self.config.exec_dirs)
+        except wrapper.FilterMatchNotExecutable as exc:
+            msg = ("Executable not found: %s (filter match = %s)"
+                   % (exc.match.exec_path, exc.match.name))
+            if self.config.use_syslog:
+                logging.error(msg)
+            return cmd.RC_NOEXECFOUND, '', msg
+        except wrapper.NoFilterMatched:
+            msg = ("Unauthorized command: %s (no filter matched)"
+                   % ' '.join(userargs))
+            if self.config.use_syslog:
+                logging.error(msg)
+            return cmd.RC_UNAUTHORIZED, '', msg
+
+        command = filtermatch.get_command(userargs,
+                                          exec_dirs=self.config.exec_dirs)
+        if self.config.use_syslog:
+            logging.info("(daemon) Executing %s (filter match = %s)" % (
+                command, filtermatch.name))
+
+        obj = subprocess.Popen(command,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               close_fds=True,
+                               preexec_fn=_subprocess_setup,
+                               env=filtermatch.get_environment(userargs))
+        stdout, stderr = obj.communicate(stdin)
+        return obj.returncode, stdout, stderr
+
+    def handle(self, conn):
+        try:
+            userargs, stdin = _recv_request(conn)
+            _send_reply(conn, *self.run_command(userargs, stdin))
+        except (EOFError, ValueError, socket.error):
+            # The client went away or sent garbage, nothing to answer.
+            pass
+        finally:
+            conn.close()
+
+    def serve(self, listener):
+        while True:
+            conn, _addr = listener.accept()
+            worker = threading.Thread(target=self.handle, args=(conn,))
+            worker.daemon = True
+            worker.start()
+
+
+def daemon_start(config, filters):
+    """Serve commands until stdin is closed."""
+    sockdir = tempfile.mkdtemp(prefix='rootwrap-')
+    try:
+        # mkdtemp() creates the directory with mode 0700, hand it over to
+        # the user that called sudo so that nobody else can connect.
+        owner = os.environ.get('SUDO_UID')
+        if owner:
+            os.chown(sockdir, int(owner), -1)
+        socket_path = os.path.join(sockdir, 'rootwrap.sock')
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket is created by root: bind it with mode 0700 and hand
+        # it over too, or the user that called sudo can't connect to it.
+        old_umask = os.umask(0o077)
+        try:
+            listener.bind(socket_path)
+        finally:
+            os.umask(old_umask)
+        if owner:
+            os.chown(socket_path, int(owner), -1)
+        listener.listen(128)
+
+        server = threading.Thread(target=Daemon(config, filters).serve,
+                                  args=(listener,))
+        server.daemon = True
+        server.start()
+
+        sys.stdout.write(socket_path + '\n')
+        sys.stdout.flush()
+        sys.stdin.read()
+    finally:
+        shutil.rmtree(sockdir, ignore_errors=True)
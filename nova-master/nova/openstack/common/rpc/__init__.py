@@ -27,6 +27,7 @@ For some wrappers that add message versioning to rpc, see:
 
 import inspect
 
+import eventlet
 from oslo.config import cfg
 
 from nova.openstack.common.gettextutils import _  # noqa
@@ -139,6 +140,24 @@ def call(context, topic, msg, timeout=None, check_for_lock=False):
     return _get_impl().call(CONF, context, topic, msg, timeout)
 
 
+def call_async(context, topic, msg, timeout=None, check_for_lock=False):
+    """Invoke a remote method without waiting for its result.
+
+    The parameters are the same as for call(). Many calls can be made this
+    way before waiting on any of them, the AMQP drivers then send them in
+    batches on a shared channel instead of publishing one at a time.
+
+    :returns: A future whose wait() method returns what call() would have
+              returned, or raises what call() would have raised.
+    """
+    if check_for_lock:
+        _check_for_lock()
+    impl = _get_impl()
+    if not hasattr(impl, 'call_async'):
+        return eventlet.spawn(impl.call, CONF, context, topic, msg, timeout)
+    return impl.call_async(CONF, context, topic, msg, timeout)
+
+
 def cast(context, topic, msg):
     """Invoke a remote method that does not return anything.
 
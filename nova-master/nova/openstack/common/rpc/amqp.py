@@ -28,9 +28,13 @@ AMQP, but is deprecated and predates this code.
 import collections
 import inspect
 import sys
+import time
 import uuid
 
+import eventlet
+from eventlet import event
 from eventlet import greenpool
+from eventlet import hubs
 from eventlet import pools
 from eventlet import queue
 from eventlet import semaphore
@@ -52,6 +56,10 @@ amqp_opts = [
     cfg.BoolOpt('amqp_auto_delete',
                 default=False,
                 help='Auto-delete queues in amqp.'),
+    cfg.IntOpt('amqp_duplicate_message_window',
+               default=1,
+               help='Number of minutes during which the ids of received '
+                    'messages are kept to drop redelivered ones'),
 ]
 
 cfg.CONF.register_opts(amqp_opts)
@@ -69,6 +77,7 @@ class Pool(pools.Pool):
         kwargs.setdefault("order_as_stack", True)
         super(Pool, self).__init__(*args, **kwargs)
         self.reply_proxy = None
+        self.call_publisher = None
 
     # TODO(comstud): Timeout connections not used in a while
     def create(self):
@@ -191,6 +200,7 @@ class ReplyProxy(ConnectionContext):
         self._num_call_waiters = 0
         self._num_call_waiters_wrn_threshhold = 10
         self._reply_q = 'reply_' + uuid.uuid4().hex
+        self.msg_id_cache = MsgIdCache(conf)
         super(ReplyProxy, self).__init__(conf, connection_pool, pooled=False)
         self.declare_direct_consumer(self._reply_q, self._process_data)
         self.consume_in_thread()
@@ -310,28 +320,47 @@ def pack_context(msg, context):
     msg.update(context_d)
 
 
-class _MsgIdCache(object):
-    """This class checks any duplicate messages."""
+class MsgIdCache(object):
+    """Remembers the unique ids of the messages seen recently.
 
-    # NOTE: This value is considered can be a configuration item, but
-    #       it is not necessary to change its value in most cases,
-    #       so let this value as static for now.
-    DUP_MSG_CHECK_SIZE = 16
+    AMQP consumers may read same message twice when exceptions occur before
+    ack is returned, or after a reconnection. The ids are kept for
+    amqp_duplicate_message_window minutes in a set, so that checking a
+    message costs the same whatever the size of the window, and are expired
+    in the order they were seen. The duplicates dropped are counted, and
+    logged with the running count.
+    """
 
-    def __init__(self, **kwargs):
-        self.prev_msgids = collections.deque([],
-                                             maxlen=self.DUP_MSG_CHECK_SIZE)
+    # Upper bound on the number of ids kept, whatever the window.
+    DUP_MSG_CHECK_SIZE = 65536
+
+    def __init__(self, conf=None, **kwargs):
+        conf = conf or cfg.CONF
+        self.window = conf.amqp_duplicate_message_window * 60
+        self.msgids = set()
+        self.expiries = collections.deque()
+        self.duplicates = 0
+
+    def _expire(self, now):
+        expiries = self.expiries
+        while expiries and (expiries[0][0] < now or
+                            len(expiries) >= self.DUP_MSG_CHECK_SIZE):
+            self.msgids.discard(expiries.popleft()[1])
 
     def check_duplicate_message(self, message_data):
-        """AMQP consumers may read same message twice when exceptions occur
-           before ack is returned. This method prevents doing it.
-        """
+        """Raise DuplicateMessageError if the message was already seen."""
         if UNIQUE_ID in message_data:
             msg_id = message_data[UNIQUE_ID]
-            if msg_id not in self.prev_msgids:
-                self.prev_msgids.append(msg_id)
-            else:
+            now = time.time()
+            self._expire(now)
+            if msg_id in self.msgids:
+                self.duplicates += 1
+                LOG.warn(_('Dropping duplicate message %(msg_id)s, '
+                           '%(duplicates)d dropped so far'),
+                         {'msg_id': msg_id, 'duplicates': self.duplicates})
                 raise rpc_common.DuplicateMessageError(msg_id=msg_id)
+            self.msgids.add(msg_id)
+            self.expiries.append((now + self.window, msg_id))
 
 
 def _add_unique_id(msg):
@@ -406,13 +435,13 @@ class CallbackWrapper(_ThreadPoolWithWait):
 class ProxyCallback(_ThreadPoolWithWait):
     """Calls methods on a proxy object based on method and args."""
 
-    def __init__(self, conf, proxy, connection_pool):
+    def __init__(self, conf, proxy, connection_pool, msg_id_cache=None):
         super(ProxyCallback, self).__init__(
             conf=conf,
             connection_pool=connection_pool,
         )
         self.proxy = proxy
-        self.msg_id_cache = _MsgIdCache()
+        self.msg_id_cache = msg_id_cache or MsgIdCache(conf)
 
     def __call__(self, message_data):
         """Consumer callback to call a method on a proxy object.
@@ -492,11 +521,15 @@ class MulticallProxyWaiter(object):
         self._dataqueue = queue.LightQueue()
         # Add this caller to the reply proxy's call_waiters
         self._reply_proxy.add_call_waiter(self, self._msg_id)
-        self.msg_id_cache = _MsgIdCache()
+        self.msg_id_cache = self._reply_proxy.msg_id_cache
 
     def put(self, data):
         self._dataqueue.put(data)
 
+    def has_replies(self):
+        """Return True if replies are queued, waiting to be processed."""
+        return not self._dataqueue.empty()
+
     def done(self):
         if self._done:
             return
@@ -540,6 +573,137 @@ class MulticallProxyWaiter(object):
             yield result
 
 
+class CallFuture(object):
+    """The pending result of a call made with call_async().
+
+    wait() blocks until the message has been published and the reply has
+    come back, and returns the result like call() would, or raises the
+    remote exception, a publish failure or Timeout.
+
+    The reply is collected without waiting for wait() once the timeout has
+    passed since the message was sent, so that the waiter of a future which
+    is never waited on does not stay registered on the reply proxy.
+    """
+    def __init__(self, waiter, timeout):
+        self._waiter = waiter
+        self._timeout = timeout
+        self._sent = event.Event()
+        self._lock = semaphore.Semaphore()
+        self._expiry = None
+        self._result = None
+        self._exc_info = None
+        self._finished = False
+
+    def sent(self, exc_info=None):
+        """Called by the publisher once the message went out (or not)."""
+        if exc_info:
+            self._waiter.done()
+            self._sent.send_exception(*exc_info)
+        else:
+            self._sent.send()
+            # A timer is much cheaper than a greenthread per call
+            self._expiry = hubs.get_hub().schedule_call_global(
+                self._timeout, self._expire)
+
+    def ready(self):
+        """Return True if the reply, or a failure, came in."""
+        if self._finished:
+            return True
+        if not self._sent.ready():
+            return False
+        return self._sent.has_exception() or self._waiter.has_replies()
+
+    def _expire(self):
+        if not self._finished:
+            eventlet.spawn_n(self._collect)
+
+    def _collect(self):
+        with self._lock:
+            if self._finished:
+                return
+            try:
+                self._sent.wait()
+                rv = list(self._waiter)
+                if rv:
+                    self._result = rv[-1]
+            except Exception:
+                self._exc_info = sys.exc_info()
+            self._finished = True
+            if self._expiry is not None:
+                self._expiry.cancel()
+                self._expiry = None
+
+    def wait(self):
+        self._collect()
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class CallPublisher(object):
+    """Publishes the messages of call_async() calls in batches.
+
+    Callers queue their message and go on with their work. A single
+    greenthread takes one connection from the pool and sends everything
+    queued so far on it, with a single topic_send_batch() when the driver
+    has one. Many calls in flight share a channel instead of each of them
+    waiting for a connection, its own publish and the reset of the channel.
+    """
+    def __init__(self, conf, connection_pool):
+        self.conf = conf
+        self.connection_pool = connection_pool
+        self._queue = collections.deque()
+        self._thread = None
+
+    def publish(self, topic, msg, timeout, future):
+        self._queue.append((topic, msg, timeout, future))
+        if self._thread is None:
+            self._thread = eventlet.spawn(self._run)
+
+    def _fail_queued(self):
+        exc_info = sys.exc_info()
+        while self._queue:
+            self._queue.popleft()[3].sent(exc_info)
+
+    def _send(self, conn, batch):
+        if hasattr(conn.connection, 'topic_send_batch'):
+            try:
+                conn.topic_send_batch([item[:3] for item in batch])
+            except Exception:
+                exc_info = sys.exc_info()
+                for item in batch:
+                    item[3].sent(exc_info)
+            else:
+                for item in batch:
+                    item[3].sent()
+            return
+        for topic, msg, timeout, future in batch:
+            try:
+                conn.topic_send(topic, msg, timeout)
+            except Exception:
+                future.sent(sys.exc_info())
+            else:
+                future.sent()
+
+    def _run(self):
+        try:
+            while self._queue:
+                try:
+                    conn = ConnectionContext(self.conf, self.connection_pool)
+                except Exception:
+                    LOG.exception(_('Failed to get a connection to publish '
+                                    '%d queued calls'), len(self._queue))
+                    self._fail_queued()
+                    break
+                with conn:
+                    while self._queue:
+                        batch = list(self._queue)
+                        self._queue.clear()
+                        self._send(conn, batch)
+        finally:
+            self._thread = None
+
+
 def create_connection(conf, new, connection_pool):
     """Create a connection."""
     return ConnectionContext(conf, connection_pool, pooled=not new)
@@ -548,9 +712,7 @@ def create_connection(conf, new, connection_pool):
 _reply_proxy_create_sem = semaphore.Semaphore()
 
 
-def multicall(conf, context, topic, msg, timeout, connection_pool):
-    """Make a call that returns multiple times."""
-    LOG.debug(_('Making synchronous call on %s ...'), topic)
+def _prepare_call(conf, context, msg, timeout, connection_pool):
     msg_id = uuid.uuid4().hex
     msg.update({'_msg_id': msg_id})
     LOG.debug(_('MSG_ID is %s') % (msg_id))
@@ -561,12 +723,35 @@ def multicall(conf, context, topic, msg, timeout, connection_pool):
         if not connection_pool.reply_proxy:
             connection_pool.reply_proxy = ReplyProxy(conf, connection_pool)
     msg.update({'_reply_q': connection_pool.reply_proxy.get_reply_q()})
-    wait_msg = MulticallProxyWaiter(conf, msg_id, timeout, connection_pool)
+    return MulticallProxyWaiter(conf, msg_id, timeout, connection_pool)
+
+
+def multicall(conf, context, topic, msg, timeout, connection_pool):
+    """Make a call that returns multiple times."""
+    LOG.debug(_('Making synchronous call on %s ...'), topic)
+    wait_msg = _prepare_call(conf, context, msg, timeout, connection_pool)
     with ConnectionContext(conf, connection_pool) as conn:
         conn.topic_send(topic, rpc_common.serialize_msg(msg), timeout)
     return wait_msg
 
 
+def call_async(conf, context, topic, msg, timeout, connection_pool):
+    """Sends a message on a topic and return a CallFuture for the response.
+
+    The message is queued on the CallPublisher of the pool rather than
+    published by the caller, see CallPublisher.
+    """
+    LOG.debug(_('Making asynchronous call on %s ...'), topic)
+    future = CallFuture(_prepare_call(conf, context, msg, timeout,
+                                      connection_pool),
+                        timeout or conf.rpc_response_timeout)
+    if not connection_pool.call_publisher:
+        connection_pool.call_publisher = CallPublisher(conf, connection_pool)
+    connection_pool.call_publisher.publish(
+        topic, rpc_common.serialize_msg(msg), timeout, future)
+    return future
+
+
 def call(conf, context, topic, msg, timeout, connection_pool):
     """Sends a message on a topic and wait for a response."""
     rv = multicall(conf, context, topic, msg, timeout, connection_pool)
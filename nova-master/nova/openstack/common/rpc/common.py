@@ -17,9 +17,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import copy
 import sys
 import traceback
+import zlib
 
 from oslo.config import cfg
 import six
@@ -31,7 +33,35 @@ from nova.openstack.common import local
 from nova.openstack.common import log as logging
 
 
+msgpack = importutils.try_import('msgpack')
+lz4 = importutils.try_import('lz4.block') or importutils.try_import('lz4')
+
+envelope_opts = [
+    cfg.StrOpt('rpc_envelope_version',
+               default='2.0',
+               help='Version of the envelope of the messages sent: 2.0 '
+                    'JSON encodes the payload as a string, 2.1 uses '
+                    'rpc_message_codec and rpc_message_compression.  Only '
+                    'set 2.1 once every service understands it'),
+    cfg.StrOpt('rpc_message_codec',
+               default='json',
+               help='Codec of the payload of 2.1 envelopes: json or '
+                    'msgpack.  msgpack payloads are base64 encoded, which '
+                    'makes them larger than JSON ones unless they are '
+                    'compressed, so only use it along with '
+                    'rpc_message_compression'),
+    cfg.StrOpt('rpc_message_compression',
+               default=None,
+               help='Compression of the payload of 2.1 envelopes: zlib or '
+                    'lz4.  Not compressed if unset'),
+    cfg.IntOpt('rpc_message_compression_threshold',
+               default=16384,
+               help='Payloads of 2.1 envelopes smaller than this number of '
+                    'bytes are not compressed'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(envelope_opts)
 LOG = logging.getLogger(__name__)
 
 
@@ -47,13 +77,33 @@ This version number applies to the message envelope that is used in the
 serialization done inside the rpc layer.  See serialize_msg() and
 deserialize_msg().
 
-The current message format (version 2.0) is very simple.  It is:
+The message format version 2.0 is very simple.  It is:
 
     {
         'oslo.version': <RPC Envelope Version as a String>,
         'oslo.message': <Application Message Payload, JSON encoded>
     }
 
+Version 2.1 adds a codec and an optional compression of the payload:
+
+    {
+        'oslo.version': '2.1',
+        'oslo.codec': 'json' or 'msgpack',
+        'oslo.compression': 'zlib' or 'lz4', only if compressed,
+        'oslo.message': <Application Message Payload>
+    }
+
+JSON payloads which are not compressed are put in the envelope as they
+are, since the envelope itself is passed down as a dict and JSON encoded by
+the messaging library: encoding them as a string first, like 2.0 does,
+encodes them twice.  Other payloads are encoded with the codec (compact
+JSON or msgpack) and then compressed if they are larger than a threshold.
+These binary payloads, i.e. msgpack or compressed ones, are base64 encoded
+so that the messaging library can still JSON encode the envelope.  The
+base64 encoding makes uncompressed msgpack payloads larger than JSON ones.
+The version of the envelopes sent is set by the rpc_envelope_version
+option, so that 2.1 is only used once every service accepts it.
+
 Message format version '1.0' is just considered to be the messages we sent
 without a message envelope.
 
@@ -61,14 +111,15 @@ So, the current message envelope just includes the envelope version.  It may
 eventually contain additional information, such as a signature for the message
 payload.
 
-We will JSON encode the application message payload.  The message envelope,
-which includes the JSON encoded application message body, will be passed down
-to the messaging libraries as a dict.
+The message envelope is passed down to the messaging libraries as a dict,
+which they JSON encode.
 '''
-_RPC_ENVELOPE_VERSION = '2.0'
+_RPC_ENVELOPE_VERSION = '2.1'
 
 _VERSION_KEY = 'oslo.version'
 _MESSAGE_KEY = 'oslo.message'
+_CODEC_KEY = 'oslo.codec'
+_COMPRESSION_KEY = 'oslo.compression'
 
 _REMOTE_POSTFIX = '_Remote'
 
@@ -468,11 +519,119 @@ def version_is_compatible(imp_version, version):
     return True
 
 
+if msgpack is not None:
+    if getattr(msgpack, 'version', (0,)) >= (0, 5, 2):
+        _MSGPACK_UNPACK_KWARGS = {'raw': False}
+    else:
+        _MSGPACK_UNPACK_KWARGS = {'encoding': 'utf-8'}
+
+
+def _msgpack_dumps(raw_msg):
+    return msgpack.packb(raw_msg, default=jsonutils.to_primitive)
+
+
+def _msgpack_loads(data):
+    return msgpack.unpackb(data, **_MSGPACK_UNPACK_KWARGS)
+
+
+def _json_dumps(raw_msg):
+    return jsonutils.dumps(raw_msg, separators=(',', ':'))
+
+
+# codec: (encode, decode, binary)
+_CODECS = {
+    'json': (_json_dumps, jsonutils.loads, False),
+    'msgpack': (_msgpack_dumps, _msgpack_loads, True),
+}
+
+_COMPRESSIONS = {
+    'zlib': (lambda data: zlib.compress(data, 1), zlib.decompress),
+    'lz4': (lambda data: lz4.compress(data),
+            lambda data: lz4.decompress(data)),
+}
+
+
+def _get_codec(name):
+    if name not in _CODECS or (name == 'msgpack' and msgpack is None):
+        raise RPCException(_('Unsupported RPC message codec: %s') % name)
+    return _CODECS[name]
+
+
+def _get_compression(name):
+    if name not in _COMPRESSIONS or (name == 'lz4' and lz4 is None):
+        raise RPCException(_('Unsupported RPC message compression: %s')
+                           % name)
+    return _COMPRESSIONS[name]
+
+
+# Types the messaging libraries JSON encode as they are
+_JSON_SCALAR_TYPES = frozenset(six.string_types + six.integer_types +
+                               (six.text_type, float, bool, type(None)))
+
+
+def _json_primitive(value):
+    """Returns value with what json can't encode converted to primitives.
+
+    Like the default= hook jsonutils.dumps() passes to json, only the values
+    json can't encode go through to_primitive(), and the containers holding
+    them are copied. Everything else is returned as it is.
+    """
+    kind = type(value)
+    if kind in _JSON_SCALAR_TYPES:
+        return value
+    if kind is dict:
+        converted = None
+        for key, item in six.iteritems(value):
+            primitive = _json_primitive(item)
+            if primitive is not item:
+                if converted is None:
+                    converted = dict(value)
+                converted[key] = primitive
+        return value if converted is None else converted
+    if kind is list or kind is tuple:
+        converted = None
+        for index, item in enumerate(value):
+            primitive = _json_primitive(item)
+            if primitive is not item:
+                if converted is None:
+                    converted = list(value)
+                converted[index] = primitive
+        return value if converted is None else converted
+    return jsonutils.to_primitive(value)
+
+
 def serialize_msg(raw_msg):
     # NOTE(russellb) See the docstring for _RPC_ENVELOPE_VERSION for more
     # information about this format.
+    if CONF.rpc_envelope_version == '2.0':
+        return {_VERSION_KEY: '2.0',
+                _MESSAGE_KEY: jsonutils.dumps(raw_msg)}
+    if CONF.rpc_envelope_version != _RPC_ENVELOPE_VERSION:
+        raise UnsupportedRpcEnvelopeVersion(
+            version=CONF.rpc_envelope_version)
+
+    encode, _decode, binary = _get_codec(CONF.rpc_message_codec)
     msg = {_VERSION_KEY: _RPC_ENVELOPE_VERSION,
-           _MESSAGE_KEY: jsonutils.dumps(raw_msg)}
+           _CODEC_KEY: CONF.rpc_message_codec}
+
+    compression = CONF.rpc_message_compression
+    payload = None
+    if binary or compression:
+        payload = encode(raw_msg)
+    if (compression and
+            len(payload) >= CONF.rpc_message_compression_threshold):
+        compress, _decompress = _get_compression(compression)
+        if isinstance(payload, six.text_type):
+            payload = payload.encode('utf-8')
+        payload = compress(payload)
+        msg[_COMPRESSION_KEY] = compression
+        binary = True
+
+    if binary:
+        msg[_MESSAGE_KEY] = base64.b64encode(payload)
+    else:
+        # JSON encoded by the messaging library along with the envelope
+        msg[_MESSAGE_KEY] = _json_primitive(raw_msg)
 
     return msg
 
@@ -516,6 +675,23 @@ def deserialize_msg(msg):
     if not version_is_compatible(_RPC_ENVELOPE_VERSION, msg[_VERSION_KEY]):
         raise UnsupportedRpcEnvelopeVersion(version=msg[_VERSION_KEY])
 
-    raw_msg = jsonutils.loads(msg[_MESSAGE_KEY])
+    codec = msg.get(_CODEC_KEY)
+    if codec is None:
+        # 2.0 envelope
+        return jsonutils.loads(msg[_MESSAGE_KEY])
+
+    _encode, decode, binary = _get_codec(codec)
+    payload = msg[_MESSAGE_KEY]
+    compression = msg.get(_COMPRESSION_KEY)
+    if not binary and not compression:
+        # Uncompressed JSON payloads are in the envelope as they are
+        return payload
+    payload = base64.b64decode(payload)
+    if compression:
+        _compress, decompress = _get_compression(compression)
+        payload = decompress(payload)
+        if not binary:
+            payload = payload.decode('utf-8')
+    raw_msg = decode(payload)
 
     return raw_msg
@@ -162,6 +162,12 @@ def call(conf, context, topic, msg, timeout=None):
     return rv[-1]
 
 
+def call_async(conf, context, topic, msg, timeout=None):
+    """Sends a message on a topic and return a future for the response."""
+    check_serialize(msg)
+    return eventlet.spawn(call, conf, context, topic, msg, timeout)
+
+
 def cast(conf, context, topic, msg):
     check_serialize(msg)
     try:
@@ -416,6 +416,7 @@ class Connection(object):
         self.consumers = []
         self.consumer_thread = None
         self.proxy_callbacks = []
+        self.msg_id_cache = rpc_amqp.MsgIdCache(conf)
         self.conf = conf
         self.max_retries = self.conf.rabbit_max_retries
         # Try forever?
@@ -719,6 +720,31 @@ class Connection(object):
         """Send a 'topic' message."""
         self.publisher_send(TopicPublisher, topic, msg, timeout)
 
+    def topic_send_batch(self, messages):
+        """Send a list of (topic, msg, timeout) 'topic' messages.
+
+        The publisher, and so the exchange declaration, of a topic is reused
+        for all the messages of the list going to that topic.
+        """
+        sent = [0]
+        publishers = {}
+
+        def _error_callback(exc):
+            publishers.clear()
+            LOG.exception(_("Failed to publish a batch of messages: "
+                            "%s") % str(exc))
+
+        def _publish():
+            for topic, msg, timeout in messages[sent[0]:]:
+                publisher = publishers.get(topic)
+                if publisher is None:
+                    publisher = TopicPublisher(self.conf, self.channel, topic)
+                    publishers[topic] = publisher
+                publisher.send(msg, timeout)
+                sent[0] += 1
+
+        self.ensure(_error_callback, _publish)
+
     def fanout_send(self, topic, msg):
         """Send a 'fanout' message."""
         self.publisher_send(FanoutPublisher, topic, msg)
@@ -752,7 +778,8 @@ class Connection(object):
         """Create a consumer that calls a method in a proxy object."""
         proxy_cb = rpc_amqp.ProxyCallback(
             self.conf, proxy,
-            rpc_amqp.get_connection_pool(self.conf, Connection))
+            rpc_amqp.get_connection_pool(self.conf, Connection),
+            self.msg_id_cache)
         self.proxy_callbacks.append(proxy_cb)
 
         if fanout:
@@ -764,7 +791,8 @@ class Connection(object):
         """Create a worker that calls a method in a proxy object."""
         proxy_cb = rpc_amqp.ProxyCallback(
             self.conf, proxy,
-            rpc_amqp.get_connection_pool(self.conf, Connection))
+            rpc_amqp.get_connection_pool(self.conf, Connection),
+            self.msg_id_cache)
         self.proxy_callbacks.append(proxy_cb)
         self.declare_topic_consumer(topic, proxy_cb, pool_name)
 
@@ -816,6 +844,13 @@ def call(conf, context, topic, msg, timeout=None):
         rpc_amqp.get_connection_pool(conf, Connection))
 
 
+def call_async(conf, context, topic, msg, timeout=None):
+    """Sends a message on a topic and return a future for the response."""
+    return rpc_amqp.call_async(
+        conf, context, topic, msg, timeout,
+        rpc_amqp.get_connection_pool(conf, Connection))
+
+
 def cast(conf, context, topic, msg):
     """Sends a message on a topic without waiting for a response."""
     return rpc_amqp.cast(
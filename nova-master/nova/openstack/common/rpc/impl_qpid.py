@@ -449,6 +449,7 @@ class Connection(object):
         self.consumers = {}
         self.consumer_thread = None
         self.proxy_callbacks = []
+        self.msg_id_cache = rpc_amqp.MsgIdCache(conf)
         self.conf = conf
 
         if server_params and 'hostname' in server_params:
@@ -706,7 +707,8 @@ class Connection(object):
         """Create a consumer that calls a method in a proxy object."""
         proxy_cb = rpc_amqp.ProxyCallback(
             self.conf, proxy,
-            rpc_amqp.get_connection_pool(self.conf, Connection))
+            rpc_amqp.get_connection_pool(self.conf, Connection),
+            self.msg_id_cache)
         self.proxy_callbacks.append(proxy_cb)
 
         if fanout:
@@ -722,7 +724,8 @@ class Connection(object):
         """Create a worker that calls a method in a proxy object."""
         proxy_cb = rpc_amqp.ProxyCallback(
             self.conf, proxy,
-            rpc_amqp.get_connection_pool(self.conf, Connection))
+            rpc_amqp.get_connection_pool(self.conf, Connection),
+            self.msg_id_cache)
         self.proxy_callbacks.append(proxy_cb)
 
         consumer = TopicConsumer(self.conf, self.session, topic, proxy_cb,
@@ -783,6 +786,13 @@ def call(conf, context, topic, msg, timeout=None):
         rpc_amqp.get_connection_pool(conf, Connection))
 
 
+def call_async(conf, context, topic, msg, timeout=None):
+    """Sends a message on a topic and return a future for the response."""
+    return rpc_amqp.call_async(
+        conf, context, topic, msg, timeout,
+        rpc_amqp.get_connection_pool(conf, Connection))
+
+
 def cast(conf, context, topic, msg):
     """Sends a message on a topic without waiting for a response."""
     return rpc_amqp.cast(
@@ -27,6 +27,24 @@ from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common.rpc import serializer as rpc_serializer
 
 
+class _CallFuture(object):
+    """Wraps the future of rpc.call_async() for RpcProxy.call_async()."""
+
+    def __init__(self, future, serializer, context, topic, method):
+        self._future = future
+        self._serializer = serializer
+        self._context = context
+        self._topic = topic
+        self._method = method
+
+    def wait(self):
+        try:
+            result = self._future.wait()
+        except rpc.common.Timeout as exc:
+            raise rpc.common.Timeout(exc.info, self._topic, self._method)
+        return self._serializer.deserialize_entity(self._context, result)
+
+
 class RpcProxy(object):
     """A helper class for rpc clients.
 
@@ -129,6 +147,29 @@ class RpcProxy(object):
             raise rpc.common.Timeout(
                 exc.info, real_topic, msg.get('method'))
 
+    def call_async(self, context, msg, topic=None, version=None,
+                   timeout=None):
+        """rpc.call_async() a remote method.
+
+        :param context: The request context
+        :param msg: The message to send, including the method and args.
+        :param topic: Override the topic for this message.
+        :param version: (Optional) Override the requested API version in this
+               message.
+        :param timeout: (Optional) A timeout to use when waiting for the
+               response.  If no timeout is specified, a default timeout will be
+               used that is usually sufficient.
+
+        :returns: A future whose wait() method returns the return value from
+                  the remote method.
+        """
+        self._set_version(msg, version)
+        msg['args'] = self._serialize_msg_args(context, msg['args'])
+        real_topic = self._get_topic(topic)
+        future = rpc.call_async(context, real_topic, msg, timeout)
+        return _CallFuture(future, self.serializer, context, real_topic,
+                           msg.get('method'))
+
     def multicall(self, context, msg, topic=None, version=None, timeout=None):
         """rpc.multicall() a remote method.
 
@@ -18,6 +18,8 @@
 """Policy Engine For Nova."""
 
 import os.path
+import re
+import weakref
 
 from oslo.config import cfg
 
@@ -42,12 +44,23 @@ CONF.register_opts(policy_opts)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
 
+# (rules, compiled rules, per context memo) for the rules in use
+_COMPILED = None
+
+# Keys interpolated from the target by a check like project_id:%(project_id)s
+_TEMPLATE_KEY_RE = re.compile(r'%\(([^)]*)\)')
+
+# Stands for a target field which is not there in a memo key
+_MISSING = object()
+
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _COMPILED
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _COMPILED = None
     policy.reset()
 
 
@@ -67,6 +80,184 @@ def init():
 def _set_rules(data):
     default_rule = CONF.policy_default_rule
     policy.set_rules(policy.Rules.load_json(data, default_rule))
+    _get_compiled()
+
+
+def _compile_check(check, rules, compiled):
+    """Turn a Check tree into a function of (target, creds).
+
+    Returns the function and what its result depends on, as a sorted tuple
+    of ('creds', name) and ('target', name) pairs, or None when that is not
+    known.  Only the checks whose behaviour is known here are compiled, any
+    other check is called as it is.
+    """
+    kind = type(check)
+    if kind is policy.TrueCheck:
+        return lambda target, creds: True, ()
+    elif kind is policy.FalseCheck:
+        return lambda target, creds: False, ()
+    elif kind is policy.NotCheck:
+        func, deps = _compile_check(check.rule, rules, compiled)
+        return lambda target, creds: not func(target, creds), deps
+    elif kind in (policy.AndCheck, policy.OrCheck):
+        funcs = []
+        deps = set()
+        for rule in check.rules:
+            func, rule_deps = _compile_check(rule, rules, compiled)
+            funcs.append(func)
+            if deps is not None and rule_deps is not None:
+                deps.update(rule_deps)
+            else:
+                deps = None
+        funcs = tuple(funcs)
+        deps = tuple(sorted(deps)) if deps is not None else None
+        if kind is policy.AndCheck:
+            def and_check(target, creds):
+                for func in funcs:
+                    if not func(target, creds):
+                        return False
+                return True
+            return and_check, deps
+
+        def or_check(target, creds):
+            for func in funcs:
+                if func(target, creds):
+                    return True
+            return False
+        return or_check, deps
+    elif kind is policy.RuleCheck:
+        func, deps = _compile_rule(check.match, rules, compiled)
+        if func is None:
+            # No such rule and no default one either, fail closed
+            return lambda target, creds: False, ()
+
+        def rule_check(target, creds):
+            try:
+                return func(target, creds)
+            except KeyError:
+                return False
+        return rule_check, deps
+    elif kind is policy.RoleCheck:
+        role = check.match.lower()
+
+        def role_check(target, creds):
+            return role in [x.lower() for x in creds['roles']]
+        return role_check, (('creds', 'roles'),)
+    elif kind is IsAdminCheck:
+        expected = check.expected
+
+        def is_admin_check(target, creds):
+            return creds['is_admin'] == expected
+        return is_admin_check, (('creds', 'is_admin'),)
+    elif kind is policy.GenericCheck:
+        cred, match = check.kind, check.match
+        deps = [('creds', cred)]
+        if '%' in match:
+            def generic_target_check(target, creds):
+                value = match % target
+                if cred in creds:
+                    return value == unicode(creds[cred])
+                return False
+            deps.extend(('target', name)
+                        for name in _TEMPLATE_KEY_RE.findall(match))
+            return generic_target_check, tuple(sorted(set(deps)))
+
+        def generic_check(target, creds):
+            if cred in creds:
+                return match == unicode(creds[cred])
+            return False
+        return generic_check, tuple(deps)
+    return check, None
+
+
+def _compile_rule(name, rules, compiled):
+    """Compile the rule called name, resolved like the Rules dict does."""
+    if name not in rules:
+        name = getattr(rules, 'default_rule', None)
+        if name is None or name not in rules:
+            return None, ()
+    if name not in compiled:
+        # NOTE: A rule referring to itself recurses forever when
+        # called, keep it that way rather than looping here.
+        compiled[name] = (rules[name], None)
+        compiled[name] = _compile_check(rules[name], rules, compiled)
+    return compiled[name]
+
+
+def _get_compiled():
+    """Return the compiled form of the rules in use, compiling them once."""
+    global _COMPILED
+    # NOTE: Rules may be set on the common policy module directly, as the
+    # tests do, so look at which are in use.
+    rules = policy._rules
+    if _COMPILED is None or _COMPILED[0] is not rules:
+        compiled = {}
+        for name in (rules or {}):
+            _compile_rule(name, rules, compiled)
+        _COMPILED = (rules, compiled, weakref.WeakKeyDictionary())
+    return _COMPILED
+
+
+def _memo_key(context, action, target, deps):
+    # NOTE: The credentials are the to_dict() of a RequestContext, which
+    # holds the same values in its attributes.
+    key = [action]
+    for source, name in deps:
+        if source == 'creds':
+            value = getattr(context, name, None)
+        else:
+            try:
+                value = target[name]
+            except KeyError:
+                value = _MISSING
+        if isinstance(value, list):
+            value = tuple(value)
+        key.append(value)
+    return tuple(key)
+
+
+def _check(context, action, target, credentials=None):
+    """Evaluate the compiled rule for action.
+
+    Decisions are remembered for the lifetime of a RequestContext, i.e.
+    for the request, with the values of the credentials and of the target
+    fields they depend on.  The credentials are only turned into a dict
+    when the rule has to be evaluated.
+    """
+    # NOTE: nova.context uses this module
+    from nova import context as nova_context
+
+    rules, compiled, memo = _get_compiled()
+    if not rules:
+        # No rules to reference means we're going to fail closed
+        return False
+    func, deps = _compile_rule(action, rules, compiled)
+    if func is None:
+        return False
+
+    results = None
+    if deps and isinstance(context, nova_context.RequestContext):
+        try:
+            key = _memo_key(context, action, target, deps)
+            results = memo.setdefault(context, {})
+            if key in results:
+                return results[key]
+        except TypeError:
+            # Values which cannot be hashed, or a target which is not a dict
+            results = None
+
+    if credentials is None:
+        # A rule depending on nothing does not need them
+        credentials = context.to_dict() if deps != () else {}
+    try:
+        result = func(target, credentials)
+    except KeyError:
+        # The rule refers to something missing, fail closed
+        result = False
+
+    if results is not None:
+        results[key] = result
+    return result
 
 
 def enforce(context, action, target, do_raise=True):
@@ -93,14 +284,13 @@ def enforce(context, action, target, do_raise=True):
     """
     init()
 
-    credentials = context.to_dict()
-
-    # Add the exception arguments if asked to do a raise
-    extra = {}
-    if do_raise:
-        extra.update(exc=exception.PolicyNotAuthorized, action=action)
-
-    return policy.check(action, target, credentials, **extra)
+    result = _check(context, action, target)
+    if not result:
+        # NOTE: Custom checks may deny with any false value, like None
+        if do_raise:
+            raise exception.PolicyNotAuthorized(action=action)
+        return False
+    return result
 
 
 def check_is_admin(context):
@@ -113,7 +303,7 @@ def check_is_admin(context):
     credentials = context.to_dict()
     target = credentials
 
-    return policy.check('context_is_admin', target, credentials)
+    return _check(context, 'context_is_admin', target, credentials)
 
 
 @policy.register('is_admin')
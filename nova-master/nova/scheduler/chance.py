@@ -86,7 +86,7 @@ class ChanceScheduler(driver.Scheduler):
                               filter_properties, legacy_bdm_in_spec):
         """Create and run an instance or instances."""
         instance_uuids = request_spec.get('instance_uuids')
-        for num, 6e_uuid in enumerate(instance_uuids):
+        for num, instance_uuid in enumerate(instance_uuids):
             request_spec['instance_properties']['launch_index'] = num
             try:
                 host = self._schedule(context, CONF.compute_topic,
@@ -21,6 +21,7 @@ from nova.scheduler import filters
 from nova import servicegroup
 
 CONF = cfg.CONF
+CONF.import_opt('compute_topic', 'nova.compute.rpcapi')
 
 LOG = logging.getLogger(__name__)
 
@@ -43,7 +44,11 @@ class ComputeFilter(filters.BaseHostFilter):
                        'reason': service.get('disabled_reason')})
             return False
         else:
-            if not self.servicegroup_api.service_is_up(service):
+            # NOTE: check against the cached set of up compute hosts rather
+            # than evaluating the heartbeat of every host on every request.
+            up_hosts = self.servicegroup_api.get_up_members(
+                CONF.compute_topic)
+            if host_state.host not in up_hosts:
                 LOG.warn(_("%(host_state)s has not been heard from in a "
                            " while"), {'host_state': host_state})
                 return False
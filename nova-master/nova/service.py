@@ -30,6 +30,7 @@ from nova import context
 from nova import exception
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
+from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import rpc
 from nova.openstack.common import service
@@ -52,6 +53,10 @@ service_opts = [
                help='range of seconds to randomly delay when starting the'
                     ' periodic task scheduler to reduce stampeding.'
                     ' (Disable by setting to 0)'),
+    cfg.IntOpt('lock_stats_interval',
+               default=600,
+               help='seconds between logging the wait and hold times of the'
+                    ' most contended locks. (Disable by setting to 0)'),
     cfg.ListOpt('enabled_apis',
                 default=['ec2', 'osapi_compute', 'metadata'],
                 help='a list of APIs to enable by default'),
@@ -219,6 +224,10 @@ class Service(service.Service):
                                      periodic_interval_max=
                                         self.periodic_interval_max)
 
+        if CONF.lock_stats_interval:
+            self.tg.add_timer(CONF.lock_stats_interval, lockutils.log_stats,
+                              initial_delay=CONF.lock_stats_interval)
+
     def _create_service_ref(self, context):
         svc_values = {
             'host': self.host,
@@ -306,6 +315,7 @@ class Service(service.Service):
         except Exception:
             pass
 
+        lockutils.log_stats()
         super(Service, self).stop()
 
     def periodic_tasks(self, raise_on_error=False):
@@ -23,23 +23,32 @@ from oslo.config import cfg
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 from nova import utils
 
 LOG = logging.getLogger(__name__)
 _default_driver = 'db'
-servicegroup_driver_opt = cfg.StrOpt('servicegroup_driver',
-                                     default=_default_driver,
-                                     help='The driver for servicegroup '
-                                          'service (valid options are: '
-                                          'db, zk, mc)')
+servicegroup_opts = [
+    cfg.StrOpt('servicegroup_driver',
+               default=_default_driver,
+               help='The driver for servicegroup '
+                    'service (valid options are: '
+                    'db, zk, mc)'),
+    cfg.IntOpt('servicegroup_up_members_ttl',
+               default=5,
+               help='Number of seconds the members of a group found to be '
+                    'up are cached for. Set to 0 to disable the cache'),
+]
 
 CONF = cfg.CONF
-CONF.register_opt(servicegroup_driver_opt)
+CONF.register_opts(servicegroup_opts)
 
 
 class API(object):
 
     _driver = None
+    # Snapshots of the up members of each group: {group_id: (expires, set)}
+    _up_members = {}
     _driver_name_class_mapping = {
         'db': 'nova.servicegroup.drivers.db.DbDriver',
         'zk': 'nova.servicegroup.drivers.zk.ZooKeeperDriver',
@@ -68,6 +77,7 @@ class API(object):
                                 % driver_name)
             cls._driver = importutils.import_object(driver_class,
                                                     *args, **kwargs)
+            cls._up_members.clear()
             utils.check_isinstance(cls._driver, ServiceGroupDriver)
             # we don't have to check that cls._driver is not NONE,
             # check_isinstance does it
@@ -116,6 +126,25 @@ class API(object):
         LOG.debug(_('Returns one member of the [%s] group'), group_id)
         return self._driver.get_one(group_id)
 
+    def get_up_members(self, group_id):
+        """Returns a frozenset of the members of the given group that are up.
+
+        The set is fetched with a single get_all() and cached for
+        servicegroup_up_members_ttl seconds, so callers checking many
+        members in a row get O(1) membership tests without evaluating the
+        heartbeat of each service again.
+        """
+        ttl = CONF.servicegroup_up_members_ttl
+        now = timeutils.utcnow_ts()
+        cached = self._up_members.get(group_id)
+        if ttl > 0 and cached is not None and cached[0] > now:
+            return cached[1]
+
+        members = frozenset(self._driver.get_all(group_id) or [])
+        if ttl > 0:
+            self._up_members[group_id] = (now + ttl, members)
+        return members
+
 
 class ServiceGroupDriver(object):
     """Base class for ServiceGroup drivers."""
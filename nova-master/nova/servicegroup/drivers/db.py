@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+
 from oslo.config import cfg
 import six
 
@@ -51,25 +53,41 @@ class DbDriver(api.ServiceGroupDriver):
             service.tg.add_timer(report_interval, self._report_state,
                                  report_interval, service)
 
-    def is_up(self, service_ref):
-        """Moved from nova.utils
-        Check whether a service is up based on last heartbeat.
-        """
+    @staticmethod
+    def _last_heartbeat(service_ref):
         last_heartbeat = service_ref['updated_at'] or service_ref['created_at']
         if isinstance(last_heartbeat, six.string_types):
             # NOTE(russellb) If this service_ref came in over rpc via
             # conductor, then the timestamp will be a string and needs to be
             # converted back to a datetime.
-            last_heartbeat = timeutils.parse_strtime(last_heartbeat)
-        else:
-            # Objects have proper UTC timezones, but the timeutils comparison
-            # below does not (and will fail)
-            last_heartbeat = last_heartbeat.replace(tzinfo=None)
+            return timeutils.parse_strtime(last_heartbeat)
+        # Objects have proper UTC timezones, but the timeutils comparison
+        # below does not (and will fail)
+        return last_heartbeat.replace(tzinfo=None)
+
+    @staticmethod
+    def _heartbeat_window():
+        """Returns the oldest and newest heartbeats of a service that is up.
+
+        Newer heartbeats than now are accepted up to the same distance to
+        tolerate clock skew between hosts.
+        """
         # Timestamps in DB are UTC.
-        elapsed = timeutils.delta_seconds(last_heartbeat, timeutils.utcnow())
-        LOG.debug('DB_Driver.is_up last_heartbeat = %(lhb)s elapsed = %(el)s',
-                  {'lhb': str(last_heartbeat), 'el': str(elapsed)})
-        return abs(elapsed) <= CONF.service_down_time
+        now = timeutils.utcnow()
+        down_time = datetime.timedelta(seconds=CONF.service_down_time)
+        return now - down_time, now + down_time
+
+    def is_up(self, service_ref):
+        """Moved from nova.utils
+        Check whether a service is up based on last heartbeat.
+        """
+        last_heartbeat = self._last_heartbeat(service_ref)
+        oldest, newest = self._heartbeat_window()
+        LOG.debug('DB_Driver.is_up last_heartbeat = %(lhb)s window = '
+                  '%(oldest)s - %(newest)s',
+                  {'lhb': str(last_heartbeat), 'oldest': str(oldest),
+                   'newest': str(newest)})
+        return oldest <= last_heartbeat <= newest
 
     def get_all(self, group_id):
         """
@@ -79,8 +97,23 @@ class DbDriver(api.ServiceGroupDriver):
         rs = []
         ctxt = context.get_admin_context()
         services = self.conductor_api.service_get_all_by_topic(ctxt, group_id)
+
+        # NOTE: evaluate the whole group against a single heartbeat window.
+        # Timestamps coming back from the conductor are timeutils.strtime()
+        # strings, which sort the same way as the datetimes they encode, so
+        # they are compared as is rather than parsed one by one.
+        oldest, newest = self._heartbeat_window()
+        str_oldest = timeutils.strtime(oldest)
+        str_newest = timeutils.strtime(newest)
         for service in services:
-            if self.is_up(service):
+            last_heartbeat = service['updated_at'] or service['created_at']
+            if (isinstance(last_heartbeat, six.string_types) and
+                    len(last_heartbeat) == len(str_oldest)):
+                is_up = str_oldest <= last_heartbeat <= str_newest
+            else:
+                last_heartbeat = self._last_heartbeat(service)
+                is_up = oldest <= last_heartbeat <= newest
+            if is_up:
                 rs.append(service['host'])
         return rs
 
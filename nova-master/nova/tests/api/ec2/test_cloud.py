@@ -2851,6 +2851,62 @@ class CloudTestCase(test.TestCase):
         self.assertIsNone(
                 ec2utils.resource_type_from_id(self.context, 'x-12345'))
 
+    def test_get_int_ids_from_instance_uuids(self):
+        inst = db.ec2_instance_create(self.context, 'fake-uuid-1')
+        int_ids = ec2utils.get_int_ids_from_instance_uuids(
+                self.context, ['fake-uuid-1', 'fake-uuid-2', None])
+        self.assertEqual(
+                {'fake-uuid-1': inst['id'],
+                 'fake-uuid-2': db.get_ec2_instance_id_by_uuid(
+                        self.context, 'fake-uuid-2')},
+                int_ids)
+
+    def test_get_int_ids_from_instance_uuids_shares_memoize_cache(self):
+        int_id = ec2utils.get_int_id_from_instance_uuid(self.context,
+                                                        'fake-uuid-1')
+        int_ids = ec2utils.get_int_ids_from_instance_uuids(
+                self.context, ['fake-uuid-1', 'fake-uuid-2'])
+        self.assertEqual(int_id, int_ids['fake-uuid-1'])
+
+        self.mox.StubOutWithMock(db, 'get_ec2_instance_id_by_uuid')
+        self.mox.StubOutWithMock(db, 'get_ec2_instance_ids_by_uuids')
+        self.mox.ReplayAll()
+        self.assertEqual(int_ids['fake-uuid-2'],
+                         ec2utils.get_int_id_from_instance_uuid(
+                                self.context, 'fake-uuid-2'))
+        self.assertEqual(int_ids,
+                         ec2utils.get_int_ids_from_instance_uuids(
+                                self.context, ['fake-uuid-1', 'fake-uuid-2']))
+
+    def test_ids_to_ec2_inst_ids(self):
+        inst = db.ec2_instance_create(self.context,
+                                      'a2ba3abd-1fd6-4fa0-9c70-cd0e6a3a35a4')
+        ec2_ids = ec2utils.ids_to_ec2_inst_ids(
+                [inst['uuid'], 435679, None])
+        self.assertEqual({inst['uuid']: ec2utils.id_to_ec2_id(inst['id']),
+                          435679: 'i-0006a5df',
+                          None: None},
+                         ec2_ids)
+
+    def test_format_instances_resolves_ec2_ids_in_bulk(self):
+        self._stub_instance_get_with_fixed_ips('get_all')
+        image_uuid = 'cedef40a-ed67-4d10-800e-17455edce175'
+        sys_meta = flavors.save_flavor_info(
+            {}, flavors.get_flavor(1))
+        for hostname in ('server-1', 'server-2', 'server-3'):
+            db.instance_create(self.context, {'reservation_id': 'a',
+                                              'image_ref': image_uuid,
+                                              'instance_type_id': 1,
+                                              'hostname': hostname,
+                                              'vm_state': 'active',
+                                              'system_metadata': sys_meta})
+
+        self.mox.StubOutWithMock(db, 'get_ec2_instance_id_by_uuid')
+        self.mox.StubOutWithMock(db, 'ec2_instance_create')
+        self.mox.ReplayAll()
+        result = self.cloud.describe_instances(self.context)
+        self.assertEqual(3, len(result['reservationSet'][0]['instancesSet']))
+
 
 class CloudTestCaseNeutronProxy(test.TestCase):
     def setUp(self):
@@ -750,6 +750,46 @@ class TemplateTest(test.NoDBTestCase):
         self.assertEqual(result[0].tag, 'image')
         self.assertEqual(result[0].get('id'), str(obj['test']['image']))
 
+    def _compiled_template(self):
+        root = xmlutil.TemplateElement('servers')
+        elem = xmlutil.SubTemplateElement(root, 'server', selector='servers')
+        elem.set('id')
+        elem.set('name')
+        meta = xmlutil.SubTemplateElement(elem, 'meta',
+                                          selector='metadata',
+                                          subselector=xmlutil.get_items)
+        meta.set('key', 0)
+        meta.text = 1
+        main = xmlutil.MainTemplate(root, 1, nsmap={None: 'ns'})
+
+        root_subordinate = xmlutil.TemplateElement('servers')
+        elem = xmlutil.SubTemplateElement(root_subordinate, 'server',
+                                          selector='servers')
+        elem.set('status')
+        main.attach(xmlutil.SubordinateTemplate(root_subordinate, 1))
+        return main, elem
+
+    def test_serialize_matches_tree_walk(self):
+        main, _elem = self._compiled_template()
+        obj = {'servers': [{'id': 1, 'name': 'a', 'status': 'ACTIVE',
+                            'metadata': {'k': 'v'}},
+                           {'id': 2, 'name': u'\xe9', 'metadata': {}}]}
+
+        expected = etree.tostring(main._serialize(None, obj,
+                                                  main._siblings(),
+                                                  main._nsmap()),
+                                  **main.serialize_options)
+        self.assertEqual(expected, main.serialize(obj))
+
+    def test_serialize_recompiles_modified_template(self):
+        main, elem = self._compiled_template()
+        obj = {'servers': [{'id': 1, 'name': 'a', 'status': 'ACTIVE',
+                            'host': 'h', 'metadata': {}}]}
+
+        self.assertNotIn('host=', main.serialize(obj))
+        elem.set('host')
+        self.assertIn('host="h"', main.serialize(obj))
+
 
 class MainTemplateBuilder(xmlutil.TemplateBuilder):
     def construct(self):
@@ -205,7 +205,8 @@ class CellsManagerClassTestCase(test.NoDBTestCase):
         def utcnow():
             return stalled_time
 
-        call_info = {'get_instances': 0, 'sync_instances': []}
+        call_info = {'get_instances': 0, 'sync_instances': [],
+                     'bulk_queries': 0}
 
         instances = ['instance1', 'instance2', 'instance3']
 
@@ -217,17 +218,18 @@ class CellsManagerClassTestCase(test.NoDBTestCase):
             call_info['get_instances'] += 1
             return iter(instances)
 
-        def instance_get_by_uuid(context, uuid):
-            return instances[int(uuid[-1]) - 1]
+        def instance_get_all_by_filters(context, filters):
+            call_info['bulk_queries'] += 1
+            return [{'uuid': uuid} for uuid in filters['uuid']]
 
         def sync_instance(context, instance):
             self.assertEqual(context, fake_context)
-            call_info['sync_instances'].append(instance)
+            call_info['sync_instances'].append(instance['uuid'])
 
         self.stubs.Set(cells_utils, 'get_instances_to_sync',
                 get_instances_to_sync)
-        self.stubs.Set(self.cells_manager.db, 'instance_get_by_uuid',
-                instance_get_by_uuid)
+        self.stubs.Set(self.cells_manager.db, 'instance_get_all_by_filters',
+                instance_get_all_by_filters)
         self.stubs.Set(self.cells_manager, '_sync_instance',
                 sync_instance)
         self.stubs.Set(timeutils, 'utcnow', utcnow)
@@ -237,6 +239,7 @@ class CellsManagerClassTestCase(test.NoDBTestCase):
         self.assertIsNone(call_info['project_id'])
         self.assertEqual(call_info['updated_since'], updated_since)
         self.assertEqual(call_info['get_instances'], 1)
+        self.assertEqual(call_info['bulk_queries'], 1)
         # Only first 2
         self.assertEqual(call_info['sync_instances'],
                 instances[:2])
@@ -247,10 +250,34 @@ class CellsManagerClassTestCase(test.NoDBTestCase):
         self.assertIsNone(call_info['project_id'])
         self.assertEqual(call_info['updated_since'], updated_since)
         self.assertEqual(call_info['get_instances'], 2)
+        self.assertEqual(call_info['bulk_queries'], 2)
         # Now the last 1 and the first 1
         self.assertEqual(call_info['sync_instances'],
                 [instances[-1], instances[0]])
 
+    def test_heal_instances_skips_missing(self):
+        self.flags(instance_update_num_instances=2, group='cells')
+        instances = ['instance1', 'gone', 'instance2', 'instance3']
+        synced = []
+        queries = []
+
+        def instance_get_all_by_filters(context, filters):
+            queries.append(filters['uuid'])
+            return [{'uuid': uuid} for uuid in filters['uuid']
+                    if uuid != 'gone']
+
+        self.stubs.Set(cells_utils, 'get_instances_to_sync',
+                lambda context, **kwargs: iter(instances))
+        self.stubs.Set(self.cells_manager.db, 'instance_get_all_by_filters',
+                instance_get_all_by_filters)
+        self.stubs.Set(self.cells_manager, '_sync_instance',
+                lambda context, instance: synced.append(instance['uuid']))
+
+        self.cells_manager._heal_instances(context.RequestContext('fake',
+                                                                  'fake'))
+        self.assertEqual([['instance1', 'gone'], ['instance2']], queries)
+        self.assertEqual(['instance1', 'instance2'], synced)
+
     def test_sync_instances(self):
         self.mox.StubOutWithMock(self.msg_runner,
                                  'sync_instances')
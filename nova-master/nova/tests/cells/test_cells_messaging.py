@@ -15,6 +15,7 @@
 Tests For Cells Messaging module
 """
 
+import mox
 from oslo.config import cfg
 
 from nova.cells import messaging
@@ -1546,6 +1547,52 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
 
         self.src_msg_runner.instance_destroy_at_top(self.ctxt, fake_instance)
 
+    def test_instance_sync_batched(self):
+        self.flags(instance_update_batch_window=1, group='cells')
+        flushes = []
+
+        def fake_spawn_after(seconds, func):
+            self.assertEqual(1, seconds)
+            flushes.append(func)
+
+        self.stubs.Set(messaging.eventlet, 'spawn_after', fake_spawn_after)
+
+        expected_cell_name = 'api-cell!child-cell2!grandchild-cell1'
+        self.mox.StubOutWithMock(self.src_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_destroy')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_fault_create')
+        self.tgt_db_inst.instance_update(mox.IgnoreArg(), 'uuid1',
+                                         {'uuid': 'uuid1',
+                                          'vm_state': 'active',
+                                          'task_state': None,
+                                          'cell_name': expected_cell_name},
+                                         update_cells=False)
+        self.tgt_db_inst.instance_destroy(mox.IgnoreArg(), 'uuid2',
+                                          update_cells=False)
+        self.tgt_db_inst.instance_fault_create(mox.IgnoreArg(),
+                                               {'instance_uuid': 'uuid1'})
+        self.mox.ReplayAll()
+
+        runner = self.src_msg_runner
+        runner.instance_update_at_top(self.ctxt, {'uuid': 'uuid1',
+                                                  'vm_state': 'building',
+                                                  'task_state': 'spawning'})
+        runner.instance_update_at_top(self.ctxt, {'uuid': 'uuid2'})
+        runner.instance_update_at_top(self.ctxt, {'uuid': 'uuid1',
+                                                  'vm_state': 'active',
+                                                  'task_state': None})
+        runner.instance_destroy_at_top(self.ctxt, {'uuid': 'uuid2'})
+        runner.instance_fault_create_at_top(self.ctxt,
+                                            {'id': 1,
+                                             'instance_uuid': 'uuid1'})
+
+        # Nothing is sent until the window is over
+        self.assertEqual(1, len(flushes))
+        flushes[0]()
+        self.assertIsNone(runner._instance_sync_batch)
+
     def test_instance_hard_delete_everywhere(self):
         # Reset this, as this is a broadcast down.
         self._setup_attrs(up=False)
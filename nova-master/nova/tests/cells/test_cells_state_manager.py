@@ -130,6 +130,32 @@ class TestCellsStateManager(test.TestCase):
         units = 2  # 2 on host 3
         self.assertEqual(units, cap['disk_free']['units_by_mb'][str(sz)])
 
+    def test_capacity_duplicate_sizes(self):
+        # two instance_types of the same size are both counted:
+        FAKE_ITYPES.append((50, 12, 13))
+        self.addCleanup(FAKE_ITYPES.pop)
+        cap = self._capacity(0.0)
+
+        cell_free_ram = sum(compute[3] for compute in FAKE_COMPUTES)
+        units = 2 * (cell_free_ram / 50)
+        self.assertEqual(units, cap['ram_free']['units_by_mb']['50'])
+
+        sz = 25 * 1024
+        self.assertEqual(10, cap['disk_free']['units_by_mb'][str(sz)])
+
+    def test_free_units_without_numpy(self):
+        sizes = [0, 50, 50, 512, 1024, 2048, 4096]
+        totals = [1024, 2048, 4096, 8192, 16384]
+        frees = [-1, 0, 1023, 4096, 12000]
+        expected = state._free_units_by_size(sizes, totals, frees, 0.1)
+
+        self.stubs.Set(state, 'numpy', None)
+        self.assertEqual(expected, state._free_units_by_size(sizes, totals,
+                                                             frees, 0.1))
+        self.assertEqual({'0': 0, '50': 2 * 284, '512': 27, '1024': 13,
+                          '2048': 6, '4096': 2},
+                         expected)
+
     def _get_state_manager(self, reserve_percent=0.0):
         self.flags(reserve_percent=reserve_percent, group='cells')
         return state.CellStateManager()
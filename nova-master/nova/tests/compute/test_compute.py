@@ -5965,11 +5965,16 @@ class ComputeTestCase(BaseTestCase):
     def test_sync_power_states(self):
         ctxt = self.context.elevated()
         self._create_fake_instance({'host': self.compute.host})
-        self._create_fake_instance({'host': self.compute.host})
-        self._create_fake_instance({'host': self.compute.host})
+        instance2 = self._create_fake_instance({'host': self.compute.host})
+        instance3 = self._create_fake_instance({'host': self.compute.host})
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'get_info_for_instances')
         self.mox.StubOutWithMock(self.compute.driver, 'get_info')
         self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
 
+        self.compute.driver.get_info_for_instances(mox.IgnoreArg()).AndReturn(
+            {instance2['uuid']: {'state': power_state.RUNNING},
+             instance3['uuid']: {'state': power_state.SHUTDOWN}})
         # Check to make sure task continues on error.
         self.compute.driver.get_info(mox.IgnoreArg()).AndRaise(
             exception.InstanceNotFound(instance_id='fake-uuid'))
@@ -5977,19 +5982,67 @@ class ComputeTestCase(BaseTestCase):
                                                 power_state.NOSTATE).AndRaise(
             exception.InstanceNotFound(instance_id='fake-uuid'))
 
-        self.compute.driver.get_info(mox.IgnoreArg()).AndReturn(
-            {'state': power_state.RUNNING})
         self.compute._sync_instance_power_state(ctxt, mox.IgnoreArg(),
                                                 power_state.RUNNING,
                                                 use_subordinate=True)
-        self.compute.driver.get_info(mox.IgnoreArg()).AndReturn(
-            {'state': power_state.SHUTDOWN})
         self.compute._sync_instance_power_state(ctxt, mox.IgnoreArg(),
                                                 power_state.SHUTDOWN,
                                                 use_subordinate=True)
         self.mox.ReplayAll()
         self.compute._sync_power_states(ctxt)
 
+    def test_sync_power_states_bulk_failure(self):
+        ctxt = self.context.elevated()
+        self._create_fake_instance({'host': self.compute.host})
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'get_info_for_instances')
+        self.mox.StubOutWithMock(self.compute.driver, 'get_info')
+        self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
+
+        self.compute.driver.get_info_for_instances(mox.IgnoreArg()).AndRaise(
+            test.TestingException())
+        self.compute.driver.get_info(mox.IgnoreArg()).AndReturn(
+            {'state': power_state.RUNNING})
+        self.compute._sync_instance_power_state(ctxt, mox.IgnoreArg(),
+                                                power_state.RUNNING,
+                                                use_subordinate=True)
+        self.mox.ReplayAll()
+        self.compute._sync_power_states(ctxt)
+
+    def test_sync_power_states_deferred_save_failure(self):
+        ctxt = self.context.elevated()
+        instance = self._create_fake_instance({'host': self.compute.host})
+        instances = instance_obj.InstanceList.get_by_host(ctxt,
+                                                          self.compute.host)
+        actions = []
+
+        class FakeIndirectionAPI(object):
+            def object_class_action(self, context, objname, objmethod,
+                                    objver, args, kwargs):
+                return instances
+
+            def object_actions(self, context, object_actions):
+                actions.extend(action[1] for action in object_actions)
+                # The instance was deleted during the pass
+                return [(exception.InstanceNotFound(instance_id='fake'),
+                         {}, None)] * len(object_actions)
+
+        def fake_sync_instance_power_state(context, db_instance,
+                                           vm_power_state,
+                                           use_subordinate=False):
+            db_instance.power_state = vm_power_state
+            db_instance.save()
+
+        self.stubs.Set(obj_base.NovaObject, 'indirection_api',
+                       FakeIndirectionAPI())
+        self.stubs.Set(self.compute.driver, 'get_info_for_instances',
+                       lambda instances: {instance['uuid']:
+                                          {'state': power_state.SHUTDOWN}})
+        self.stubs.Set(self.compute, '_sync_instance_power_state',
+                       fake_sync_instance_power_state)
+        self.compute._sync_power_states(ctxt)
+        self.assertEqual(['save'], actions)
+
     def _test_lifecycle_event(self, lifecycle_event, power_state):
         instance = self._create_fake_instance()
         uuid = instance['uuid']
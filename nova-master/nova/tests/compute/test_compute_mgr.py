@@ -608,6 +608,18 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.assertFalse(c.cleaned)
         self.assertEqual('1', c.system_metadata['clean_attempts'])
 
+    def test_prefetch_image(self):
+        with mock.patch.object(self.compute.driver,
+                               'prefetch_image') as prefetch_image:
+            self.compute.prefetch_image(self.context, 'fake-image')
+            prefetch_image.assert_called_once_with(self.context,
+                                                   'fake-image')
+
+    def test_prefetch_image_not_implemented(self):
+        with mock.patch.object(self.compute.driver, 'prefetch_image',
+                               side_effect=NotImplementedError()):
+            self.compute.prefetch_image(self.context, 'fake-image')
+
     def test_swap_volume_volume_api_usage(self):
         # This test ensures that volume_id arguments are passed to volume_api
         # and that volume states are OK
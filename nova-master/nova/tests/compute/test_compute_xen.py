@@ -47,12 +47,15 @@ class ComputeXenTestCase(stubs.XenAPITestBaseNoDB):
 
         self.mox.StubOutWithMock(instance_obj.InstanceList, 'get_by_host')
         self.mox.StubOutWithMock(self.compute.driver, 'get_num_instances')
+        self.mox.StubOutWithMock(self.compute.driver,
+                                 'get_info_for_instances')
         self.mox.StubOutWithMock(vm_utils, 'lookup')
         self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
 
         instance_obj.InstanceList.get_by_host(ctxt,
                 self.compute.host, use_subordinate=True).AndReturn(instance_list)
         self.compute.driver.get_num_instances().AndReturn(1)
+        self.compute.driver.get_info_for_instances([instance]).AndReturn({})
         vm_utils.lookup(self.compute.driver._session, instance['name'],
                 False).AndReturn(None)
         self.compute._sync_instance_power_state(ctxt, instance,
@@ -108,6 +108,31 @@ class ComputeHostAPITestCase(test.TestCase):
         result = self.host_api.get_host_uptime(self.ctxt, 'fake_host')
         self.assertEqual('fake-result', result)
 
+    def test_prefetch_image(self):
+        self.stubs.Set(self.host_api, '_assert_host_exists',
+                       lambda context, host_name: host_name.lower())
+        self.mox.StubOutWithMock(self.host_api.rpcapi, 'prefetch_image')
+        self.host_api.rpcapi.prefetch_image(self.ctxt, image_id='fake-image',
+                                            host='host1')
+        self.host_api.rpcapi.prefetch_image(self.ctxt, image_id='fake-image',
+                                            host='host2')
+        self.mox.ReplayAll()
+        self.host_api.prefetch_image(self.ctxt, 'fake-image',
+                                     ['Host1', 'Host2'])
+
+    def test_prefetch_image_unknown_host(self):
+        def fake_assert_host_exists(context, host_name):
+            if host_name != 'fake_host':
+                raise exception.HostNotFound(host=host_name)
+            return host_name
+        self.stubs.Set(self.host_api, '_assert_host_exists',
+                       fake_assert_host_exists)
+        self.mox.StubOutWithMock(self.host_api.rpcapi, 'prefetch_image')
+        self.mox.ReplayAll()
+        self.assertRaises(exception.HostNotFound,
+                          self.host_api.prefetch_image, self.ctxt,
+                          'fake-image', ['fake_host', 'unknown_host'])
+
     def test_get_host_uptime_service_down(self):
         def fake_service_get_by_compute_host(context, host_name):
             return dict(test_service.fake_service, id=1)
@@ -442,6 +467,15 @@ class ComputeHostAPICellsTestCase(ComputeHostAPITestCase):
                 cell_and_host)
         self.assertEqual(expected_result, result)
 
+    def test_prefetch_image_in_cell(self):
+        cell_and_host = cells_utils.cell_with_item('cell1', 'fake-host')
+        self.mox.StubOutWithMock(self.host_api.rpcapi, 'prefetch_image')
+        self.host_api.rpcapi.prefetch_image(self.ctxt, image_id='fake-image',
+                                            host=cell_and_host)
+        self.mox.ReplayAll()
+        self.host_api.prefetch_image(self.ctxt, 'fake-image',
+                                     [cell_and_host])
+
     def test_task_log_get_all(self):
         self.mox.StubOutWithMock(self.host_api.cells_rpcapi,
                                  'task_log_get_all')
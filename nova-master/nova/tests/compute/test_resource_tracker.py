@@ -617,6 +617,61 @@ class InstanceClaimTestCase(BaseTrackerTestCase):
         self.assertEqual(claim_disk, self.compute['local_gb_used'])
         self.assertEqual(6 - claim_disk, self.compute['free_disk_gb'])
 
+    def test_claim_during_audit(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=2,
+                                       ephemeral_gb=0)
+        driver = self.tracker.driver
+
+        def fake_get_per_instance_usage():
+            # the instance is claimed after the audit fetched the instances
+            # of the host, but before it updated the compute node:
+            self.tracker.instance_claim(self.context, instance, self.limits)
+            return {}
+
+        self.stubs.Set(driver, 'get_per_instance_usage',
+                       fake_get_per_instance_usage)
+        self.tracker.update_available_resource(self.context)
+
+        self.assertIn(instance['uuid'], self.tracker.tracked_instances)
+        self._assert(3 + FAKE_VIRT_MEMORY_OVERHEAD, 'memory_mb_used')
+        self._assert(2, 'local_gb_used')
+        self.assertEqual({}, self.tracker.drift)
+
+    def test_abort_during_audit(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=2,
+                                       ephemeral_gb=0)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        driver = self.tracker.driver
+
+        def fake_get_per_instance_usage():
+            self.tracker.abort_instance_claim(instance)
+            return {}
+
+        self.stubs.Set(driver, 'get_per_instance_usage',
+                       fake_get_per_instance_usage)
+        self.tracker.update_available_resource(self.context)
+
+        self.assertNotIn(instance['uuid'], self.tracker.tracked_instances)
+        self._assert(0, 'memory_mb_used')
+        self._assert(0, 'local_gb_used')
+        self.assertEqual({}, self.tracker.drift)
+
+    def test_audit_reports_drift(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=2,
+                                       ephemeral_gb=0)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        # the instance goes away without the tracker being told about it:
+        del self._instances[instance['uuid']]
+
+        self.tracker.update_available_resource(self.context)
+
+        self._assert(0, 'memory_mb_used')
+        drift = self.tracker.drift
+        self.assertEqual({'ledger': 3 + FAKE_VIRT_MEMORY_OVERHEAD,
+                          'audit': 0}, drift['memory_mb_used'])
+        self.assertEqual({'ledger': 2, 'audit': 0}, drift['local_gb_used'])
+        self.assertEqual([instance['uuid']], drift['unknown_instances'])
+
     def test_claim_and_abort(self):
         claim_mem = 3
         claim_disk = 2
@@ -663,6 +663,10 @@ class ComputeRpcAPITestCase(test.TestCase):
         self._test_compute_api('get_host_uptime', 'call', host='host',
                 version='2.0')
 
+    def test_prefetch_image(self):
+        self._test_compute_api('prefetch_image', 'cast', image_id='id',
+                host='host', version='3.5')
+
     def test_backup_instance(self):
         self._test_compute_api('backup_instance', 'cast',
                 instance=self.fake_instance, image_id='id',
@@ -847,6 +847,27 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.assertIn('dict', updates)
         self.assertEqual({'foo': 'bar'}, updates['dict'])
 
+    def test_object_actions(self):
+        class TestObject(obj_base.NovaObject):
+            def foo(self, context):
+                return 'foo'
+
+            @classmethod
+            def bar(cls, context):
+                raise exc.NotFound()
+
+        results = self.conductor.object_actions(
+            self.context, [(TestObject(), 'foo', None, tuple(), {}),
+                           (TestObject.obj_name(), 'bar', '1.0', tuple(),
+                            {})])
+        self.assertEqual(2, len(results))
+        self.assertEqual((None, {'obj_what_changed': set()}, 'foo'),
+                         results[0])
+        failure, updates, result = results[1]
+        self.assertEqual('NotFound', jsonutils.loads(failure)['class'])
+        self.assertIsNone(updates)
+        self.assertIsNone(result)
+
     def test_aggregate_metadata_add(self):
         aggregate = {'name': 'fake aggregate', 'id': 'fake-id'}
         metadata = {'foo': 'bar'}
@@ -899,6 +920,40 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def _test_object_actions(self):
+        class TestObject(obj_base.NovaObject):
+            fields = {'foo': fields.IntegerField()}
+
+            def touch(self, context):
+                self.foo = 2
+
+            @classmethod
+            def bar(cls, context):
+                raise exc.NotFound()
+
+        obj = TestObject(foo=1)
+        obj.obj_reset_changes()
+        results = self.conductor.object_actions(
+            self.context, [(obj, 'touch', None, tuple(), {}),
+                           (TestObject.obj_name(), 'bar', '1.0', tuple(),
+                            {})])
+        self.assertEqual(2, len(results))
+        error, updates, result = results[0]
+        self.assertIsNone(error)
+        self.assertEqual(2, updates['foo'])
+        self.assertIsNone(result)
+        self.assertIsInstance(results[1][0], exc.NotFound)
+
+    def test_object_actions(self):
+        self._test_object_actions()
+
+    def test_object_actions_old_conductor(self):
+        self.flags(conductor='havana', group='upgrade_levels')
+        self.conductor = conductor_rpcapi.ConductorAPI()
+        self.mox.StubOutWithMock(self.conductor_manager, 'object_actions')
+        self.mox.ReplayAll()
+        self._test_object_actions()
+
     def test_block_device_mapping_update_or_create(self):
         fake_bdm = {'id': 'fake-id'}
         self.mox.StubOutWithMock(db, 'block_device_mapping_create')
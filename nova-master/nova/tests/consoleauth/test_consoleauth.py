@@ -22,8 +22,10 @@ Tests for Consoleauth Code.
 
 import mox
 from nova.consoleauth import manager
+from nova.consoleauth import store
 from nova import context
 from nova import db
+from nova.openstack.common import memorycache
 from nova.openstack.common import timeutils
 from nova import test
 
@@ -123,21 +125,37 @@ class ConsoleauthTestCase(test.TestCase):
         self.assertEqual(stored_tokens[0], token1)
 
 
+class MemcacheConsoleauthTestCase(ConsoleauthTestCase):
+    """Test Case for consoleauth w/ tokens in memcached."""
+
+    def setUp(self):
+        super(MemcacheConsoleauthTestCase, self).setUp()
+        self.manager.token_store = store.MemcacheTokenStore(
+            memorycache.Client())
+
+
 class ControlauthMemcacheEncodingTestCase(test.TestCase):
     def setUp(self):
         super(ControlauthMemcacheEncodingTestCase, self).setUp()
         self.manager = manager.ConsoleAuthManager()
+        self.manager.token_store = store.MemcacheTokenStore(
+            memorycache.Client())
+        self.mc = self.manager.token_store.mc
         self.context = context.get_admin_context()
         self.u_token = u"token"
         self.u_instance = u"instance"
 
     def test_authorize_console_encoding(self):
-        self.mox.StubOutWithMock(self.manager.mc, "set")
-        self.mox.StubOutWithMock(self.manager.mc, "get")
-        self.manager.mc.set(mox.IsA(str), mox.IgnoreArg(), mox.IgnoreArg()
-                           ).AndReturn(True)
-        self.manager.mc.get(mox.IsA(str)).AndReturn(None)
-        self.manager.mc.set(mox.IsA(str), mox.IgnoreArg()).AndReturn(True)
+        self.mox.StubOutWithMock(self.mc, "set")
+        self.mox.StubOutWithMock(self.mc, "get")
+        self.mc.set(mox.IsA(str), mox.IgnoreArg(), mox.IgnoreArg()
+                    ).AndReturn(True)
+        self.mc.get(mox.IsA(str)).AndReturn(None)
+        self.mc.get(mox.IsA(str)).AndReturn(None)
+        self.mc.set(mox.IsA(str), mox.IgnoreArg(), mox.IgnoreArg()
+                    ).AndReturn(True)
+        self.mc.set(mox.IsA(str), mox.IgnoreArg(), mox.IgnoreArg()
+                    ).AndReturn(True)
 
         self.mox.ReplayAll()
 
@@ -146,19 +164,21 @@ class ControlauthMemcacheEncodingTestCase(test.TestCase):
                                        self.u_instance)
 
     def test_check_token_encoding(self):
-        self.mox.StubOutWithMock(self.manager.mc, "get")
-        self.manager.mc.get(mox.IsA(str)).AndReturn(None)
+        self.mox.StubOutWithMock(self.mc, "get")
+        self.mc.get(mox.IsA(str)).AndReturn(None)
 
         self.mox.ReplayAll()
 
         self.manager.check_token(self.context, self.u_token)
 
     def test_delete_tokens_for_instance_encoding(self):
-        self.mox.StubOutWithMock(self.manager.mc, "delete")
-        self.mox.StubOutWithMock(self.manager.mc, "get")
-        self.manager.mc.get(mox.IsA(str)).AndReturn('["token"]')
-        self.manager.mc.delete(mox.IsA(str)).AndReturn(True)
-        self.manager.mc.delete(mox.IsA(str)).AndReturn(True)
+        self.mox.StubOutWithMock(self.mc, "delete")
+        self.mox.StubOutWithMock(self.mc, "get")
+        self.mc.get(mox.IsA(str)).AndReturn('["token"]')
+        self.mc.get(mox.IsA(str)).AndReturn(None)
+        self.mc.delete(mox.IsA(str)).AndReturn(True)
+        self.mc.delete(mox.IsA(str)).AndReturn(True)
+        self.mc.delete(mox.IsA(str)).AndReturn(True)
 
         self.mox.ReplayAll()
 
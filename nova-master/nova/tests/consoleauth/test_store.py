@@ -0,0 +1,189 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests for the console token stores.
+"""
+
+import mock
+
+from nova.consoleauth import store
+from nova.openstack.common import jsonutils
+from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
+from nova import test
+
+
+class _TokenStoreTestMixin(object):
+    def setUp(self):
+        super(_TokenStoreTestMixin, self).setUp()
+        self.useFixture(test.TimeOverride())
+
+    def test_get(self):
+        self.store.add(u'token', u'instance', 'data', 10)
+        self.assertEqual('data', self.store.get(u'token'))
+        self.assertIsNone(self.store.get(u'other'))
+
+    def test_get_multi(self):
+        self.store.add(u'token1', u'instance1', 'data1', 10)
+        self.store.add(u'token2', u'instance2', 'data2', 10)
+        self.assertEqual({u'token1': 'data1', u'token2': 'data2'},
+                         self.store.get_multi([u'token1', u'token2',
+                                               u'other']))
+        self.assertEqual({}, self.store.get_multi([]))
+
+    def test_tokens_expire(self):
+        self.store.add(u'token1', u'instance', 'data1', 1)
+        self.store.add(u'token2', u'instance', 'data2', 2)
+        timeutils.advance_time_seconds(1)
+        self.assertIsNone(self.store.get(u'token1'))
+        self.assertEqual('data2', self.store.get(u'token2'))
+        self.assertEqual([u'token2'],
+                         self.store.get_instance_tokens(u'instance'))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual({}, self.store.get_multi([u'token1', u'token2']))
+        self.assertEqual([], self.store.get_instance_tokens(u'instance'))
+
+    def test_add_again(self):
+        self.store.add(u'token', u'instance', 'data1', 1)
+        self.store.add(u'token', u'instance', 'data2', 2)
+        timeutils.advance_time_seconds(1)
+        self.assertEqual('data2', self.store.get(u'token'))
+        self.assertEqual([u'token'],
+                         self.store.get_instance_tokens(u'instance'))
+
+    def test_get_instance_tokens(self):
+        for i in range(3):
+            self.store.add(u'token%d' % i, u'instance1', 'data', 10)
+        self.store.add(u'other', u'instance2', 'data', 10)
+        self.assertEqual([u'token0', u'token1', u'token2'],
+                         sorted(self.store.get_instance_tokens(u'instance1')))
+        self.assertEqual([], self.store.get_instance_tokens(u'instance3'))
+
+    def test_delete_multi(self):
+        self.store.add(u'token1', u'instance', 'data', 10)
+        self.store.add(u'token2', u'instance', 'data', 10)
+        self.store.delete_multi([u'token1', u'other'])
+        self.assertEqual({u'token2': 'data'},
+                         self.store.get_multi([u'token1', u'token2']))
+
+    def test_delete_instance_tokens(self):
+        self.store.add(u'token1', u'instance1', 'data', 10)
+        self.store.add(u'token2', u'instance1', 'data', 10)
+        self.store.add(u'token3', u'instance2', 'data', 10)
+        self.store.delete_instance_tokens(u'instance1')
+        self.store.delete_instance_tokens(u'instance3')
+        self.assertEqual({u'token3': 'data'},
+                         self.store.get_multi([u'token1', u'token2',
+                                               u'token3']))
+        self.assertEqual([], self.store.get_instance_tokens(u'instance1'))
+        self.assertEqual([u'token3'],
+                         self.store.get_instance_tokens(u'instance2'))
+
+
+class MemoryTokenStoreTestCase(_TokenStoreTestMixin, test.NoDBTestCase):
+    def setUp(self):
+        super(MemoryTokenStoreTestCase, self).setUp()
+        self.store = store.MemoryTokenStore()
+
+    def test_expired_tokens_purged(self):
+        for i in range(3):
+            self.store.add(u'token%d' % i, u'instance', 'data', 1)
+        timeutils.advance_time_seconds(1)
+        self.store.add(u'token', u'instance', 'data', 1)
+        self.assertEqual([u'token'], self.store._tokens.keys())
+        self.assertEqual(1, len(self.store._expiry))
+
+
+class FakeMemcacheClient(memorycache.Client):
+    """memorycache client with the batch calls of python-memcached."""
+
+    def get_multi(self, keys):
+        values = ((key, self.get(key)) for key in keys)
+        return dict((key, value) for key, value in values
+                    if value is not None)
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+        return True
+
+
+class MemcacheTokenStoreTestCase(_TokenStoreTestMixin, test.NoDBTestCase):
+    def setUp(self):
+        super(MemcacheTokenStoreTestCase, self).setUp()
+        self.store = store.MemcacheTokenStore(FakeMemcacheClient())
+
+    def test_add_prunes_without_lookups(self):
+        for i in range(3):
+            self.store.add(u'token%d' % i, u'instance', 'data', 1)
+        timeutils.advance_time_seconds(1)
+        with mock.patch.object(self.store.mc, 'get_multi',
+                               side_effect=self.store.mc.get_multi
+                               ) as get_multi:
+            self.store.add(u'token', u'instance', 'data', 1)
+        # Only the tokens of the instance and their expiry are read
+        get_multi.assert_called_once_with(['instance', 'instance.expiry'])
+        self.assertEqual([u'token'],
+                         self.store.get_instance_tokens(u'instance'))
+
+    def test_tokens_of_older_releases(self):
+        self.store.add(u'token1', u'other', 'data1', 1)
+        self.store.add(u'token2', u'other', 'data2', 2)
+        self.store.mc.set('instance', '["token1", "token2"]')
+        timeutils.advance_time_seconds(1)
+        self.assertEqual([u'token2'],
+                         self.store.get_instance_tokens(u'instance'))
+        self.store.delete_instance_tokens(u'instance')
+        self.assertIsNone(self.store.get(u'token2'))
+
+    def test_instance_tokens_readable_by_older_releases(self):
+        self.store.add(u'token1', u'instance', 'data', 10)
+        self.store.add(u'token2', u'instance', 'data', 10)
+        tokens = jsonutils.loads(self.store.mc.get('instance'))
+        self.assertEqual([u'token1', u'token2'], sorted(tokens))
+
+    def test_tokens_added_by_older_releases(self):
+        self.store.add(u'token1', u'instance', 'data1', 1)
+        # What an older release does when it authorizes a console
+        self.store.mc.set('token2', 'data2', 2)
+        self.store.mc.set('instance', '["token1", "token2"]')
+        self.assertEqual([u'token1', u'token2'],
+                         sorted(self.store.get_instance_tokens(u'instance')))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual([u'token2'],
+                         self.store.get_instance_tokens(u'instance'))
+
+    def test_batch_calls(self):
+        self.store.add(u'token1', u'instance', 'data', 10)
+        self.store.add(u'token2', u'instance', 'data', 10)
+        with mock.patch.object(self.store.mc, 'delete_multi') as delete_multi:
+            self.store.delete_instance_tokens(u'instance')
+            self.assertEqual(1, delete_multi.call_count)
+            self.assertEqual(['instance', 'instance.expiry', 'token1',
+                              'token2'],
+                             sorted(delete_multi.call_args[0][0]))
+
+
+class GetTokenStoreTestCase(test.NoDBTestCase):
+    def test_memory(self):
+        self.assertIsInstance(store.get_token_store(),
+                              store.MemoryTokenStore)
+
+    def test_memcache(self):
+        self.flags(memcached_servers=['localhost:11211'])
+        self.assertIsInstance(store.get_token_store(),
+                              store.MemcacheTokenStore)
@@ -6262,6 +6262,37 @@ class Ec2TestCase(test.TestCase):
                           db.get_instance_uuid_by_ec2_id,
                           self.ctxt, 100500)
 
+    def test_ec2_instance_create_many(self):
+        ids = db.ec2_instance_create_many(self.ctxt,
+                                          ['fake-uuid-1', 'fake-uuid-2'])
+        self.assertEqual(set(['fake-uuid-1', 'fake-uuid-2']), set(ids))
+        self.assertNotEqual(ids['fake-uuid-1'], ids['fake-uuid-2'])
+        for instance_uuid, inst_id in ids.items():
+            self.assertEqual(instance_uuid,
+                             db.get_instance_uuid_by_ec2_id(self.ctxt,
+                                                            inst_id))
+
+    def test_ec2_instance_create_many_empty(self):
+        self.assertEqual({}, db.ec2_instance_create_many(self.ctxt, []))
+
+    def test_get_ec2_instance_ids_by_uuids(self):
+        inst1 = db.ec2_instance_create(self.ctxt, 'fake-uuid-1')
+        inst2 = db.ec2_instance_create(self.ctxt, 'fake-uuid-2')
+        db.ec2_instance_create(self.ctxt, 'fake-uuid-3')
+        ids = db.get_ec2_instance_ids_by_uuids(
+                self.ctxt, ['fake-uuid-1', 'fake-uuid-2', 'uuid-not-present'])
+        self.assertEqual({'fake-uuid-1': inst1['id'],
+                          'fake-uuid-2': inst2['id']}, ids)
+
+    def test_get_ec2_instance_ids_by_uuids_prefers_oldest(self):
+        inst = db.ec2_instance_create(self.ctxt, 'fake-uuid')
+        db.ec2_instance_create(self.ctxt, 'fake-uuid')
+        ids = db.get_ec2_instance_ids_by_uuids(self.ctxt, ['fake-uuid'])
+        self.assertEqual({'fake-uuid': inst['id']}, ids)
+
+    def test_get_ec2_instance_ids_by_uuids_empty(self):
+        self.assertEqual({}, db.get_ec2_instance_ids_by_uuids(self.ctxt, []))
+
 
 class ArchiveTestCase(test.TestCase):
 
@@ -165,10 +165,10 @@ class _TestInstanceObject(object):
                                 ).AndReturn(fake_inst2)
         self.mox.ReplayAll()
         inst = instance.Instance.get_by_uuid(self.context, fake_uuid)
-        self.assertFalse(hasattr(inst, '_system_metadata'))
+        self.assertFalse(inst.obj_attr_is_set('system_metadata'))
         sys_meta = inst.system_metadata
         self.assertEqual(sys_meta, {'foo': 'bar'})
-        self.assertTrue(hasattr(inst, '_system_metadata'))
+        self.assertTrue(inst.obj_attr_is_set('system_metadata'))
         # Make sure we don't run load again
         sys_meta2 = inst.system_metadata
         self.assertEqual(sys_meta2, {'foo': 'bar'})
@@ -1008,6 +1008,56 @@ class _TestInstanceListObject(object):
         for inst in inst_list:
             self.assertEqual(inst.obj_what_changed(), set())
 
+    def test_lazy_load_for_all_members(self):
+        fake_insts = [
+            fake_instance.fake_db_instance(uuid='fake-uuid', host='host'),
+            fake_instance.fake_db_instance(uuid='fake-inst2', host='host'),
+            ]
+        fake_meta = [dict(fake_insts[0], metadata={'foo': 'bar'}),
+                     dict(fake_insts[1], metadata={'foo': 'baz'})]
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_host')
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_filters')
+        db.instance_get_all_by_host(self.context, 'host',
+                                    columns_to_join=None,
+                                    use_subordinate=False
+                                    ).AndReturn(fake_insts)
+        db.instance_get_all_by_filters(self.context,
+                                       {'uuid': ['fake-uuid', 'fake-inst2']},
+                                       'created_at', 'desc', limit=None,
+                                       marker=None,
+                                       columns_to_join=['metadata'],
+                                       use_subordinate=False
+                                       ).AndReturn(fake_meta)
+        self.mox.ReplayAll()
+        instances = instance.InstanceList.get_by_host(self.context, 'host')
+        self.assertEqual({'foo': 'bar'}, instances[0].metadata)
+        self.assertEqual({'foo': 'baz'}, instances[1].metadata)
+        self.assertEqual(set(['metadata']), instances.lazy_loaded_attrs)
+        for inst in instances:
+            self.assertEqual(set(), inst.obj_what_changed())
+
+    def test_lazy_load_fault_for_all_members(self):
+        fake_insts = [
+            fake_instance.fake_db_instance(uuid='fake-uuid', host='host'),
+            fake_instance.fake_db_instance(uuid='fake-inst2', host='host'),
+            ]
+        fake_faults = test_instance_fault.fake_faults
+        self.mox.StubOutWithMock(db, 'instance_get_all_by_host')
+        self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
+        db.instance_get_all_by_host(self.context, 'host',
+                                    columns_to_join=None,
+                                    use_subordinate=False
+                                    ).AndReturn(fake_insts)
+        db.instance_fault_get_by_instance_uuids(
+            self.context, [x['uuid'] for x in fake_insts]
+            ).AndReturn(fake_faults)
+        self.mox.ReplayAll()
+        instances = instance.InstanceList.get_by_host(self.context, 'host')
+        self.assertIsNone(instances[1].fault)
+        self.assertEqual(fake_faults['fake-uuid'][0],
+                         dict(instances[0].fault.iteritems()))
+        self.assertEqual(set(['fault']), instances.lazy_loaded_attrs)
+
     def test_get_by_security_group(self):
         fake_secgroup = dict(test_security_group.fake_secgroup)
         fake_secgroup['instances'] = [
@@ -13,6 +13,7 @@
 #    under the License.
 
 import contextlib
+import copy
 import datetime
 import iso8601
 
@@ -108,6 +109,10 @@ class TestSubclassedObject(RandomMixInWithNoFields, MyObj):
     fields = {'new_field': fields.Field(fields.String())}
 
 
+class MyCompactObj(MyObj):
+    obj_compact_storage = True
+
+
 class TestMetaclass(test.TestCase):
     def test_obj_tracking(self):
 
@@ -691,6 +696,128 @@ class TestRemoteObject(_RemoteTest, _TestObject):
         obj = MyObj2.query(self.context)
         self.assertEqual('oldbar', obj.bar)
 
+    def _stub_object_actions(self):
+        calls = []
+        orig_object_actions = self.conductor_service.manager.object_actions
+
+        def fake_object_actions(context, actions):
+            calls.append([action[1] for action in actions])
+            return orig_object_actions(context, actions)
+        self.stubs.Set(self.conductor_service.manager, 'object_actions',
+                       fake_object_actions)
+        return calls
+
+    def test_batch_actions(self):
+        calls = self._stub_object_actions()
+        obj = MyObj.query(self.context)
+        with base.NovaObjectSerializer().batch_actions():
+            obj.bar = 'batched'
+            self.assertIsNone(obj.save())
+            self.assertEqual([], calls)
+            self.assertEqual(set(), obj.obj_what_changed())
+            obj.foo = 2
+            self.assertEqual('polo', obj.marco())
+            self.assertEqual([['save', 'marco']], calls)
+            self.assertEqual(set(['foo']), obj.obj_what_changed())
+            self.assertEqual(2, obj.foo)
+            obj.refresh()
+            obj.save()
+        self.assertEqual([['save', 'marco'], ['refresh'], ['save']], calls)
+        self.assertEqual('refreshed', obj.bar)
+
+    def test_batch_actions_failure(self):
+        calls = self._stub_object_actions()
+
+        def marco(self, context):
+            raise exception.ObjectActionError(action='marco', reason='test')
+        self.stubs.Set(MyObj, 'marco', base.remotable(marco))
+
+        obj = MyObj.query(self.context)
+        obj.foo = 2
+
+        def _test():
+            with base.NovaObjectSerializer().batch_actions(('marco',
+                                                            'save')):
+                obj.marco()
+                obj.save()
+        self.assertRaises(exception.ObjectActionError, _test)
+        self.assertEqual([['marco', 'save']], calls)
+        self.assertEqual(set(), obj.obj_what_changed())
+        self.assertEqual(2, obj.foo)
+
+    def test_batch_actions_failure_not_raised(self):
+        calls = self._stub_object_actions()
+
+        def save(self, context):
+            raise exception.ObjectActionError(action='save', reason='test')
+        self.stubs.Set(MyObj, 'save', base.remotable(save))
+
+        obj = MyObj.query(self.context)
+        with base.NovaObjectSerializer().batch_actions(raise_failures=False):
+            obj.foo = 2
+            obj.save()
+            self.assertEqual('polo', obj.marco())
+        self.assertEqual([['save', 'marco']], calls)
+
+
+class TestCompactStorage(test.TestCase):
+    def test_set_and_unset(self):
+        obj = MyCompactObj(foo=1)
+        self.assertEqual(1, obj.foo)
+        self.assertTrue(obj.obj_attr_is_set('foo'))
+        self.assertFalse(obj.obj_attr_is_set('bar'))
+        self.assertFalse(hasattr(obj, '_foo'))
+        self.assertEqual(set(['foo']), obj.obj_what_changed())
+
+    def test_load(self):
+        obj = MyCompactObj()
+        self.assertEqual('loaded!', obj.bar)
+        self.assertTrue(obj.obj_attr_is_set('bar'))
+
+    def test_delete(self):
+        obj = MyCompactObj(foo=1)
+        del obj.foo
+        self.assertFalse(obj.obj_attr_is_set('foo'))
+        self.assertRaises(AttributeError, delattr, obj, 'foo')
+
+    def test_primitive_cache_invalidated_on_set(self):
+        dt = datetime.datetime(1955, 11, 5)
+        obj = MyCompactObj(foo=1, created_at=dt)
+        data = obj.obj_to_primitive()['nova_object.data']
+        self.assertEqual({'foo': 1, 'created_at': timeutils.isotime(dt)},
+                         data)
+        obj.foo = 2
+        obj.created_at = dt + datetime.timedelta(days=1)
+        data = obj.obj_to_primitive()['nova_object.data']
+        self.assertEqual(2, data['foo'])
+        self.assertEqual(timeutils.isotime(obj.created_at),
+                         data['created_at'])
+
+    def test_primitive_not_cached_for_mutable_values(self):
+        class MyDictObj(base.NovaObject):
+            obj_compact_storage = True
+            fields = {'meta': fields.DictOfStringsField()}
+
+        obj = MyDictObj(meta={'a': 'b'})
+        obj.obj_to_primitive()
+        obj.meta['a'] = 'c'
+        self.assertEqual({'a': 'c'},
+                         obj.obj_to_primitive()['nova_object.data']['meta'])
+
+    def test_deepcopy(self):
+        obj = MyCompactObj(foo=1, bar='bar')
+        obj.obj_reset_changes()
+        obj.missing = 'foo'
+        obj2 = copy.deepcopy(obj)
+        self.assertEqual(1, obj2.foo)
+        self.assertEqual('bar', obj2.bar)
+        self.assertEqual(set(['missing']), obj2.obj_what_changed())
+        obj2.foo = 2
+        self.assertEqual(1, obj.foo)
+        self.assertEqual(obj.obj_to_primitive()['nova_object.data'],
+                         dict(obj2.obj_to_primitive()['nova_object.data'],
+                              foo=1))
+
 
 class TestObjectListBase(test.TestCase):
     def test_list_like_operations(self):
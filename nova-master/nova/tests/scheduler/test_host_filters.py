@@ -274,7 +274,12 @@ class HostFiltersTestCase(test.NoDBTestCase):
     def _stub_service_is_up(self, ret_value):
         def fake_service_is_up(self, service):
                 return ret_value
+
+        def fake_get_up_members(self, group_id):
+            return frozenset(['host1']) if ret_value else frozenset()
         self.stubs.Set(servicegroup.API, 'service_is_up', fake_service_is_up)
+        self.stubs.Set(servicegroup.API, 'get_up_members',
+                       fake_get_up_members)
 
     def test_affinity_different_filter_passes(self):
         filt_cls = self.class_map['DifferentHostFilter']()
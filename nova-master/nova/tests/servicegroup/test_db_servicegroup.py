@@ -15,6 +15,7 @@
 import datetime
 
 import fixtures
+import mox
 
 from nova import context
 from nova import db
@@ -142,3 +143,68 @@ class DBServiceGroupTestCase(test.TestCase):
         self.mox.ReplayAll()
         result = self.servicegroup_api.service_is_up(service)
         self.assertFalse(result)
+
+    def test_get_all_with_string_timestamps(self):
+        fake_now = timeutils.parse_strtime('2013-10-01T12:00:00.000000')
+        self.useFixture(test.TimeOverride())
+        timeutils.set_time_override(fake_now)
+        before = lambda seconds: timeutils.strtime(
+                fake_now - datetime.timedelta(seconds=seconds))
+        services = [
+            # Up, heartbeats coming over rpc are strings
+            {'host': 'up', 'created_at': before(60),
+             'updated_at': before(self.down_time)},
+            # Up, never updated
+            {'host': 'new', 'created_at': before(1), 'updated_at': None},
+            # Up, heartbeat from a host with a slightly fast clock
+            {'host': 'skewed', 'created_at': before(60),
+             'updated_at': before(-1)},
+            # Up, heartbeat as a datetime
+            {'host': 'datetime', 'created_at': before(60),
+             'updated_at': fake_now},
+            # Down
+            {'host': 'down', 'created_at': before(60),
+             'updated_at': before(self.down_time + 1)},
+            {'host': 'future', 'created_at': before(60),
+             'updated_at': before(-self.down_time - 1)},
+        ]
+        driver = self.servicegroup_api._driver
+        self.mox.StubOutWithMock(driver.conductor_api,
+                                 'service_get_all_by_topic')
+        driver.conductor_api.service_get_all_by_topic(
+                mox.IgnoreArg(), self._topic).AndReturn(services)
+        self.mox.ReplayAll()
+
+        self.assertEqual(['up', 'new', 'skewed', 'datetime'],
+                         self.servicegroup_api.get_all(self._topic))
+
+    def test_get_up_members(self):
+        self.flags(servicegroup_up_members_ttl=10)
+        self.useFixture(test.TimeOverride())
+        driver = self.servicegroup_api._driver
+        self.mox.StubOutWithMock(driver, 'get_all')
+        driver.get_all(self._topic).AndReturn(['host1', 'host2'])
+        driver.get_all(self._topic).AndReturn(['host2'])
+        self.mox.ReplayAll()
+
+        up = self.servicegroup_api.get_up_members(self._topic)
+        self.assertEqual(frozenset(['host1', 'host2']), up)
+        # Served from the cache until the ttl expires
+        timeutils.advance_time_seconds(9)
+        self.assertIs(up, self.servicegroup_api.get_up_members(self._topic))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(frozenset(['host2']),
+                         self.servicegroup_api.get_up_members(self._topic))
+
+    def test_get_up_members_cache_disabled(self):
+        self.flags(servicegroup_up_members_ttl=0)
+        driver = self.servicegroup_api._driver
+        self.mox.StubOutWithMock(driver, 'get_all')
+        driver.get_all(self._topic).AndReturn(['host1'])
+        driver.get_all(self._topic).AndReturn([])
+        self.mox.ReplayAll()
+
+        self.assertEqual(frozenset(['host1']),
+                         self.servicegroup_api.get_up_members(self._topic))
+        self.assertEqual(frozenset(),
+                         self.servicegroup_api.get_up_members(self._topic))
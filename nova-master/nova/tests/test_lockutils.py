@@ -0,0 +1,140 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import gc
+import weakref
+
+import fixtures
+
+from nova.openstack.common import lockutils
+from nova import test
+
+
+class LockManagerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(LockManagerTestCase, self).setUp()
+        self.manager = lockutils._LockManager(shards=1, recent_locks=2,
+                                              stats=3)
+
+    def test_get_shared(self):
+        self.assertIs(self.manager.get('foo'), self.manager.get('foo'))
+
+    def test_get_keeps_recent_locks(self):
+        lock = weakref.ref(self.manager.get('foo'))
+        self.manager.get('bar')
+        gc.collect()
+        self.assertIsNotNone(lock())
+        self.assertIs(lock(), self.manager.get('foo'))
+
+    def test_get_forgets_old_locks(self):
+        lock = weakref.ref(self.manager.get('foo'))
+        self.manager.get('bar')
+        self.manager.get('baz')
+        gc.collect()
+        self.assertIsNone(lock())
+        self.assertEqual(2, len(self.manager._shards[0].recent))
+
+    def test_get_keeps_locks_in_use(self):
+        lock = self.manager.get('foo')
+        self.manager.get('bar')
+        self.manager.get('baz')
+        gc.collect()
+        self.assertIs(lock, self.manager.get('foo'))
+
+    def test_record(self):
+        self.manager.record('foo', 0.005, 2)
+        self.manager.record('foo', 0.5, 20)
+        stats = self.manager.stats()['foo']
+        self.assertEqual({'count': 2, 'total': 0.505, 'max': 0.5,
+                          'buckets': [0, 1, 0, 1, 0, 0]}, stats['wait'])
+        self.assertEqual([0, 0, 0, 0, 1, 1], stats['hold']['buckets'])
+
+    def test_record_forgets_old_names(self):
+        for name in ('a', 'b', 'c'):
+            self.manager.record(name, 0, 0)
+        self.manager.record('a', 0, 0)
+        self.manager.record('d', 0, 0)
+        self.assertEqual(set(['a', 'c', 'd']), set(self.manager.stats()))
+
+    def test_reset_stats(self):
+        self.manager.record('foo', 0, 0)
+        self.manager.reset_stats()
+        self.assertEqual({}, self.manager.stats())
+
+
+class LockTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(LockTestCase, self).setUp()
+        self.lock_path = self.useFixture(fixtures.TempDir()).path
+        self.stubs.Set(lockutils, '_lock_manager', lockutils._LockManager())
+
+    def test_external_lock_keeps_file_open(self):
+        lockfiles = []
+        for i in range(5):
+            with lockutils.lock('foo', external=True,
+                                lock_path=self.lock_path) as lock:
+                lockfiles.append(lock.lockfile)
+        self.assertEqual(1, len(set(lockfiles)))
+        self.assertFalse(lockfiles[0].closed)
+
+    def test_external_lock_path_changed(self):
+        other_path = self.useFixture(fixtures.TempDir()).path
+        with lockutils.lock('foo', external=True,
+                            lock_path=self.lock_path) as lock:
+            lockfile = lock.lockfile
+        with lockutils.lock('foo', external=True,
+                            lock_path=other_path) as lock:
+            self.assertTrue(lock.fname.startswith(other_path))
+        self.assertTrue(lockfile.closed)
+
+    def test_lock_records_stats(self):
+        for i in range(3):
+            with lockutils.lock('foo'):
+                pass
+        stats = lockutils.get_stats()
+        self.assertEqual(3, stats['foo']['wait']['count'])
+        self.assertEqual(3, stats['foo']['hold']['count'])
+
+    def test_log_stats(self):
+        for name, wait in (('foo', 0.5), ('bar', 2.0), ('baz', 1.0)):
+            lockutils._lock_manager.record(name, wait, 0.25)
+        messages = []
+        self.stubs.Set(lockutils.LOG, 'info',
+                       lambda msg, args: messages.append(msg % args))
+        lockutils.log_stats(limit=2)
+        self.assertEqual(['Lock "bar": acquired 1 times, waited 2.000s '
+                          '(max 2.000s), held 0.250s (max 0.250s)',
+                          'Lock "baz": acquired 1 times, waited 1.000s '
+                          '(max 1.000s), held 0.250s (max 0.250s)'],
+                         messages)
+
+    def test_stats_bounded(self):
+        for i in range(2000):
+            with lockutils.lock('instance-%d' % i):
+                pass
+        self.assertTrue(len(lockutils.get_stats()) <=
+                        16 * lockutils._STATS_PER_SHARD)
+
+    def test_synchronized(self):
+        @lockutils.synchronized('foo', external=True,
+                                lock_path=self.lock_path)
+        def f():
+            return lockutils.local.strong_store.locks_held[:]
+        self.assertEqual(['foo'], f())
+        self.assertEqual([], lockutils.local.strong_store.locks_held)
@@ -20,6 +20,7 @@ import StringIO
 import sys
 
 from nova.cmd import manage
+from nova.compute import api as compute_api
 from nova import context
 from nova import db
 from nova import exception
@@ -384,6 +385,35 @@ class ProjectCommandsTestCase(test.TestCase):
         self.assertEqual(2, self.commands.quota('admin', 'volumes1', '10'))
 
 
+class HostCommandsTestCase(test.TestCase):
+    def setUp(self):
+        super(HostCommandsTestCase, self).setUp()
+        self.commands = manage.HostCommands()
+        self.prefetched = []
+
+        def fake_prefetch_image(host_api, context, image_id, host_names):
+            self.prefetched.append((context.auth_token, image_id,
+                                    host_names))
+        self.stubs.Set(compute_api.HostAPI, 'prefetch_image',
+                       fake_prefetch_image)
+
+    def test_prefetch_image(self):
+        self.flags(auth_strategy='noauth')
+        self.assertIsNone(self.commands.prefetch_image('fake-image',
+                                                       'host1,host2'))
+        self.assertEqual([(None, 'fake-image', ['host1', 'host2'])],
+                         self.prefetched)
+
+    def test_prefetch_image_keystone(self):
+        self.flags(auth_strategy='keystone')
+        self.assertEqual(2, self.commands.prefetch_image('fake-image',
+                                                         'host1'))
+        self.commands.prefetch_image('fake-image', 'host1',
+                                     token='fake-token')
+        self.assertEqual([('fake-token', 'fake-image', ['host1'])],
+                         self.prefetched)
+
+
 class DBCommandsTestCase(test.TestCase):
     def setUp(self):
         super(DBCommandsTestCase, self).setUp()
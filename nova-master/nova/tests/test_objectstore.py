@@ -21,6 +21,7 @@ Unittets for S3 objectstore clone.
 """
 
 import boto
+import hashlib
 import os
 import shutil
 import tempfile
@@ -128,6 +129,68 @@ class S3APITestCase(test.NoDBTestCase):
 
         self._ensure_no_buckets(bucket.get_all_keys())
 
+    def test_list_keys(self):
+        bucket_name = 'testbucket'
+        key_names = ['a1', 'a2', 'a3', 'b1', 'c']
+
+        b = self.conn.create_bucket(bucket_name)
+        for key_name in reversed(key_names):
+            b.new_key(key_name).set_contents_from_string(key_name)
+
+        bucket = self.conn.get_bucket(bucket_name)
+        keys = bucket.get_all_keys()
+        self.assertEqual(key_names, [k.name for k in keys])
+        self.assertEqual([2, 2, 2, 2, 1], [k.size for k in keys])
+        keys = bucket.get_all_keys(prefix='a', marker='a1')
+        self.assertEqual(['a2', 'a3'], [k.name for k in keys])
+        keys = bucket.get_all_keys(marker='a2', max_keys=2)
+        self.assertEqual(['a3', 'b1'], [k.name for k in keys])
+        keys = bucket.get_all_keys(prefix='b', marker='c')
+        self.assertEqual([], [k.name for k in keys])
+
+        bucket.delete_key('a2')
+        keys = bucket.get_all_keys(prefix='a')
+        self.assertEqual(['a1', 'a3'], [k.name for k in keys])
+
+    def test_list_keys_of_unindexed_bucket(self):
+        # Buckets created without an index are indexed when listed
+        bucket_name = 'testbucket'
+
+        b = self.conn.create_bucket(bucket_name)
+        b.new_key('somekey').set_contents_from_string('somekey')
+        os.unlink(os.path.join(CONF.buckets_path, s3server.INDEX_DIRECTORY,
+                               bucket_name))
+
+        keys = self.conn.get_bucket(bucket_name).get_all_keys()
+        self.assertEqual(['somekey'], [k.name for k in keys])
+        self.assertEqual(7, keys[0].size)
+
+    def test_large_key(self):
+        bucket_name = 'testbucket'
+        key_contents = os.urandom(s3server.CHUNK_SIZE * 3 + 1)
+
+        b = self.conn.create_bucket(bucket_name)
+        k = b.new_key('somekey')
+        k.set_contents_from_string(key_contents)
+        self.assertEqual(hashlib.md5(key_contents).hexdigest(),
+                         k.etag.strip('"'))
+
+        bucket = self.conn.get_bucket(bucket_name)
+        self.assertEqual([len(key_contents)],
+                         [key.size for key in bucket.get_all_keys()])
+        key = bucket.get_key('somekey')
+        self.assertEqual(key_contents, key.get_contents_as_string())
+
+    def test_hidden_bucket(self):
+        self.conn.create_bucket('testbucket')
+        bucket = self.conn.get_bucket(s3server.INDEX_DIRECTORY,
+                                      validate=False)
+        self.assertRaises(boto_exception.S3ResponseError,
+                          bucket.get_all_keys)
+        self.assertRaises(boto_exception.S3ResponseError,
+                          bucket.get_key('testbucket').get_contents_as_string)
+        self._ensure_one_bucket(self.conn.get_all_buckets(), 'testbucket')
+
     def test_unknown_bucket(self):
         bucket_name = 'falalala'
         self.assertRaises(boto_exception.S3ResponseError,
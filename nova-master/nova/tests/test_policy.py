@@ -118,6 +118,19 @@ class PolicyTestCase(test.NoDBTestCase):
         self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
                           self.context, action, target)
 
+    def test_enforce_check_false_value(self):
+        class NoneCheck(common_policy.Check):
+            def __call__(self, target, creds):
+                return None
+
+        self.stubs.Set(common_policy, '_checks', {})
+        common_policy.register('none', NoneCheck)
+        self.policy.set_rules({'example:none': 'none:foo'})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'example:none', self.target)
+        self.assertEqual(False, policy.enforce(self.context, 'example:none',
+                                               self.target, False))
+
     def test_templatized_enforcement(self):
         target_mine = {'project_id': 'fake'}
         target_not_mine = {'project_id': 'another'}
@@ -147,6 +160,79 @@ class PolicyTestCase(test.NoDBTestCase):
         policy.enforce(admin_context, uppercase_action, self.target)
 
 
+class CompiledPolicyTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(CompiledPolicyTestCase, self).setUp()
+        self.context = context.RequestContext('fake', 'fake', roles=['member'])
+
+    def test_same_as_check(self):
+        admin_context = context.RequestContext('admin', 'fake',
+                                               roles=['admin'])
+        policy.init()
+        rules = common_policy._rules
+        self.assertTrue(rules)
+        for ctxt in (self.context, admin_context):
+            for target in ({'project_id': 'fake', 'user_id': 'fake'},
+                           {'project_id': 'other', 'user_id': 'other'}):
+                for action in list(rules) + ['example:noexist']:
+                    expected = common_policy.check(action, target,
+                                                   ctxt.to_dict())
+                    self.assertEqual(expected,
+                                     policy.enforce(ctxt, action, target,
+                                                    do_raise=False),
+                                     action)
+
+    def test_missing_target_key_fails_closed(self):
+        self.policy.set_rules({"example:my_file":
+                                   "role:member and project_id:%(foo)s"})
+        self.assertFalse(policy.enforce(self.context, "example:my_file",
+                                        {'project_id': 'fake'},
+                                        do_raise=False))
+
+    def test_rule_reference(self):
+        self.policy.set_rules({"admin": "role:admin",
+                               "example:admin": "rule:admin",
+                               "example:missing": "rule:missing"})
+        self.assertFalse(policy.enforce(self.context, "example:admin", {},
+                                        do_raise=False))
+        self.assertFalse(policy.enforce(self.context, "example:missing", {},
+                                        do_raise=False))
+        self.context.roles = ['admin']
+        self.assertTrue(policy.enforce(self.context, "example:admin", {}))
+
+    def test_memoized_for_context(self):
+        self.policy.set_rules({"example:role": "role:member",
+                               "example:my_file":
+                                   "role:member and project_id:%(project_id)s"
+                               })
+        policy.enforce(self.context, "example:role", {})
+        policy.enforce(self.context, "example:my_file",
+                       {'project_id': 'fake'})
+        memo = policy._COMPILED[2]
+        self.assertEqual({('example:role', ('member',)): True,
+                          ('example:my_file', 'fake', ('member',), 'fake'):
+                              True},
+                         memo[self.context])
+
+        # The memo is keyed by the credentials the rule looks at
+        self.context.roles = ['other']
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, "example:role", {})
+
+        # And by the target fields it looks at
+        self.context.roles = ['member']
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, "example:my_file",
+                          {'project_id': 'other'})
+
+    def test_memo_reset_with_rules(self):
+        self.policy.set_rules({"example:role": "role:member"})
+        policy.enforce(self.context, "example:role", {})
+        self.policy.set_rules({"example:role": "!"})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, "example:role", {})
+
+
 class DefaultPolicyTestCase(test.NoDBTestCase):
 
     def setUp(self):
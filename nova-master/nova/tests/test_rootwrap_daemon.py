@@ -0,0 +1,164 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import socket
+import stat
+import StringIO
+
+import eventlet
+import fixtures
+
+from nova.openstack.common import processutils
+from nova.openstack.common.rootwrap import cmd
+from nova.openstack.common.rootwrap import daemon
+from nova.openstack.common.rootwrap import filters
+from nova import test
+
+
+class FakeConfig(object):
+    exec_dirs = ['/bin', '/usr/bin']
+    use_syslog = False
+
+
+class RootwrapDaemonTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        self.daemon = daemon.Daemon(FakeConfig(), [
+            filters.CommandFilter('cat', 'root'),
+            filters.CommandFilter('/nonexistent/missing-binary', 'root')])
+
+    def test_run_command(self):
+        self.assertEqual((0, 'data', ''),
+                         self.daemon.run_command(['cat'], 'data'))
+
+    def test_run_command_unauthorized(self):
+        returncode, stdout, stderr = self.daemon.run_command(
+            ['rm', '-rf', '/'])
+        self.assertEqual(cmd.RC_UNAUTHORIZED, returncode)
+        self.assertEqual('', stdout)
+        self.assertIn('Unauthorized command', stderr)
+
+    def test_run_command_not_executable(self):
+        returncode, _stdout, stderr = self.daemon.run_command(
+            ['missing-binary'])
+        self.assertEqual(cmd.RC_NOEXECFOUND, returncode)
+        self.assertIn('Executable not found', stderr)
+
+    def test_handle(self):
+        client, server = socket.socketpair()
+        daemon._send_request(client, ['cat'], 'data')
+        self.daemon.handle(server)
+        self.assertEqual((0, 'data', ''), daemon._recv_reply(client))
+        client.close()
+
+    def test_handle_garbage(self):
+        client, server = socket.socketpair()
+        client.sendall('garbage')
+        client.close()
+        self.daemon.handle(server)
+
+    def test_client(self):
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        socket_path = os.path.join(tmpdir, 'rootwrap.sock')
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(socket_path)
+        listener.listen(1)
+        server = eventlet.spawn(self.daemon.serve, listener)
+        self.addCleanup(server.kill)
+        client = daemon.Client(socket_path)
+        self.assertEqual((0, 'data', ''), client.execute(['cat'], 'data'))
+        self.assertEqual(cmd.RC_UNAUTHORIZED,
+                         client.execute(['rm', '-rf', '/'])[0])
+
+    def test_client_no_daemon(self):
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        client = daemon.Client(os.path.join(tmpdir, 'rootwrap.sock'))
+        self.assertRaises(socket.error, client.execute, ['cat'])
+
+    def test_daemon_start_socket_owner(self):
+        self.useFixture(fixtures.EnvironmentVariable('SUDO_UID', '4242'))
+        stdout = StringIO.StringIO()
+        self.stubs.Set(daemon.sys, 'stdin', StringIO.StringIO())
+        self.stubs.Set(daemon.sys, 'stdout', stdout)
+        self.stubs.Set(daemon.Daemon, 'serve', lambda self, listener: None)
+        chowned = {}
+
+        def fake_chown(path, uid, gid):
+            chowned[path] = (uid, stat.S_IMODE(os.stat(path).st_mode))
+        self.stubs.Set(daemon.os, 'chown', fake_chown)
+
+        daemon.daemon_start(FakeConfig(), [])
+        socket_path = stdout.getvalue().strip()
+        self.assertEqual(4242, chowned[os.path.dirname(socket_path)][0])
+        uid, mode = chowned[socket_path]
+        self.assertEqual(4242, uid)
+        self.assertEqual(0, mode & 0o077)
+        self.assertFalse(os.path.exists(socket_path))
+
+
+class FakeClient(object):
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def execute(self, userargs, stdin=None):
+        self.calls.append((userargs, stdin))
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+class FakeRootwrapDaemon(object):
+
+    def __init__(self, reply):
+        self.client = FakeClient(reply)
+
+
+class ExecuteWithRootwrapDaemonTestCase(test.NoDBTestCase):
+
+    def _stub_daemon(self, reply):
+        fake_daemon = FakeRootwrapDaemon(reply)
+        self.stubs.Set(processutils, '_get_rootwrap_daemon',
+                       lambda root_helper_daemon: fake_daemon)
+        self.stubs.Set(processutils, '_ROOTWRAP_DAEMONS',
+                       {'rootwrap-daemon': fake_daemon})
+        return fake_daemon
+
+    def test_execute(self):
+        fake_daemon = self._stub_daemon((0, 'out', 'err'))
+        self.assertEqual((0, 'out', 'err'),
+                         processutils._execute_with_rootwrap_daemon(
+                             'rootwrap-daemon', ['cat'], 'data'))
+        self.assertEqual([(['cat'], 'data')], fake_daemon.client.calls)
+
+    def test_execute_lost_daemon(self):
+        self._stub_daemon(socket.error('Connection refused'))
+        self.assertRaises(processutils.ProcessExecutionError,
+                          processutils._execute_with_rootwrap_daemon,
+                          'rootwrap-daemon', ['cat'], None)
+        self.assertEqual({}, processutils._ROOTWRAP_DAEMONS)
+
+    def test_execute_checks_exit_code(self):
+        self.stubs.Set(os, 'geteuid', lambda: 1000)
+        self._stub_daemon((cmd.RC_UNAUTHORIZED, '', 'Unauthorized command'))
+        self.assertRaises(processutils.ProcessExecutionError,
+                          processutils.execute, 'rm', '-rf', '/',
+                          run_as_root=True,
+                          root_helper_daemon='rootwrap-daemon')
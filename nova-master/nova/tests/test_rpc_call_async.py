@@ -0,0 +1,322 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests for rpc.call_async() and the batched publishing of the AMQP drivers,
+and for the detection of duplicate messages.
+"""
+
+import sys
+import time
+
+import eventlet
+from oslo.config import cfg
+
+from nova import context
+from nova import exception
+from nova.openstack.common import rpc
+from nova.openstack.common.rpc import amqp as rpc_amqp
+from nova.openstack.common.rpc import common as rpc_common
+from nova.openstack.common.rpc import proxy as rpc_proxy
+from nova import test
+
+CONF = cfg.CONF
+
+
+class FakeConnection(object):
+    """AMQP driver connection recording the messages it publishes."""
+
+    pool = None
+    # Reply queue -> callback of its direct consumer
+    consumers = {}
+    # Lists of (topic, message) published together
+    batches = []
+
+    def __init__(self, conf, server_params=None):
+        self.conf = conf
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+    def declare_direct_consumer(self, topic, callback):
+        self.consumers[topic] = callback
+
+    def consume_in_thread(self):
+        pass
+
+    def topic_send(self, topic, msg, timeout=None):
+        self.batches.append([(topic, rpc_common.deserialize_msg(msg))])
+
+
+class FakeBatchConnection(FakeConnection):
+    """Connection of a driver able to publish messages in batches."""
+
+    pool = None
+    error = None
+
+    def topic_send_batch(self, messages):
+        if self.error:
+            raise self.error
+        self.batches.append([(topic, rpc_common.deserialize_msg(msg))
+                             for topic, msg, timeout in messages])
+
+
+class EchoProxy(object):
+    def dispatch(self, ctxt, version, method, namespace, **kwargs):
+        if method == 'fail':
+            raise exception.InstanceNotFound(instance_id=kwargs['value'])
+        return kwargs['value']
+
+
+class AmqpCallAsyncTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(AmqpCallAsyncTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        for connection_cls in (FakeConnection, FakeBatchConnection):
+            self.stubs.Set(connection_cls, 'pool', None)
+        self.stubs.Set(FakeConnection, 'consumers', {})
+        self.stubs.Set(FakeConnection, 'batches', [])
+        self.pool = rpc_amqp.get_connection_pool(CONF, FakeBatchConnection)
+
+    def _call_async(self, value, timeout=None, pool=None):
+        return rpc_amqp.call_async(CONF, self.ctxt, 'fake-topic',
+                                   {'method': 'echo',
+                                    'args': {'value': value}},
+                                   timeout, pool or self.pool)
+
+    def _sent(self):
+        """Return the messages published so far."""
+        # Let the publisher run
+        eventlet.sleep(0)
+        return [msg for batch in FakeConnection.batches
+                for topic, msg in batch]
+
+    def _reply(self, msg, result=None, failure=None):
+        callback = FakeConnection.consumers[msg['_reply_q']]
+        callback({'_msg_id': msg['_msg_id'], 'result': result,
+                  'failure': failure})
+        callback({'_msg_id': msg['_msg_id'], 'result': None,
+                  'failure': None, 'ending': True})
+
+    def _call_waiters(self):
+        return self.pool.reply_proxy._call_waiters
+
+    def test_batched(self):
+        futures = [self._call_async(value) for value in range(3)]
+        sent = self._sent()
+        self.assertEqual(1, len(FakeConnection.batches))
+        self.assertEqual([0, 1, 2], [msg['args']['value'] for msg in sent])
+        self.assertEqual(['fake-topic'] * 3,
+                         [topic for topic, msg in FakeConnection.batches[0]])
+
+        for msg in reversed(sent):
+            self._reply(msg, result=msg['args']['value'])
+        self.assertEqual([0, 1, 2], [future.wait() for future in futures])
+        self.assertEqual({}, self._call_waiters())
+
+    def test_without_topic_send_batch(self):
+        pool = rpc_amqp.get_connection_pool(CONF, FakeConnection)
+        futures = [self._call_async(value, pool=pool) for value in range(3)]
+        sent = self._sent()
+        self.assertEqual(3, len(FakeConnection.batches))
+
+        for msg in sent:
+            self._reply(msg, result=msg['args']['value'])
+        self.assertEqual([0, 1, 2], [future.wait() for future in futures])
+
+    def test_publish_failure(self):
+        self.stubs.Set(FakeBatchConnection, 'error',
+                       test.TestingException())
+        futures = [self._call_async(value) for value in range(3)]
+        self.assertEqual([], self._sent())
+
+        for future in futures:
+            self.assertTrue(future.ready())
+            self.assertRaises(test.TestingException, future.wait)
+        self.assertEqual({}, self._call_waiters())
+
+    def test_connection_failure(self):
+        def fake_create():
+            raise test.TestingException()
+
+        # The reply proxy does not come from the pool
+        self.stubs.Set(self.pool, 'create', fake_create)
+        futures = [self._call_async(value) for value in range(3)]
+        self.assertEqual([], self._sent())
+
+        for future in futures:
+            self.assertRaises(test.TestingException, future.wait)
+        self.assertEqual({}, self._call_waiters())
+
+    def test_remote_exception(self):
+        future = self._call_async('fake-uuid')
+        try:
+            raise exception.InstanceNotFound(instance_id='fake-uuid')
+        except exception.InstanceNotFound:
+            failure = rpc_common.serialize_remote_exception(sys.exc_info(),
+                                                            False)
+        self._reply(self._sent()[0], failure=failure)
+
+        self.assertRaises(exception.InstanceNotFound, future.wait)
+        # The outcome is kept
+        self.assertRaises(exception.InstanceNotFound, future.wait)
+        self.assertEqual({}, self._call_waiters())
+
+    def test_timeout(self):
+        future = self._call_async('fake-value', timeout=0.01)
+        self.assertRaises(rpc_common.Timeout, future.wait)
+        self.assertEqual({}, self._call_waiters())
+
+    def test_ready(self):
+        future = self._call_async('fake-value')
+        self.assertFalse(future.ready())
+        msg = self._sent()[0]
+        self.assertFalse(future.ready())
+        self._reply(msg, result='fake-value')
+        self.assertTrue(future.ready())
+        self.assertEqual('fake-value', future.wait())
+        self.assertTrue(future.ready())
+
+    def test_not_waited(self):
+        future = self._call_async('fake-value', timeout=0.01)
+        lost = self._call_async('fake-value', timeout=0.01)
+        msg = self._sent()[0]
+        self._reply(msg, result='fake-value')
+        self.assertEqual(2, len(self._call_waiters()))
+
+        # The waiters go away once the timeout has passed
+        eventlet.sleep(0.1)
+        self.assertEqual({}, self._call_waiters())
+        self.assertEqual('fake-value', future.wait())
+        self.assertRaises(rpc_common.Timeout, lost.wait)
+
+
+class MsgIdCacheTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(MsgIdCacheTestCase, self).setUp()
+        self.flags(amqp_duplicate_message_window=1)
+        self.now = 1000.0
+        self.stubs.Set(time, 'time', lambda: self.now)
+        self.warnings = []
+        self.stubs.Set(rpc_amqp.LOG, 'warn',
+                       lambda msg, args: self.warnings.append(msg % args))
+        self.cache = rpc_amqp.MsgIdCache(CONF)
+
+    def _msg(self, unique_id):
+        return {'method': 'echo', 'args': {'value': 42},
+                rpc_amqp.UNIQUE_ID: unique_id}
+
+    def test_duplicate(self):
+        self.cache.check_duplicate_message(self._msg('id-1'))
+        self.cache.check_duplicate_message(self._msg('id-2'))
+        for count in (1, 2):
+            self.assertRaises(rpc_common.DuplicateMessageError,
+                              self.cache.check_duplicate_message,
+                              self._msg('id-1'))
+            self.assertEqual(count, self.cache.duplicates)
+        self.assertEqual(2, len(self.warnings))
+        self.assertIn('2 dropped so far', self.warnings[-1])
+
+    def test_without_unique_id(self):
+        for i in range(2):
+            self.cache.check_duplicate_message({'method': 'echo'})
+        self.assertEqual(0, self.cache.duplicates)
+
+    def test_window(self):
+        self.cache.check_duplicate_message(self._msg('id-1'))
+        self.now += 30
+        self.cache.check_duplicate_message(self._msg('id-2'))
+        self.now += 30
+        self.assertRaises(rpc_common.DuplicateMessageError,
+                          self.cache.check_duplicate_message,
+                          self._msg('id-1'))
+
+        # id-1 expires, id-2 was seen less than a minute ago
+        self.now += 1
+        self.cache.check_duplicate_message(self._msg('id-1'))
+        self.assertRaises(rpc_common.DuplicateMessageError,
+                          self.cache.check_duplicate_message,
+                          self._msg('id-2'))
+        self.assertEqual(set(['id-1', 'id-2']), self.cache.msgids)
+
+    def test_size(self):
+        self.stubs.Set(rpc_amqp.MsgIdCache, 'DUP_MSG_CHECK_SIZE', 2)
+        for unique_id in ('id-1', 'id-2', 'id-3'):
+            self.cache.check_duplicate_message(self._msg(unique_id))
+        self.assertEqual(set(['id-2', 'id-3']), self.cache.msgids)
+        self.assertRaises(rpc_common.DuplicateMessageError,
+                          self.cache.check_duplicate_message,
+                          self._msg('id-3'))
+        # The oldest id was forgotten
+        self.cache.check_duplicate_message(self._msg('id-1'))
+
+    def test_shared_by_the_consumers_of_a_connection(self):
+        # What the kombu and qpid connections do for their consumers
+        self.stubs.Set(FakeConnection, 'pool', None)
+        pool = rpc_amqp.get_connection_pool(CONF, FakeConnection)
+        callbacks = [rpc_amqp.ProxyCallback(CONF, EchoProxy(), pool,
+                                            self.cache)
+                     for i in range(2)]
+        callbacks[0](self._msg('id-1'))
+        self.assertRaises(rpc_common.DuplicateMessageError, callbacks[1],
+                          self._msg('id-1'))
+        self.assertEqual(1, self.cache.duplicates)
+        for callback in callbacks:
+            callback.wait()
+
+
+class FakeCallAsyncTestCase(test.NoDBTestCase):
+    """call_async() with impl_fake, the rpc backend of the tests."""
+
+    def setUp(self):
+        super(FakeCallAsyncTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.conn = rpc.create_connection(new=True)
+        self.conn.create_consumer('fake-topic', EchoProxy())
+        self.addCleanup(self.conn.close)
+
+    def test_call_async(self):
+        futures = [rpc.call_async(self.ctxt, 'fake-topic',
+                                  {'method': 'echo',
+                                   'args': {'value': value}})
+                   for value in range(3)]
+        self.assertEqual([0, 1, 2], [future.wait() for future in futures])
+
+    def test_remote_exception(self):
+        future = rpc.call_async(self.ctxt, 'fake-topic',
+                                {'method': 'fail',
+                                 'args': {'value': 'fake-uuid'}})
+        self.assertRaises(exception.InstanceNotFound, future.wait)
+
+    def test_proxy_call_async(self):
+        rpcapi = rpc_proxy.RpcProxy('fake-topic', '1.0')
+        future = rpcapi.call_async(self.ctxt, rpcapi.make_msg(
+            'echo', value='fake-value'))
+        self.assertEqual('fake-value', future.wait())
+
+    def test_proxy_timeout(self):
+        rpcapi = rpc_proxy.RpcProxy('fake-topic', '1.0')
+        future = rpcapi.call_async(self.ctxt, rpcapi.make_msg(
+            'echo', value='fake-value'), topic='other-topic')
+        exc = self.assertRaises(rpc_common.Timeout, future.wait)
+        self.assertEqual('other-topic', exc.topic)
+        self.assertEqual('echo', exc.method)
@@ -0,0 +1,125 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import testtools
+
+from nova.openstack.common import jsonutils
+from nova.openstack.common.rpc import common as rpc_common
+from nova import test
+
+
+class RpcEnvelopeTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(RpcEnvelopeTestCase, self).setUp()
+        self.msg = {'method': 'object_action',
+                    'namespace': None,
+                    'args': {'objinst': {'nova_object.data': {
+                                 'uuid': 'fake-uuid',
+                                 'display_name': u'caf\xe9',
+                                 'launched_at': datetime.datetime(
+                                     2013, 10, 1, 12, 30),
+                                 'metadata': {'key': 'value' * 1000},
+                                 'security_groups': ['default'],
+                                 'vcpus': 2}},
+                             'objmethod': 'save'},
+                    'version': '1.0',
+                    '_context_roles': ['admin']}
+        self.expected = jsonutils.loads(jsonutils.dumps(self.msg))
+
+    def _round_trip(self, version, codec='json', compression=None,
+                    threshold=0):
+        self.flags(rpc_envelope_version=version,
+                   rpc_message_codec=codec,
+                   rpc_message_compression=compression,
+                   rpc_message_compression_threshold=threshold)
+        envelope = rpc_common.serialize_msg(self.msg)
+        # What the messaging library sends
+        wire = jsonutils.dumps(envelope)
+        self.assertEqual(self.expected,
+                         rpc_common.deserialize_msg(jsonutils.loads(wire)))
+        return envelope
+
+    def test_2_0(self):
+        envelope = self._round_trip('2.0')
+        self.assertEqual('2.0', envelope['oslo.version'])
+        self.assertIsInstance(envelope['oslo.message'], basestring)
+
+    def test_2_0_ignores_codec(self):
+        envelope = self._round_trip('2.0', 'msgpack', 'zlib')
+        self.assertEqual(set(['oslo.version', 'oslo.message']),
+                         set(envelope))
+
+    def test_2_1_json(self):
+        envelope = self._round_trip('2.1')
+        self.assertEqual('json', envelope['oslo.codec'])
+        self.assertNotIn('oslo.compression', envelope)
+        # Encoded once, along with the envelope
+        self.assertEqual(self.expected, envelope['oslo.message'])
+
+    def test_2_1_json_zlib(self):
+        envelope = self._round_trip('2.1', 'json', 'zlib')
+        self.assertEqual('zlib', envelope['oslo.compression'])
+        self.assertTrue(len(envelope['oslo.message']) <
+                        len(jsonutils.dumps(self.msg)))
+
+    def test_2_1_json_zlib_below_threshold(self):
+        envelope = self._round_trip('2.1', 'json', 'zlib', threshold=100000)
+        self.assertNotIn('oslo.compression', envelope)
+        self.assertEqual(self.expected, envelope['oslo.message'])
+
+    def test_2_1_json_converts_only_what_json_cannot_encode(self):
+        self.flags(rpc_envelope_version='2.1')
+        envelope = rpc_common.serialize_msg(self.msg)
+        message = envelope['oslo.message']
+        objinst = message['args']['objinst']
+        self.assertIsNot(self.msg['args']['objinst'], objinst)
+        self.assertEqual('2013-10-01T12:30:00.000000',
+                         objinst['nova_object.data']['launched_at'])
+        # Left as they are
+        self.assertIs(self.msg['_context_roles'], message['_context_roles'])
+        self.assertIs(self.msg['args']['objinst']['nova_object.data']
+                      ['metadata'],
+                      objinst['nova_object.data']['metadata'])
+        self.assertIsInstance(self.msg['args']['objinst']['nova_object.data']
+                              ['launched_at'], datetime.datetime)
+
+    @testtools.skipIf(rpc_common.msgpack is None, 'msgpack is not installed')
+    def test_2_1_msgpack(self):
+        envelope = self._round_trip('2.1', 'msgpack')
+        self.assertEqual('msgpack', envelope['oslo.codec'])
+        self.assertIsInstance(envelope['oslo.message'], basestring)
+
+    @testtools.skipIf(rpc_common.msgpack is None, 'msgpack is not installed')
+    def test_2_1_msgpack_zlib(self):
+        envelope = self._round_trip('2.1', 'msgpack', 'zlib')
+        self.assertEqual('zlib', envelope['oslo.compression'])
+
+    def test_2_1_unknown_codec(self):
+        self.flags(rpc_envelope_version='2.1', rpc_message_codec='pickle')
+        self.assertRaises(rpc_common.RPCException,
+                          rpc_common.serialize_msg, self.msg)
+
+    def test_unsupported_version(self):
+        self.assertRaises(rpc_common.UnsupportedRpcEnvelopeVersion,
+                          rpc_common.deserialize_msg,
+                          {'oslo.version': '3.0', 'oslo.message': '{}'})
+
+    def test_not_an_envelope(self):
+        self.assertEqual({'a': 1}, rpc_common.deserialize_msg({'a': 1}))
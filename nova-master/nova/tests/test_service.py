@@ -35,6 +35,7 @@ from nova import test
 from nova.tests import utils
 from nova import wsgi
 
+from nova.openstack.common import lockutils
 from nova.openstack.common import service as _service
 
 test_service_opts = [
@@ -175,6 +176,32 @@ class ServiceTestCase(test.TestCase):
                                'nova.tests.test_service.FakeManager')
         serv.start()
 
+    def _start_with_timers(self):
+        self._service_start_mocks()
+        self.mox.ReplayAll()
+        serv = service.Service(self.host,
+                               self.binary,
+                               self.topic,
+                               'nova.tests.test_service.FakeManager')
+        timers = []
+
+        def fake_add_timer(interval, callback, initial_delay=None,
+                           *args, **kwargs):
+            timers.append((interval, callback, initial_delay))
+        self.stubs.Set(serv.tg, 'add_timer', fake_add_timer)
+        serv.start()
+        return timers
+
+    def test_lock_stats_logged(self):
+        self.flags(lock_stats_interval=300)
+        self.assertIn((300, lockutils.log_stats, 300),
+                      self._start_with_timers())
+
+    def test_lock_stats_not_logged(self):
+        self.flags(lock_stats_interval=0)
+        self.assertNotIn(lockutils.log_stats,
+                         [timer[1] for timer in self._start_with_timers()])
+
     def test_parent_graceful_shutdown(self):
         self.manager_mock = self.mox.CreateMock(FakeManager)
         self.mox.StubOutWithMock(sys.modules[__name__],
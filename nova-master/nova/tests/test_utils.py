@@ -575,6 +575,49 @@ class MkfsTestCase(test.NoDBTestCase):
         utils.mkfs('swap', '/my/swap/block/dev', 'swap-vol')
 
 
+class ExecuteTestCase(test.NoDBTestCase):
+
+    def test_execute_root_helper(self):
+        self.mox.StubOutWithMock(processutils, 'execute')
+        processutils.execute('ip', 'link', run_as_root=True,
+                             root_helper=utils._get_root_helper())
+        self.mox.ReplayAll()
+
+        utils.execute('ip', 'link', run_as_root=True)
+
+    def test_execute_root_helper_daemon(self):
+        self.flags(use_rootwrap_daemon=True)
+        self.mox.StubOutWithMock(processutils, 'execute')
+        processutils.execute(
+                'ip', 'link', run_as_root=True,
+                root_helper=utils._get_root_helper(),
+                root_helper_daemon='sudo nova-rootwrap-daemon %s' %
+                        CONF.rootwrap_config)
+        self.mox.ReplayAll()
+
+        utils.execute('ip', 'link', run_as_root=True)
+
+    def test_trycmd_root_helper_daemon(self):
+        self.flags(use_rootwrap_daemon=True)
+        self.mox.StubOutWithMock(processutils, 'trycmd')
+        processutils.trycmd(
+                'ip', 'link', run_as_root=True,
+                root_helper=utils._get_root_helper(),
+                root_helper_daemon=utils._get_root_helper_daemon())
+        self.mox.ReplayAll()
+
+        utils.trycmd('ip', 'link', run_as_root=True)
+
+    def test_execute_explicit_root_helper_skips_daemon(self):
+        self.flags(use_rootwrap_daemon=True)
+        self.mox.StubOutWithMock(processutils, 'execute')
+        processutils.execute('ip', 'link', run_as_root=True,
+                             root_helper='sudo')
+        self.mox.ReplayAll()
+
+        utils.execute('ip', 'link', run_as_root=True, root_helper='sudo')
+
+
 class LastBytesTestCase(test.NoDBTestCase):
     """Test the last_bytes() utility method."""
 
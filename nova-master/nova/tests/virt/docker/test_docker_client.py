@@ -15,6 +15,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import socket
+
+from eventlet.green import httplib
 import mox
 
 from nova.openstack.common import jsonutils
@@ -23,10 +26,11 @@ import nova.virt.docker.client
 
 
 class FakeResponse(object):
-    def __init__(self, status, data='', headers=None):
+    def __init__(self, status, data='', headers=None, will_close=False):
         self.status = status
         self._data = data
         self._headers = headers or {}
+        self.will_close = will_close
 
     def read(self, _size=None):
         return self._data
@@ -482,3 +486,126 @@ class DockerHTTPClientTestCase(test.NoDBTestCase):
         self.assertIsNone(logs)
 
         self.mox.VerifyAll()
+
+    def _stub_connections(self, *connections):
+        connections = list(connections)
+        self.stubs.Set(nova.virt.docker.client, 'UnixHTTPConnection',
+                       lambda: connections.pop(0))
+
+    def _expect_list_containers(self, mock_conn, will_close=False):
+        mock_conn.request('GET', '/v1.4/containers/ps?all=1&limit=50',
+                          headers={'Content-Type': 'application/json'})
+        response = FakeResponse(200, data='[]',
+                                headers={'Content-Type': 'application/json'},
+                                will_close=will_close)
+        mock_conn.getresponse().AndReturn(response)
+
+    def test_connection_kept_alive(self):
+        mock_conn = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn)
+        self._expect_list_containers(mock_conn)
+        self._stub_connections(mock_conn)
+
+        self.mox.ReplayAll()
+
+        client = nova.virt.docker.client.DockerHTTPClient()
+        self.assertEqual([], client.list_containers())
+        self.assertEqual([], client.list_containers())
+
+        self.mox.VerifyAll()
+
+    def test_connection_closed_by_daemon(self):
+        mock_conn = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn, will_close=True)
+        mock_conn2 = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn2)
+        self._stub_connections(mock_conn, mock_conn2)
+
+        self.mox.ReplayAll()
+
+        client = nova.virt.docker.client.DockerHTTPClient()
+        self.assertEqual([], client.list_containers())
+        self.assertEqual([], client.list_containers())
+
+        self.mox.VerifyAll()
+
+    def test_idle_connection_closed_by_daemon(self):
+        mock_conn = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn)
+        mock_conn.request('GET', '/v1.4/containers/ps?all=1&limit=50',
+                          headers={'Content-Type': 'application/json'})
+        mock_conn.getresponse().AndRaise(httplib.BadStatusLine(''))
+        mock_conn.close()
+        mock_conn2 = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn2)
+        self._stub_connections(mock_conn, mock_conn2)
+
+        self.mox.ReplayAll()
+
+        client = nova.virt.docker.client.DockerHTTPClient()
+        self.assertEqual([], client.list_containers())
+        self.assertEqual([], client.list_containers())
+
+        self.mox.VerifyAll()
+
+    def _expect_start_container(self, mock_conn):
+        mock_conn.request('POST', '/v1.4/containers/XXX/start',
+                          body='{}',
+                          headers={'Content-Type': 'application/json'})
+        mock_conn.getresponse().AndReturn(FakeResponse(200))
+
+    def test_post_new_connection(self):
+        # The daemon restarted and closed the idle connection, which the
+        # request is not sent on since it cannot be sent again.
+        mock_conn = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn)
+        mock_conn2 = self.mox.CreateMockAnything()
+        self._expect_start_container(mock_conn2)
+        self._stub_connections(mock_conn, mock_conn2)
+
+        self.mox.ReplayAll()
+
+        client = nova.virt.docker.client.DockerHTTPClient()
+        self.assertEqual([], client.list_containers())
+        self.assertEqual(True, client.start_container('XXX'))
+
+        self.mox.VerifyAll()
+
+    def test_idle_connections_closed_by_daemon(self):
+        mock_conn = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn)
+        mock_conn2 = self.mox.CreateMockAnything()
+        self._expect_start_container(mock_conn2)
+        # The daemon restarts
+        mock_conn2.request('GET', '/v1.4/containers/ps?all=1&limit=50',
+                           headers={'Content-Type': 'application/json'})
+        mock_conn2.getresponse().AndRaise(httplib.BadStatusLine(''))
+        mock_conn2.close()
+        mock_conn.close()
+        mock_conn3 = self.mox.CreateMockAnything()
+        self._expect_list_containers(mock_conn3)
+        self._stub_connections(mock_conn, mock_conn2, mock_conn3)
+
+        self.mox.ReplayAll()
+
+        client = nova.virt.docker.client.DockerHTTPClient()
+        self.assertEqual([], client.list_containers())
+        self.assertEqual(True, client.start_container('XXX'))
+        self.assertEqual([], client.list_containers())
+
+        self.mox.VerifyAll()
+
+    def test_new_connection_error(self):
+        mock_conn = self.mox.CreateMockAnything()
+        mock_conn.request('GET', '/v1.4/containers/ps?all=1&limit=50',
+                          headers={'Content-Type': 'application/json'}
+                          ).AndRaise(socket.error())
+        mock_conn.close()
+        self._stub_connections(mock_conn)
+
+        self.mox.ReplayAll()
+
+        client = nova.virt.docker.client.DockerHTTPClient()
+        self.assertRaises(socket.error, client.list_containers)
+
+        self.mox.VerifyAll()
@@ -202,3 +202,43 @@ class DockerDriverTestCase(_VirtDriverTestCase, test.TestCase):
         instance = utils.get_test_instance(obj=False)
         limit = self.connection._get_memory_limit_bytes(instance)
         self.assertEqual(2048 * unit.Mi, limit)
+
+    def _create_containers(self, *names):
+        return [self.connection.docker.create_container({'Hostname': name})
+                for name in names]
+
+    def test_list_instances_inspects_containers_once(self):
+        self._create_containers('foo', 'bar')
+        with mock.patch.object(self.connection.docker, 'inspect_container',
+                               wraps=self.connection.docker.inspect_container
+                               ) as inspect_container:
+            self.assertEqual(set(['foo', 'bar']),
+                             set(self.connection.list_instances()))
+            self._create_containers('baz')
+            self.assertEqual(set(['foo', 'bar', 'baz']),
+                             set(self.connection.list_instances()))
+        self.assertEqual(3, inspect_container.call_count)
+
+    def test_find_container_by_name_from_index(self):
+        instance_ref, network_info = self._get_running_instance()
+        with mock.patch.object(self.connection.docker, 'list_containers',
+                               wraps=self.connection.docker.list_containers
+                               ) as list_containers:
+            container = self.connection.find_container_by_name(
+                instance_ref['name'])
+            self.assertEqual(instance_ref['name'],
+                             container['Config']['Hostname'])
+            self.assertFalse(list_containers.called)
+
+    def test_find_container_by_name_not_indexed(self):
+        container_id, = self._create_containers('foo')
+        self.assertEqual(container_id,
+                         self.connection.find_container_by_name('foo')['id'])
+        self.assertEqual({}, self.connection.find_container_by_name('bar'))
+
+    def test_find_container_by_name_destroyed(self):
+        container_id, = self._create_containers('foo')
+        self.connection.list_instances()
+        self.connection.docker.destroy_container(container_id)
+        self.assertEqual({}, self.connection.find_container_by_name('foo'))
+        self.assertEqual({}, self.connection._container_ids)
@@ -0,0 +1,92 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from nova import test
+from nova.virt.libvirt import domaincache
+
+
+class FakeDomain(object):
+
+    def __init__(self, name):
+        self._name = name
+        self.XMLDesc = mock.Mock(
+            return_value='<domain><name>%s</name></domain>' % name)
+
+    def name(self):
+        return self._name
+
+
+class DomainCacheTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(DomainCacheTestCase, self).setUp()
+        self.cache = domaincache.DomainCache()
+        self.cache.reset(True)
+        self.domain = FakeDomain('instance-00000001')
+        self.lookup = mock.Mock(return_value=self.domain)
+
+    def test_lookup(self):
+        self.assertEqual(self.domain,
+                         self.cache.lookup('instance-00000001', self.lookup))
+        self.assertEqual(self.domain,
+                         self.cache.lookup('instance-00000001', self.lookup))
+        self.lookup.assert_called_once_with('instance-00000001')
+
+    def test_lookup_invalidated(self):
+        self.cache.lookup('instance-00000001', self.lookup)
+        self.cache.invalidate('instance-00000001')
+        self.cache.lookup('instance-00000001', self.lookup)
+        self.assertEqual(2, self.lookup.call_count)
+
+    def test_lookup_invalidated_meanwhile(self):
+        def lookup(name):
+            self.cache.invalidate(name)
+            return self.domain
+        self.cache.lookup('instance-00000001', lookup)
+        self.cache.lookup('instance-00000001', self.lookup)
+        self.lookup.assert_called_once_with('instance-00000001')
+
+    def test_get_doc(self):
+        doc = self.cache.get_doc(self.domain)
+        self.assertEqual('instance-00000001', doc.findtext('name'))
+        self.assertIs(doc, self.cache.get_doc(self.domain))
+        self.domain.XMLDesc.assert_called_once_with(0)
+
+    def test_get_doc_invalidated(self):
+        doc = self.cache.get_doc(self.domain)
+        self.cache.invalidate('instance-00000001')
+        self.assertIsNot(doc, self.cache.get_doc(self.domain))
+        self.assertEqual(2, self.domain.XMLDesc.call_count)
+
+    def test_reset(self):
+        self.cache.lookup('instance-00000001', self.lookup)
+        self.cache.get_doc(self.domain)
+        self.cache.reset(True)
+        self.cache.lookup('instance-00000001', self.lookup)
+        self.cache.get_doc(self.domain)
+        self.assertEqual(2, self.lookup.call_count)
+        self.assertEqual(2, self.domain.XMLDesc.call_count)
+
+    def test_disabled(self):
+        self.cache.reset(False)
+        for i in range(2):
+            self.cache.lookup('instance-00000001', self.lookup)
+            self.cache.get_doc(self.domain)
+        self.assertEqual(2, self.lookup.call_count)
+        self.assertEqual(2, self.domain.XMLDesc.call_count)
@@ -162,6 +162,20 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
                                 '10737418240')
         self.assertNotIn(unexpected, image_cache_manager.originals)
 
+    def test_list_base_images_partial(self):
+        listing = ['e97222e91fc4241f49a7f520d1dcf446751129b3',
+                   'e09c675c2d1cfac32dae3c2d83689c8c94bc693b.prefetch']
+        self.stubs.Set(os, 'listdir', lambda x: listing)
+        self.stubs.Set(os.path, 'isfile', lambda x: True)
+
+        base_dir = '/var/lib/nova/instances/_base'
+        image_cache_manager = imagecache.ImageCacheManager()
+        image_cache_manager._list_base_images(base_dir)
+
+        partial = os.path.join(base_dir, listing[1])
+        self.assertEqual([partial], image_cache_manager.partial_images)
+        self.assertNotIn(partial, image_cache_manager.unexplained_images)
+
     def test_list_backing_images_small(self):
         self.stubs.Set(os, 'listdir',
                        lambda x: ['_base', 'instance-00000001',
@@ -411,6 +425,22 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
                 self.assertNotEqual(stream.getvalue().find('Failed to remove'),
                                     -1)
 
+    def test_remove_partial_image(self):
+        with utils.tempdir() as tmpdir:
+            fname = os.path.join(tmpdir, 'aaa.prefetch')
+            with open(fname, 'w') as partial_file:
+                partial_file.write('data')
+            image_cache_manager = imagecache.ImageCacheManager()
+
+            # Downloads may still be in progress
+            os.utime(fname, (-1, time.time() - 3601))
+            image_cache_manager._remove_partial_image(fname)
+            self.assertTrue(os.path.exists(fname))
+
+            os.utime(fname, (-1, time.time() - 3600 * 25))
+            image_cache_manager._remove_partial_image(fname)
+            self.assertFalse(os.path.exists(fname))
+
     def test_handle_base_image_unused(self):
         img = '123'
 
@@ -0,0 +1,143 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import cStringIO
+import hashlib
+import os
+
+import fixtures
+from oslo.config import cfg
+
+from nova import context
+from nova import exception
+from nova import test
+from nova.tests.image import fake as fake_image
+from nova.virt import images
+from nova.virt.libvirt import imagecache
+from nova.virt.libvirt import imageprefetch
+
+CONF = cfg.CONF
+
+
+class ThrottleTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ThrottleTestCase, self).setUp()
+        self.sleeps = []
+        self.stubs.Set(imageprefetch.time, 'time', lambda: 10.0)
+        self.stubs.Set(imageprefetch.greenthread, 'sleep',
+                       self.sleeps.append)
+
+    def test_consume(self):
+        throttle = imageprefetch.Throttle(100)
+        throttle.consume(50)
+        throttle.consume(100)
+        self.assertEqual([0.5, 1.5], self.sleeps)
+
+    def test_consume_unlimited(self):
+        throttle = imageprefetch.Throttle(0)
+        throttle.consume(50)
+        self.assertEqual([], self.sleeps)
+
+
+class ImagePrefetcherTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ImagePrefetcherTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=self.tmpdir)
+        self.context = context.get_admin_context()
+        self.image_service = fake_image.stub_out_image_service(self.stubs)
+        self.addCleanup(fake_image.FakeImageService_reset)
+        self.data = os.urandom(1000)
+        self.image_id = self.image_service.create(
+            self.context,
+            {'checksum': hashlib.md5(self.data).hexdigest(),
+             'size': len(self.data)},
+            cStringIO.StringIO(self.data))['id']
+        self.base = os.path.join(
+            self.tmpdir, CONF.image_cache_subdirectory_name,
+            imagecache.get_cache_fname({'image_id': self.image_id},
+                                       'image_id'))
+        self.partial = self.base + imageprefetch.PARTIAL_SUFFIX
+        os.makedirs(os.path.dirname(self.base))
+
+        def fake_fetched_to_raw(image_href, path_tmp, path, max_size=0):
+            os.rename(path_tmp, path)
+        self.stubs.Set(images, 'fetched_to_raw', fake_fetched_to_raw)
+
+        self.consumed = []
+        self.prefetcher = imageprefetch.ImagePrefetcher()
+        self.stubs.Set(self.prefetcher._throttle, 'consume',
+                       self.consumed.append)
+
+    def _read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_fetch(self):
+        self.prefetcher.fetch(self.context, self.image_id)
+        self.assertEqual(self.data, self._read(self.base))
+        self.assertFalse(os.path.exists(self.partial))
+        self.assertEqual([len(self.data)], self.consumed)
+
+    def test_fetch_resumes(self):
+        with open(self.partial, 'w') as f:
+            f.write(self.data[:300])
+        self.prefetcher.fetch(self.context, self.image_id)
+        self.assertEqual(self.data, self._read(self.base))
+        self.assertEqual([700], self.consumed)
+
+    def test_fetch_bad_checksum(self):
+        self.image_service.update(self.context, self.image_id,
+                                  {'checksum': 'bad'})
+        self.assertRaises(exception.ImageUnacceptable,
+                          self.prefetcher.fetch, self.context, self.image_id)
+        self.assertFalse(os.path.exists(self.base))
+        self.assertFalse(os.path.exists(self.partial))
+
+    def test_fetch_bad_partial(self):
+        with open(self.partial, 'w') as f:
+            f.write(self.data + 'more')
+        self.assertRaises(exception.ImageUnacceptable,
+                          self.prefetcher.fetch, self.context, self.image_id)
+        self.assertFalse(os.path.exists(self.partial))
+
+    def test_prefetch(self):
+        self.prefetcher.prefetch(self.context, self.image_id)
+        self.prefetcher.wait()
+        self.assertEqual(self.data, self._read(self.base))
+        self.assertEqual(set(), self.prefetcher._prefetching)
+
+    def test_prefetch_cached(self):
+        with open(self.base, 'w') as f:
+            f.write('cached')
+        self.mox.StubOutWithMock(self.prefetcher, 'fetch')
+        self.mox.ReplayAll()
+        self.prefetcher.prefetch(self.context, self.image_id)
+        self.prefetcher.wait()
+
+    def test_prefetch_failure_keeps_partial(self):
+        def fake_download(context, image_id, data):
+            data.write(self.data[:300])
+            raise test.TestingException()
+        self.stubs.Set(self.image_service, 'download', fake_download)
+        self.prefetcher.prefetch(self.context, self.image_id)
+        self.prefetcher.wait()
+        self.assertFalse(os.path.exists(self.base))
+        self.assertEqual(self.data[:300], self._read(self.partial))
+        self.assertEqual(set(), self.prefetcher._prefetching)
@@ -57,6 +57,7 @@ import nova.tests.image.fake
 from nova.tests import matchers
 from nova.tests.objects import test_pci_device
 from nova.tests.virt.libvirt import fake_libvirt_utils
+from nova.tests.virt.libvirt import fakelibvirt
 from nova import unit
 from nova import utils
 from nova import version
@@ -454,6 +455,17 @@ class LibvirtConnTestCase(test.TestCase):
         nova.tests.image.fake.FakeImageService_reset()
         super(LibvirtConnTestCase, self).tearDown()
 
+    def _stub_disk_files(self, sizes, mtime=0):
+        """Makes os.stat() of disk files return the given sizes."""
+        real_stat = os.stat
+
+        def fake_stat(path):
+            if path in sizes:
+                return mock.Mock(st_ino=hash(path), st_size=sizes[path],
+                                 st_mtime=mtime)
+            return real_stat(path)
+        self.stubs.Set(os, 'stat', fake_stat)
+
     def create_fake_libvirt_mock(self, **kwargs):
         """Defining mocks for LibvirtDriver(libvirt is not used)."""
 
@@ -3487,9 +3499,8 @@ class LibvirtConnTestCase(test.TestCase):
         fake_libvirt_utils.disk_sizes['/test/disk.local'] = 20 * unit.Gi
         fake_libvirt_utils.disk_backing_files['/test/disk.local'] = 'file'
 
-        self.mox.StubOutWithMock(os.path, "getsize")
-        os.path.getsize('/test/disk').AndReturn((10737418240))
-        os.path.getsize('/test/disk.local').AndReturn((3328599655))
+        self._stub_disk_files({'/test/disk': 10737418240,
+                               '/test/disk.local': 3328599655})
 
         ret = ("image: /test/disk\n"
                "file format: raw\n"
@@ -3522,6 +3533,66 @@ class LibvirtConnTestCase(test.TestCase):
 
         db.instance_destroy(self.context, instance_ref['uuid'])
 
+    def _test_get_instance_disk_info_cache(self, changed_sizes=None,
+                                           changed_mtime=0):
+        xml = ("<domain type='kvm'><name>instance-0000000a</name>"
+               "<devices>"
+               "<disk type='file'><driver name='qemu' type='raw'/>"
+               "<source file='/test/disk'/>"
+               "<target dev='vda' bus='virtio'/></disk>"
+               "<disk type='file'><driver name='qemu' type='qcow2'/>"
+               "<source file='/test/disk.local'/>"
+               "<target dev='vdb' bus='virtio'/></disk>"
+               "</devices></domain>")
+        sizes = {'/test/disk': 10737418240, '/test/disk.local': 3328599655}
+        fake_libvirt_utils.disk_backing_files['/test/disk.local'] = 'file'
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        with mock.patch.object(libvirt_driver.disk, 'get_disk_size',
+                               return_value=21474836480) as get_disk_size:
+            self._stub_disk_files(sizes)
+            first = conn.get_instance_disk_info('instance-0000000a', xml=xml)
+            sizes.update(changed_sizes or {})
+            self._stub_disk_files(sizes, changed_mtime)
+            second = conn.get_instance_disk_info('instance-0000000a',
+                                                 xml=xml)
+        return jsonutils.loads(first), jsonutils.loads(second), get_disk_size
+
+    def test_get_instance_disk_info_cached(self):
+        first, second, get_disk_size = (
+            self._test_get_instance_disk_info_cache())
+        self.assertEqual(first, second)
+        get_disk_size.assert_called_once_with('/test/disk.local')
+
+    def test_get_instance_disk_info_changed_size(self):
+        first, second, get_disk_size = (
+            self._test_get_instance_disk_info_cache(
+                changed_sizes={'/test/disk.local': 4328599655}))
+        self.assertEqual(18146236825, first[1]['over_committed_disk_size'])
+        self.assertEqual(17146236825, second[1]['over_committed_disk_size'])
+        self.assertEqual(2, get_disk_size.call_count)
+
+    def test_get_instance_disk_info_changed_mtime(self):
+        first, second, get_disk_size = (
+            self._test_get_instance_disk_info_cache(changed_mtime=1))
+        self.assertEqual(first, second)
+        self.assertEqual(2, get_disk_size.call_count)
+
+    def test_disk_info_cache_evicted(self):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        conn._disk_info_cache = {'fake1': {}, 'fake2': {}, 'fake3': {}}
+        self.stubs.Set(conn, 'list_instances', lambda: ['fake1', 'fake2'])
+        self.stubs.Set(conn, 'get_instance_disk_info',
+                       lambda instance_name: '[]')
+        self.stubs.Set(conn, '_lookup_by_name',
+                       mock.Mock(side_effect=exception.InstanceNotFound(
+                           instance_id='fake1')))
+
+        conn.get_disk_over_committed_size_total()
+        self.assertEqual(set(['fake1', 'fake2']), set(conn._disk_info_cache))
+        conn._undefine_domain({'name': 'fake1'})
+        self.assertEqual(['fake2'], conn._disk_info_cache.keys())
+
     def test_post_live_migration(self):
         vol = {'block_device_mapping': [
                   {'connection_info': 'dummy1', 'mount_device': '/dev/sda'},
@@ -3580,9 +3651,8 @@ class LibvirtConnTestCase(test.TestCase):
         fake_libvirt_utils.disk_sizes['/test/disk.local'] = 20 * unit.Gi
         fake_libvirt_utils.disk_backing_files['/test/disk.local'] = 'file'
 
-        self.mox.StubOutWithMock(os.path, "getsize")
-        os.path.getsize('/test/disk').AndReturn((10737418240))
-        os.path.getsize('/test/disk.local').AndReturn((3328599655))
+        self._stub_disk_files({'/test/disk': 10737418240,
+                               '/test/disk.local': 3328599655})
 
         ret = ("image: /test/disk\n"
                "file format: raw\n"
@@ -5619,6 +5689,51 @@ class LibvirtConnTestCase(test.TestCase):
         self.assertEqual(got_events[0].transition,
                          virtevent.EVENT_LIFECYCLE_STOPPED)
 
+    def _test_domain_cache(self, events):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        if events:
+            conn._init_events_pipe()
+        fake_conn = fakelibvirt.Connection('qemu:///system')
+        self.stubs.Set(conn, '_connect', lambda *a, **k: fake_conn)
+        dom = conn._conn.defineXML(
+            "<domain type='kvm'><name>instance-00000001</name>"
+            "<memory>128000</memory><vcpu>1</vcpu>"
+            "<os><type>hvm</type></os><devices>"
+            "<disk type='file' device='disk'>"
+            "<driver name='qemu' type='qcow2'/>"
+            "<source file='/test/disk'/>"
+            "<target dev='vda' bus='virtio'/></disk>"
+            "</devices></domain>")
+        self.stubs.Set(fake_conn, 'lookupByName',
+                       mock.Mock(wraps=fake_conn.lookupByName))
+        self.stubs.Set(dom, 'XMLDesc', mock.Mock(wraps=dom.XMLDesc))
+
+        for i in range(2):
+            self.assertEqual(['vda'], conn.get_disks('instance-00000001'))
+        calls = [(fake_conn.lookupByName.call_count, dom.XMLDesc.call_count)]
+        # Starting the domain changes it
+        dom.createWithFlags(0)
+        conn.get_disks('instance-00000001')
+        calls.append((fake_conn.lookupByName.call_count,
+                      dom.XMLDesc.call_count))
+        return calls
+
+    def test_domain_cache(self):
+        self.assertEqual([(1, 1), (2, 2)], self._test_domain_cache(True))
+
+    def test_domain_cache_without_events(self):
+        self.assertEqual([(2, 2), (3, 3)], self._test_domain_cache(False))
+
+    def test_domain_cache_reset_on_connection(self):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        conn._init_events_pipe()
+        conn._conn
+        self.assertTrue(conn._domain_cache.enabled)
+        self.mox.StubOutWithMock(conn._domain_cache, 'reset')
+        conn._domain_cache.reset(False)
+        self.mox.ReplayAll()
+        conn._close_callback(conn._wrapped_conn, 'Connection closed', None)
+
     def test_set_cache_mode(self):
         self.flags(disk_cachemodes=['file=directsync'], group='libvirt')
         conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
@@ -476,6 +476,16 @@ class _VirtDriverTestCase(_FakeDriverBackendTestCase):
                           self.connection.get_info,
                           {'name': 'I just made this name up'})
 
+    @catch_notimplementederror
+    def test_get_info_for_instances(self):
+        instance_ref, network_info = self._get_running_instance()
+        unknown = {'uuid': 'fake-uuid', 'name': 'I just made this name up'}
+        infos = self.connection.get_info_for_instances([instance_ref,
+                                                        unknown])
+        self.assertEqual([instance_ref['uuid']], infos.keys())
+        self.assertEqual(self.connection.get_info(instance_ref),
+                         infos[instance_ref['uuid']])
+
     @catch_notimplementederror
     def test_get_diagnostics(self):
         instance_ref, network_info = self._get_running_instance()
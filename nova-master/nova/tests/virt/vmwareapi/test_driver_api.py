@@ -682,6 +682,21 @@ class VMwareAPIVMTestCase(test.NoDBTestCase):
                                    'node': self.instance_node})
         self._check_vm_info(info, power_state.RUNNING)
 
+    def test_get_info_for_instances(self):
+        self._create_vm()
+        unknown = {'uuid': 'fake-uuid', 'name': 'fake-name',
+                   'node': self.instance_node}
+        infos = self.conn.get_info_for_instances([self.instance, unknown])
+        self.assertEqual([self.uuid], infos.keys())
+        self._check_vm_info(infos[self.uuid], power_state.RUNNING)
+
+    def test_get_info_for_instances_by_name(self):
+        self._create_vm()
+        instance = {'uuid': 'fake-uuid', 'name': self.uuid,
+                    'node': self.instance_node}
+        infos = self.conn.get_info_for_instances([instance])
+        self._check_vm_info(infos['fake-uuid'], power_state.RUNNING)
+
     def test_destroy(self):
         self._create_vm()
         info = self.conn.get_info({'uuid': self.uuid,
@@ -19,10 +19,14 @@
 import collections
 import re
 
+from eventlet import greenthread
+
 from nova import exception
 from nova.openstack.common.gettextutils import _
 from nova import test
+from nova.tests.virt.vmwareapi import stubs
 from nova import unit
+from nova.virt.vmwareapi import driver
 from nova.virt.vmwareapi import fake
 from nova.virt.vmwareapi import vm_util
 
@@ -397,3 +401,144 @@ class VMwareVMUtilTestCase(test.NoDBTestCase):
 
     def test_detach_virtual_disk_destroy_spec(self):
         self._test_detach_virtual_disk_spec(destroy_disk=True)
+
+
+class VMRefCacheTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(VMRefCacheTestCase, self).setUp()
+        fake.reset()
+        stubs.set_stubs(self.stubs)
+        self.session = driver.VMwareAPISession()
+        self.stubs.Set(self.session, '__del__', lambda: None)
+        self.cache = self.session.vm_ref_cache
+
+        self.calls = []
+        call_method = self.session._call_method
+
+        def fake_call_method(module, method, *args, **kwargs):
+            self.calls.append(method)
+            return call_method(module, method, *args, **kwargs)
+
+        self.stubs.Set(self.session, '_call_method', fake_call_method)
+
+    def tearDown(self):
+        super(VMRefCacheTestCase, self).tearDown()
+        fake.reset()
+
+    def _create_vm(self, name):
+        vm = fake.VirtualMachine(name=name)
+        fake._create_object('VirtualMachine', vm)
+        return vm
+
+    def test_get_vm_ref(self):
+        vm = self._create_vm('fake-uuid')
+        self._create_vm('other-uuid')
+        vm_ref = vm_util.get_vm_ref(self.session, {'uuid': 'fake-uuid'})
+        self.assertEqual(vm.obj.value, vm_ref.value)
+        self.assertEqual(['create_property_collector', 'create_filter',
+                          'wait_for_updates'], self.calls)
+
+        # Found without calling the server
+        self.calls = []
+        vm_ref = vm_util.get_vm_ref(self.session, {'uuid': 'fake-uuid'})
+        self.assertEqual(vm.obj.value, vm_ref.value)
+        self.assertEqual([], self.calls)
+
+    def test_get_vm_ref_by_name(self):
+        vm = self._create_vm('fake-name')
+        vm_ref = vm_util.get_vm_ref(self.session, {'uuid': 'fake-uuid',
+                                                   'name': 'fake-name'})
+        self.assertEqual(vm.obj.value, vm_ref.value)
+
+    def test_get_vm_ref_fetches_new_vms(self):
+        self._create_vm('other-uuid')
+        self.assertIsNone(self.cache.get('fake-uuid'))
+        vm = self._create_vm('fake-uuid')
+        self.calls = []
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+        self.assertEqual(['wait_for_updates'], self.calls)
+
+    def test_get_vm_ref_not_found(self):
+        self._create_vm('other-uuid')
+        self.assertRaises(exception.InstanceNotFound, vm_util.get_vm_ref,
+                          self.session, {'uuid': 'fake-uuid',
+                                         'name': 'fake-name'})
+
+    def test_invalidate(self):
+        vm = self._create_vm('fake-uuid')
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+
+        del fake._db_content['VirtualMachine'][vm.obj]
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get('fake-uuid'))
+
+    def test_rename(self):
+        vm = self._create_vm('fake-uuid')
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+
+        vm.set('name', 'fake-uuid-orig')
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get('fake-uuid'))
+        self.assertEqual(vm.obj.value,
+                         self.cache.get('fake-uuid-orig').value)
+
+    def test_new_session(self):
+        vm = self._create_vm('fake-uuid')
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+
+        self.session._create_session()
+        self.cache.invalidate()
+        self.calls = []
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+        self.assertEqual('create_property_collector', self.calls[0])
+
+    def _yield_on_calls(self):
+        call_method = self.session._call_method
+
+        def fake_call_method(module, method, *args, **kwargs):
+            greenthread.sleep(0)
+            return call_method(module, method, *args, **kwargs)
+
+        self.stubs.Set(self.session, '_call_method', fake_call_method)
+
+    def test_concurrent_get(self):
+        vm = self._create_vm('fake-uuid')
+        self._yield_on_calls()
+        threads = [greenthread.spawn(self.cache.get, 'fake-uuid')
+                   for i in range(2)]
+        for thread in threads:
+            self.assertEqual(vm.obj.value, thread.wait().value)
+        self.assertEqual(['create_property_collector', 'create_filter',
+                          'wait_for_updates'], self.calls)
+
+    def test_invalidate_during_refresh(self):
+        vm = self._create_vm('fake-uuid')
+        call_method = self.session._call_method
+
+        def fake_call_method(module, method, *args, **kwargs):
+            if method == 'wait_for_updates':
+                self.cache.invalidate()
+            return call_method(module, method, *args, **kwargs)
+
+        self.stubs.Set(self.session, '_call_method', fake_call_method)
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+        self.calls = []
+        self.cache.get('fake-uuid')
+        self.assertEqual(['wait_for_updates'], self.calls)
+
+    def test_failed_refresh(self):
+        vm = self._create_vm('fake-uuid')
+        self.assertEqual(vm.obj.value, self.cache.get('fake-uuid').value)
+        self.cache.invalidate()
+        call_method = self.session._call_method
+
+        def fake_call_method(module, method, *args, **kwargs):
+            raise test.TestingException()
+
+        self.stubs.Set(self.session, '_call_method', fake_call_method)
+        self.assertRaises(test.TestingException, self.cache.get, 'fake-uuid')
+        self.stubs.Set(self.session, '_call_method', call_method)
+        self.calls = []
+        self.cache.get('fake-uuid')
+        self.assertEqual(['wait_for_updates'], self.calls)
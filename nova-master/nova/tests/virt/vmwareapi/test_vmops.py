@@ -103,3 +103,15 @@ class VMwareVMOpsTestCase(test.NoDBTestCase):
         value = vmops.VMwareVMOps.decide_linked_clone("yes", False)
         self.assertTrue(value,
                         "image level metadata failed to override global")
+
+    def test_wait_for_vm_task_failed(self):
+        session = self.mox.CreateMockAnything()
+        session.vm_ref_cache = self.mox.CreateMockAnything()
+        session._wait_for_task('fake-uuid', 'fake-task').AndRaise(
+                test.TestingException())
+        session.vm_ref_cache.invalidate()
+        self.mox.ReplayAll()
+
+        ops = vmops.VMwareVMOps(session, None, None)
+        self.assertRaises(test.TestingException, ops._wait_for_vm_task,
+                          'fake-uuid', 'fake-task')
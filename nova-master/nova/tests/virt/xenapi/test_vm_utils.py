@@ -16,6 +16,8 @@
 #    under the License.
 
 import contextlib
+import errno
+import os
 import uuid
 
 from eventlet import greenthread
@@ -1689,20 +1691,86 @@ class GetAllVdiForVMTestCase(VMUtilsTestBase):
 
 class GetAllVdisTestCase(VMUtilsTestBase):
     def test_get_all_vdis_in_sr(self):
-
-        def fake_get_rec(record_type, ref):
-            if ref == "2":
-                return "vdi_rec_2"
-
         session = mock.Mock()
-        session.call_xenapi.return_value = ["1", "2"]
-        session.get_rec.side_effect = fake_get_rec
+        session.call_xenapi.return_value = {"2": "vdi_rec_2"}
 
         sr_ref = "sr_ref"
         actual = list(vm_utils._get_all_vdis_in_sr(session, sr_ref))
         self.assertEqual(actual, [('2', 'vdi_rec_2')])
 
-        session.call_xenapi.assert_called_once_with("SR.get_VDIs", sr_ref)
+        session.call_xenapi.assert_called_once_with(
+            "VDI.get_all_records_where", 'field "SR"="sr_ref"')
+
+
+class VdiChainTestCase(VMUtilsTestBase):
+    def setUp(self):
+        super(VdiChainTestCase, self).setUp()
+        self.session = mock.Mock()
+        self.vdis = {}
+        for uuid, parent in (('base', None), ('image', 'base'),
+                             ('other', 'base'), ('disk', 'image')):
+            self.vdis['ref_' + uuid] = {'uuid': uuid,
+                                        'sm_config': {'vhd-parent': parent}}
+        self.vdi_recs = vm_utils._get_vdi_recs_by_uuid(self.vdis)
+
+    def test_walk_vdi_chain_in_snapshot(self):
+        chain = vm_utils._walk_vdi_chain(self.session, 'disk',
+                                         vdi_recs=self.vdi_recs)
+
+        self.assertEqual(['disk', 'image', 'base'],
+                         [vdi_rec['uuid'] for vdi_rec in chain])
+        self.assertFalse(self.session.call_xenapi.called)
+
+    @mock.patch.object(vm_utils, 'scan_default_sr')
+    def test_walk_vdi_chain(self, mock_scan_default_sr):
+        def fake_call_xenapi(method, arg):
+            if method == 'VDI.get_by_uuid':
+                return 'ref_' + arg
+            return self.vdis[arg]
+        self.session.call_xenapi.side_effect = fake_call_xenapi
+
+        chain = vm_utils._walk_vdi_chain(self.session, 'image')
+
+        self.assertEqual(['image', 'base'],
+                         [vdi_rec['uuid'] for vdi_rec in chain])
+        mock_scan_default_sr.assert_called_once_with(self.session)
+        self.assertEqual(4, self.session.call_xenapi.call_count)
+
+    def test_child_vhds_in_snapshot(self):
+        self.assertEqual(set(['image', 'other']),
+                         vm_utils._child_vhds(self.session, 'sr_ref', 'base',
+                                              vdi_recs=self.vdi_recs))
+        self.assertFalse(self.session.call_xenapi.called)
+
+    def test_child_vhds(self):
+        self.session.call_xenapi.return_value = self.vdis
+
+        self.assertEqual(set(['disk']),
+                         vm_utils._child_vhds(self.session, 'sr_ref',
+                                              'image'))
+        self.session.call_xenapi.assert_called_once_with(
+            "VDI.get_all_records_where", 'field "SR"="sr_ref"')
+
+    @mock.patch.object(vm_utils, 'destroy_vdi')
+    @mock.patch.object(vm_utils, '_scan_sr')
+    def test_destroy_cached_images(self, mock_scan_sr, mock_destroy_vdi):
+        self.vdis['ref_image']['other_config'] = {'image-id': 'used'}
+        self.vdis['ref_unused'] = {'uuid': 'unused',
+                                   'other_config': {'image-id': 'unused'},
+                                   'sm_config': {'vhd-parent': 'unused_base'}}
+        self.vdis['ref_unused_base'] = {'uuid': 'unused_base',
+                                        'sm_config': {}}
+        for vdi_rec in self.vdis.values():
+            vdi_rec.setdefault('other_config', {})
+        self.session.call_xenapi.return_value = self.vdis
+
+        destroyed = vm_utils.destroy_cached_images(self.session, 'sr_ref')
+
+        self.assertEqual(set(['unused']), destroyed)
+        mock_scan_sr.assert_called_once_with(self.session, 'sr_ref')
+        mock_destroy_vdi.assert_called_once_with(self.session, 'ref_unused')
+        self.session.call_xenapi.assert_called_once_with(
+            "VDI.get_all_records_where", 'field "SR"="sr_ref"')
 
 
 class SnapshotAttachedHereTestCase(VMUtilsTestBase):
@@ -2030,3 +2098,74 @@ class ResizeFunctionTestCase(test.NoDBTestCase):
 
     def test_bad_version(self):
         self._test_is_resize("XenServer", "asdf")
+
+
+class SparseCopyTestCase(test.NoDBTestCase):
+    block_size = 4096
+
+    def _make_source(self, path):
+        with open(path, 'w') as f:
+            f.write('a' * self.block_size)
+            f.write('\0' * self.block_size * 3)
+            f.seek(self.block_size * 300, os.SEEK_CUR)
+            f.write('b' * 100 + '\0' * (self.block_size - 100))
+            f.write('c' * 10)
+        return os.path.getsize(path)
+
+    def _test_sparse_copy(self):
+        with utils.tempdir() as tmpdir:
+            src_path = os.path.join(tmpdir, 'src')
+            dst_path = os.path.join(tmpdir, 'dst')
+            size = self._make_source(src_path)
+            # The destination is an attached device, which already exists
+            open(dst_path, 'w').close()
+
+            vm_utils._sparse_copy(src_path, dst_path, size)
+
+            with open(src_path) as src:
+                with open(dst_path) as dst:
+                    self.assertEqual(src.read(), dst.read())
+
+            src = os.open(src_path, os.O_RDONLY)
+            dst = os.open(dst_path, os.O_WRONLY)
+            try:
+                self.assertEqual((size, 303 * self.block_size),
+                                 vm_utils._sparse_copy_fd(src, dst, size,
+                                                          self.block_size))
+            finally:
+                os.close(src)
+                os.close(dst)
+
+    def test_sparse_copy(self):
+        self._test_sparse_copy()
+
+    def test_sparse_copy_small_reads(self):
+        self.stubs.Set(vm_utils, 'SPARSE_COPY_READ_SIZE',
+                       self.block_size * 2)
+        self._test_sparse_copy()
+
+    def test_sparse_copy_without_seek_data(self):
+        self.stubs.Set(vm_utils, 'SEEK_DATA', -1)
+        self._test_sparse_copy()
+
+    def test_sparse_copy_short_source(self):
+        with utils.tempdir() as tmpdir:
+            src_path = os.path.join(tmpdir, 'src')
+            dst_path = os.path.join(tmpdir, 'dst')
+            size = self._make_source(src_path)
+            open(dst_path, 'w').close()
+
+            vm_utils._sparse_copy(src_path, dst_path, size * 2)
+
+            self.assertEqual(size, os.path.getsize(dst_path))
+
+    def test_next_data_extent_no_more_data(self):
+        with mock.patch.object(os, 'lseek',
+                               side_effect=OSError(errno.ENXIO, 'ENXIO')):
+            self.assertEqual((100, 100),
+                             vm_utils._next_data_extent(0, 10, 100, 4))
+
+    def test_next_data_extent_rounded(self):
+        with mock.patch.object(os, 'lseek', side_effect=[9, 13]):
+            self.assertEqual((8, 16),
+                             vm_utils._next_data_extent(0, 4, 100, 4))
@@ -76,6 +76,11 @@ utils_opts = [
                default="/etc/nova/rootwrap.conf",
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run commands as root through a long-lived '
+                     'nova-rootwrap-daemon instead of starting '
+                     'nova-rootwrap for each of them'),
     cfg.StrOpt('tempdir',
                help='Explicitly specify the temporary working directory'),
 ]
@@ -169,17 +174,26 @@ def _get_root_helper():
     return 'sudo nova-rootwrap %s' % CONF.rootwrap_config
 
 
-def execute(*cmd, **kwargs):
-    """Convenience wrapper around oslo's execute() method."""
+def _get_root_helper_daemon():
+    return 'sudo nova-rootwrap-daemon %s' % CONF.rootwrap_config
+
+
+def _set_root_helper(kwargs):
     if 'run_as_root' in kwargs and not 'root_helper' in kwargs:
         kwargs['root_helper'] = _get_root_helper()
+        if CONF.use_rootwrap_daemon:
+            kwargs['root_helper_daemon'] = _get_root_helper_daemon()
+
+
+def execute(*cmd, **kwargs):
+    """Convenience wrapper around oslo's execute() method."""
+    _set_root_helper(kwargs)
     return processutils.execute(*cmd, **kwargs)
 
 
 def trycmd(*args, **kwargs):
     """Convenience wrapper around oslo's trycmd() method."""
-    if 'run_as_root' in kwargs and not 'root_helper' in kwargs:
-        kwargs['root_helper'] = _get_root_helper()
+    _set_root_helper(kwargs)
     return processutils.trycmd(*args, **kwargs)
 
 
@@ -27,6 +27,9 @@ from nova.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Requests sent on idle connections, and sent again if the daemon closed it
+_IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
 
 def filter_data(f):
     """Decorator that post-processes data returned by Docker to avoid any
@@ -85,13 +88,25 @@ class UnixHTTPConnection(httplib.HTTPConnection):
 class DockerHTTPClient(object):
     def __init__(self, connection=None):
         self._connection = connection
+        # Connections to the daemon kept alive between requests
+        self._idle_connections = []
+
+    def _get_connection(self, method):
+        """Returns a connection, and whether it has been used before.
 
-    @property
-    def connection(self):
+        Requests which cannot run twice always get a new connection: an
+        idle one may have been closed by the daemon, and there is no
+        telling whether a request sent on it ran.
+        """
         if self._connection:
-            return self._connection
-        else:
-            return UnixHTTPConnection()
+            return self._connection, False
+        if method in _IDEMPOTENT_METHODS and self._idle_connections:
+            return self._idle_connections.pop(), True
+        return UnixHTTPConnection(), False
+
+    def _close_idle_connections(self):
+        while self._idle_connections:
+            self._idle_connections.pop().close()
 
     def make_request(self, *args, **kwargs):
         headers = {}
@@ -100,9 +115,27 @@ class DockerHTTPClient(object):
         if 'Content-Type' not in headers:
             headers['Content-Type'] = 'application/json'
             kwargs['headers'] = headers
-        conn = self.connection
-        conn.request(*args, **kwargs)
-        return Response(conn.getresponse())
+        method = args[0] if args else kwargs.get('method')
+        conn, reused = self._get_connection(method)
+        try:
+            conn.request(*args, **kwargs)
+            http_response = conn.getresponse()
+        except (httplib.BadStatusLine, socket.error):
+            conn.close()
+            if not reused:
+                raise
+            # The daemon closed the idle connection in the meantime, most
+            # likely because it restarted, which closed the others too.
+            self._close_idle_connections()
+            conn = UnixHTTPConnection()
+            conn.request(*args, **kwargs)
+            http_response = conn.getresponse()
+        # The whole body is read here, so the connection can be used again
+        # once the response is built.
+        response = Response(http_response)
+        if conn is not self._connection and not http_response.will_close:
+            self._idle_connections.append(conn)
+        return response
 
     def list_containers(self, _all=True):
         resp = self.make_request(
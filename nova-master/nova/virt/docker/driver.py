@@ -63,6 +63,10 @@ class DockerDriver(driver.ComputeDriver):
     def __init__(self, virtapi):
         super(DockerDriver, self).__init__(virtapi)
         self._docker = None
+        # Names of the instances of the containers, which are their
+        # hostnames, by container id and the other way around
+        self._container_names = {}
+        self._container_ids = {}
 
     @property
     def docker(self):
@@ -86,14 +90,45 @@ class DockerDriver(driver.ComputeDriver):
             # is huge.
             return False
 
+    def _refresh_container_index(self):
+        """Updates the container index from a single list_containers call.
+
+        Containers keep their hostname for their whole life, so only the
+        ones not indexed yet are inspected. Returns the names of the
+        containers in the order they are listed.
+        """
+        names = []
+        container_names = {}
+        for container in self.docker.list_containers():
+            container_id = container['id']
+            name = self._container_names.get(container_id)
+            if name is None:
+                info = self.docker.inspect_container(container_id)
+                if not info:
+                    continue
+                name = info['Config'].get('Hostname')
+            names.append(name)
+            container_names[container_id] = name
+        self._container_names = container_names
+        self._container_ids = dict((name, container_id) for container_id, name
+                                   in container_names.iteritems())
+        return names
+
+    def _index_container(self, name, container_id):
+        self._container_names[container_id] = name
+        self._container_ids[name] = container_id
+
+    def _unindex_container(self, container_id):
+        name = self._container_names.pop(container_id, None)
+        if self._container_ids.get(name) == container_id:
+            del self._container_ids[name]
+
     def list_instances(self, inspect=False):
+        if not inspect:
+            return self._refresh_container_index()
         res = []
         for container in self.docker.list_containers():
-            info = self.docker.inspect_container(container['id'])
-            if inspect:
-                res.append(info)
-            else:
-                res.append(info['Config'].get('Hostname'))
+            res.append(self.docker.inspect_container(container['id']))
         return res
 
     def plug_vifs(self, instance, network_info):
@@ -107,9 +142,22 @@ class DockerDriver(driver.ComputeDriver):
         raise NotImplementedError(msg)
 
     def find_container_by_name(self, name):
-        for info in self.list_instances(inspect=True):
-            if info['Config'].get('Hostname') == name:
+        """Returns the inspected container of an instance, or {}.
+
+        The container is looked up in the index, which is only refreshed
+        when it does not know the container or is out of date.
+        """
+        for refresh in (False, True):
+            if refresh:
+                self._refresh_container_index()
+            container_id = self._container_ids.get(name)
+            if container_id is None:
+                continue
+            info = self.docker.inspect_container(container_id)
+            if info:
                 return info
+            # The container was destroyed behind our back
+            self._unindex_container(container_id)
         return {}
 
     def get_info(self, instance):
@@ -303,6 +351,7 @@ class DockerDriver(driver.ComputeDriver):
                 raise exception.InstanceDeployFailure(
                     _('Cannot create container'),
                     instance_id=instance['name'])
+        self._index_container(instance['name'], container_id)
         self.docker.start_container(container_id)
         try:
             self._setup_network(instance, network_info)
@@ -318,6 +367,7 @@ class DockerDriver(driver.ComputeDriver):
             return
         self.docker.stop_container(container_id)
         self.docker.destroy_container(container_id)
+        self._unindex_container(container_id)
 
     def reboot(self, context, instance, network_info, reboot_type,
                block_device_info=None, bad_volumes_callback=None):
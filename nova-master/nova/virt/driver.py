@@ -26,6 +26,7 @@ import sys
 
 from oslo.config import cfg
 
+from nova import exception
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
@@ -155,6 +156,28 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_info_for_instances(self, instances):
+        """Get the current status of several instances at once.
+
+        Returns a dict mapping the uuid of each instance found on the
+        hypervisor to the dict get_info() returns for it. Instances that
+        are not found are left out.
+
+        .. note::
+
+            This implementation works for all drivers, but it is
+            not particularly efficient. Maintainers of the virt drivers are
+            encouraged to override this method with something more
+            efficient.
+        """
+        infos = {}
+        for instance in instances:
+            try:
+                infos[instance['uuid']] = self.get_info(instance)
+            except exception.InstanceNotFound:
+                pass
+        return infos
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -987,6 +1010,14 @@ class ComputeDriver(object):
         """
         pass
 
+    def prefetch_image(self, context, image_id):
+        """Download an image to the local image cache in the background.
+
+        So that the first instance using the image on this host doesn't
+        wait for it to be downloaded.
+        """
+        raise NotImplementedError()
+
     def add_to_aggregate(self, context, aggregate, host, **kwargs):
         """Add a compute host to an aggregate."""
         #NOTE(jogo) Currently only used for XenAPI-Pool
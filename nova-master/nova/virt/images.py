@@ -78,7 +78,13 @@ def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0):
     path_tmp = "%s.part" % path
     fetch(context, image_href, path_tmp, user_id, project_id,
           max_size=max_size)
+    fetched_to_raw(image_href, path_tmp, path, max_size=max_size)
 
+
+def fetched_to_raw(image_href, path_tmp, path, max_size=0):
+    """Checks an image fetched to path_tmp and moves it to path, converting
+    it to raw if force_raw_images is set.
+    """
     with fileutils.remove_path_on_error(path_tmp):
         data = qemu_img_info(path_tmp)
 
@@ -0,0 +1,99 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Domain cache.
+
+Keeps the domains the libvirt driver looks up by name, and their XML
+description parsed, until libvirt reports a lifecycle event for them or the
+driver changes them itself.
+"""
+
+from eventlet import patcher
+from lxml import etree
+
+native_threading = patcher.original("threading")
+
+
+class DomainCache(object):
+    """Caches domains and their parsed XML description by domain name.
+
+    Entries are invalidated from the native thread receiving the libvirt
+    events as well as from green threads, so a domain looked up or described
+    while an invalidation happens isn't stored: the cache keeps a generation
+    which every invalidation increments.
+
+    The cache is only used while enabled, that is while the driver receives
+    the lifecycle events of the domains. Otherwise every call goes to
+    libvirt.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Domain name -> {'domain': virDomain, 'doc': parsed XMLDesc(0)}
+        self._entries = {}
+        self._generation = 0
+        self._lock = native_threading.Lock()
+
+    def _get(self, name, key):
+        entry = self._entries.get(name)
+        if entry is not None:
+            return entry.get(key)
+
+    def _store(self, name, generation, key, value):
+        with self._lock:
+            if self.enabled and generation == self._generation:
+                self._entries.setdefault(name, {})[key] = value
+
+    def lookup(self, name, lookup):
+        """Returns the domain called name, from lookup(name) unless cached."""
+        if not self.enabled:
+            return lookup(name)
+        domain = self._get(name, 'domain')
+        if domain is None:
+            generation = self._generation
+            domain = lookup(name)
+            self._store(name, generation, 'domain', domain)
+        return domain
+
+    def get_doc(self, domain):
+        """Returns the parsed XML description of a domain.
+
+        The document is shared by the callers until the domain is
+        invalidated, so it must not be modified.
+        """
+        if not self.enabled:
+            return etree.fromstring(domain.XMLDesc(0))
+        name = domain.name()
+        doc = self._get(name, 'doc')
+        if doc is None:
+            generation = self._generation
+            doc = etree.fromstring(domain.XMLDesc(0))
+            self._store(name, generation, 'doc', doc)
+        return doc
+
+    def invalidate(self, name):
+        """Forgets a domain, after it has changed."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(name, None)
+
+    def reset(self, enabled):
+        """Forgets all the domains, enabling or disabling the cache."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.enabled = enabled
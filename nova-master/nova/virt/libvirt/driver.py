@@ -98,9 +98,11 @@ from nova.virt import event as virtevent
 from nova.virt import firewall
 from nova.virt.libvirt import blockinfo
 from nova.virt.libvirt import config as vconfig
+from nova.virt.libvirt import domaincache
 from nova.virt.libvirt import firewall as libvirt_firewall
 from nova.virt.libvirt import imagebackend
 from nova.virt.libvirt import imagecache
+from nova.virt.libvirt import imageprefetch
 from nova.virt.libvirt import utils as libvirt_utils
 from nova.virt import netutils
 from nova import volume
@@ -379,7 +381,12 @@ class LibvirtDriver(driver.ComputeDriver):
         self._event_queue = None
 
         self._disk_cachemode = None
+        # Instance name -> {disk path: (file identity, disk info)}, so that
+        # disks are only inspected again once their file has changed
+        self._disk_info_cache = {}
+        self._domain_cache = domaincache.DomainCache()
         self.image_cache_manager = imagecache.ImageCacheManager()
+        self.image_prefetcher = imageprefetch.ImagePrefetcher()
         self.image_backend = imagebackend.Backend(CONF.use_cow_images)
 
         self.disk_cachemodes = {}
@@ -500,6 +507,8 @@ class LibvirtDriver(driver.ComputeDriver):
 
         self = opaque
 
+        self._domain_cache.invalidate(dom.name())
+
         uuid = dom.UUIDString()
         transition = None
         if event == libvirt.VIR_DOMAIN_EVENT_STOPPED:
@@ -607,6 +616,10 @@ class LibvirtDriver(driver.ComputeDriver):
     def init_host(self, host):
         libvirt.registerErrorHandler(libvirt_error_handler, None)
         libvirt.virEventRegisterDefaultImpl()
+        # NOTE: events are set up before connecting, so that the domain
+        #       cache is enabled along with the lifecycle events of the
+        #       first connection.
+        self._init_events()
 
         if not self.has_min_version(MIN_LIBVIRT_VERSION):
             major = MIN_LIBVIRT_VERSION[0]
@@ -616,8 +629,6 @@ class LibvirtDriver(driver.ComputeDriver):
                         '%(major)i.%(minor)i.%(micro)i or greater.'),
                       {'major': major, 'minor': minor, 'micro': micro})
 
-        self._init_events()
-
     def _get_new_connection(self):
         # call with _wrapped_conn_lock held
         LOG.debug(_('Connecting to libvirt: %s'), self.uri())
@@ -632,6 +643,7 @@ class LibvirtDriver(driver.ComputeDriver):
             self.set_host_enabled(CONF.host, is_connected)
 
         self._wrapped_conn = wrapped_conn
+        self._domain_cache.reset(False)
 
         try:
             LOG.debug(_("Registering for lifecycle events %s") % str(self))
@@ -640,6 +652,9 @@ class LibvirtDriver(driver.ComputeDriver):
                 libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
                 self._event_lifecycle_callback,
                 self)
+            # Domains are only cached while their lifecycle events are
+            # received, which takes the event loop to be running.
+            self._domain_cache.reset(self._event_queue is not None)
         except Exception as e:
             LOG.warn(_("URI %(uri)s does not support events: %(error)s"),
                      {'uri': self.uri(), 'error': e})
@@ -675,6 +690,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 _error = _("Connection to libvirt lost: %s") % reason
                 LOG.warn(_error)
                 self._wrapped_conn = None
+                self._domain_cache.reset(False)
                 # Disable compute service to avoid
                 # new instances of being scheduled on this host.
                 self.set_host_enabled(CONF.host, _error)
@@ -861,6 +877,8 @@ class LibvirtDriver(driver.ComputeDriver):
                                     'Code=%(errcode)s Error=%(e)s'),
                                   {'errcode': errcode, 'e': e},
                                   instance=instance)
+            # The domain has another ID once destroyed
+            self._domain_cache.invalidate(instance['name'])
 
         def _wait_for_destroy(expected_domid):
             """Called at an interval until the VM is gone."""
@@ -908,6 +926,7 @@ class LibvirtDriver(driver.ComputeDriver):
                       destroy_disks)
 
     def _undefine_domain(self, instance):
+        self._disk_info_cache.pop(instance['name'], None)
         try:
             virt_dom = self._lookup_by_name(instance['name'])
         except exception.InstanceNotFound:
@@ -937,6 +956,7 @@ class LibvirtDriver(driver.ComputeDriver):
                     LOG.error(_('Error from libvirt during undefine. '
                                 'Code=%(errcode)s Error=%(e)s') %
                               {'errcode': errcode, 'e': e}, instance=instance)
+            self._domain_cache.invalidate(instance['name'])
 
     def _cleanup(self, context, instance, network_info, block_device_info,
                  destroy_disks):
@@ -1180,6 +1200,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 encryptor.attach_volume(context, **encryption)
 
             virt_dom.attachDeviceFlags(conf.to_xml(), flags)
+            self._domain_cache.invalidate(instance_name)
         except Exception as ex:
             if isinstance(ex, libvirt.libvirtError):
                 errcode = ex.get_error_code()
@@ -1227,6 +1248,7 @@ class LibvirtDriver(driver.ComputeDriver):
                                  libvirt.VIR_DOMAIN_BLOCK_JOB_ABORT_PIVOT)
         finally:
             self._conn.defineXML(xml)
+            self._invalidate_domain(domain)
 
     def swap_volume(self, old_connection_info,
                     new_connection_info, instance, mountpoint):
@@ -1302,6 +1324,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 if state == power_state.RUNNING:
                     flags |= libvirt.VIR_DOMAIN_AFFECT_LIVE
                 virt_dom.detachDeviceFlags(xml, flags)
+                self._domain_cache.invalidate(instance_name)
 
                 if encryption:
                     # The volume must be detached from the VM before
@@ -1340,6 +1363,7 @@ class LibvirtDriver(driver.ComputeDriver):
             if state == power_state.RUNNING:
                 flags |= libvirt.VIR_DOMAIN_AFFECT_LIVE
             virt_dom.attachDeviceFlags(cfg.to_xml(), flags)
+            self._domain_cache.invalidate(instance['name'])
         except libvirt.libvirtError:
             LOG.error(_('attaching network adapter failed.'),
                      instance=instance)
@@ -1359,6 +1383,7 @@ class LibvirtDriver(driver.ComputeDriver):
             if state == power_state.RUNNING:
                 flags |= libvirt.VIR_DOMAIN_AFFECT_LIVE
             virt_dom.detachDeviceFlags(cfg.to_xml(), flags)
+            self._domain_cache.invalidate(instance['name'])
         except libvirt.libvirtError as ex:
             error_code = ex.get_error_code()
             if error_code == libvirt.VIR_ERR_NO_DOMAIN:
@@ -1583,6 +1608,7 @@ class LibvirtDriver(driver.ComputeDriver):
             libvirt_utils.chown(disk_delta, os.getuid())
         finally:
             self._conn.defineXML(xml)
+            self._invalidate_domain(domain)
 
         # Convert the delta (CoW) image with a backing file to a flat
         # image with no backing file.
@@ -1751,6 +1777,8 @@ class LibvirtDriver(driver.ComputeDriver):
                 LOG.exception(msg)
                 self._volume_snapshot_update_status(
                     context, snapshot_id, 'error')
+        finally:
+            self._domain_cache.invalidate(instance['name'])
 
         self._volume_snapshot_update_status(
             context, snapshot_id, 'creating')
@@ -1888,6 +1916,8 @@ class LibvirtDriver(driver.ComputeDriver):
                 LOG.exception(msg)
                 self._volume_snapshot_update_status(
                     context, snapshot_id, 'error_deleting')
+        finally:
+            self._domain_cache.invalidate(instance['name'])
 
         self._volume_snapshot_update_status(context, snapshot_id, 'deleting')
 
@@ -1938,6 +1968,8 @@ class LibvirtDriver(driver.ComputeDriver):
         self._prepare_pci_devices_for_use(
             pci_manager.get_instance_pci_devs(instance))
         for x in xrange(CONF.libvirt.wait_soft_reboot_seconds):
+            # The domain has another ID once the guest has shut down
+            self._domain_cache.invalidate(instance["name"])
             dom = self._lookup_by_name(instance["name"])
             (state, _max_mem, _mem, _cpus, _t) = dom.info()
             state = LIBVIRT_POWER_STATE[state]
@@ -2060,6 +2092,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._detach_pci_devices(dom,
             pci_manager.get_instance_pci_devs(instance))
         dom.managedSave(0)
+        self._domain_cache.invalidate(instance['name'])
 
     def resume(self, context, instance, network_info, block_device_info=None):
         """resume the specified instance."""
@@ -2653,6 +2686,7 @@ class LibvirtDriver(driver.ComputeDriver):
             for dev in pci_devs:
                 dom.detachDeviceFlags(self.get_guest_pci_device(dev).to_xml(),
                                             libvirt.VIR_DOMAIN_AFFECT_LIVE)
+                self._invalidate_domain(dom)
                 # after detachDeviceFlags returned, we should check the dom to
                 # ensure the detaching is finished
                 xml = dom.XMLDesc(0)
@@ -2682,6 +2716,7 @@ class LibvirtDriver(driver.ComputeDriver):
         try:
             for dev in pci_devs:
                 dom.attachDevice(self.get_guest_pci_device(dev).to_xml())
+                self._invalidate_domain(dom)
 
         except libvirt.libvirtError:
             LOG.error(_('Attaching PCI devices %(dev)s to %(dom)s failed.')
@@ -3294,8 +3329,11 @@ class LibvirtDriver(driver.ComputeDriver):
         relevant nova exceptions should be raised in response.
 
         """
+        def lookup(name):
+            return self._conn.lookupByName(name)
+
         try:
-            return self._conn.lookupByName(instance_name)
+            return self._domain_cache.lookup(instance_name, lookup)
         except libvirt.libvirtError as ex:
             error_code = ex.get_error_code()
             if error_code == libvirt.VIR_ERR_NO_DOMAIN:
@@ -3308,6 +3346,11 @@ class LibvirtDriver(driver.ComputeDriver):
                     'ex': ex})
             raise exception.NovaException(msg)
 
+    def _invalidate_domain(self, domain):
+        """Drops a domain the driver has changed from the domain cache."""
+        if self._domain_cache.enabled:
+            self._domain_cache.invalidate(domain.name())
+
     def get_info(self, instance):
         """Retrieve information from libvirt for a specific instance name.
 
@@ -3362,6 +3405,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 LOG.error(_("An error occurred while trying to define a domain"
                             " with xml: %s") % xml)
                 raise e
+            self._invalidate_domain(domain)
 
         if power_on:
             try:
@@ -3371,6 +3415,8 @@ class LibvirtDriver(driver.ComputeDriver):
                     LOG.error(_("An error occurred while trying to launch a "
                                 "defined domain with xml: %s") %
                               domain.XMLDesc(0))
+            finally:
+                self._invalidate_domain(domain)
 
         try:
             self._enable_hairpin(domain.XMLDesc(0))
@@ -3440,7 +3486,7 @@ class LibvirtDriver(driver.ComputeDriver):
         for dom_id in self.list_instance_ids():
             try:
                 domain = self._lookup_by_id(dom_id)
-                doc = etree.fromstring(domain.XMLDesc(0))
+                doc = self._domain_cache.get_doc(domain)
             except exception.InstanceNotFound:
                 LOG.info(_("libvirt can't find a domain with id: %s") % dom_id)
                 continue
@@ -3462,10 +3508,11 @@ class LibvirtDriver(driver.ComputeDriver):
         Returns a list of all block devices for this domain.
         """
         domain = self._lookup_by_name(instance_name)
-        xml = domain.XMLDesc(0)
 
         try:
-            doc = etree.fromstring(xml)
+            doc = self._domain_cache.get_doc(domain)
+        except libvirt.libvirtError:
+            raise
         except Exception:
             return []
 
@@ -4233,6 +4280,8 @@ class LibvirtDriver(driver.ComputeDriver):
 
         def wait_for_live_migration():
             """waiting for live migration completion."""
+            # The domain is gone from here once migrated
+            self._domain_cache.invalidate(instance['name'])
             try:
                 self.get_info(instance)['state']
             except exception.InstanceNotFound:
@@ -4418,6 +4467,7 @@ class LibvirtDriver(driver.ComputeDriver):
             # included in to_xml() result.
             dom = self._lookup_by_name(instance["name"])
             self._conn.defineXML(dom.XMLDesc(0))
+            self._domain_cache.invalidate(instance["name"])
 
     def get_instance_disk_info(self, instance_name, xml=None,
                                block_device_info=None):
@@ -4441,7 +4491,7 @@ class LibvirtDriver(driver.ComputeDriver):
         if xml is None:
             try:
                 virt_dom = self._lookup_by_name(instance_name)
-                xml = virt_dom.XMLDesc(0)
+                doc = self._domain_cache.get_doc(virt_dom)
             except libvirt.libvirtError as ex:
                 error_code = ex.get_error_code()
                 msg = (_('Error from libvirt while getting description of '
@@ -4452,6 +4502,8 @@ class LibvirtDriver(driver.ComputeDriver):
                         'ex': ex})
                 LOG.warn(msg)
                 raise exception.InstanceNotFound(instance_id=instance_name)
+        else:
+            doc = etree.fromstring(xml)
 
         # NOTE (rmk): When block_device_info is provided, we will use it to
         #             filter out devices which are actually volumes.
@@ -4464,7 +4516,8 @@ class LibvirtDriver(driver.ComputeDriver):
             volume_devices.add(disk_dev)
 
         disk_info = []
-        doc = etree.fromstring(xml)
+        cached_disks = self._disk_info_cache.get(instance_name, {})
+        disks = {}
         disk_nodes = doc.findall('.//devices/disk')
         path_nodes = doc.findall('.//devices/disk/source')
         driver_nodes = doc.findall('.//devices/disk/driver')
@@ -4491,30 +4544,43 @@ class LibvirtDriver(driver.ComputeDriver):
 
             # get the real disk size or
             # raise a localized error if image is unavailable
-            dk_size = int(os.path.getsize(path))
+            stat = os.stat(path)
+            identity = (stat.st_ino, stat.st_size, stat.st_mtime)
 
             disk_type = driver_nodes[cnt].get('type')
-            if disk_type == "qcow2":
-                backing_file = libvirt_utils.get_disk_backing_file(path)
-                virt_size = disk.get_disk_size(path)
-                over_commit_size = int(virt_size) - dk_size
+            cached = cached_disks.get(path)
+            if (cached and cached[0] == identity and
+                    cached[1]['type'] == disk_type):
+                info = cached[1]
             else:
-                backing_file = ""
-                virt_size = dk_size
-                over_commit_size = 0
-
-            disk_info.append({'type': disk_type,
-                              'path': path,
-                              'virt_disk_size': virt_size,
-                              'backing_file': backing_file,
-                              'disk_size': dk_size,
-                              'over_committed_disk_size': over_commit_size})
+                dk_size = int(stat.st_size)
+                if disk_type == "qcow2":
+                    backing_file = libvirt_utils.get_disk_backing_file(path)
+                    virt_size = disk.get_disk_size(path)
+                    over_commit_size = int(virt_size) - dk_size
+                else:
+                    backing_file = ""
+                    virt_size = dk_size
+                    over_commit_size = 0
+
+                info = {'type': disk_type,
+                        'path': path,
+                        'virt_disk_size': virt_size,
+                        'backing_file': backing_file,
+                        'disk_size': dk_size,
+                        'over_committed_disk_size': over_commit_size}
+            disks[path] = (identity, info)
+            disk_info.append(info)
+        self._disk_info_cache[instance_name] = disks
         return jsonutils.dumps(disk_info)
 
     def get_disk_over_committed_size_total(self):
         """Return total over committed disk size for all instances."""
         # Disk size that all instance uses : virtual_size - disk_size
         instances_name = self.list_instances()
+        # Forget the disks of the instances which are gone
+        for i_name in set(self._disk_info_cache) - set(instances_name):
+            del self._disk_info_cache[i_name]
         disk_over_committed_size = 0
         for i_name in instances_name:
             try:
@@ -4568,6 +4634,10 @@ class LibvirtDriver(driver.ComputeDriver):
         """Manage the local cache of images."""
         self.image_cache_manager.update(context, all_instances)
 
+    def prefetch_image(self, context, image_id):
+        """Download an image to the local cache of images."""
+        self.image_prefetcher.prefetch(context, image_id)
+
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize,
                                   shared_storage=False):
         """Used only for cleanup in case migrate_disk_and_power_off fails."""
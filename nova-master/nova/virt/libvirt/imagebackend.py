@@ -174,6 +174,10 @@ class Image(object):
         """
         @utils.synchronized(filename, external=True, lock_path=self.lock_path)
         def fetch_func_sync(target, *args, **kwargs):
+            # The template may have been fetched while waiting for the lock,
+            # by another instance or by the image prefetcher.
+            if target == base and os.path.exists(target):
+                return
             fetch_func(target=target, *args, **kwargs)
 
         base_dir = os.path.join(CONF.instances_path,
@@ -75,6 +75,9 @@ CONF.register_opts(imagecache_opts, 'libvirt')
 CONF.import_opt('instances_path', 'nova.compute.manager')
 CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
 
+# Suffix of the images being downloaded by the image prefetcher
+PARTIAL_SUFFIX = '.prefetch'
+
 
 def get_cache_fname(images, key):
     """Return a filename based on the SHA1 hash of a given image ID.
@@ -256,6 +259,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.originals = []
         self.removable_base_files = []
         self.unexplained_images = []
+        self.partial_images = []
 
     def _store_image(self, base_dir, ent, original=False):
         """Store a base image for later examination."""
@@ -283,6 +287,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                   not is_valid_info_file(os.path.join(base_dir, ent))):
                 self._store_image(base_dir, ent, original=False)
 
+            elif (len(ent) == digest_size + len(PARTIAL_SUFFIX) and
+                  ent.endswith(PARTIAL_SUFFIX)):
+                self.partial_images.append(os.path.join(base_dir, ent))
+
         return {'unexplained_images': self.unexplained_images,
                 'originals': self.originals}
 
@@ -454,6 +462,24 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                           {'base_file': base_file,
                            'error': e})
 
+    def _remove_partial_image(self, partial_image):
+        """Remove an image prefetch left unfinished if it is old enough.
+
+        A download in progress keeps writing to it, while the partial image
+        of a failed one is kept for the next prefetch of the image to resume.
+        """
+        age = time.time() - os.path.getmtime(partial_image)
+        if age < CONF.remove_unused_original_minimum_age_seconds:
+            return
+        LOG.info(_('Removing partial image: %s'), partial_image)
+        try:
+            os.remove(partial_image)
+        except OSError as e:
+            LOG.error(_('Failed to remove %(partial_image)s, '
+                        'error was %(error)s'),
+                      {'partial_image': partial_image,
+                       'error': e})
+
     def _handle_base_image(self, img_id, base_file):
         """Handle the checks for a single base image."""
 
@@ -565,6 +591,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 for base_file in self.removable_base_files:
                     self._remove_base_file(base_file)
 
+        if self.remove_unused_base_images:
+            for partial_image in self.partial_images:
+                self._remove_partial_image(partial_image)
+
         # That's it
         LOG.debug(_('Verification complete'))
 
@@ -0,0 +1,211 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Image prefetch.
+
+Downloads images to the image cache of a compute host before the first
+instance using them is spawned there, to the same base files as
+Image.cache(), so that instances and the image cache manager use them like
+any other base file.
+"""
+
+import hashlib
+import os
+import time
+
+from eventlet import greenpool
+from eventlet import greenthread
+from oslo.config import cfg
+
+from nova import exception
+from nova.image import glance
+from nova.openstack.common import fileutils
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from nova import unit
+from nova import utils
+from nova.virt import images
+from nova.virt.libvirt import imagecache
+
+LOG = logging.getLogger(__name__)
+
+imageprefetch_opts = [
+    cfg.IntOpt('image_prefetch_workers',
+               default=2,
+               help='Number of images prefetched at the same time'),
+    cfg.IntOpt('image_prefetch_bandwidth',
+               default=0,
+               help='Bandwidth used by the images being prefetched, in '
+                    'kilobytes per second. 0 means unlimited'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(imageprefetch_opts, 'libvirt')
+CONF.import_opt('instances_path', 'nova.compute.manager')
+CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
+
+# Suffix of the image being downloaded, kept when the download fails so the
+# next prefetch of the image resumes it, until the image cache manager
+# removes it
+PARTIAL_SUFFIX = imagecache.PARTIAL_SUFFIX
+# Partial images are read this many bytes at a time to resume downloads
+CHUNK_SIZE = 64 * unit.Ki
+
+
+class Throttle(object):
+    """Limits the bandwidth of the downloads sharing it."""
+
+    def __init__(self, rate):
+        # Bytes per second, 0 for unlimited
+        self.rate = rate
+        self._next = 0
+
+    def consume(self, size):
+        """Sleeps until size bytes more can be downloaded."""
+        if not self.rate:
+            return
+        now = time.time()
+        self._next = max(self._next, now) + float(size) / self.rate
+        greenthread.sleep(self._next - now)
+
+
+class _PartialImageWriter(object):
+    """Writes image data after the part of it already downloaded."""
+
+    def __init__(self, image_file, offset, checksum, throttle):
+        self.image_file = image_file
+        self.skip = offset
+        self.checksum = checksum
+        self.throttle = throttle
+
+    def write(self, data):
+        if self.skip:
+            skipped = min(self.skip, len(data))
+            self.skip -= skipped
+            data = data[skipped:]
+            if not data:
+                return
+        self.throttle.consume(len(data))
+        self.checksum.update(data)
+        self.image_file.write(data)
+
+
+class ImagePrefetcher(object):
+    """Downloads images to the image cache in the background.
+
+    At most image_prefetch_workers images are downloaded at the same time,
+    using at most image_prefetch_bandwidth between them. An image is
+    downloaded to a partial file which is kept if the download fails, and
+    is verified against the checksum of the image before being used.
+    """
+
+    def __init__(self):
+        self._pool = greenpool.GreenPool(CONF.libvirt.image_prefetch_workers)
+        self._throttle = Throttle(CONF.libvirt.image_prefetch_bandwidth *
+                                  unit.Ki)
+        self._prefetching = set()
+
+    def _base_path(self, image_id):
+        filename = imagecache.get_cache_fname({'image_id': image_id},
+                                              'image_id')
+        return os.path.join(CONF.instances_path,
+                            CONF.image_cache_subdirectory_name, filename)
+
+    def prefetch(self, context, image_id):
+        """Starts prefetching an image, unless it is already cached."""
+        if image_id in self._prefetching:
+            return
+        if os.path.exists(self._base_path(image_id)):
+            LOG.debug(_('Image %s is already cached'), image_id)
+            return
+        self._prefetching.add(image_id)
+        self._pool.spawn_n(self._prefetch, context, image_id)
+
+    def wait(self):
+        """Waits for the images being prefetched."""
+        self._pool.waitall()
+
+    def _prefetch(self, context, image_id):
+        try:
+            self.fetch(context, image_id)
+        except Exception:
+            LOG.exception(_('Failed to prefetch image %s'), image_id)
+        finally:
+            self._prefetching.discard(image_id)
+
+    def fetch(self, context, image_id):
+        """Downloads an image to its base file."""
+        base = self._base_path(image_id)
+
+        # The lock of Image.cache(), so that an instance spawned meanwhile
+        # waits for the image rather than fetching it too
+        @utils.synchronized(os.path.basename(base), external=True,
+                            lock_path=os.path.join(CONF.instances_path,
+                                                   'locks'))
+        def fetch_sync():
+            if os.path.exists(base):
+                return
+            LOG.info(_('Prefetching image %s'), image_id)
+            partial = base + PARTIAL_SUFFIX
+            self._download(context, image_id, partial)
+            images.fetched_to_raw(image_id, partial, base)
+            LOG.info(_('Prefetched image %s'), image_id)
+
+        fileutils.ensure_tree(os.path.dirname(base))
+        fetch_sync()
+
+    def _download(self, context, image_href, path):
+        (image_service, image_id) = glance.get_remote_image_service(
+            context, image_href)
+        image_meta = image_service.show(context, image_id)
+
+        checksum = hashlib.md5()
+        offset = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as image_file:
+                for data in iter(lambda: image_file.read(CHUNK_SIZE), ''):
+                    checksum.update(data)
+                    offset += len(data)
+            LOG.debug(_('Resuming the download of image %(image)s after '
+                        '%(offset)d bytes'),
+                      {'image': image_href, 'offset': offset})
+
+        # Glance can't send part of an image: the part already downloaded
+        # is downloaded again, but isn't written or throttled again.
+        with open(path, 'ab') as image_file:
+            writer = _PartialImageWriter(image_file, offset, checksum,
+                                         self._throttle)
+            image_service.download(context, image_id, data=writer)
+
+        size = os.path.getsize(path)
+        expected = image_meta.get('size')
+        if expected is not None and size != int(expected):
+            os.unlink(path)
+            raise exception.ImageUnacceptable(
+                image_id=image_href,
+                reason=_('size %(size)d of the downloaded image is not '
+                         '%(expected)s') %
+                       {'size': size, 'expected': expected})
+        expected = image_meta.get('checksum')
+        if expected and checksum.hexdigest() != expected:
+            os.unlink(path)
+            raise exception.ImageUnacceptable(
+                image_id=image_href,
+                reason=_('checksum %(checksum)s of the downloaded image '
+                         'is not %(expected)s') %
+                       {'checksum': checksum.hexdigest(),
+                        'expected': expected})
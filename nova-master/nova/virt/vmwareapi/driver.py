@@ -226,6 +226,12 @@ class VMwareESXDriver(driver.ComputeDriver):
         """Return info about the VM instance."""
         return self._vmops.get_info(instance)
 
+    def get_info_for_instances(self, instances):
+        """Return info about the VMs of the instances, keyed by uuid."""
+        # All the VMs of the inventory are looked at, whatever the
+        # cluster of the vmops.
+        return self._vmops.get_info_for_instances(instances)
+
     def get_diagnostics(self, instance):
         """Return data about VM diagnostics."""
         return self._vmops.get_diagnostics(instance)
@@ -716,6 +722,7 @@ class VMwareAPISession(object):
         self._scheme = scheme
         self._session_id = None
         self.vim = None
+        self.vm_ref_cache = vm_util.VMRefCache(self)
         self._create_session()
 
     def _get_vim_object(self):
@@ -813,6 +820,11 @@ class VMwareAPISession(object):
                     last_fault_list = excep.fault_list
                     self._create_session()
                 else:
+                    # A VM may have been destroyed behind our back, don't
+                    # keep handing out its reference.
+                    if (error_util.FAULT_MANAGED_OBJECT_NOT_FOUND in
+                            excep.fault_list):
+                        self.vm_ref_cache.invalidate()
                     # No re-trying for errors for API call has gone through
                     # and is the caller's fault. Caller should handle these
                     # errors. e.g, InvalidArgument fault.
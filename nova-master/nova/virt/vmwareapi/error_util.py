@@ -25,6 +25,7 @@ from nova.openstack.common.gettextutils import _
 
 FAULT_NOT_AUTHENTICATED = "NotAuthenticated"
 FAULT_ALREADY_EXISTS = "AlreadyExists"
+FAULT_MANAGED_OBJECT_NOT_FOUND = "ManagedObjectNotFound"
 
 
 class VimException(Exception):
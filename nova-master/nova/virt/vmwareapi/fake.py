@@ -34,7 +34,8 @@ from nova.virt.vmwareapi import error_util
 
 _CLASSES = ['Datacenter', 'Datastore', 'ResourcePool', 'VirtualMachine',
             'Network', 'HostSystem', 'HostNetworkSystem', 'Task', 'session',
-            'files', 'ClusterComputeResource', 'HostStorageSystem']
+            'files', 'ClusterComputeResource', 'HostStorageSystem',
+            'PropertyCollector']
 
 _FAKE_FILE_SIZE = 1024
 
@@ -190,6 +191,63 @@ class ObjectContent(object):
             self.missingSet = missing_list
 
 
+class PropertyFilter(object):
+    """Filter of a property collector, see FakeVim._wait_for_updates()."""
+
+    def __init__(self, spec):
+        self.obj = ManagedObjectReference("PropertyFilter")
+        self.spec = spec
+        # Object reference -> values of the properties last reported
+        self.reported = {}
+
+    def _collect(self):
+        prop_spec = self.spec.propSet[0]
+        properties = prop_spec.pathSet
+        if not isinstance(properties, list):
+            properties = properties.split()
+        objects = {}
+        for obj_spec in self.spec.objectSet:
+            if obj_spec.obj == "RootFolder":
+                mdo_refs = _db_content[prop_spec.type].keys()
+            else:
+                mdo_refs = [obj_spec.obj]
+            for mdo_ref in mdo_refs:
+                mdo = _db_content[prop_spec.type].get(mdo_ref)
+                if mdo is not None:
+                    objects[mdo_ref] = [(prop_name, mdo.get(prop_name))
+                                        for prop_name in properties]
+        return objects
+
+    def get_updates(self):
+        """Returns the ObjectUpdates since the last call."""
+        objects = self._collect()
+        object_updates = []
+        for mdo_ref, values in objects.items():
+            reported = self.reported.get(mdo_ref)
+            if reported == values:
+                continue
+            object_update = DataObject()
+            object_update.kind = 'enter' if reported is None else 'modify'
+            object_update.obj = mdo_ref
+            object_update.changeSet = []
+            for prop_name, val in values:
+                if reported is None or (prop_name, val) not in reported:
+                    change = DataObject()
+                    change.name = prop_name
+                    change.op = 'assign'
+                    change.val = val
+                    object_update.changeSet.append(change)
+            object_updates.append(object_update)
+        for mdo_ref in self.reported:
+            if mdo_ref not in objects:
+                object_update = DataObject()
+                object_update.kind = 'leave'
+                object_update.obj = mdo_ref
+                object_updates.append(object_update)
+        self.reported = objects
+        return object_updates
+
+
 class ManagedObject(object):
     """Managed Object base class."""
     _counter = 0
@@ -1106,6 +1164,44 @@ class FakeVim(object):
                 continue
         return lst_ret_objs
 
+    def _create_property_collector(self, method, *args, **kwargs):
+        """Creates a property collector without any filter."""
+        collector = ManagedObjectReference("PropertyCollector")
+        _db_content["PropertyCollector"][collector] = []
+        return collector
+
+    def _destroy_property_collector(self, method, collector):
+        """Destroys a property collector and its filters."""
+        del _db_content["PropertyCollector"][collector]
+
+    def _create_filter(self, method, collector, spec=None, **kwargs):
+        """Adds a filter to a property collector."""
+        property_filter = PropertyFilter(spec)
+        _db_content["PropertyCollector"][collector].append(property_filter)
+        return property_filter.obj
+
+    def _wait_for_updates(self, method, collector, version=None,
+                          options=None):
+        """
+        Returns the changes of the objects and properties of the filters
+        of the collector since the last call, whatever the version.
+        """
+        filter_set = []
+        for property_filter in _db_content["PropertyCollector"][collector]:
+            object_updates = property_filter.get_updates()
+            if object_updates:
+                filter_update = DataObject()
+                filter_update.filter = property_filter.obj
+                filter_update.objectSet = object_updates
+                filter_set.append(filter_update)
+        if not filter_set:
+            return None
+        update_set = DataObject()
+        update_set.version = str(int(version or 0) + 1)
+        update_set.filterSet = filter_set
+        update_set.truncated = False
+        return update_set
+
     def _add_port_group(self, method, *args, **kwargs):
         """Adds a port group to the host system."""
         _host_sk = _db_content["HostSystem"].keys()[0]
@@ -1182,6 +1278,18 @@ class FakeVim(object):
         elif attr_name == "CancelRetrievePropertiesEx":
             return lambda *args, **kwargs: self._retrieve_properties_cancel(
                                                 attr_name, *args, **kwargs)
+        elif attr_name == "CreatePropertyCollector":
+            return lambda *args, **kwargs: self._create_property_collector(
+                                                attr_name, *args, **kwargs)
+        elif attr_name == "DestroyPropertyCollector":
+            return lambda *args, **kwargs: self._destroy_property_collector(
+                                                attr_name, *args, **kwargs)
+        elif attr_name == "CreateFilter":
+            return lambda *args, **kwargs: self._create_filter(attr_name,
+                                                *args, **kwargs)
+        elif attr_name == "WaitForUpdatesEx":
+            return lambda *args, **kwargs: self._wait_for_updates(attr_name,
+                                                *args, **kwargs)
         elif attr_name == "AcquireCloneTicket":
             return lambda *args, **kwargs: self._just_return()
         elif attr_name == "AddPortGroup":
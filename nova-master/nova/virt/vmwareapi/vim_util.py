@@ -232,6 +232,48 @@ def continue_to_get_objects(vim, token):
             token=token)
 
 
+def create_property_collector(vim):
+    """Creates a property collector of our own, to hold filters."""
+    return vim.CreatePropertyCollector(
+            vim.get_service_content().propertyCollector)
+
+
+def destroy_property_collector(vim, collector):
+    """Destroys a property collector and its filters."""
+    return vim.DestroyPropertyCollector(collector)
+
+
+def create_filter(vim, collector, type, properties_to_collect):
+    """
+    Creates a filter on the properties of all the objects of the type
+    specified, whose changes are then returned by wait_for_updates().
+    """
+    client_factory = vim.client.factory
+    object_spec = build_object_spec(client_factory,
+                        vim.get_service_content().rootFolder,
+                        [build_recursive_traversal_spec(client_factory)])
+    property_spec = build_property_spec(client_factory, type=type,
+                                properties_to_collect=properties_to_collect)
+    property_filter_spec = build_property_filter_spec(client_factory,
+                                [property_spec],
+                                [object_spec])
+    return vim.CreateFilter(collector, spec=property_filter_spec,
+                            partialUpdates=False)
+
+
+def wait_for_updates(vim, collector, version):
+    """
+    Gets the changes to the filtered properties since the version
+    specified, without waiting for new ones. All the properties are
+    returned as changes for an empty version. None means no change.
+    """
+    client_factory = vim.client.factory
+    options = client_factory.create('ns0:WaitOptions')
+    options.maxWaitSeconds = 0
+    options.maxObjectUpdates = CONF.vmware.maximum_objects
+    return vim.WaitForUpdatesEx(collector, version=version, options=options)
+
+
 def get_prop_spec(client_factory, spec_type, properties):
     """Builds the Property Spec Object."""
     prop_spec = client_factory.create('ns0:PropertySpec')
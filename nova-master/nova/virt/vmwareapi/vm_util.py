@@ -23,10 +23,13 @@ The VMware API VM utility module to build SOAP object specs.
 import collections
 import copy
 
+from eventlet import semaphore
+
 from nova import exception
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
 from nova import unit
+from nova.virt.vmwareapi import error_util
 from nova.virt.vmwareapi import vim_util
 
 LOG = logging.getLogger(__name__)
@@ -655,11 +658,129 @@ def get_vm_ref_from_uuid(session, instance_uuid):
                                     _get_object_for_value)
 
 
+class VMRefCache(object):
+    """
+    Maps the names of all the VMs to their managed object references.
+
+    Looking up a VM by name means retrieving the name of every VM of the
+    inventory. Instead, a filter on the names of the VMs is set up on a
+    property collector of our own: the first lookup gets all of them, and
+    the following ones only the VMs that were created, destroyed or
+    renamed since, through WaitForUpdatesEx. References found in the map
+    are returned without calling the server at all, so operations which
+    create, destroy or rename a VM must call invalidate() for the next
+    lookup to fetch the changes.
+
+    The cache is shared by all the greenthreads of the driver, and only one
+    of them refreshes it at a time.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self._lock = semaphore.Semaphore()
+        self._session_id = None
+        self._collector = None
+        self._version = None
+        self._dirty = True
+        # VM name -> reference, and reference value -> VM name
+        self._refs = {}
+        self._names = {}
+
+    def invalidate(self):
+        """Fetches the changes on the next lookup."""
+        self._dirty = True
+
+    def _reset(self):
+        self._refs.clear()
+        self._names.clear()
+        self._version = ''
+        self._session_id = self._session._session_id
+        self._collector = self._session._call_method(
+                vim_util, "create_property_collector")
+        self._session._call_method(vim_util, "create_filter",
+                                   self._collector, "VirtualMachine",
+                                   ["name"])
+
+    def _discard(self):
+        collector, self._collector = self._collector, None
+        if (collector is not None and
+                self._session_id == self._session._session_id):
+            try:
+                self._session._call_method(vim_util,
+                                           "destroy_property_collector",
+                                           collector)
+            except Exception as e:
+                LOG.debug(e)
+
+    def _remove(self, value):
+        name = self._names.pop(value, None)
+        vm_ref = self._refs.get(name)
+        if vm_ref is not None and vm_ref.value == value:
+            del self._refs[name]
+
+    def _apply(self, object_update):
+        vm_ref = object_update.obj
+        self._remove(vm_ref.value)
+        if object_update.kind == 'leave':
+            return
+        for change in getattr(object_update, 'changeSet', []):
+            if change.name == 'name':
+                self._names[vm_ref.value] = change.val
+                self._refs[change.val] = vm_ref
+
+    def _fetch_updates(self):
+        # The collector goes away with the session it was created in.
+        if (self._collector is None or
+                self._session_id != self._session._session_id):
+            self._reset()
+        while True:
+            update_set = self._session._call_method(
+                    vim_util, "wait_for_updates", self._collector,
+                    self._version)
+            if not update_set:
+                break
+            self._version = update_set.version
+            for filter_update in update_set.filterSet:
+                for object_update in filter_update.objectSet:
+                    self._apply(object_update)
+            if not getattr(update_set, 'truncated', False):
+                break
+
+    def _refresh(self):
+        # Invalidations made while fetching are fetched the next time
+        self._dirty = False
+        try:
+            try:
+                self._fetch_updates()
+            except (error_util.VimException,
+                    error_util.VimFaultException) as e:
+                LOG.debug(_("Reloading the VM references: %s"), e)
+                self._discard()
+                self._fetch_updates()
+        except Exception:
+            self._dirty = True
+            raise
+
+    def refresh(self):
+        """Fetches the VMs created, destroyed or renamed since last time."""
+        with self._lock:
+            self._refresh()
+
+    def get(self, vm_name):
+        """Returns the reference of the VM named vm_name, or None."""
+        if self._dirty or vm_name not in self._refs:
+            with self._lock:
+                # It may have been refreshed while waiting for the lock
+                if self._dirty or vm_name not in self._refs:
+                    self._refresh()
+        return self._refs.get(vm_name)
+
+
 def get_vm_ref(session, instance):
     """Get reference to the VM through uuid or vm name."""
-    vm_ref = get_vm_ref_from_uuid(session, instance['uuid'])
+    vm_ref = session.vm_ref_cache.get(instance['uuid'])
     if not vm_ref:
-        vm_ref = get_vm_ref_from_name(session, instance['name'])
+        vm_ref = session.vm_ref_cache.get(instance['name'])
     if vm_ref is None:
         raise exception.InstanceNotFound(instance_id=instance['uuid'])
     return vm_ref
@@ -296,7 +296,7 @@ class VMwareVMOps(object):
                                     self._session._get_vim(),
                                     "CreateVM_Task", dc_info.vmFolder,
                                     config=config_spec, pool=res_pool_ref)
-            self._session._wait_for_task(instance['uuid'], vm_create_task)
+            self._wait_for_vm_task(instance['uuid'], vm_create_task)
 
             LOG.debug(_("Created VM on the ESX host"), instance=instance)
 
@@ -887,7 +887,7 @@ class VMwareVMOps(object):
                 destroy_task = self._session._call_method(
                     self._session._get_vim(),
                     "Destroy_Task", vm_ref)
-                self._session._wait_for_task(instance['uuid'], destroy_task)
+                self._wait_for_vm_task(instance['uuid'], destroy_task)
                 LOG.debug(_("Destroyed the VM"), instance=instance)
             except Exception as excep:
                 LOG.warn(_("In vmwareapi:vmops:delete, got this exception"
@@ -932,6 +932,7 @@ class VMwareVMOps(object):
                 LOG.debug(_("Unregistering the VM"), instance=instance)
                 self._session._call_method(self._session._get_vim(),
                                            "UnregisterVM", vm_ref)
+                self._session.vm_ref_cache.invalidate()
                 LOG.debug(_("Unregistered the VM"), instance=instance)
             except Exception as excep:
                 LOG.warn(_("In vmwareapi:vmops:destroy, got this exception"
@@ -1040,11 +1041,7 @@ class VMwareVMOps(object):
             = vm_util.get_vmdk_path_and_adapter_type(hardware_devices)
         # Figure out the correct unit number
         unit_number = unit_number + 1
-        rescue_vm_ref = vm_util.get_vm_ref_from_uuid(self._session,
-                                                     r_instance['uuid'])
-        if rescue_vm_ref is None:
-            rescue_vm_ref = vm_util.get_vm_ref_from_name(self._session,
-                                                     r_instance['name'])
+        rescue_vm_ref = vm_util.get_vm_ref(self._session, r_instance)
         self._volumeops.attach_disk_to_vm(
                                 rescue_vm_ref, r_instance,
                                 adapter_type, disk_type, vmdk_path,
@@ -1104,6 +1101,14 @@ class VMwareVMOps(object):
     def power_on(self, context, instance, network_info, block_device_info):
         self._power_on(instance)
 
+    def _wait_for_vm_task(self, instance_uuid, task):
+        """Waits for a task creating, destroying or renaming a VM."""
+        try:
+            self._session._wait_for_task(instance_uuid, task)
+        finally:
+            # The VMs may have changed even if the task failed
+            self._session.vm_ref_cache.invalidate()
+
     def _get_orig_vm_name_label(self, instance):
         return instance['uuid'] + '-orig'
 
@@ -1155,7 +1160,7 @@ class VMwareVMOps(object):
         rename_task = self._session._call_method(
                             self._session._get_vim(),
                             "Rename_Task", vm_ref, newName=name_label)
-        self._session._wait_for_task(instance['uuid'], rename_task)
+        self._wait_for_vm_task(instance['uuid'], rename_task)
         LOG.debug(_("Renamed the VM to %s") % name_label,
                   instance=instance)
         self._update_instance_progress(context, instance,
@@ -1179,7 +1184,7 @@ class VMwareVMOps(object):
                                 folder=dc_info.vmFolder,
                                 name=instance['uuid'],
                                 spec=clone_spec)
-        self._session._wait_for_task(instance['uuid'], vm_clone_task)
+        self._wait_for_vm_task(instance['uuid'], vm_clone_task)
         LOG.debug(_("Cloned VM to host %s") % dest, instance=instance)
         self._update_instance_progress(context, instance,
                                        step=3,
@@ -1200,7 +1205,7 @@ class VMwareVMOps(object):
             destroy_task = self._session._call_method(
                                         self._session._get_vim(),
                                         "Destroy_Task", vm_ref)
-            self._session._wait_for_task(instance_name, destroy_task)
+            self._wait_for_vm_task(instance_name, destroy_task)
             LOG.debug(_("Destroyed the VM"), instance=instance)
         except Exception as excep:
             LOG.warn(_("In vmwareapi:vmops:confirm_migration, got this "
@@ -1221,7 +1226,7 @@ class VMwareVMOps(object):
         rename_task = self._session._call_method(
                             self._session._get_vim(),
                             "Rename_Task", vm_ref, newName=instance['uuid'])
-        self._session._wait_for_task(instance['uuid'], rename_task)
+        self._wait_for_vm_task(instance['uuid'], rename_task)
         LOG.debug(_("Renamed the VM from %s") % name_label,
                   instance=instance)
         if power_on:
@@ -1286,6 +1291,15 @@ class VMwareVMOps(object):
             LOG.info(_("Automatically hard rebooting"), instance=instance)
             self.compute_api.reboot(ctxt, instance, "HARD")
 
+    @staticmethod
+    def _get_info_from_properties(query):
+        max_mem = int(query['summary.config.memorySizeMB']) * 1024
+        return {'state': VMWARE_POWER_STATES[query['runtime.powerState']],
+                'max_mem': max_mem,
+                'mem': max_mem,
+                'num_cpu': int(query['summary.config.numCpu']),
+                'cpu_time': 0}
+
     def get_info(self, instance):
         """Return data about the VM instance."""
         vm_ref = vm_util.get_vm_ref(self._session, instance)
@@ -1300,12 +1314,48 @@ class VMwareVMOps(object):
                  'summary.config.memorySizeMB': None,
                  'runtime.powerState': None}
         self._get_values_from_object_properties(vm_props, query)
-        max_mem = int(query['summary.config.memorySizeMB']) * 1024
-        return {'state': VMWARE_POWER_STATES[query['runtime.powerState']],
-                'max_mem': max_mem,
-                'mem': max_mem,
-                'num_cpu': int(query['summary.config.numCpu']),
-                'cpu_time': 0}
+        return self._get_info_from_properties(query)
+
+    def get_info_for_instances(self, instances):
+        """
+        Return data about the VMs of the instances, keyed by instance uuid.
+
+        The properties of all the VMs are retrieved together, a page of
+        maximum_objects VMs per call, instead of one VM per call.
+        """
+        # VM name -> instance uuid. VMs are named after the uuid of their
+        # instance, or after its name for the older ones.
+        uuids = {}
+        for instance in instances:
+            uuids.setdefault(instance['name'], instance['uuid'])
+        for instance in instances:
+            uuids[instance['uuid']] = instance['uuid']
+
+        lst_properties = ["name", "summary.config.numCpu",
+                          "summary.config.memorySizeMB", "runtime.powerState"]
+        vms = self._session._call_method(vim_util, "get_objects",
+                     "VirtualMachine", lst_properties)
+        infos = {}
+        while vms:
+            token = vm_util._get_token(vms)
+            for vm in vms.objects:
+                query = vm_util.propset_dict(getattr(vm, 'propSet', None))
+                uuid = uuids.get(query.get('name'))
+                if uuid is None or (uuid in infos and
+                                    query['name'] != uuid):
+                    continue
+                # Leave the VMs whose properties could not be read to
+                # get_info().
+                if all(query.get(prop) is not None
+                       for prop in lst_properties):
+                    infos[uuid] = self._get_info_from_properties(query)
+            if token:
+                vms = self._session._call_method(vim_util,
+                                                 "continue_to_get_objects",
+                                                 token)
+            else:
+                break
+        return infos
 
     def _get_diagnostic_from_object_properties(self, props, wanted_props):
         diagnostics = {}
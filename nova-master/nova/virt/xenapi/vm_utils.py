@@ -22,6 +22,7 @@ their attributes like VDIs, VIFs, as well as their lookup functions.
 """
 
 import contextlib
+import errno
 import os
 import time
 import urllib
@@ -161,6 +162,14 @@ MBR_SIZE_BYTES = MBR_SIZE_SECTORS * SECTOR_SIZE
 KERNEL_DIR = '/boot/guest'
 MAX_VDI_CHAIN_SIZE = 16
 PROGRESS_INTERVAL_SECONDS = 300
+# _sparse_copy() reads this much data at once, and lets the other
+# greenthreads run whenever it has been busy for that long.
+SPARSE_COPY_READ_SIZE = unit.Mi
+SPARSE_COPY_YIELD_SECONDS = 0.1
+# os.SEEK_DATA and os.SEEK_HOLE only appear in Python 3.3, these are the
+# values of Linux.
+SEEK_DATA = getattr(os, 'SEEK_DATA', 3)
+SEEK_HOLE = getattr(os, 'SEEK_HOLE', 4)
 
 # Fudge factor to allow for the VHD chain to be slightly larger than
 # the partitioned space. Otherwise, legitimate images near their
@@ -844,7 +853,12 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
     The default behavior of this function is to destroy only 'unused' cached
     images. To destroy all cached images, use the `all_cached=True` kwarg.
     """
-    cached_images = _find_cached_images(session, sr_ref)
+    # Take a single snapshot of the VDI records of the SR, and walk the VHD
+    # chains in it rather than looking up every VDI of every chain.
+    _scan_sr(session, sr_ref)
+    vdis = dict(_get_all_vdis_in_sr(session, sr_ref))
+    vdi_recs = _get_vdi_recs_by_uuid(vdis)
+    cached_images = _find_cached_images(session, sr_ref, vdis=vdis)
     destroyed = set()
 
     def destroy_cached_vdi(vdi_uuid, vdi_ref):
@@ -854,7 +868,7 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
         destroyed.add(vdi_uuid)
 
     for vdi_ref in cached_images.values():
-        vdi_uuid = session.call_xenapi('VDI.get_uuid', vdi_ref)
+        vdi_uuid = vdis[vdi_ref]['uuid']
 
         if all_cached:
             destroy_cached_vdi(vdi_uuid, vdi_ref)
@@ -865,13 +879,14 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
         # Chain length greater than two implies a VM must be holding a ref to
         # the base-copy (otherwise it would have coalesced), so consider this
         # cached image used.
-        chain = list(_walk_vdi_chain(session, vdi_uuid))
+        chain = list(_walk_vdi_chain(session, vdi_uuid, vdi_recs=vdi_recs))
         if len(chain) > 2:
             continue
         elif len(chain) == 2:
             # Siblings imply cached image is used
             root_vdi_rec = chain[-1]
-            children = _child_vhds(session, sr_ref, root_vdi_rec['uuid'])
+            children = _child_vhds(session, sr_ref, root_vdi_rec['uuid'],
+                                   vdi_recs=vdi_recs)
             if len(children) > 1:
                 continue
 
@@ -880,10 +895,16 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
     return destroyed
 
 
-def _find_cached_images(session, sr_ref):
-    """Return a dict(uuid=vdi_ref) representing all cached images."""
+def _find_cached_images(session, sr_ref, vdis=None):
+    """Return a dict(uuid=vdi_ref) representing all cached images.
+
+    vdis, a dict of the refs and records of the VDIs of the SR, is searched
+    instead of fetching them when given.
+    """
+    if vdis is None:
+        vdis = dict(_get_all_vdis_in_sr(session, sr_ref))
     cached_images = {}
-    for vdi_ref, vdi_rec in _get_all_vdis_in_sr(session, sr_ref):
+    for vdi_ref, vdi_rec in vdis.iteritems():
         try:
             image_id = vdi_rec['other_config']['image-id']
         except KeyError:
@@ -1971,12 +1992,23 @@ def _get_rrd(server, vm_uuid):
 
 
 def _get_all_vdis_in_sr(session, sr_ref):
-    for vdi_ref in session.call_xenapi('SR.get_VDIs', sr_ref):
-        vdi_rec = session.get_rec('VDI', vdi_ref)
-        # Check to make sure the record still exists. It may have
-        # been deleted between the get_all call and get_rec call
-        if vdi_rec:
-            yield vdi_ref, vdi_rec
+    """Yields the refs and records of all the VDIs of an SR.
+
+    The records are all fetched in one call rather than one call per VDI,
+    which also leaves no window for a VDI to be deleted in between.
+    """
+    vdis = session.call_xenapi('VDI.get_all_records_where',
+                               'field "SR"="%s"' % sr_ref)
+    for vdi_ref, vdi_rec in vdis.iteritems():
+        yield vdi_ref, vdi_rec
+
+
+def _get_vdi_recs_by_uuid(vdis):
+    """Returns the VDI records of a dict of refs and records by uuid.
+
+    This is the snapshot _walk_vdi_chain() and _child_vhds() take.
+    """
+    return dict((vdi_rec['uuid'], vdi_rec) for vdi_rec in vdis.itervalues())
 
 
 def get_instance_vdis_for_sr(session, vm_ref, sr_ref):
@@ -1990,8 +2022,9 @@ def get_instance_vdis_for_sr(session, vm_ref, sr_ref):
             continue
 
 
-def _get_vhd_parent_uuid(session, vdi_ref):
-    vdi_rec = session.call_xenapi("VDI.get_record", vdi_ref)
+def _get_vhd_parent_uuid(session, vdi_ref, vdi_rec=None):
+    if vdi_rec is None:
+        vdi_rec = session.call_xenapi("VDI.get_record", vdi_ref)
 
     if 'vhd-parent' not in vdi_rec['sm_config']:
         return None
@@ -2003,34 +2036,47 @@ def _get_vhd_parent_uuid(session, vdi_ref):
     return parent_uuid
 
 
-def _walk_vdi_chain(session, vdi_uuid):
-    """Yield vdi_recs for each element in a VDI chain."""
-    scan_default_sr(session)
+def _walk_vdi_chain(session, vdi_uuid, vdi_recs=None):
+    """Yield vdi_recs for each element in a VDI chain.
+
+    The VDIs are looked up in vdi_recs, a snapshot of the records of the SR
+    by uuid, when given. The SR should have been scanned before it was
+    taken; otherwise the default SR is scanned first.
+    """
+    if vdi_recs is None:
+        scan_default_sr(session)
+        vdi_recs = {}
     while True:
-        vdi_ref = session.call_xenapi("VDI.get_by_uuid", vdi_uuid)
-        vdi_rec = session.call_xenapi("VDI.get_record", vdi_ref)
+        vdi_ref = None
+        vdi_rec = vdi_recs.get(vdi_uuid)
+        if vdi_rec is None:
+            vdi_ref = session.call_xenapi("VDI.get_by_uuid", vdi_uuid)
+            vdi_rec = session.call_xenapi("VDI.get_record", vdi_ref)
         yield vdi_rec
 
-        parent_uuid = _get_vhd_parent_uuid(session, vdi_ref)
+        parent_uuid = _get_vhd_parent_uuid(session, vdi_ref, vdi_rec)
         if not parent_uuid:
             break
 
         vdi_uuid = parent_uuid
 
 
-def _child_vhds(session, sr_ref, vdi_uuid):
+def _child_vhds(session, sr_ref, vdi_uuid, vdi_recs=None):
     """Return the immediate children of a given VHD.
 
     This is not recursive, only the immediate children are returned.
+    They are searched for in vdi_recs, as given to _walk_vdi_chain(), when
+    given.
     """
+    if vdi_recs is None:
+        vdi_recs = _get_vdi_recs_by_uuid(
+            dict(_get_all_vdis_in_sr(session, sr_ref)))
     children = set()
-    for ref, rec in _get_all_vdis_in_sr(session, sr_ref):
-        rec_uuid = rec['uuid']
-
+    for rec_uuid, rec in vdi_recs.iteritems():
         if rec_uuid == vdi_uuid:
             continue
 
-        parent_uuid = _get_vhd_parent_uuid(session, ref)
+        parent_uuid = rec['sm_config'].get('vhd-parent')
         if parent_uuid != vdi_uuid:
             continue
 
@@ -2340,13 +2386,104 @@ def _log_progress_if_required(left, last_log_time, virtual_size):
     return last_log_time
 
 
-def _sparse_copy(src_path, dst_path, virtual_size, block_size=4096):
-    """Copy data, skipping long runs of zeros to create a sparse file."""
-    start_time = last_log_time = timeutils.utcnow()
-    EMPTY_BLOCK = '\0' * block_size
-    bytes_read = 0
+def _next_data_extent(fd, offset, end, block_size):
+    """Returns the bounds of the first run of data of fd after offset.
+
+    Holes are only found on the file systems which support SEEK_DATA and
+    SEEK_HOLE, anywhere else the whole file is data. The bounds are
+    rounded to block_size.
+    """
+    try:
+        start = os.lseek(fd, offset, SEEK_DATA)
+        stop = os.lseek(fd, start, SEEK_HOLE)
+    except OSError as e:
+        if e.errno == errno.ENXIO:
+            # Nothing but a hole up to the end of the file
+            return end, end
+        return offset, end
+    start = max(offset, start - start % block_size)
+    stop += -stop % block_size
+    return min(start, end), min(stop, end)
+
+
+def _write_at(fd, offset, data):
+    os.lseek(fd, offset, os.SEEK_SET)
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _write_sparse(fd, offset, data, empty_block, empty_chunk):
+    """Writes data at offset, leaving out its blocks of zeros.
+
+    Returns the number of bytes left out.
+    """
+    if data == empty_chunk:
+        return len(data)
+    if data.find(empty_block) == -1:
+        # Not a single block worth of zeros, aligned or not
+        _write_at(fd, offset, data)
+        return 0
+
+    block_size = len(empty_block)
+    skipped = 0
+    pending = 0
+    for block_start in xrange(0, len(data), block_size):
+        if data[block_start:block_start + block_size] == empty_block:
+            if pending < block_start:
+                _write_at(fd, offset + pending, data[pending:block_start])
+            pending = block_start + block_size
+            skipped += block_size
+    if pending < len(data):
+        _write_at(fd, offset + pending, data[pending:])
+    return skipped
+
+
+def _sparse_copy_fd(src, dst, virtual_size, block_size):
+    """Returns the number of bytes read and skipped. See _sparse_copy()."""
+    last_log_time = timeutils.utcnow()
+    last_yield_time = time.time()
+    read_size = max(block_size,
+                    SPARSE_COPY_READ_SIZE - SPARSE_COPY_READ_SIZE % block_size)
+    empty_block = '\0' * block_size
+    empty_chunk = '\0' * read_size
+    offset = 0
     skipped_bytes = 0
-    left = virtual_size
+
+    while offset < virtual_size:
+        start, stop = _next_data_extent(src, offset, virtual_size,
+                                        block_size)
+        skipped_bytes += start - offset
+        offset = start
+        os.lseek(src, offset, os.SEEK_SET)
+
+        while offset < stop:
+            data = os.read(src, min(read_size - offset % read_size,
+                                    stop - offset))
+            if not data:
+                # The source is shorter than virtual_size
+                return offset, skipped_bytes
+            skipped_bytes += _write_sparse(dst, offset, data, empty_block,
+                                           empty_chunk)
+            offset += len(data)
+
+            if time.time() - last_yield_time > SPARSE_COPY_YIELD_SECONDS:
+                greenthread.sleep(0)
+                last_yield_time = time.time()
+            last_log_time = _log_progress_if_required(
+                virtual_size - offset, last_log_time, virtual_size)
+
+    return offset, skipped_bytes
+
+
+def _sparse_copy(src_path, dst_path, virtual_size, block_size=4096):
+    """Copy data, skipping long runs of zeros to create a sparse file.
+
+    The holes of the source are skipped without being read when its file
+    system can tell where they are. Data is read SPARSE_COPY_READ_SIZE
+    bytes at a time, and its aligned blocks of block_size zeros are not
+    written.
+    """
+    start_time = timeutils.utcnow()
 
     LOG.debug(_("Starting sparse_copy src=%(src_path)s dst=%(dst_path)s "
                 "virtual_size=%(virtual_size)d block_size=%(block_size)d"),
@@ -2358,31 +2495,20 @@ def _sparse_copy(src_path, dst_path, virtual_size, block_size=4096):
     # ownership of the devices.
     with utils.temporary_chown(src_path):
         with utils.temporary_chown(dst_path):
-            with open(src_path, "r") as src:
-                with open(dst_path, "w") as dst:
-                    data = src.read(min(block_size, left))
-                    while data:
-                        if data == EMPTY_BLOCK:
-                            dst.seek(block_size, os.SEEK_CUR)
-                            left -= block_size
-                            bytes_read += block_size
-                            skipped_bytes += block_size
-                        else:
-                            dst.write(data)
-                            data_len = len(data)
-                            left -= data_len
-                            bytes_read += data_len
-
-                        if left <= 0:
-                            break
-
-                        data = src.read(min(block_size, left))
-                        greenthread.sleep(0)
-                        last_log_time = _log_progress_if_required(
-                            left, last_log_time, virtual_size)
+            src = os.open(src_path, os.O_RDONLY)
+            try:
+                dst = os.open(dst_path,
+                              os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+                try:
+                    bytes_read, skipped_bytes = _sparse_copy_fd(
+                        src, dst, virtual_size, block_size)
+                finally:
+                    os.close(dst)
+            finally:
+                os.close(src)
 
     duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
-    compression_pct = float(skipped_bytes) / bytes_read * 100
+    compression_pct = float(skipped_bytes) / max(bytes_read, 1) * 100
 
     LOG.debug(_("Finished sparse_copy in %(duration).2f secs, "
                 "%(compression_pct).2f%% reduction in size"),
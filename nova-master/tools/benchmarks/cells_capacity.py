@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Time the computation of the units_by_mb capacities of a cell.
+
+Random compute hosts and instance_types are generated, and the per host and
+per instance_type loop CellStateManager used to run is compared with
+nova.cells.state._free_units_by_size, with and without numpy. All of them
+must give the same result. Run from the top of the tree like:
+
+    python tools/benchmarks/cells_capacity.py --hosts 3000 --flavors 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova.cells import state  # noqa
+
+
+def loop_units_by_size(sizes, totals, frees, reserve_level):
+    units = {}
+    for total, free in zip(totals, frees):
+        for size in sizes:
+            units.setdefault(str(size), 0)
+            if size:
+                room = max(0, free - total * reserve_level)
+                units[str(size)] += int(room / size)
+    return units
+
+
+def run(name, func, args, repeat):
+    best = None
+    result = None
+    for _i in range(repeat):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print('%-12s %10.2f ms' % (name, best * 1000))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--hosts', type=int, default=3000)
+    parser.add_argument('--flavors', type=int, default=200)
+    parser.add_argument('--reserve-percent', type=float, default=10.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rand = random.Random(42)
+    totals = [rand.choice([65536, 131072, 262144, 524288])
+              for _i in range(args.hosts)]
+    frees = [rand.randint(-1024, total) for total in totals]
+    sizes = [rand.choice([0, 512, 2048, 4096]) * rand.randint(1, 32)
+             for _i in range(args.flavors)]
+    bench_args = (sizes, totals, frees, args.reserve_percent / 100.0)
+
+    print('%d hosts, %d instance_types' % (args.hosts, args.flavors))
+    expected = run('loop', loop_units_by_size, bench_args, args.repeat)
+    if state.numpy is not None:
+        result = run('numpy', state._free_units_by_size, bench_args,
+                     args.repeat)
+        assert result == expected, 'numpy result differs'
+    numpy, state.numpy = state.numpy, None
+    try:
+        result = run('no numpy', state._free_units_by_size, bench_args,
+                     args.repeat)
+        assert result == expected, 'pure python result differs'
+    finally:
+        state.numpy = numpy
+
+
+if __name__ == '__main__':
+    main()
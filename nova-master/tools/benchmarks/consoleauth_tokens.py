@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Measure the rate of console token authorizations and checks.
+
+Consoles are opened --consoles times for each of --instances instances,
+the way a dashboard showing the consoles of many instances does, and all
+the tokens are then checked. The way ConsoleAuthManager used to keep the
+tokens of each instance in memcached is compared with
+nova.consoleauth.store.MemcacheTokenStore, both over a local fake memcached
+counting round trips, and with nova.consoleauth.store.MemoryTokenStore.
+All must find the same tokens. Run from the top of the tree like:
+
+    python tools/benchmarks/consoleauth_tokens.py --instances 20 --consoles 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova.consoleauth import store  # noqa
+
+
+_now = time.time
+
+
+class CountingMemcache(object):
+    """Subset of the python-memcached client counting round trips."""
+
+    def __init__(self):
+        self.cache = {}
+        self.round_trips = 0
+
+    def _get(self, key):
+        expires_at, value = self.cache.get(key, (0, None))
+        if expires_at and expires_at <= time.time():
+            del self.cache[key]
+            return None
+        return value
+
+    def get(self, key):
+        self.round_trips += 1
+        return self._get(key)
+
+    def get_multi(self, keys):
+        self.round_trips += 1
+        values = ((key, self._get(key)) for key in keys)
+        return dict((key, value) for key, value in values
+                    if value is not None)
+
+    def set(self, key, value, time=0, min_compress_len=0):
+        self.round_trips += 1
+        self.cache[key] = (time and _now() + time, value)
+        return True
+
+    def delete(self, key, time=0):
+        self.round_trips += 1
+        self.cache.pop(key, None)
+        return 1
+
+    def delete_multi(self, keys, time=0):
+        self.round_trips += 1
+        for key in keys:
+            self.cache.pop(key, None)
+        return 1
+
+
+class LegacyTokenStore(object):
+    """The tokens of an instance as ConsoleAuthManager used to keep them."""
+
+    def __init__(self, client):
+        self.mc = client
+
+    def add(self, token, instance_uuid, data, ttl):
+        self.mc.set(token.encode('UTF-8'), data, ttl)
+        tokens_str = self.mc.get(instance_uuid.encode('UTF-8'))
+        tokens = json.loads(tokens_str) if tokens_str else []
+        for tok in tokens:
+            if not self.mc.get(tok.encode('UTF-8')):
+                tokens.remove(tok)
+        tokens.append(token)
+        self.mc.set(instance_uuid.encode('UTF-8'), json.dumps(tokens))
+
+    def get(self, token):
+        return self.mc.get(token.encode('UTF-8'))
+
+
+def run(name, token_store, instances, consoles):
+    client = getattr(token_store, 'mc', None)
+    tokens = []
+    start = time.time()
+    for i in range(consoles):
+        for instance in range(instances):
+            token = u'token-%d-%d' % (instance, i)
+            token_store.add(token, u'instance-%d' % instance,
+                            json.dumps({'token': token}), 600)
+            tokens.append(token)
+    authorized = time.time()
+    round_trips = client.round_trips if client else 0
+    found = [token for token in tokens if token_store.get(token)]
+    checked = time.time()
+    print('%-8s %12.0f %16.1f %10.0f' % (
+          name, len(tokens) / (authorized - start),
+          float(round_trips) / len(tokens),
+          len(tokens) / (checked - authorized)))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--instances', type=int, default=20)
+    parser.add_argument('--consoles', type=int, default=200,
+                        help='Consoles opened for each instance')
+    args = parser.parse_args()
+
+    print('%d instances, %d consoles each' % (args.instances, args.consoles))
+    print('%-8s %12s %16s %10s' % ('store', 'authorize/s',
+                                   'trips/authorize', 'check/s'))
+    expected = run('legacy', LegacyTokenStore(CountingMemcache()),
+                   args.instances, args.consoles)
+    found = run('memcache', store.MemcacheTokenStore(CountingMemcache()),
+                args.instances, args.consoles)
+    assert found == expected, 'memcache store tokens differ'
+    found = run('memory', store.MemoryTokenStore(), args.instances,
+                args.consoles)
+    assert found == expected, 'memory store tokens differ'
+
+
+if __name__ == '__main__':
+    main()
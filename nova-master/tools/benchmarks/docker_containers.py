@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Count the Docker API round trips of the periodic tasks of the docker driver.
+
+A fake Docker API server listens on a UNIX socket and serves containers/ps
+and containers/<id>/json for --containers containers. The driver lists its
+instances and gets the state of each of them, as the power state sync does,
+the way it used to (inspecting every container for every lookup, over a new
+connection per request) and through its container index and kept alive
+connections. Both must give the same results. Run from the top of the tree
+like:
+
+    python tools/benchmarks/docker_containers.py --containers 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import uuid
+
+import eventlet
+eventlet.monkey_patch()
+from eventlet import wsgi  # noqa
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova.openstack.common import jsonutils  # noqa
+from nova.virt.docker import client  # noqa
+from nova.virt.docker import driver  # noqa
+
+
+class FakeDockerAPI(object):
+    """WSGI application serving the listing and inspection of containers."""
+
+    def __init__(self, count):
+        self.containers = {}
+        for i in range(count):
+            self.containers[uuid.uuid4().hex * 2] = 'instance-%08x' % i
+        self.requests = 0
+        self.connections = 0
+
+    def __call__(self, environ, start_response):
+        self.requests += 1
+        path = environ['PATH_INFO']
+        if path == '/v1.4/containers/ps':
+            body = [{'Id': container_id, 'Image': 'ubuntu:12.04',
+                     'Command': 'sh', 'Status': 'Up 5 minutes'}
+                    for container_id in self.containers]
+        else:
+            match = re.match('/v1.4/containers/(\\w+)/json$', path)
+            container_id = match and match.group(1)
+            if container_id not in self.containers:
+                start_response('404 Not Found',
+                               [('Content-Type', 'text/plain')])
+                return ['No such container']
+            body = {'ID': container_id,
+                    'Path': 'sh',
+                    'Config': {'Hostname': self.containers[container_id]},
+                    'State': {'Running': True}}
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [jsonutils.dumps(body)]
+
+
+class CountingSocket(object):
+    """Listening socket counting the connections accepted."""
+
+    def __init__(self, sock, app):
+        self._sock = sock
+        self._app = app
+
+    def accept(self):
+        conn, _address = self._sock.accept()
+        self._app.connections += 1
+        # eventlet.wsgi expects the address of an AF_INET peer
+        return conn, ('localhost', 0)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class LocalUnixHTTPConnection(client.UnixHTTPConnection):
+    """Connects to the fake server rather than to the docker daemon."""
+
+    unix_socket_path = None
+
+    def connect(self):
+        self.unix_socket = self.unix_socket_path
+        _UnixHTTPConnection.connect(self)
+
+
+_UnixHTTPConnection = client.UnixHTTPConnection
+
+
+class LegacyDockerHTTPClient(client.DockerHTTPClient):
+    """Opens a new connection for every request."""
+
+    def _get_connection(self):
+        return client.UnixHTTPConnection(), False
+
+    def make_request(self, *args, **kwargs):
+        response = super(LegacyDockerHTTPClient, self).make_request(
+            *args, **kwargs)
+        del self._idle_connections[:]
+        return response
+
+
+class LegacyDockerDriver(driver.DockerDriver):
+    """Inspects every container to find one."""
+
+    def list_instances(self, inspect=False):
+        res = []
+        for container in self.docker.list_containers():
+            info = self.docker.inspect_container(container['id'])
+            if inspect:
+                res.append(info)
+            else:
+                res.append(info['Config'].get('Hostname'))
+        return res
+
+    def find_container_by_name(self, name):
+        for info in self.list_instances(inspect=True):
+            if info['Config'].get('Hostname') == name:
+                return info
+        return {}
+
+
+def run(name, conn, app, repeat):
+    app.requests = app.connections = 0
+    start = time.time()
+    for _i in range(repeat):
+        names = conn.list_instances()
+        states = [conn.get_info({'name': instance_name})['state']
+                  for instance_name in names]
+    elapsed = time.time() - start
+    print('%-8s %10d requests %8d connections %10.2f ms' % (
+          name, app.requests, app.connections, elapsed * 1000))
+    return sorted(names), states
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--containers', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'docker.sock')
+        app = FakeDockerAPI(args.containers)
+        sock = eventlet.listen(path, family=socket.AF_UNIX)
+        eventlet.spawn_n(wsgi.server, CountingSocket(sock, app), app,
+                         log=open(os.devnull, 'w'))
+
+        LocalUnixHTTPConnection.unix_socket_path = path
+        client.UnixHTTPConnection = LocalUnixHTTPConnection
+
+        legacy = LegacyDockerDriver(None)
+        legacy._docker = LegacyDockerHTTPClient()
+        indexed = driver.DockerDriver(None)
+
+        print('%d containers, %d passes' % (args.containers, args.repeat))
+        expected = run('legacy', legacy, app, args.repeat)
+        result = run('indexed', indexed, app, args.repeat)
+        assert result == expected, 'results differ'
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Measure the disk over-commit accounting of the libvirt driver.
+
+--instances instances, each with a qcow2 root disk and a raw ephemeral disk
+in a temporary directory, are accounted --passes times with
+get_disk_over_committed_size_total(), the way update_available_resource()
+does. Between passes the disks of --changed percent of the instances are
+written to. Every pass is done with the disk info cache of the driver, and
+with it emptied, which is how every pass used to be done. qemu-img isn't
+run: each 'qemu-img info' is counted and takes --qemu-img-ms milliseconds,
+the cost of running it on a host. Both must find the same totals. Run from
+the top of the tree like:
+
+    python tools/benchmarks/libvirt_disk_accounting.py --instances 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova.tests.virt.libvirt import fakelibvirt  # noqa
+from nova import unit  # noqa
+from nova import utils  # noqa
+from nova.virt import fake  # noqa
+from nova.virt.libvirt import driver as libvirt_driver  # noqa
+
+CONF = cfg.CONF
+
+DOMAIN_XML = """<domain type='kvm'><name>%(name)s</name><devices>
+<disk type='file'><driver name='qemu' type='qcow2'/>
+<source file='%(path)s/disk'/><target dev='vda' bus='virtio'/></disk>
+<disk type='file'><driver name='qemu' type='raw'/>
+<source file='%(path)s/disk.local'/><target dev='vdb' bus='virtio'/></disk>
+</devices></domain>"""
+
+QEMU_IMG_INFO = """image: %(path)s
+file format: qcow2
+virtual size: 20G (21474836480 bytes)
+disk size: 1.0M
+cluster_size: 65536
+backing file: /var/lib/nova/instances/_base/%(base)s
+"""
+
+
+class QemuImg(object):
+    """Counts the runs of qemu-img, costing --qemu-img-ms each."""
+
+    runs = 0
+    cost = 0.0
+
+    @classmethod
+    def execute(cls, *cmd, **kwargs):
+        assert cmd[3:5] == ('qemu-img', 'info'), cmd
+        cls.runs += 1
+        time.sleep(cls.cost)
+        path = cmd[5]
+        return QEMU_IMG_INFO % {'path': path, 'base': 'a' * 40}, ''
+
+
+class FakeDomain(object):
+    def __init__(self, xml):
+        self.xml = xml
+
+    def XMLDesc(self, flags):
+        return self.xml
+
+
+def make_instances(root, count):
+    domains = {}
+    for i in range(count):
+        name = 'instance-%08x' % (i + 1)
+        path = os.path.join(root, name)
+        os.mkdir(path)
+        for disk in ('disk', 'disk.local'):
+            with open(os.path.join(path, disk), 'w') as f:
+                f.write('\0' * unit.Ki)
+        domains[name] = FakeDomain(DOMAIN_XML % {'name': name, 'path': path})
+    return domains
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--instances', type=int, default=200,
+                        help='Number of instances on the host')
+    parser.add_argument('--passes', type=int, default=5,
+                        help='Number of accounting passes')
+    parser.add_argument('--changed', type=float, default=10,
+                        help='Percentage of instances written to between '
+                             'passes')
+    parser.add_argument('--qemu-img-ms', type=float, default=20,
+                        help='Time taken by each run of qemu-img info')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    logging.basicConfig(level=logging.ERROR)
+    libvirt_driver.libvirt = fakelibvirt
+    utils.execute = QemuImg.execute
+    QemuImg.cost = args.qemu_img_ms / 1000.0
+
+    root = tempfile.mkdtemp(prefix='disk-accounting-bench-')
+    try:
+        domains = make_instances(root, args.instances)
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        conn.list_instances = lambda: domains.keys()
+        conn._lookup_by_name = domains.get
+
+        print('%d instances, %d%% written to between passes' % (
+              args.instances, args.changed))
+        print('%-6s %-10s %12s %10s' % ('pass', 'cache', 'qemu-img runs',
+                                        'ms'))
+        changed = int(args.instances * args.changed / 100)
+        for i in range(args.passes):
+            totals = []
+            for mode in ('emptied', 'kept'):
+                if mode == 'emptied':
+                    saved_cache = dict(conn._disk_info_cache)
+                    conn._disk_info_cache.clear()
+                runs = QemuImg.runs
+                start = time.time()
+                totals.append(conn.get_disk_over_committed_size_total())
+                elapsed = time.time() - start
+                if mode == 'emptied':
+                    conn._disk_info_cache.clear()
+                    conn._disk_info_cache.update(saved_cache)
+                print('%-6d %-10s %12d %10.1f' % (
+                      i, mode, QemuImg.runs - runs, elapsed * 1000))
+            assert totals[0] == totals[1], totals
+
+            for name in random.sample(sorted(domains), changed):
+                with open(os.path.join(root, name, 'disk'), 'a') as f:
+                    f.write('\0' * unit.Ki)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
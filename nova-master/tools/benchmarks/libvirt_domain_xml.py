@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Measure the domain lookups and XML descriptions of the libvirt driver.
+
+--instances running domains, each with --volumes volumes, are defined in
+fakelibvirt, and the libvirt driver goes through them --passes times the
+way the periodic tasks of a compute host do: get_all_block_devices(),
+get_disk_over_committed_size_total(), get_all_volume_usage() and
+get_disks() of every instance. Between passes --changed percent of the
+domains are restarted, which libvirt reports with lifecycle events. Every
+pass is done with the domain cache of the driver, and with it disabled,
+which is how every pass used to be done. Each domain lookup and XMLDesc()
+is counted and takes --rpc-ms milliseconds, a round trip to libvirtd. Both
+must find the same devices. Run from the top of the tree like:
+
+    python tools/benchmarks/libvirt_domain_xml.py --instances 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova.tests.virt.libvirt import fakelibvirt  # noqa
+from nova.virt import fake  # noqa
+from nova.virt.libvirt import driver as libvirt_driver  # noqa
+
+CONF = cfg.CONF
+
+DOMAIN_XML = """<domain type='kvm'><name>%(name)s</name>
+<memory>2097152</memory><vcpu>2</vcpu><os><type>hvm</type></os><devices>
+<disk type='block' device='disk'><driver name='qemu' type='raw'/>
+<source file='/dev/nova/%(name)s_disk'/><target dev='vda' bus='virtio'/>
+</disk>%(volumes)s
+<interface type='bridge'><mac address='fa:16:3e:00:00:01'/>
+<source bridge='br100'/></interface>
+</devices></domain>"""
+
+VOLUME_XML = """<disk type='block' device='disk'>
+<driver name='qemu' type='raw'/>
+<source file='/dev/disk/by-path/%(name)s-lun-%(lun)d'/>
+<target dev='vd%(dev)s' bus='virtio'/></disk>"""
+
+
+class RPC(object):
+    """Counts the calls to libvirtd, costing --rpc-ms each."""
+
+    calls = 0
+    cost = 0.0
+
+    @classmethod
+    def wrap(cls, method):
+        def call(*args, **kwargs):
+            cls.calls += 1
+            time.sleep(cls.cost)
+            return method(*args, **kwargs)
+        return call
+
+
+def define_domains(conn, instances, volumes):
+    names = []
+    for i in range(instances):
+        name = 'instance-%08x' % (i + 1)
+        volumes_xml = ''.join(VOLUME_XML % {'name': name, 'lun': lun,
+                                            'dev': chr(ord('b') + lun)}
+                              for lun in range(volumes))
+        dom = conn._conn.defineXML(DOMAIN_XML % {'name': name,
+                                                 'volumes': volumes_xml})
+        dom.createWithFlags(0)
+        names.append(name)
+    return names
+
+
+def periodic_pass(conn, names, bdms):
+    return (sorted(conn.get_all_block_devices()),
+            conn.get_disk_over_committed_size_total(),
+            len(conn.get_all_volume_usage(None, bdms)),
+            [conn.get_disks(name) for name in names])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--instances', type=int, default=200,
+                        help='Number of instances on the host')
+    parser.add_argument('--volumes', type=int, default=2,
+                        help='Number of volumes of each instance')
+    parser.add_argument('--passes', type=int, default=5,
+                        help='Number of periodic passes')
+    parser.add_argument('--changed', type=float, default=10,
+                        help='Percentage of domains restarted between '
+                             'passes')
+    parser.add_argument('--rpc-ms', type=float, default=0.5,
+                        help='Time taken by each call to libvirtd')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    logging.basicConfig(level=logging.ERROR)
+    libvirt_driver.libvirt = fakelibvirt
+    for cls, method in ((fakelibvirt.Connection, 'lookupByName'),
+                        (fakelibvirt.Connection, 'lookupByID'),
+                        (fakelibvirt.Domain, 'XMLDesc')):
+        setattr(cls, method, RPC.wrap(getattr(cls, method)))
+    RPC.cost = args.rpc_ms / 1000.0
+
+    conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+    # What init_host() does, but for the threads dispatching the events
+    conn._init_events_pipe()
+    fake_conn = fakelibvirt.Connection('qemu:///system')
+    conn._connect = lambda *a, **k: fake_conn
+    conn.set_host_enabled = lambda host, enabled: None
+    names = define_domains(conn, args.instances, args.volumes)
+    bdms = [{'instance': {'name': name, 'uuid': name},
+             'instance_bdms': [{'device_name': '/dev/vd%s' % chr(ord('b') + i),
+                                'volume_id': '%s-%d' % (name, i)}
+                               for i in range(args.volumes)]}
+            for name in names]
+    assert conn._domain_cache.enabled
+
+    print('%d instances, %d%% restarted between passes' % (
+          args.instances, args.changed))
+    print('%-6s %-10s %10s %10s' % ('pass', 'cache', 'rpc calls', 'ms'))
+    changed = int(args.instances * args.changed / 100)
+    for i in range(args.passes):
+        results = []
+        for mode in ('disabled', 'enabled'):
+            if mode == 'disabled':
+                # Keeps the entries of the cache for the next pass
+                conn._domain_cache.enabled = False
+            calls = RPC.calls
+            start = time.time()
+            results.append(periodic_pass(conn, names, bdms))
+            elapsed = time.time() - start
+            conn._domain_cache.enabled = True
+            print('%-6d %-10s %10d %10.1f' % (
+                  i, mode, RPC.calls - calls, elapsed * 1000))
+        assert results[0] == results[1]
+
+        for name in random.sample(names, changed):
+            dom = fake_conn.lookupByName(name)
+            dom.destroy()
+            dom.createWithFlags(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the compact and attribute storage of Instance objects.
+
+An InstanceList is built from generated database rows the way
+InstanceList.get_by_host() does, and then serialized with obj_to_primitive()
+twice (the second time hits the cached primitives of compact storage) and
+copied with obj_clone(), once with the storage Instance uses and once with
+the plain one attribute per field storage.  Memory is what the objects and
+their storage take, after a warm obj_to_primitive(), leaving out the field
+values which are the same with both storages.  Run from the top of the tree
+like:
+
+    python tools/benchmarks/objects_compact_storage.py --instances 10000
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova import context as nova_context  # noqa
+from nova.objects import base  # noqa
+from nova.objects import fields  # noqa
+from nova.objects import instance as instance_obj  # noqa
+
+
+def _storage_size(inst):
+    size = sys.getsizeof(inst) + sys.getsizeof(inst.__dict__)
+    if inst.obj_compact_storage:
+        size += sys.getsizeof(inst._obj_values)
+        size += sys.getsizeof(inst._obj_primitives)
+        for value, primitive in zip(inst._obj_values, inst._obj_primitives):
+            if primitive is not value and primitive is not base._UNSET:
+                size += sys.getsizeof(primitive)
+    return size
+
+
+def _db_instance(i):
+    now = datetime.datetime(2013, 10, 1, 12, 0, 0)
+    db_inst = {'id': i,
+               'deleted': False,
+               'uuid': str(uuid.uuid4()),
+               'user_id': 'a1f6f27c6b7e4b4e9bb1b0c4f0d8d5b0',
+               'project_id': '7b8dc6d5a2c84d4e8c1c3d5d0e9f8a7b',
+               'image_ref': str(uuid.uuid4()),
+               'hostname': 'server-%d' % i,
+               'display_name': 'server-%d' % i,
+               'host': 'compute-1',
+               'node': 'compute-1',
+               'vm_state': 'active',
+               'power_state': 1,
+               'memory_mb': 2048,
+               'vcpus': 2,
+               'root_gb': 20,
+               'ephemeral_gb': 0,
+               'instance_type_id': 3,
+               'launched_at': now,
+               'created_at': now,
+               'updated_at': now,
+               'metadata': [],
+               'system_metadata': [{'key': 'instance_type_%s' % key,
+                                    'value': str(value)}
+                                   for key, value in (('memory_mb', 2048),
+                                                      ('vcpus', 2),
+                                                      ('root_gb', 20),
+                                                      ('flavorid', '3'),
+                                                      ('name', 'm1.medium'))],
+               'pci_devices': [],
+               'security_groups': []}
+    for name, field in instance_obj.Instance.fields.items():
+        if name in db_inst:
+            continue
+        if field.nullable:
+            db_inst[name] = None
+        elif field.default != fields.UnspecifiedDefault:
+            db_inst[name] = field.default
+    return db_inst
+
+
+def _set_storage(compact):
+    instance_obj.Instance.obj_compact_storage = compact
+    base.make_class_properties(instance_obj.Instance)
+
+
+def _best(func, repeat):
+    best = None
+    for _i in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000
+
+
+def run(name, context, db_insts, repeat):
+    start = time.time()
+    inst_list = instance_obj._make_instance_list(
+        context, instance_obj.InstanceList(), db_insts,
+        ['metadata', 'system_metadata'])
+    build = (time.time() - start) * 1000
+
+    # The cold pass fills the primitive cache of compact objects
+    start = time.time()
+    primitive = inst_list.obj_to_primitive()
+    cold = (time.time() - start) * 1000
+    warm = _best(inst_list.obj_to_primitive, repeat)
+    clone = _best(inst_list.obj_clone, repeat)
+    memory = sum(_storage_size(inst) for inst in inst_list) / 1024.0 / 1024.0
+    print('%-10s %10.1f %10.1f %10.1f %10.1f %10.1f' % (
+          name, memory, build, cold, warm, clone))
+    return primitive
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--instances', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    context = nova_context.get_admin_context()
+    db_insts = [_db_instance(i) for i in range(args.instances)]
+
+    print('%d instances' % args.instances)
+    print('%-10s %10s %10s %10s %10s %10s' % ('storage', 'MB', 'build ms',
+                                              'cold ms', 'warm ms',
+                                              'clone ms'))
+    compact = instance_obj.Instance.obj_compact_storage
+    try:
+        _set_storage(False)
+        expected = run('attribute', context, db_insts, args.repeat)
+        _set_storage(True)
+        result = run('compact', context, db_insts, args.repeat)
+        assert result == expected, 'primitives differ'
+    finally:
+        _set_storage(compact)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Measure nova-objectstore object transfers and bucket listings.
+
+An object of --size megabytes is written and read back through
+S3Application, recording the largest buffer read from the request body and
+returned in the response, which is what the server holds in memory for an
+object: before, the whole object was. A bucket of --objects objects is then
+listed page by page with --max-keys, both by walking the bucket the way
+BucketHandler used to and from the bucket index, and both must find the
+same objects. Run from the top of the tree like:
+
+    python tools/benchmarks/objectstore_streaming.py --size 256 --objects 5000
+"""
+
+from __future__ import print_function
+
+import argparse
+import bisect
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+import webob  # noqa
+
+from nova.objectstore import s3server  # noqa
+
+
+class CountingReader(object):
+    """Request body of zero bytes, recording the largest read."""
+
+    def __init__(self, size):
+        self.left = size
+        self.largest = 0
+        self.md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.left
+        size = min(size, self.left)
+        self.left -= size
+        self.largest = max(self.largest, size)
+        data = '\0' * size
+        self.md5.update(data)
+        return data
+
+
+def _request(app, method, path, **kwargs):
+    request = webob.Request.blank(path, method=method, **kwargs)
+    return request.get_response(app)
+
+
+def bench_transfer(app, size):
+    _request(app, 'PUT', '/bench/')
+    body = CountingReader(size)
+    start = time.time()
+    response = _request(app, 'PUT', '/bench/large', body_file=body,
+                        content_length=size)
+    put_time = time.time() - start
+    assert response.headers['ETag'] == '"%s"' % body.md5.hexdigest()
+
+    start = time.time()
+    response = _request(app, 'GET', '/bench/large')
+    largest = read = 0
+    for chunk in response.app_iter:
+        largest = max(largest, len(chunk))
+        read += len(chunk)
+    get_time = time.time() - start
+    assert read == size, read
+
+    print('%-10s %14s %10s' % ('transfer', 'largest buffer', 'ms'))
+    print('%-10s %14d %10.1f' % ('PUT', body.largest, put_time * 1000))
+    print('%-10s %14d %10.1f' % ('GET', largest, get_time * 1000))
+
+
+def legacy_list(app, bucket_name, marker, max_keys):
+    """The listing of BucketHandler.get before the bucket index."""
+    path = os.path.join(app.directory, bucket_name)
+    object_names = []
+    for root, dirs, files in os.walk(path):
+        for file_name in files:
+            object_names.append(os.path.join(root, file_name))
+    skip = len(path) + 1
+    object_names = [n[skip:] for n in object_names]
+    object_names.sort()
+    start_pos = 0
+    if marker:
+        start_pos = bisect.bisect_right(object_names, marker, start_pos)
+    contents = []
+    for object_name in object_names[start_pos:start_pos + max_keys]:
+        info = os.stat(os.path.join(path, object_name))
+        contents.append((object_name, info.st_size, info.st_mtime))
+    return contents
+
+
+def index_list(app, bucket_name, marker, max_keys):
+    index = s3server.BucketIndex(os.path.join(
+        app.directory, s3server.INDEX_DIRECTORY, bucket_name))
+    contents = []
+    for entry in index.list(marker=marker):
+        if len(contents) >= max_keys:
+            break
+        contents.append(tuple(entry))
+    return contents
+
+
+def bench_list(app, objects, max_keys):
+    _request(app, 'PUT', '/listing/')
+    for i in range(objects):
+        _request(app, 'PUT', '/listing/object-%08d' % i, body='x')
+
+    results = {}
+    print('%-10s %14s %10s' % ('listing', 'pages', 'ms'))
+    for name, list_objects in (('walk', legacy_list),
+                               ('index', index_list)):
+        found = []
+        pages = 0
+        start = time.time()
+        while True:
+            marker = found[-1][0] if found else ''
+            page = list_objects(app, 'listing', marker, max_keys)
+            if not page:
+                break
+            pages += 1
+            found.extend(page)
+        elapsed = time.time() - start
+        results[name] = [entry[:2] for entry in found]
+        print('%-10s %14d %10.1f' % (name, pages, elapsed * 1000))
+    assert results['walk'] == results['index']
+    assert len(results['index']) == objects
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--size', type=int, default=256,
+                        help='Size of the transferred object in megabytes')
+    parser.add_argument('--objects', type=int, default=5000,
+                        help='Number of objects in the listed bucket')
+    parser.add_argument('--max-keys', type=int, default=1000,
+                        help='Number of objects listed per page')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='objectstore-bench-')
+    try:
+        app = s3server.S3Application(root)
+        bench_transfer(app, args.size * 1024 * 1024)
+        bench_list(app, args.objects, args.max_keys)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
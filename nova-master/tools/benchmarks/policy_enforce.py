@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare nova.policy.enforce() with the common policy check() it replaced.
+
+The rules of a policy file, etc/nova/policy.json by default, are checked
+for a series of requests, each of them with its own context of a member or
+an admin and a target owned by the project or not. Every request makes
+--checks checks of --rules different rules, the way a server list with the
+extensions checks the same rules for every server, and both ways must agree
+on every decision. Run from the top of the tree like:
+
+    python tools/benchmarks/policy_enforce.py --requests 1000 --checks 40
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova import context as nova_context  # noqa
+from nova.openstack.common import policy as common_policy  # noqa
+from nova import policy  # noqa
+
+CONF = cfg.CONF
+
+
+def check(ctxt, action, target):
+    # What enforce() used to do
+    policy.init()
+    return common_policy.check(action, target, ctxt.to_dict())
+
+
+def enforce(ctxt, action, target):
+    return policy.enforce(ctxt, action, target, do_raise=False)
+
+
+def make_requests(actions, count, rules, checks, seed):
+    rand = random.Random(seed)
+    requests = []
+    for i in range(count):
+        project_id = 'project-%d' % (i % 10)
+        if rand.random() < 0.1:
+            ctxt = nova_context.RequestContext('admin', project_id,
+                                               roles=['admin'])
+        else:
+            ctxt = nova_context.RequestContext('user-%d' % i, project_id,
+                                               roles=['Member'])
+        if rand.random() < 0.9:
+            target = {'project_id': project_id, 'user_id': ctxt.user_id}
+        else:
+            target = {'project_id': 'other', 'user_id': 'other'}
+        used = rand.sample(actions, rules)
+        requests.append((ctxt, target,
+                         [rand.choice(used) for _j in range(checks)]))
+    return requests
+
+
+def run(name, func, requests, repeat):
+    best = None
+    results = None
+    calls = sum(len(actions) for _ctxt, _target, actions in requests)
+    for _i in range(repeat):
+        # Every run starts with fresh requests
+        policy._COMPILED = None
+        policy.init()
+        results = []
+        start = time.time()
+        for ctxt, target, actions in requests:
+            for action in actions:
+                results.append(func(ctxt, action, target))
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print('%-10s %10.2f ms %10.2f us/check' % (name, best * 1000,
+                                               best * 1000000 / calls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--policy-file',
+                        default=os.path.join(os.path.dirname(__file__),
+                                             os.pardir, os.pardir, 'etc',
+                                             'nova', 'policy.json'))
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rules', type=int, default=10,
+                        help='Different rules checked by each request')
+    parser.add_argument('--checks', type=int, default=40,
+                        help='Checks made by each request')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('policy_file', os.path.abspath(args.policy_file))
+    policy.reset()
+    policy.init()
+    actions = sorted(common_policy._rules)
+    rules = min(args.rules, len(actions))
+    requests = make_requests(actions, args.requests, rules, args.checks, 42)
+
+    print('%d rules, %d requests of %d checks of %d rules' % (
+          len(actions), args.requests, args.checks, rules))
+    expected = run('check', check, requests, args.repeat)
+    result = run('enforce', enforce, requests, args.repeat)
+    assert result == expected, 'decisions differ'
+
+
+if __name__ == '__main__':
+    main()
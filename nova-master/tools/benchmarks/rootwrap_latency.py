@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the per-command latency of nova-rootwrap and nova-rootwrap-daemon.
+
+A throwaway rootwrap.conf allowing only the benchmarked command is written to
+a temporary directory, so no sudo or root access is needed. Run from the top
+of the tree like:
+
+    python tools/benchmarks/rootwrap_latency.py --count 200 -- echo hello
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova.openstack.common import processutils  # noqa
+
+ROOTWRAP_CONF = """[DEFAULT]
+filters_path=%(filters_path)s
+exec_dirs=/sbin,/usr/sbin,/bin,/usr/bin
+"""
+
+FILTERS = """[Filters]
+%(name)s: CommandFilter, %(name)s, root
+"""
+
+
+def helper(entry_point, config):
+    code = ('from nova.openstack.common.rootwrap import cmd; cmd.%s()'
+            % entry_point)
+    return [sys.executable, '-c', code, config]
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    total = sum(timings)
+    print('%-20s %6d cmds  mean %8.3f ms  p50 %8.3f ms  p99 %8.3f ms' % (
+          name, len(timings), 1000 * total / len(timings),
+          1000 * timings[len(timings) // 2],
+          1000 * timings[int(len(timings) * 0.99)]))
+
+
+def bench_rootwrap(config, command, count):
+    timings = []
+    for _i in xrange(count):
+        start = time.time()
+        processutils.execute(*(helper('main', config) + command))
+        timings.append(time.time() - start)
+    return timings
+
+
+def bench_daemon(config, command, count):
+    daemon_helper = subprocess.list2cmdline(helper('daemon', config))
+    # Start the daemon outside of the timed loop, services only pay for
+    # this once.
+    processutils._get_rootwrap_daemon(daemon_helper)
+    timings = []
+    for _i in xrange(count):
+        start = time.time()
+        returncode, _out, err = processutils._execute_with_rootwrap_daemon(
+            daemon_helper, command, None)
+        timings.append(time.time() - start)
+        if returncode:
+            raise processutils.ProcessExecutionError(exit_code=returncode,
+                                                     stderr=err)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100,
+                        help='number of commands to run in each mode')
+    parser.add_argument('command', nargs='*', default=['true'],
+                        help='command to run (default: true)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filters_path = os.path.join(tmpdir, 'rootwrap.d')
+        os.mkdir(filters_path)
+        with open(os.path.join(filters_path, 'bench.filters'), 'w') as f:
+            f.write(FILTERS % {'name': args.command[0]})
+        config = os.path.join(tmpdir, 'rootwrap.conf')
+        with open(config, 'w') as f:
+            f.write(ROOTWRAP_CONF % {'filters_path': filters_path})
+
+        report('nova-rootwrap', bench_rootwrap(config, args.command,
+                                               args.count))
+        report('nova-rootwrap-daemon', bench_daemon(config, args.command,
+                                                    args.count))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the RPC envelope formats on size and encode/decode time.
+
+Messages are read from a file holding one JSON message per line, for instance
+the payloads of a conductor queue dumped with:
+
+    rabbitmqadmin get queue=conductor requeue=true count=500 \\
+        --format=raw_json
+
+Lines may hold either envelopes or bare messages.  Without a file, messages
+shaped like the instance updates and object_action calls that nova-compute
+sends to nova-conductor are generated.  The envelope is JSON encoded as the
+kombu driver would, and decoded back, for every combination of codec and
+compression available. Run from the top of the tree like:
+
+    python tools/benchmarks/rpc_envelope.py --payloads conductor.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova.openstack.common.rpc import common as rpc_common  # noqa
+
+CONF = cfg.CONF
+
+
+def load_payloads(path):
+    messages = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if not isinstance(data, list):
+                data = [data]
+            for msg in data:
+                # rabbitmqadmin wraps the message body
+                if isinstance(msg, dict) and 'payload' in msg:
+                    msg = json.loads(msg['payload'])
+                messages.append(rpc_common.deserialize_msg(msg))
+    return messages
+
+
+def _context():
+    return {'_context_user_id': 'a1f6f27c6b7e4b4e9bb1b0c4f0d8d5b0',
+            '_context_project_id': '7b8dc6d5a2c84d4e8c1c3d5d0e9f8a7b',
+            '_context_request_id': 'req-%s' % uuid.uuid4(),
+            '_context_roles': ['admin', 'Member'],
+            '_context_is_admin': True,
+            '_context_read_deleted': 'no',
+            '_context_timestamp': '2013-10-01T12:00:00.000000',
+            '_context_auth_token': 'x' * 4000,
+            '_context_service_catalog': [],
+            '_context_quota_class': None}
+
+
+def _instance(i):
+    sys_meta = {}
+    for prefix in ('', 'old_', 'new_'):
+        for key, value in (('memory_mb', 2048), ('vcpus', 2),
+                           ('root_gb', 20), ('ephemeral_gb', 0),
+                           ('flavorid', '3'), ('swap', 0),
+                           ('rxtx_factor', 1.0), ('vcpu_weight', None),
+                           ('id', 3), ('name', 'm1.medium')):
+            sys_meta['%sinstance_type_%s' % (prefix, key)] = value
+    sys_meta['image_base_image_ref'] = str(uuid.uuid4())
+    vifs = [{'id': str(uuid.uuid4()),
+             'address': 'fa:16:3e:00:00:%02x' % n,
+             'type': 'bridge',
+             'devname': 'tap%d' % n,
+             'ovs_interfaceid': None,
+             'qbh_params': None,
+             'qbg_params': None,
+             'meta': {},
+             'network': {'id': str(uuid.uuid4()),
+                         'bridge': 'br100',
+                         'label': 'private',
+                         'tenant_id': None,
+                         'meta': {'multi_host': False,
+                                  'should_create_bridge': True},
+                         'subnets': [{'cidr': '10.0.%d.0/24' % n,
+                                      'dns': [{'address': '8.8.8.8',
+                                               'type': 'dns',
+                                               'version': 4,
+                                               'meta': {}}],
+                                      'gateway': {'address': '10.0.%d.1' % n,
+                                                  'type': 'gateway',
+                                                  'version': 4,
+                                                  'meta': {}},
+                                      'ips': [{'address': '10.0.%d.%d' % (
+                                                   n, i % 250 + 2),
+                                               'type': 'fixed',
+                                               'version': 4,
+                                               'floating_ips': [],
+                                               'meta': {}}],
+                                      'routes': [],
+                                      'version': 4,
+                                      'meta': {'dhcp_server': '10.0.0.1'}}]}}
+            for n in range(2)]
+    return {'id': i,
+            'uuid': str(uuid.uuid4()),
+            'user_id': 'a1f6f27c6b7e4b4e9bb1b0c4f0d8d5b0',
+            'project_id': '7b8dc6d5a2c84d4e8c1c3d5d0e9f8a7b',
+            'image_ref': str(uuid.uuid4()),
+            'hostname': 'server-%d' % i,
+            'display_name': 'server-%d' % i,
+            'host': 'compute-%d' % (i % 100),
+            'node': 'compute-%d' % (i % 100),
+            'vm_state': 'active',
+            'task_state': None,
+            'power_state': 1,
+            'memory_mb': 2048,
+            'vcpus': 2,
+            'root_gb': 20,
+            'ephemeral_gb': 0,
+            'instance_type_id': 3,
+            'launched_at': '2013-10-01T12:00:00.000000',
+            'created_at': '2013-10-01T11:58:00.000000',
+            'updated_at': '2013-10-01T12:00:05.000000',
+            'metadata': {},
+            'system_metadata': sys_meta,
+            'info_cache': {'instance_uuid': None,
+                           'network_info': json.dumps(vifs)},
+            'security_groups': [{'name': 'default',
+                                 'description': 'default',
+                                 'rules': []}]}
+
+
+def synthetic_payloads(count):
+    messages = []
+    for i in range(count):
+        instance = _instance(i)
+        msg = _context()
+        if i % 2:
+            msg.update({'method': 'instance_update',
+                        'version': '1.38',
+                        'args': {'instance_uuid': instance['uuid'],
+                                 'updates': {'vm_state': 'active',
+                                             'task_state': None,
+                                             'power_state': 1},
+                                 'service': 'compute'}})
+        else:
+            msg.update({'method': 'object_action',
+                        'version': '1.58',
+                        'args': {'objinst': {
+                                     'nova_object.name': 'Instance',
+                                     'nova_object.namespace': 'nova',
+                                     'nova_object.version': '1.9',
+                                     'nova_object.data': instance,
+                                     'nova_object.changes': ['task_state']},
+                                 'objmethod': 'save',
+                                 'args': [],
+                                 'kwargs': {'expected_task_state':
+                                            'spawning'}}})
+        messages.append(msg)
+    return messages
+
+
+def bench(messages, codec, compression, repeat):
+    if codec is None:
+        CONF.set_override('rpc_envelope_version', '2.0')
+    else:
+        CONF.set_override('rpc_envelope_version', '2.1')
+        CONF.set_override('rpc_message_codec', codec)
+        CONF.set_override('rpc_message_compression', compression)
+
+    encode_time = decode_time = None
+    for _i in range(repeat):
+        start = time.time()
+        wire = [json.dumps(rpc_common.serialize_msg(msg))
+                for msg in messages]
+        encoded = time.time()
+        decoded = [rpc_common.deserialize_msg(json.loads(data))
+                   for data in wire]
+        done = time.time()
+        encode_time = min(encode_time or encoded - start, encoded - start)
+        decode_time = min(decode_time or done - encoded, done - encoded)
+
+    assert decoded == [rpc_common.deserialize_msg(json.loads(json.dumps(
+        {'oslo.version': '2.0', 'oslo.message': json.dumps(msg)})))
+        for msg in messages]
+
+    name = '2.0 json' if codec is None else '2.1 %s%s' % (
+        codec, '+' + compression if compression else '')
+    print('%-22s %12d %10.2f %10.2f' % (
+          name, sum(len(data) for data in wire),
+          encode_time * 1000, decode_time * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--payloads',
+                        help='File of recorded messages, one per line')
+    parser.add_argument('--count', type=int, default=500,
+                        help='Number of generated messages')
+    parser.add_argument('--threshold', type=int, default=0,
+                        help='rpc_message_compression_threshold')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    CONF.set_override('rpc_message_compression_threshold', args.threshold)
+    if args.payloads:
+        messages = load_payloads(args.payloads)
+    else:
+        messages = synthetic_payloads(args.count)
+
+    print('%d messages' % len(messages))
+    print('%-22s %12s %10s %10s' % ('envelope', 'bytes', 'encode ms',
+                                    'decode ms'))
+    bench(messages, None, None, args.repeat)
+    codecs = ['json']
+    if rpc_common.msgpack is not None:
+        codecs.append('msgpack')
+    compressions = [None, 'zlib']
+    if rpc_common.lz4 is not None:
+        compressions.append('lz4')
+    for codec in codecs:
+        for compression in compressions:
+            bench(messages, codec, compression, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare rpc call() and call_async() throughput and latency.
+
+Concurrent greenthreads make calls through the shared AMQP code, the way the
+kombu driver does, over a local fake transport: messages are delivered in
+process, and every operation that needs a round trip to the broker with
+kombu (declaring the exchange of a publisher, closing and opening a channel
+when a connection goes back to the pool) sleeps for --rtt milliseconds.
+impl_fake itself is not used because it dispatches calls directly and never
+goes through the connection pool and reply queue being measured here.
+
+Each greenthread either does call(), or does call_async() for --pipeline
+calls before waiting on all of them. Run from the top of the tree like:
+
+    python tools/benchmarks/rpc_pipelining.py --threads 500 --calls 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import eventlet
+eventlet.monkey_patch()
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova.openstack.common.rpc import amqp as rpc_amqp  # noqa
+from nova.openstack.common.rpc import common as rpc_common  # noqa
+
+CONF = cfg.CONF
+CONF.import_opt('rpc_conn_pool_size', 'nova.openstack.common.rpc')
+CONF.import_opt('rpc_response_timeout', 'nova.openstack.common.rpc')
+
+# Queue name -> callback of its direct consumer
+_DIRECT = {}
+
+
+class FakeConnection(object):
+    """In process connection costing --rtt per broker round trip."""
+
+    pool = None
+    rtt = 0.0
+
+    def __init__(self, conf, server_params=None):
+        self.conf = conf
+
+    def _round_trip(self):
+        if self.rtt:
+            eventlet.sleep(self.rtt)
+
+    def reset(self):
+        # channel.close() and connection.channel()
+        self._round_trip()
+        self._round_trip()
+
+    def close(self):
+        pass
+
+    def declare_direct_consumer(self, topic, callback):
+        _DIRECT[topic] = callback
+
+    def consume_in_thread(self):
+        pass
+
+    def direct_send(self, msg_id, msg):
+        self._round_trip()
+        callback = _DIRECT[msg_id]
+        msg = rpc_common.deserialize_msg(msg)
+        eventlet.spawn_n(callback, msg)
+
+    def _deliver(self, msg):
+        msg = rpc_common.deserialize_msg(msg)
+        eventlet.spawn_n(_serve, self.conf, msg)
+
+    def topic_send(self, topic, msg, timeout=None):
+        self._round_trip()
+        self._deliver(msg)
+
+    def topic_send_batch(self, messages):
+        topics = set()
+        for topic, msg, timeout in messages:
+            if topic not in topics:
+                self._round_trip()
+                topics.add(topic)
+            self._deliver(msg)
+
+
+def _serve(conf, msg):
+    """Answer a call the way ProxyCallback would, on its own pool."""
+    reply = msg['args']['value']
+    rpc_amqp.msg_reply(conf, msg['_msg_id'], msg['_reply_q'], ServerPool.pool,
+                       reply=reply)
+    rpc_amqp.msg_reply(conf, msg['_msg_id'], msg['_reply_q'], ServerPool.pool,
+                       ending=True)
+
+
+class ServerPool(FakeConnection):
+    pool = None
+
+
+def _msg(value):
+    return {'method': 'echo', 'args': {'value': value}}
+
+
+def worker(context, calls, pipeline, latencies):
+    pool = rpc_amqp.get_connection_pool(CONF, FakeConnection)
+    done = 0
+    while done < calls:
+        count = min(pipeline, calls - done) if pipeline else 1
+        start = time.time()
+        if pipeline:
+            futures = [rpc_amqp.call_async(CONF, context, 'bench',
+                                           _msg(done + i), None, pool)
+                       for i in range(count)]
+            results = []
+            for future in futures:
+                results.append(future.wait())
+                latencies.append(time.time() - start)
+        else:
+            results = [rpc_amqp.call(CONF, context, 'bench', _msg(done),
+                                     None, pool)]
+            latencies.append(time.time() - start)
+        assert results == range(done, done + count), results
+        done += count
+
+
+def run(name, threads, calls, pipeline):
+    FakeConnection.pool = None
+    ServerPool.pool = rpc_amqp.Pool(CONF, ServerPool)
+    context = rpc_common.CommonRpcContext(user_id='bench',
+                                          project_id='bench')
+    latencies = []
+    pool = eventlet.GreenPool(threads)
+    start = time.time()
+    for _i in range(threads):
+        pool.spawn_n(worker, context, calls, pipeline, latencies)
+    pool.waitall()
+    elapsed = time.time() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print('%-16s %10d %12.1f %10.2f %10.2f' % (
+          name, len(latencies), len(latencies) / elapsed,
+          p50 * 1000, p99 * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--threads', type=int, default=500,
+                        help='Number of concurrent greenthreads')
+    parser.add_argument('--calls', type=int, default=20,
+                        help='Calls made by each greenthread')
+    parser.add_argument('--pipeline', type=int, default=10,
+                        help='Calls made by call_async() before waiting')
+    parser.add_argument('--rtt', type=float, default=0.5,
+                        help='Broker round trip time in milliseconds')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    logging.basicConfig(level=logging.ERROR)
+    FakeConnection.rtt = args.rtt / 1000.0
+
+    print('%d greenthreads, %d calls each, rpc_conn_pool_size %d' % (
+          args.threads, args.calls, CONF.rpc_conn_pool_size))
+    print('%-16s %10s %12s %10s %10s' % ('mode', 'calls', 'calls/sec',
+                                         'p50 ms', 'p99 ms'))
+    run('call', args.threads, args.calls, 0)
+    run('call_async x%d' % args.pipeline, args.threads, args.calls,
+        args.pipeline)
+    run('call_async x1', args.threads, args.calls, 1)
+
+
+if __name__ == '__main__':
+    main()
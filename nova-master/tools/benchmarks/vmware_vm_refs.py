@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Count the round trips and objects needed to look up VMs with the VMware
+driver.
+
+--vms VirtualMachines are registered with the fake vCenter of
+nova.virt.vmwareapi.fake and VMs of random instances are looked up, the way
+get_info() or power_off() start, either by listing the names of all the
+VMs like vm_util.get_vm_ref_from_uuid() or through the VMRefCache of the
+session. Every --churn lookups a VM is created and another one destroyed,
+and the cache is invalidated as the driver does. Both must find the same
+VMs. The times include the work of the fake server. Run from the top of
+the tree like:
+
+    python tools/benchmarks/vmware_vm_refs.py --vms 5000 --lookups 1000
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova.virt.vmwareapi import driver  # noqa
+from nova.virt.vmwareapi import fake  # noqa
+from nova.virt.vmwareapi import vm_util  # noqa
+
+CONF = cfg.CONF
+
+
+class CountingVim(fake.FakeVim):
+    """Fake vCenter counting the calls and the objects it returns."""
+
+    calls = 0
+    objects = 0
+
+    def _retrieve_properties(self, method, *args, **kwargs):
+        result = super(CountingVim, self)._retrieve_properties(
+                method, *args, **kwargs)
+        CountingVim.calls += 1
+        CountingVim.objects += len(result.objects)
+        return result
+
+    def _wait_for_updates(self, method, *args, **kwargs):
+        result = super(CountingVim, self)._wait_for_updates(
+                method, *args, **kwargs)
+        CountingVim.calls += 1
+        if result:
+            CountingVim.objects += sum(len(filter_update.objectSet)
+                                       for filter_update in result.filterSet)
+        return result
+
+
+class Session(driver.VMwareAPISession):
+    def _get_vim_object(self):
+        return CountingVim()
+
+    def _is_vim_object(self, module):
+        return isinstance(module, fake.FakeVim)
+
+
+def _create_vm(name):
+    vm = fake.VirtualMachine(name=name)
+    fake._create_object('VirtualMachine', vm)
+    return vm
+
+
+def scan(session, name):
+    return vm_util.get_vm_ref_from_uuid(session, name)
+
+
+def cached(session, name):
+    return session.vm_ref_cache.get(name)
+
+
+def run(label, lookup, vms, lookups, churn, seed):
+    fake.reset()
+    names = []
+    for i in range(vms):
+        names.append('vm-%d' % i)
+        _create_vm(names[-1])
+    session = Session()
+    rand = random.Random(seed)
+    CountingVim.calls = CountingVim.objects = 0
+
+    found = []
+    start = time.time()
+    for i in range(lookups):
+        if churn and i and not i % churn:
+            victim = names.pop(rand.randrange(len(names)))
+            for mdo_ref, mdo in fake._db_content['VirtualMachine'].items():
+                if mdo.get('name') == victim:
+                    del fake._db_content['VirtualMachine'][mdo_ref]
+            names.append('vm-new-%d' % i)
+            _create_vm(names[-1])
+            session.vm_ref_cache.invalidate()
+        vm_ref = lookup(session, rand.choice(names))
+        found.append(fake._get_object(vm_ref).get('name'))
+    elapsed = time.time() - start
+    print('%-10s %10d %12d %12.3f' % (label, CountingVim.calls,
+                                      CountingVim.objects,
+                                      elapsed * 1000 / lookups))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--vms', type=int, default=5000,
+                        help='Number of VMs in the fake vCenter')
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--churn', type=int, default=50,
+                        help='Lookups between VM creations, 0 for none')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    print('%d VMs, %d lookups' % (args.vms, args.lookups))
+    print('%-10s %10s %12s %12s' % ('lookup', 'calls', 'objects',
+                                    'ms/lookup'))
+    expected = run('scan', scan, args.vms, args.lookups, args.churn, 42)
+    result = run('cache', cached, args.vms, args.lookups, args.churn, 42)
+    assert result == expected, 'cache found other VMs'
+
+
+if __name__ == '__main__':
+    main()
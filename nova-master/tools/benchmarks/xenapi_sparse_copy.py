@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Time the sparse copy of images done by the XenAPI driver.
+
+Sparse source files are generated, with a mix of data, blocks of zeros and
+holes, and copied by the block at a time loop _sparse_copy used to run and by
+nova.virt.xenapi.vm_utils._sparse_copy. Both copies must hold the same data.
+Run from the top of the tree like:
+
+    python tools/benchmarks/xenapi_sparse_copy.py --size 1024 --data 0.2
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova import unit  # noqa
+from nova.virt.xenapi import vm_utils  # noqa
+
+BLOCK_SIZE = 4096
+
+
+def block_sparse_copy(src_path, dst_path, virtual_size,
+                      block_size=BLOCK_SIZE):
+    empty_block = '\0' * block_size
+    left = virtual_size
+    with open(src_path, 'r') as src:
+        with open(dst_path, 'w') as dst:
+            data = src.read(min(block_size, left))
+            while data:
+                if data == empty_block:
+                    dst.seek(block_size, os.SEEK_CUR)
+                else:
+                    dst.write(data)
+                left -= len(data)
+                if left <= 0:
+                    break
+                data = src.read(min(block_size, left))
+                vm_utils.greenthread.sleep(0)
+
+
+def make_source(path, size, data_ratio, zero_ratio, rand):
+    """Writes runs of data and zeros, leaving holes in between."""
+    run = 256 * unit.Ki
+    with open(path, 'w') as f:
+        for offset in range(0, size, run):
+            kind = rand.random()
+            if kind < data_ratio:
+                f.seek(offset)
+                f.write(os.urandom(min(run, size - offset)))
+            elif kind < data_ratio + zero_ratio:
+                f.seek(offset)
+                f.write('\0' * min(run, size - offset))
+        f.truncate(size)
+
+
+def read_padded(path, size):
+    with open(path) as f:
+        data = f.read()
+    return data + '\0' * (size - len(data))
+
+
+def run(name, func, src_path, dst_path, size, repeat):
+    best = None
+    for _i in range(repeat):
+        # Like the attached VDI, the destination already exists
+        open(dst_path, 'w').close()
+        start = time.time()
+        func(src_path, dst_path, size)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print('%-12s %10.2f ms %10d KiB allocated' % (
+          name, best * 1000, os.stat(dst_path).st_blocks // 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--size', type=int, default=1024,
+                        help='Virtual size of the image in MiB')
+    parser.add_argument('--data', type=float, default=0.2,
+                        help='Fraction of the image holding data')
+    parser.add_argument('--zeros', type=float, default=0.2,
+                        help='Fraction of the image holding written zeros')
+    parser.add_argument('--tmpdir',
+                        help='Directory for the images, on the file system '
+                             'being measured')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    size = args.size * unit.Mi
+    tmpdir = tempfile.mkdtemp(dir=args.tmpdir)
+    try:
+        src_path = os.path.join(tmpdir, 'src')
+        block_path = os.path.join(tmpdir, 'block')
+        extent_path = os.path.join(tmpdir, 'extent')
+        make_source(src_path, size, args.data, args.zeros, random.Random(42))
+
+        print('%d MiB, %d%% data, %d%% zeros, %d KiB allocated' % (
+              args.size, args.data * 100, args.zeros * 100,
+              os.stat(src_path).st_blocks // 2))
+        run('block', block_sparse_copy, src_path, block_path, size,
+            args.repeat)
+        run('extent', vm_utils._sparse_copy, src_path, extent_path, size,
+            args.repeat)
+        assert read_padded(block_path, size) == read_padded(extent_path,
+                                                            size), \
+            'copies differ'
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Count the XenAPI calls made to find the unused cached images of an SR.
+
+An SR holding cached images, some of them used by instance disks, and
+standalone VDIs is created in nova.virt.xenapi.fake. The per VDI lookups
+vm_utils used to do are compared with
+nova.virt.xenapi.vm_utils.destroy_cached_images, in dry run mode. Both must
+find the same images. Run from the top of the tree like:
+
+    python tools/benchmarks/xenapi_vdi_scan.py --vdis 10000 --images 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from oslo.config import cfg  # noqa
+
+from nova.virt.xenapi import fake  # noqa
+from nova.virt.xenapi import vm_utils  # noqa
+
+CONF = cfg.CONF
+
+
+class CountingSession(object):
+    """Calls nova.virt.xenapi.fake, counting the calls."""
+
+    XenAPI = fake
+
+    def __init__(self):
+        self._session = fake.SessionBase('http://localhost')
+        self._session.xenapi_request('login_with_password', ('root', ''))
+        self.host_ref = fake.get_all('host')[0]
+        self.calls = 0
+
+    def call_xenapi(self, method, *args):
+        self.calls += 1
+        return self._session.xenapi_request(method, args)
+
+    def get_rec(self, record_type, ref):
+        try:
+            return self.call_xenapi('%s.get_record' % record_type, ref)
+        except fake.Failure as e:
+            if e.details[0] != 'HANDLE_INVALID':
+                raise
+
+
+def _vdi(sr_ref, parent_ref=None, image_id=None):
+    sm_config = {'vhd-parent': None}
+    if parent_ref:
+        sm_config['vhd-parent'] = fake.get_record('VDI', parent_ref)['uuid']
+    other_config = {}
+    if image_id:
+        other_config['image-id'] = image_id
+    vdi_ref = fake.create_vdi('vdi', sr_ref, sm_config=sm_config,
+                              other_config=other_config)
+    fake.get_record('SR', sr_ref)['VDIs'].append(vdi_ref)
+    return vdi_ref
+
+
+def make_sr(session, vdis, images, rand):
+    """Returns the default SR, filled with base copies, cached images and
+    instance disks chained to them, and standalone VDIs.
+    """
+    sr_ref = vm_utils.safe_find_sr(session)
+    fake.get_record('SR', sr_ref)['VDIs'] = []
+    count = 0
+    for i in range(images):
+        base_ref = _vdi(sr_ref)
+        _vdi(sr_ref, base_ref, image_id='image-%d' % i)
+        count += 2
+        for _j in range(rand.choice([0, 0, 1, 3])):
+            _vdi(sr_ref, base_ref)
+            count += 1
+    for _i in range(vdis - count):
+        _vdi(sr_ref)
+    return sr_ref
+
+
+def _legacy_get_all_vdis_in_sr(session, sr_ref):
+    for vdi_ref in session.call_xenapi('SR.get_VDIs', sr_ref):
+        vdi_rec = session.get_rec('VDI', vdi_ref)
+        if vdi_rec:
+            yield vdi_ref, vdi_rec
+
+
+def _legacy_get_vhd_parent_uuid(session, vdi_ref):
+    vdi_rec = session.call_xenapi('VDI.get_record', vdi_ref)
+    return vdi_rec['sm_config'].get('vhd-parent')
+
+
+def _legacy_walk_vdi_chain(session, vdi_uuid):
+    vm_utils.scan_default_sr(session)
+    while True:
+        vdi_ref = session.call_xenapi('VDI.get_by_uuid', vdi_uuid)
+        vdi_rec = session.call_xenapi('VDI.get_record', vdi_ref)
+        yield vdi_rec
+        parent_uuid = _legacy_get_vhd_parent_uuid(session, vdi_ref)
+        if not parent_uuid:
+            break
+        vdi_uuid = parent_uuid
+
+
+def _legacy_child_vhds(session, sr_ref, vdi_uuid):
+    children = set()
+    for ref, rec in _legacy_get_all_vdis_in_sr(session, sr_ref):
+        if rec['uuid'] == vdi_uuid:
+            continue
+        if _legacy_get_vhd_parent_uuid(session, ref) == vdi_uuid:
+            children.add(rec['uuid'])
+    return children
+
+
+def legacy_destroy_cached_images(session, sr_ref, dry_run=True):
+    cached_images = {}
+    for vdi_ref, vdi_rec in _legacy_get_all_vdis_in_sr(session, sr_ref):
+        if 'image-id' in vdi_rec['other_config']:
+            cached_images[vdi_rec['other_config']['image-id']] = vdi_ref
+
+    destroyed = set()
+    for vdi_ref in cached_images.values():
+        vdi_uuid = session.call_xenapi('VDI.get_uuid', vdi_ref)
+        chain = list(_legacy_walk_vdi_chain(session, vdi_uuid))
+        if len(chain) > 2:
+            continue
+        elif len(chain) == 2:
+            children = _legacy_child_vhds(session, sr_ref, chain[-1]['uuid'])
+            if len(children) > 1:
+                continue
+        destroyed.add(vdi_uuid)
+    return destroyed
+
+
+def run(name, func, session, sr_ref):
+    session.calls = 0
+    start = time.time()
+    destroyed = func(session, sr_ref, dry_run=True)
+    elapsed = time.time() - start
+    print('%-8s %10d calls %10.2f ms %6d unused' % (
+          name, session.calls, elapsed * 1000, len(destroyed)))
+    return destroyed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--vdis', type=int, default=10000,
+                        help='Number of VDIs in the SR')
+    parser.add_argument('--images', type=int, default=200,
+                        help='Number of cached images in the SR')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    fake.reset()
+    session = CountingSession()
+    sr_ref = make_sr(session, args.vdis, args.images, random.Random(42))
+
+    print('%d VDIs, %d cached images' % (args.vdis, args.images))
+    expected = run('legacy', legacy_destroy_cached_images, session, sr_ref)
+    destroyed = run('bulk', vm_utils.destroy_cached_images, session, sr_ref)
+    assert destroyed == expected, 'unused images differ'
+
+
+if __name__ == '__main__':
+    main()
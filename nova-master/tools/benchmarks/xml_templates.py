@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare compiled and tree walking XML serialization of API templates.
+
+Responses of servers/detail, with the extended status extension attached,
+flavors/detail and images/detail are serialized with Template.serialize(),
+which renders compiled templates, and with the Template._serialize() tree
+walk it replaces.  Both must give the same bytes.  The templates are built
+the way the TemplateBuilders of nova.api.openstack.compute build them.
+Run from the top of the tree like:
+
+    python tools/benchmarks/xml_templates.py --count 1000
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+from lxml import etree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                os.pardir, os.pardir)))
+
+from nova.api.openstack import common  # noqa
+from nova.api.openstack.compute.contrib import extended_status  # noqa
+from nova.api.openstack import xmlutil  # noqa
+
+NSMAP = {None: xmlutil.XMLNS_V11, 'atom': xmlutil.XMLNS_ATOM}
+
+
+def _metadata(parent):
+    root = common.MetadataTemplateElement('metadata', selector='metadata')
+    elem = xmlutil.SubTemplateElement(root, 'meta',
+                                      selector=xmlutil.get_items)
+    elem.set('key', 0)
+    elem.text = 1
+    parent.append(root)
+
+
+def _addresses(parent):
+    root = xmlutil.SubTemplateElement(parent, 'addresses',
+                                      selector='addresses')
+    elem = xmlutil.SubTemplateElement(root, 'network',
+                                      selector=xmlutil.get_items)
+    elem.set('id', 0)
+    ip = xmlutil.SubTemplateElement(elem, 'ip', selector=1)
+    ip.set('version')
+    ip.set('addr')
+
+
+def servers_template():
+    root = xmlutil.TemplateElement('servers')
+    elem = xmlutil.SubTemplateElement(root, 'server', selector='servers')
+    for key in ('name', 'id', 'updated', 'created', 'hostId', 'accessIPv4',
+                'accessIPv6', 'status', 'progress', 'reservation_id'):
+        elem.set(key)
+    elem.set('userId', 'user_id')
+    elem.set('tenantId', 'tenant_id')
+    for name in ('image', 'flavor'):
+        sub = xmlutil.SubTemplateElement(elem, name, selector=name)
+        sub.set('id')
+        xmlutil.make_links(sub, 'links')
+    fault = xmlutil.SubTemplateElement(elem, 'fault', selector='fault')
+    fault.set('code')
+    fault.set('created')
+    xmlutil.SubTemplateElement(fault, 'message').text = 'message'
+    xmlutil.SubTemplateElement(fault, 'details').text = 'details'
+    _metadata(elem)
+    _addresses(elem)
+    xmlutil.make_links(elem, 'links')
+    template = xmlutil.MainTemplate(root, 1, nsmap=NSMAP)
+    template.attach(extended_status.ExtendedStatusesTemplate())
+    return template
+
+
+def flavors_template():
+    root = xmlutil.TemplateElement('flavors')
+    elem = xmlutil.SubTemplateElement(root, 'flavor', selector='flavors')
+    for key in ('name', 'id', 'ram', 'disk'):
+        elem.set(key)
+    elem.set('vcpus', xmlutil.EmptyStringSelector('vcpus'))
+    xmlutil.make_links(elem, 'links')
+    return xmlutil.MainTemplate(root, 1, nsmap=NSMAP)
+
+
+def images_template():
+    root = xmlutil.TemplateElement('images')
+    elem = xmlutil.SubTemplateElement(root, 'image', selector='images')
+    for key in ('name', 'id', 'updated', 'created', 'status', 'progress',
+                'minRam', 'minDisk'):
+        elem.set(key)
+    server = xmlutil.SubTemplateElement(elem, 'server', selector='server')
+    server.set('id')
+    xmlutil.make_links(server, 'links')
+    _metadata(elem)
+    xmlutil.make_links(elem, 'links')
+    return xmlutil.MainTemplate(root, 1, nsmap=NSMAP)
+
+
+def _links(kind, item_id):
+    url = 'http://localhost:8774/v2/openstack/%s/%s' % (kind, item_id)
+    return [{'rel': 'self', 'href': url},
+            {'rel': 'bookmark', 'href': url.replace('/v2', '')}]
+
+
+def servers(count):
+    result = []
+    for i in range(count):
+        server_id = str(uuid.uuid4())
+        result.append({
+            'id': server_id,
+            'name': u'server-\xe9-%d' % i,
+            'user_id': 'fake', 'tenant_id': 'openstack',
+            'updated': '2013-10-01T12:00:00Z',
+            'created': '2013-10-01T11:58:00Z',
+            'hostId': 'a' * 56,
+            'accessIPv4': '', 'accessIPv6': '',
+            'status': 'ACTIVE', 'progress': 100,
+            'image': {'id': '155d900f', 'links': _links('images', '155d')},
+            'flavor': {'id': '1', 'links': _links('flavors', '1')},
+            'metadata': {'group': 'web', 'index': str(i)},
+            'addresses': {'private': [{'version': 4,
+                                       'addr': '10.0.0.%d' % (i % 250)}]},
+            'links': _links('servers', server_id),
+            'OS-EXT-STS:task_state': None,
+            'OS-EXT-STS:vm_state': 'active',
+            'OS-EXT-STS:power_state': 1})
+    return {'servers': result}
+
+
+def flavors(count):
+    return {'flavors': [{'id': str(i), 'name': 'flavor-%d' % i,
+                         'ram': 512 * i, 'disk': i, 'vcpus': '',
+                         'links': _links('flavors', i)}
+                        for i in range(count)]}
+
+
+def images(count):
+    return {'images': [{'id': str(i), 'name': 'image-%d' % i,
+                        'updated': '2013-10-01T12:00:00Z',
+                        'created': '2013-10-01T11:58:00Z',
+                        'status': 'ACTIVE', 'progress': 100,
+                        'minRam': 0, 'minDisk': 0,
+                        'server': {'id': 'abc', 'links': _links('servers',
+                                                                'abc')},
+                        'metadata': {'kernel_id': 'nokernel'},
+                        'links': _links('images', i)}
+                       for i in range(count)]}
+
+
+def tree_walk(template, obj):
+    elem = template._serialize(None, obj, template._siblings(),
+                               template._nsmap())
+    return etree.tostring(elem, **template.serialize_options)
+
+
+def _best(func, args, repeat):
+    best = None
+    result = None
+    for _i in range(repeat):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000, result
+
+
+def run(name, template, obj, repeat):
+    walk_time, expected = _best(tree_walk, (template, obj), repeat)
+    compiled_time, result = _best(template.serialize, (obj,), repeat)
+    assert result == expected, '%s output differs' % name
+    print('%-16s %10d %12.2f %12.2f' % (name, len(result), walk_time,
+                                        compiled_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=1000,
+                        help='Number of items in each response')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%d items per response' % args.count)
+    print('%-16s %10s %12s %12s' % ('response', 'bytes', 'tree walk ms',
+                                    'compiled ms'))
+    run('servers/detail', servers_template(), servers(args.count),
+        args.repeat)
+    run('flavors/detail', flavors_template(), flavors(args.count),
+        args.repeat)
+    run('images/detail', images_template(), images(args.count),
+        args.repeat)
+
+
+if __name__ == '__main__':
+    main()